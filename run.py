@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Shopping Bot Application Entry Point – Production-Safe
-- Works under both Gunicorn (WSGI import) and python CLI.
+- Works under Gunicorn (WSGI: `run:app`), Hypercorn (ASGI: `run:asgi_app`) and python CLI.
 - Ensures smart logging is initialized exactly once per process.
 - Aligns Flask app logger with root logger for consistent output.
 """
@@ -21,6 +21,7 @@ load_dotenv()
 
 # Local imports after env load
 from shopping_bot import create_app  # your app factory
+from shopping_bot.asgi import create_asgi_app
 from shopping_bot.utils.smart_logger import LogLevel, configure_logging
 
 # --------------------------------------------------------------------------------------
@@ -240,5 +241,11 @@ except Exception:
 
 app = create_application(strict_env=False)
 
+# --------------------------------------------------------------------------------------
+# ASGI entrypoint for Hypercorn: `hypercorn run:asgi_app`
+# --------------------------------------------------------------------------------------
+# Same app, but async views share one long-lived event loop (and LLM/ES pools) per worker.
+asgi_app = create_asgi_app(app)
+
 if __name__ == "__main__":
     main()
@@ -94,6 +94,25 @@ def create_app() -> Flask:
         
         bot_core = ShoppingBotCore(ctx_mgr)
         app.extensions["bot_core"] = bot_core
+        # Preload taxonomies so the first request doesn't pay for it
+        from .llm_registry import get_static_data
+        get_static_data()
+        # Precompile ES query fragments / stored template sources per scoring subcategory
+        from .data_fetchers.es_templates import compile_all
+        compile_all()
+        # Preload the most requested product docs (background thread, never blocks startup)
+        from .data_fetchers.es_products import warm_up_product_docs
+        warm_up_product_docs()
+        # In-process brand dictionary for suggest_brand (refreshed in the background)
+        from .data_fetchers.es_products import start_brand_index
+        start_brand_index()
+        # Queue mode: this worker consumes from startup, not from its first enqueue
+        if os.getenv("BACKGROUND_TASK_MODE", "executor").lower() == "queue":
+            from .background_processor import BackgroundProcessor
+            from .enhanced_bot_core import EnhancedShoppingBotCore
+            processor = BackgroundProcessor(EnhancedShoppingBotCore(bot_core), ctx_mgr)
+            app.extensions["background_processor"] = processor
+            processor.start_workers()
         log.info("INIT_BOT_CORE_SUCCESS | 4-intent classification enabled | UX generation enabled")
         
     except Exception as e:
@@ -117,6 +136,13 @@ def create_app() -> Flask:
         except ImportError:
             log.info("REGISTER_ROUTES | health routes not found, using built-in health check")
 
+        # Register tracing/debug endpoints
+        try:
+            from .routes.debug import bp as debug_bp
+            app.register_blueprint(debug_bp, url_prefix='/rs')
+        except Exception as e:
+            log.error(f"REGISTER_ROUTES_ERROR | debug routes failed: {e}")
+
         # Register simple search endpoint
         try:
             from .routes.simple_search import bp as simple_search_bp
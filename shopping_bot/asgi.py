@@ -0,0 +1,409 @@
+# shopping_bot/asgi.py
+"""
+ASGI Serving Mode
+─────────────────
+Runs the Flask app under an ASGI server with one long-lived event loop per
+worker process:
+
+    hypercorn run:asgi_app --workers 4 --bind 0.0.0.0:8000
+
+• `async def` views are awaited on the worker loop instead of a fresh loop per
+  request, so the per-loop AsyncAnthropic client (llm_registry) and aiohttp
+  ES session (es_transport) are reused by every request the worker serves.
+• Flask's sync machinery (routing, hooks, sync views, body iteration) runs on
+  a bounded thread pool (ASGI_THREADS). A request waiting on the LLM parks one
+  of those threads on a future; the network I/O itself is multiplexed on the
+  loop, so one worker holds hundreds of in-flight chat turns.
+• Lifespan: startup builds the app if needed, binds the shared clients to the
+  loop and runs `on_startup` hooks; shutdown waits up to
+  ASGI_SHUTDOWN_GRACE_SECONDS for in-flight requests, runs `on_shutdown` hooks
+  and closes the pools on the loop that owns them.
+• Async response bodies (utils.sse.EventStreamBody) are iterated on the loop
+  with every send awaited, so SSE streams hold no thread at all.
+• A client disconnect cancels the request's pending coroutine and closes a
+  streaming body.
+
+`gunicorn run:app` keeps working unchanged (per-request loops).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+import sys
+import threading
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from flask import Flask
+from werkzeug.exceptions import ClientDisconnected
+
+from .config import get_config
+
+log = logging.getLogger(__name__)
+
+Hook = Callable[[], Awaitable[None]]
+_startup_hooks: List[Hook] = []
+_shutdown_hooks: List[Hook] = []
+
+
+def on_startup(hook: Hook) -> Hook:
+    """Register a coroutine function run on the worker loop once the app is up."""
+    _startup_hooks.append(hook)
+    return hook
+
+
+def on_shutdown(hook: Hook) -> Hook:
+    """Register a coroutine function run on the worker loop before shared pools close."""
+    _shutdown_hooks.append(hook)
+    return hook
+
+
+class _RequestState:
+    """Per-request link between the loop (disconnect watcher) and the request thread."""
+
+    __slots__ = ("disconnected", "futures", "lock")
+
+    def __init__(self) -> None:
+        self.disconnected = threading.Event()
+        self.futures: Set[concurrent.futures.Future] = set()
+        self.lock = threading.Lock()
+
+    def cancel(self) -> None:
+        self.disconnected.set()
+        with self.lock:
+            pending = list(self.futures)
+        for fut in pending:
+            fut.cancel()
+
+
+# Request thread -> its _RequestState (set while the WSGI app runs)
+_current = threading.local()
+
+
+def _environ(scope: Dict[str, Any], body: BytesIO) -> Dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):] or "/"
+    environ: Dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        value = raw_value.decode("latin-1")
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+async def _close_shared_clients() -> None:
+    """Close the loop-bound Anthropic client and ES session of this worker."""
+    from .data_fetchers import es_products
+    from .llm_registry import aclose_anthropic_client
+
+    try:
+        await aclose_anthropic_client()
+    except Exception as exc:  # noqa: BLE001
+        log.warning(f"ASGI_CLOSE_FAILED | client=anthropic | error={exc}")
+    fetcher = getattr(es_products, "_es_fetcher", None)
+    if fetcher is not None:
+        try:
+            await fetcher.transport.aclose()
+        except Exception as exc:  # noqa: BLE001
+            log.warning(f"ASGI_CLOSE_FAILED | client=elasticsearch | error={exc}")
+
+
+class FlaskASGI:
+    """ASGI callable serving a Flask app on one persistent loop per worker."""
+
+    def __init__(
+        self,
+        app: Optional[Flask] = None,
+        *,
+        factory: Optional[Callable[[], Flask]] = None,
+        threads: Optional[int] = None,
+        shutdown_grace: Optional[float] = None,
+        max_body_bytes: Optional[int] = None,
+    ):
+        cfg = get_config()
+        self.app = app
+        self._factory = factory
+        self.threads = int(threads or cfg.ASGI_THREADS)
+        self.shutdown_grace = float(cfg.ASGI_SHUTDOWN_GRACE_SECONDS if shutdown_grace is None else shutdown_grace)
+        self.max_body_bytes = int(max_body_bytes or cfg.ASGI_MAX_BODY_BYTES)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._starting: Optional[asyncio.Future] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._inflight = 0
+        self._stats = {"requests": 0, "disconnects": 0, "max_inflight": 0}
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        kind = scope["type"]
+        if kind == "http":
+            await self._http(scope, receive, send)
+        elif kind == "lifespan":
+            await self._lifespan(receive, send)
+        elif kind == "websocket":
+            await send({"type": "websocket.close", "code": 1000})
+        else:
+            raise RuntimeError(f"unsupported ASGI scope type: {kind}")
+
+    # ── lifecycle ──
+
+    async def startup(self) -> None:
+        """Idempotent; also runs lazily on the first request if the server skips lifespan."""
+        if self.loop is not None:
+            return
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._startup())
+        try:
+            await asyncio.shield(self._starting)
+        except BaseException:
+            self._starting = None
+            raise
+
+    async def _startup(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="asgi")
+        if self.app is None:
+            if self._factory is None:
+                from . import create_app
+
+                self._factory = create_app
+            self.app = await loop.run_in_executor(self._executor, self._factory)
+        self.app.async_to_sync = self._async_to_sync  # type: ignore[method-assign]
+        self.app.extensions["asgi"] = self
+        self._idle = asyncio.Event()
+        self._idle.set()
+        try:
+            from .llm_registry import get_anthropic_client
+
+            get_anthropic_client()  # bind the worker's shared client to this loop
+        except Exception as exc:  # noqa: BLE001
+            log.warning(f"ASGI_WARMUP_FAILED | client=anthropic | error={exc}")
+        for hook in list(_startup_hooks):
+            await hook()
+        self.loop = loop
+        log.info(f"ASGI_STARTUP | pid={os.getpid()} | threads={self.threads}")
+
+    async def shutdown(self) -> None:
+        if self.loop is None:
+            return
+        if self._inflight:
+            log.info(f"ASGI_DRAIN | inflight={self._inflight} | grace_s={self.shutdown_grace}")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=self.shutdown_grace)
+            except asyncio.TimeoutError:
+                log.warning(f"ASGI_DRAIN_TIMEOUT | inflight={self._inflight}")
+        for hook in reversed(_shutdown_hooks):
+            try:
+                await hook()
+            except Exception as exc:  # noqa: BLE001
+                log.warning(f"ASGI_SHUTDOWN_HOOK_FAILED | hook={getattr(hook, '__name__', hook)} | error={exc}")
+        await _close_shared_clients()
+        self._executor.shutdown(wait=False)
+        self.loop = None
+        self._starting = None
+        log.info(f"ASGI_SHUTDOWN | pid={os.getpid()} | served={self._stats['requests']}")
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as exc:  # noqa: BLE001
+                    log.error(f"ASGI_STARTUP_FAILED | error={exc}", exc_info=True)
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {"inflight": self._inflight, "threads": self.threads, **self._stats}
+
+    # ── async views ──
+
+    def _async_to_sync(self, func: Callable[..., Awaitable[Any]]) -> Callable[..., Any]:
+        """Flask `async_to_sync` hook: await the view on the worker loop, not a new one."""
+        loop = self.loop
+
+        @functools.wraps(func)
+        def run(*args: Any, **kwargs: Any) -> Any:
+            # The task copies this thread's contextvars, so `request`/`g` work inside it
+            fut = asyncio.run_coroutine_threadsafe(func(*args, **kwargs), loop)
+            state: Optional[_RequestState] = getattr(_current, "state", None)
+            if state is None:
+                return fut.result()
+            with state.lock:
+                state.futures.add(fut)
+            if state.disconnected.is_set():
+                fut.cancel()
+            try:
+                return fut.result()
+            except concurrent.futures.CancelledError:
+                if state.disconnected.is_set():
+                    raise ClientDisconnected() from None
+                raise
+            finally:
+                with state.lock:
+                    state.futures.discard(fut)
+
+        return run
+
+    # ── http ──
+
+    async def _http(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        await self.startup()
+        body = BytesIO()
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                await send({"type": "http.response.start", "status": 413, "headers": [(b"content-type", b"text/plain")]})
+                await send({"type": "http.response.body", "body": b"Request body too large"})
+                return
+            body.write(chunk)
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+
+        state = _RequestState()
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, state))
+        self._inflight += 1
+        self._stats["requests"] += 1
+        self._stats["max_inflight"] = max(self._stats["max_inflight"], self._inflight)
+        self._idle.clear()
+        try:
+            handoff = await self.loop.run_in_executor(self._executor, self._run_wsgi, _environ(scope, body), send, state)
+            if handoff is not None:
+                await self._send_async_body(*handoff, send, watcher)
+        finally:
+            watcher.cancel()
+            self._inflight -= 1
+            if not self._inflight:
+                self._idle.set()
+
+    async def _watch_disconnect(self, receive: Callable, state: _RequestState) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                self._stats["disconnects"] += 1
+                state.cancel()
+                return
+
+    async def _send_async_body(self, status: int, headers: List[Any], body: Any, send: Callable, watcher: asyncio.Future) -> None:
+        """Stream an async body on the loop; each send waits on the socket, a disconnect cancels it."""
+
+        async def pump() -> None:
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            async for chunk in body:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        task = asyncio.ensure_future(pump())
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not task.done():
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                log.info("ASGI_CLIENT_DISCONNECTED | stream cancelled")
+            except Exception as exc:  # noqa: BLE001
+                log.warning(f"ASGI_STREAM_ABORTED | error={exc}")
+            await body.aclose()
+
+    def _run_wsgi(self, environ: Dict[str, Any], send: Callable, state: _RequestState) -> Optional[Tuple[int, List[Any], Any]]:
+        """Request thread: run the WSGI app and forward each body chunk as it is produced.
+
+        Async bodies (`__aiter__`, e.g. utils.sse.EventStreamBody) are handed
+        back as (status, headers, body) to be streamed on the loop instead.
+        """
+        loop = self.loop
+        response: List[Any] = []
+        started = False
+
+        def emit(message: Dict[str, Any]) -> None:
+            if state.disconnected.is_set():
+                raise ClientDisconnected()
+            try:
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+            except Exception as exc:
+                state.cancel()
+                raise ClientDisconnected() from exc
+
+        def start_response(status: str, headers: List[Any], exc_info: Any = None) -> None:
+            response[:] = [
+                int(status.split(" ", 1)[0]),
+                [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+            ]
+
+        _current.state = state
+        body: Any = None
+        try:
+            body = self.app(environ, start_response)
+            if hasattr(body, "__aiter__"):
+                handoff, body = (response[0], response[1], body), None
+                return handoff
+            for chunk in body:
+                if not started:
+                    emit({"type": "http.response.start", "status": response[0], "headers": response[1]})
+                    started = True
+                if chunk:
+                    emit({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not started:
+                emit({"type": "http.response.start", "status": response[0], "headers": response[1]})
+                started = True
+            emit({"type": "http.response.body", "body": b"", "more_body": False})
+        except ClientDisconnected:
+            log.info(f"ASGI_CLIENT_DISCONNECTED | path={environ.get('PATH_INFO')}")
+        except Exception as exc:  # noqa: BLE001
+            log.error(f"ASGI_RESPONSE_ERROR | path={environ.get('PATH_INFO')} | error={exc}", exc_info=True)
+            try:
+                if not started:
+                    emit({"type": "http.response.start", "status": 500, "headers": [(b"content-type", b"text/plain")]})
+                emit({"type": "http.response.body", "body": b"" if started else b"Internal server error", "more_body": False})
+            except ClientDisconnected:
+                pass
+        finally:
+            _current.state = None
+            if hasattr(body, "close"):
+                body.close()  # stops streaming generators (GeneratorExit)
+
+
+def create_asgi_app(app: Optional[Flask] = None, **kwargs: Any) -> FlaskASGI:
+    """ASGI callable for `app`, or for `create_app()` built at lifespan startup."""
+    return FlaskASGI(app, **kwargs)
@@ -7,6 +7,12 @@ Fixes:
 3. Return immediately after spawning background work (no await)
 4. Proper error handling with failed status
 5. Enhanced logging for debugging
+
+Spawn modes (BACKGROUND_TASK_MODE):
+• executor (default): new event loop per job on the default thread pool
+• create_task: task on the request's loop
+• queue: durable Redis Streams job (utils.job_queue) run by each worker's
+  bounded consumer; survives worker restarts, retried when abandoned
 """
 from __future__ import annotations
 
@@ -25,6 +31,8 @@ import aiohttp
 from .redis_manager import RedisContextManager
 from .config import get_config
 from .enums import ResponseType
+from .utils.job_queue import JobQueue
+from .utils.metrics import timed
 
 Cfg = get_config()
 log = logging.getLogger(__name__)
@@ -37,6 +45,24 @@ class BackgroundProcessor:
         self.enhanced_bot = enhanced_bot_core
         self.ctx_mgr = ctx_mgr
         self.processing_ttl = timedelta(hours=2)
+        self._queue: Optional[JobQueue] = None
+
+    @property
+    def queue(self) -> JobQueue:
+        """Durable job queue shared by all workers (consumer started by create_app in queue mode)."""
+        if self._queue is None:
+            self._queue = JobQueue(self.ctx_mgr.redis, "bg")
+            self._queue.register("process_query", self._run_queued_job)
+        return self._queue
+
+    def start_workers(self) -> None:
+        """Start this process' queue consumer (also picks up jobs abandoned by dead workers)."""
+        self.queue.start()
+
+    async def _run_queued_job(self, job: Dict[str, Any]) -> None:
+        await self._execute_background_work(
+            job["processing_id"], job["query"], job["user_id"], job["session_id"], job.get("wa_id"), None
+        )
 
     async def process_query_background(
         self,
@@ -46,6 +72,7 @@ class BackgroundProcessor:
         wa_id: Optional[str] = None,
         notification_callback: Optional[callable] = None,
         inline: bool = False,
+        lane: str = "interactive",
     ) -> str:
         """
         Execute heavy work, persist the full result for polling,
@@ -56,6 +83,9 @@ class BackgroundProcessor:
         2. Execute work WITHOUT blocking the caller
         3. Always write result BEFORE setting completed status
         4. Handle errors properly with failed status
+
+        In queue mode `lane` picks the priority lane ("interactive" or
+        "prefetch"); `notification_callback` is not serializable and is ignored.
         """
         processing_id = f"bg_{user_id}_{session_id}_{int(datetime.now().timestamp())}"
         
@@ -76,9 +106,19 @@ class BackgroundProcessor:
             )
         else:
             # FIX: Spawn background work outside the request's task lifecycle to avoid cancellations
-            # Toggle with env BACKGROUND_TASK_MODE=create_task|executor (default: executor)
+            # Toggle with env BACKGROUND_TASK_MODE=queue|create_task|executor (default: executor)
             spawn_mode = os.getenv("BACKGROUND_TASK_MODE", "executor").lower()
-            if spawn_mode == "create_task":
+            if spawn_mode == "queue":
+                self.start_workers()  # no-op once create_app started it; covers processors built elsewhere
+                entry_id = self.queue.enqueue("process_query", {
+                    "processing_id": processing_id,
+                    "query": query,
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "wa_id": wa_id,
+                }, lane=lane)
+                log.info(f"BACKGROUND_SPAWN_MODE | processing_id={processing_id} | mode=queue | lane={lane} | entry={entry_id}")
+            elif spawn_mode == "create_task":
                 log.info(f"BACKGROUND_SPAWN_MODE | processing_id={processing_id} | mode=create_task")
                 asyncio.create_task(self._execute_background_work(
                     processing_id, query, user_id, session_id, wa_id, notification_callback
@@ -496,6 +536,7 @@ class FrontendNotifier:
             return s
         return f"{s[:self.max_log_bytes]}... (truncated {len(s) - self.max_log_bytes} bytes)"
 
+    @timed("webhook.post")
     async def post_json(self, payload: Dict[str, Any]) -> bool:
         """POST JSON to FE webhook with comprehensive logging and retries."""
         if not self.webhook_url:
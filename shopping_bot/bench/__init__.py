@@ -0,0 +1,7 @@
+"""
+End-to-end benchmark harness: local Anthropic/ES/Redis stand-ins, an
+instrumented app process and a closed-loop load driver.
+
+Run `python -m shopping_bot.bench --help`. Nothing here is imported by the
+app itself.
+"""
@@ -0,0 +1,175 @@
+# shopping_bot/bench/__main__.py
+"""
+End-to-end load/latency benchmark against local stand-ins.
+
+    python -m shopping_bot.bench
+    python -m shopping_bot.bench --endpoints chat,search -n 200 -c 16 --json out.json
+    python -m shopping_bot.bench --env SPECULATIVE_ES_PARAMS=true --baseline out.json
+
+Starts a stub Anthropic server, a stub Elasticsearch endpoint and fakeredis
+(or uses --redis HOST:PORT), boots the app in a child process pointed at them
+(`shopping_bot.bench.serve`) and drives each endpoint in turn at the given
+concurrency. Per endpoint it reports p50/p95/p99 latency, throughput, TTFB
+for SSE, the app process' per-stage breakdown (LLM call per tool, ES per
+route, Redis context load/save, process_query) and CPU time.
+
+Latencies of the stand-ins are fixed by flags, so runs on the same machine
+are comparable; `--baseline` prints the change against a saved `--json`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from .loadgen import ENDPOINTS, Workload, compare, render, run_endpoint, summarize, to_json
+from .stubs import StubAnthropic, StubElasticsearch, load_recordings, start_fake_redis
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base_url: str, proc: subprocess.Popen, log_path: str, timeout_s: float = 90.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"app process exited with {proc.returncode}; see {log_path}")
+        try:
+            if httpx.get(f"{base_url}/__bench/stats", timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"app did not become ready in {timeout_s}s; see {log_path}")
+
+
+def _app_env(args: argparse.Namespace, anthropic_url: str, es_url: str, redis_addr: tuple) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "ANTHROPIC_BASE_URL": anthropic_url,
+        "ANTHROPIC_API_KEY": "sk-ant-bench",
+        "ES_URL": es_url,
+        "ES_API_KEY": "bench",
+        "ELASTIC_INDEX": "products-bench",
+        "REDIS_HOST": str(redis_addr[0]),
+        "REDIS_PORT": str(redis_addr[1]),
+        "REDIS_DB": "0",
+        "ENABLE_STREAMING": "true",
+        "STREAM_MAX_CONCURRENT": "0",
+        "ENABLE_ASYNC": "false",
+        "BOT_LOG_LEVEL": env.get("BOT_LOG_LEVEL", "SILENT"),
+        "TRACE_LEVEL": env.get("TRACE_LEVEL", "WARNING"),
+    })
+    if not args.es_cache:
+        env["ES_CACHE_ENABLED"] = "false"
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key.strip()] = value
+    return env
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="chat,stream,search,products", help=f"comma list of {','.join(ENDPOINTS)}")
+    parser.add_argument("-n", "--requests", type=int, default=100, help="measured requests per endpoint")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per endpoint")
+    parser.add_argument("--turns", type=int, default=1, help="chat turns per session (follow-ups from turn 2)")
+    parser.add_argument("--distinct", action="store_true", help="unique query text per request")
+    parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi")
+    parser.add_argument("--llm-first-token-ms", type=float, default=400.0)
+    parser.add_argument("--llm-delta-ms", type=float, default=15.0)
+    parser.add_argument("--es-latency-ms", type=float, default=25.0)
+    parser.add_argument("--recordings", help="JSON: tool name -> list of recorded tool inputs")
+    parser.add_argument("--redis", help="HOST:PORT of a real Redis (default: in-process fakeredis)")
+    parser.add_argument("--es-cache", action="store_true", help="keep the ES result cache on")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra env for the app process")
+    parser.add_argument("--json", help="write the full report here")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--app-log", help="app process stdout/stderr (default: temp file)")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.endpoints.split(",") if n.strip()]
+    unknown = [n for n in names if n not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {unknown}")
+
+    anthropic = StubAnthropic(
+        first_token_ms=args.llm_first_token_ms,
+        delta_ms=args.llm_delta_ms,
+        recordings=load_recordings(args.recordings) if args.recordings else None,
+    ).start()
+    es = StubElasticsearch(latency_ms=args.es_latency_ms).start()
+    redis_server = None
+    if args.redis:
+        host, _, port = args.redis.partition(":")
+        redis_addr = (host, int(port or 6379))
+    else:
+        redis_server, redis_addr = start_fake_redis()
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    log_path = args.app_log or tempfile.mkstemp(prefix="shopbot-bench-", suffix=".log")[1]
+    with open(log_path, "ab") as log_file:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "shopping_bot.bench.serve", "--port", str(port), "--server", args.server],
+            env=_app_env(args, anthropic.url, es.url, redis_addr),
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+        )
+    reports = []
+    try:
+        _wait_ready(base_url, proc, log_path)
+        workload = Workload(turns=args.turns, distinct=args.distinct, run_id=f"bench{int(time.time())}")
+        offset = 0
+        for name in names:
+            endpoint = ENDPOINTS[name]
+            if args.warmup:
+                run_endpoint(base_url, endpoint, workload, requests=args.warmup, concurrency=min(args.warmup, args.concurrency), offset=offset)
+                offset += args.warmup
+            cpu_before = httpx.post(f"{base_url}/__bench/reset", timeout=10).json()["process_cpu"]
+            anthropic.reset()
+            es.reset()
+            samples, wall = run_endpoint(base_url, endpoint, workload, requests=args.requests, concurrency=args.concurrency, offset=offset)
+            offset += args.requests
+            app_stats = httpx.get(f"{base_url}/__bench/stats", timeout=10).json()
+            reports.append(summarize(endpoint, samples, wall, app_stats, cpu_before, {**anthropic.stats(), **es.stats()}))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        anthropic.stop()
+        es.stop()
+        if redis_server is not None:
+            redis_server.shutdown()
+            redis_server.server_close()
+
+    settings = {k: v for k, v in vars(args).items() if k not in ("json", "baseline")}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            fh.write(to_json(reports, settings))
+    print(render(reports))
+    print(f"\napp log: {log_path}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)["reports"]
+        print("\nvs baseline")
+        print(compare(reports, baseline))
+
+
+if __name__ == "__main__":
+    main()
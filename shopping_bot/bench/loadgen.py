@@ -0,0 +1,271 @@
+# shopping_bot/bench/loadgen.py
+"""
+Closed-loop load driver and report for the end-to-end benchmark.
+
+`run_endpoint` keeps `concurrency` requests in flight against one endpoint
+until `requests` have completed and returns one `Sample` per request.
+`summarize` turns samples plus the app process' stage timings into the
+report rows; `compare` diffs two JSON reports (regression check).
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+QUERIES: Tuple[str, ...] = (
+    "show me healthy chips",
+    "cheaper ones under 100",
+    "protein bars with at least 10g protein",
+    "baked namkeen without palm oil",
+    "dark chocolate with less sugar",
+    "hi there",
+    "sunscreen for oily skin",
+    "gentle face wash for dry skin",
+    "peanut butter no added sugar",
+    "muesli for kids",
+)
+
+
+@dataclass
+class Sample:
+    ok: bool
+    status: int
+    latency_ms: float
+    ttfb_ms: Optional[float] = None
+    events: int = 0
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    name: str
+    path: str
+    streaming: bool
+    body: Callable[[int, "Workload"], Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class Workload:
+    turns: int = 1            # chat turns per session before a fresh session starts
+    distinct: bool = False    # make every query text unique (defeats result caches)
+    run_id: str = "bench"
+
+    def query(self, i: int) -> str:
+        text = QUERIES[i % len(QUERIES)]
+        return f"{text} {i}" if self.distinct else text
+
+    def chat_body(self, i: int) -> Dict[str, Any]:
+        session = f"{self.run_id}-s{i // max(1, self.turns)}"
+        return {"user_id": session, "session_id": session, "message": self.query(i), "channel": "web"}
+
+
+ENDPOINTS: Dict[str, Endpoint] = {
+    "chat": Endpoint("chat", "/rs/chat", False, lambda i, w: w.chat_body(i)),
+    "stream": Endpoint("stream", "/rs/chat/stream", True, lambda i, w: w.chat_body(i)),
+    "search": Endpoint("search", "/rs/search", False, lambda i, w: {"query": w.query(i)}),
+    "products": Endpoint(
+        "products",
+        "/rs/api/v1/products/search",
+        False,
+        lambda i, w: {"query": w.query(i), "size": 20, "category_group": "f_and_b", "price_max": 300},
+    ),
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), int(-(-q * len(ordered) // 100))))
+    return ordered[rank - 1]
+
+
+def _one(client: httpx.Client, endpoint: Endpoint, body: Dict[str, Any]) -> Sample:
+    start = time.perf_counter()
+    try:
+        if not endpoint.streaming:
+            resp = client.post(endpoint.path, json=body)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            return Sample(ok=resp.status_code < 400, status=resp.status_code, latency_ms=elapsed,
+                          error=None if resp.status_code < 400 else resp.text[:200])
+        ttfb = None
+        events = 0
+        error = None
+        with client.stream("POST", endpoint.path, json=body) as resp:
+            for line in resp.iter_lines():
+                if not line.startswith("event:"):
+                    continue
+                name = line[6:].strip()
+                if name == "heartbeat":
+                    continue
+                events += 1
+                if ttfb is None and name != "status":
+                    ttfb = (time.perf_counter() - start) * 1000.0
+                if name == "error" and error is None:
+                    error = "error event"
+            status = resp.status_code
+        elapsed = (time.perf_counter() - start) * 1000.0
+        return Sample(ok=status < 400 and error is None, status=status, latency_ms=elapsed, ttfb_ms=ttfb, events=events, error=error)
+    except httpx.HTTPError as exc:
+        return Sample(ok=False, status=0, latency_ms=(time.perf_counter() - start) * 1000.0, error=f"{type(exc).__name__}: {exc}")
+
+
+def run_endpoint(
+    base_url: str,
+    endpoint: Endpoint,
+    workload: Workload,
+    *,
+    requests: int,
+    concurrency: int,
+    timeout_s: float = 120.0,
+    offset: int = 0,
+) -> Tuple[List[Sample], float]:
+    """Drive `requests` calls with `concurrency` in flight; returns (samples, wall seconds)."""
+    counter = itertools.count(offset)
+    limit = offset + requests
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    with httpx.Client(base_url=base_url, timeout=timeout_s, limits=limits) as client:
+        def worker() -> None:
+            while True:
+                with lock:
+                    i = next(counter)
+                if i >= limit:
+                    return
+                sample = _one(client, endpoint, endpoint.body(i, workload))
+                with lock:
+                    samples.append(sample)
+
+        threads = [threading.Thread(target=worker, name=f"bench-{endpoint.name}-{n}", daemon=True) for n in range(concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+    return samples, wall
+
+
+# ────────────────────────────────────────────────────────
+# Report
+# ────────────────────────────────────────────────────────
+
+def _dist(values: List[float]) -> Dict[str, float]:
+    return {
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2) if values else 0.0,
+    }
+
+
+def summarize(
+    endpoint: Endpoint,
+    samples: List[Sample],
+    wall_s: float,
+    app_stats: Dict[str, Any],
+    cpu_before: Dict[str, float],
+    stub_stats: Dict[str, Dict[str, float]],
+) -> Dict[str, Any]:
+    """One endpoint's report: client latency, throughput, app stages and CPU."""
+    latencies = [s.latency_ms for s in samples]
+    errors = [s for s in samples if not s.ok]
+    wall_by_stage: Dict[str, List[float]] = app_stats.get("stages", {}).get("wall_ms", {})
+    cpu_by_stage: Dict[str, List[float]] = app_stats.get("stages", {}).get("cpu_ms", {})
+    request_stage = f"request {endpoint.path}"
+    request_wall = sum(wall_by_stage.get(request_stage, [])) or 1.0
+    n = max(1, len(samples))
+
+    stages = {}
+    for stage, values in sorted(wall_by_stage.items()):
+        stages[stage] = {
+            "calls": len(values),
+            "calls_per_request": round(len(values) / n, 2),
+            **_dist(values),
+            "share": round(sum(values) / request_wall, 3),
+        }
+
+    cpu_after = app_stats.get("process_cpu", {})
+    process_cpu_s = (cpu_after.get("user_s", 0) + cpu_after.get("system_s", 0)) - (cpu_before.get("user_s", 0) + cpu_before.get("system_s", 0))
+    request_cpu = cpu_by_stage.get(request_stage, [])
+
+    report: Dict[str, Any] = {
+        "endpoint": endpoint.path,
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_examples": sorted({(e.error or str(e.status))[:120] for e in errors})[:3],
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(samples) / wall_s, 2) if wall_s else 0.0,
+        "latency_ms": _dist(latencies),
+        "stages": stages,
+        "stubs": stub_stats,
+        "cpu": {
+            "process_s": round(process_cpu_s, 3),
+            "process_ms_per_request": round(process_cpu_s * 1000.0 / n, 2),
+            "request_thread_ms": _dist(request_cpu),
+            "max_rss_kb": cpu_after.get("max_rss_kb"),
+        },
+    }
+    if endpoint.streaming:
+        report["ttfb_ms"] = _dist([s.ttfb_ms for s in samples if s.ttfb_ms is not None])
+        report["events_per_stream"] = round(sum(s.events for s in samples) / n, 1)
+    return report
+
+
+def render(reports: List[Dict[str, Any]]) -> str:
+    lines = [
+        f"{'endpoint':<28} {'n':>5} {'err':>4} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttfb p50':>9} {'cpu ms/req':>10}",
+    ]
+    for r in reports:
+        lat = r["latency_ms"]
+        ttfb = r.get("ttfb_ms", {}).get("p50")
+        lines.append(
+            f"{r['endpoint']:<28} {r['requests']:>5} {r['errors']:>4} {r['throughput_rps']:>7.1f} "
+            f"{lat['p50']:>8.1f} {lat['p95']:>8.1f} {lat['p99']:>8.1f} "
+            f"{(f'{ttfb:.1f}' if ttfb is not None else '-'):>9} {r['cpu']['process_ms_per_request']:>10.2f}"
+        )
+    for r in reports:
+        lines.append("")
+        lines.append(f"{r['endpoint']} stages (app process)")
+        lines.append(f"  {'stage':<40} {'calls/req':>9} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'share':>6}")
+        for stage, s in r["stages"].items():
+            lines.append(f"  {stage:<40} {s['calls_per_request']:>9.2f} {s['mean']:>8.1f} {s['p50']:>8.1f} {s['p95']:>8.1f} {s['share']:>6.2f}")
+        if r["error_examples"]:
+            lines.append(f"  errors: {r['error_examples']}")
+    return "\n".join(lines)
+
+
+def compare(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> str:
+    """Percent change per endpoint for p50/p95/p99/rps/cpu (positive = slower / more CPU / more rps)."""
+    base = {r["endpoint"]: r for r in baseline}
+    lines = [f"{'endpoint':<28} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8} {'cpu/req':>8}"]
+
+    def pct(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100.0:+.1f}%" if old else "-"
+
+    for r in current:
+        b = base.get(r["endpoint"])
+        if not b:
+            continue
+        lines.append(
+            f"{r['endpoint']:<28} "
+            + " ".join(f"{pct(r['latency_ms'][k], b['latency_ms'][k]):>8}" for k in ("p50", "p95", "p99"))
+            + f" {pct(r['throughput_rps'], b['throughput_rps']):>8}"
+            + f" {pct(r['cpu']['process_ms_per_request'], b['cpu']['process_ms_per_request']):>8}"
+        )
+    return "\n".join(lines)
+
+
+def to_json(reports: List[Dict[str, Any]], settings: Dict[str, Any]) -> str:
+    return json.dumps({"settings": settings, "reports": reports}, indent=2, default=lambda o: asdict(o))
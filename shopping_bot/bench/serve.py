@@ -0,0 +1,258 @@
+# shopping_bot/bench/serve.py
+"""
+App process for the load benchmark (started by `python -m shopping_bot.bench`).
+
+Boots `create_app()` with whatever env the driver exported (stub Anthropic /
+ES URLs, Redis address), wraps the pipeline's stage boundaries with timers
+and serves it:
+
+    python -m shopping_bot.bench.serve --port 8765 --server wsgi|asgi
+
+Bench-only endpoints:
+  GET  /__bench/stats   per-stage timings, request CPU time, process CPU
+  POST /__bench/reset   clear them (after warm-up)
+
+Stages are recorded in this process so they include client-side work
+(prompt building, JSON decode, transforms) that the stubs cannot see.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import inspect
+import logging
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class StageRecorder:
+    """Thread-safe per-stage duration samples (ms)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+        self._cpu_ms: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, wall_ms: float, cpu_ms: Optional[float] = None) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, []).append(wall_ms)
+            if cpu_ms is not None:
+                self._cpu_ms.setdefault(stage, []).append(cpu_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, List[float]]]:
+        with self._lock:
+            return {"wall_ms": {k: list(v) for k, v in self._samples.items()},
+                    "cpu_ms": {k: list(v) for k, v in self._cpu_ms.items()}}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._cpu_ms.clear()
+
+
+STAGES = StageRecorder()
+
+
+def _timed(fn: Callable[..., Any], label: Callable[[tuple, dict], str]) -> Callable[..., Any]:
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                STAGES.add(label(args, kwargs), (time.perf_counter() - start) * 1000.0)
+        return awrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        if not inspect.isawaitable(result):
+            STAGES.add(label(args, kwargs), (time.perf_counter() - start) * 1000.0)
+            return result
+
+        # Sync decorators over async SDK methods return a coroutine: time it to completion
+        async def finish() -> Any:
+            try:
+                return await result
+            finally:
+                STAGES.add(label(args, kwargs), (time.perf_counter() - start) * 1000.0)
+        return finish()
+    return wrapper
+
+
+def _llm_label(args: tuple, kwargs: dict) -> str:
+    choice = kwargs.get("tool_choice") or {}
+    return f"llm.{choice.get('name') or 'text'}"
+
+
+def _es_label(args: tuple, kwargs: dict) -> str:
+    url = kwargs.get("url") or next((a for a in args if isinstance(a, str) and "://" in a), "")
+    parts = str(url).split("?", 1)[0].rstrip("/").rsplit("/", 2)
+    if parts[-1] == "template" and len(parts) > 1:
+        return f"es.{parts[-2]}/template"
+    if len(parts) > 1 and parts[-2] == "_scripts":
+        return "es._scripts"
+    return f"es.{parts[-1] if parts[-1].startswith('_') else 'request'}"
+
+
+def _fixed(name: str) -> Callable[[tuple, dict], str]:
+    return lambda _args, _kwargs: name
+
+
+def _instrument() -> List[str]:
+    """Wrap stage boundaries in place; returns the wrapped targets (missing ones are skipped)."""
+    import anthropic.resources.messages as messages
+
+    from ..bot_core import ShoppingBotCore
+    from ..data_fetchers.es_transport import ESTransport
+    from ..redis_manager import RedisContextManager
+
+    targets: List[Tuple[Any, str, Callable[[tuple, dict], str]]] = [
+        (messages.AsyncMessages, "create", _llm_label),
+        (messages.Messages, "create", _llm_label),
+        (ESTransport, "request", _es_label),
+        (ESTransport, "arequest", _es_label),
+        (ESTransport, "post_ndjson", _es_label),
+        (ESTransport, "apost_ndjson", _es_label),
+        (RedisContextManager, "get_context", _fixed("redis.get_context")),
+        (RedisContextManager, "save_context", _fixed("redis.save_context")),
+        (ShoppingBotCore, "process_query", _fixed("core.process_query")),
+    ]
+    wrapped = []
+    for owner, attr, label in targets:
+        fn = owner.__dict__.get(attr)
+        if fn is None:
+            continue
+        setattr(owner, attr, _timed(fn, label))
+        wrapped.append(f"{owner.__name__}.{attr}")
+    return wrapped
+
+
+class _RequestTimer:
+    """WSGI middleware: wall and thread-CPU time per request, until the body is closed."""
+
+    def __init__(self, app: Callable[..., Any], *, async_bodies: bool = False):
+        self.app = app
+        # Under the ASGI server async bodies are streamed by the loop, not iterated here
+        self.async_bodies = async_bodies
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable[..., Any]) -> Any:
+        path = environ.get("PATH_INFO", "")
+        if path.startswith("/__bench/"):
+            return self.app(environ, start_response)
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        body = self.app(environ, start_response)
+        if self.async_bodies and hasattr(body, "__aiter__"):
+            # Streams on the worker loop: wall time only (the loop thread's CPU is shared)
+            return _AsyncClosing(body, f"request {path}", wall0)
+        return _ClosingIterator(body, f"request {path}", wall0, cpu0)
+
+
+class _ClosingIterator:
+    def __init__(self, body: Any, stage: str, wall0: float, cpu0: float):
+        self._body = body
+        self._iter = iter(body)
+        self._stage = stage
+        self._wall0 = wall0
+        self._cpu = time.thread_time() - cpu0
+
+    def __iter__(self) -> "_ClosingIterator":
+        return self
+
+    def __next__(self) -> Any:
+        cpu0 = time.thread_time()
+        try:
+            return next(self._iter)
+        finally:
+            self._cpu += time.thread_time() - cpu0
+
+    def close(self) -> None:
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            STAGES.add(self._stage, (time.perf_counter() - self._wall0) * 1000.0, self._cpu * 1000.0)
+
+
+class _AsyncClosing:
+    def __init__(self, body: Any, stage: str, wall0: float):
+        self._body = body
+        self._stage = stage
+        self._wall0 = wall0
+
+    def __aiter__(self) -> Any:
+        return self._body.__aiter__()
+
+    async def aclose(self) -> None:
+        try:
+            if hasattr(self._body, "aclose"):
+                await self._body.aclose()
+        finally:
+            STAGES.add(self._stage, (time.perf_counter() - self._wall0) * 1000.0)
+
+
+def _process_cpu() -> Dict[str, float]:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {"user_s": usage.ru_utime, "system_s": usage.ru_stime, "max_rss_kb": usage.ru_maxrss}
+
+
+def build_app(server: str = "wsgi"):
+    from flask import Blueprint, jsonify
+
+    from .. import create_app
+
+    wrapped = _instrument()
+    app = create_app()
+
+    bp = Blueprint("bench", __name__)
+
+    @bp.get("/__bench/stats")
+    def bench_stats():
+        return jsonify({"stages": STAGES.snapshot(), "process_cpu": _process_cpu(), "instrumented": wrapped, "pid": os.getpid()})
+
+    @bp.post("/__bench/reset")
+    def bench_reset():
+        STAGES.reset()
+        return jsonify({"ok": True, "process_cpu": _process_cpu()})
+
+    app.register_blueprint(bp)
+    app.wsgi_app = _RequestTimer(app.wsgi_app, async_bodies=server == "asgi")
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.getenv("BENCH_APP_LOG_LEVEL", "WARNING"))
+    app = build_app(args.server)
+    if args.server == "asgi":
+        import asyncio
+
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        from ..asgi import create_asgi_app
+
+        config = Config()
+        config.bind = [f"127.0.0.1:{args.port}"]
+        config.accesslog = None
+        asyncio.run(serve(create_asgi_app(app), config))
+    else:
+        from werkzeug.serving import make_server
+
+        make_server("127.0.0.1", args.port, app, threaded=True).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+# shopping_bot/bench/stubs.py
+"""
+Local stand-ins for the services the pipeline talks to.
+
+• `StubAnthropic`  – Messages API on a local port. Forced tool calls are
+  answered from recorded tool inputs (round-robin per tool name, see
+  recordings.json); unrecorded tools get an input synthesized from their
+  schema. `stream: true` requests are answered as SSE with input_json/text
+  deltas. Latency: `first_token_ms` before the first byte, `delta_ms`
+  between stream deltas.
+• `StubElasticsearch` – canned `_search` / `_mget` / `_msearch` / `_mapping`
+  responses over a deterministic synthetic catalogue, with `latency_ms`.
+  Point-in-time snapshots (`_pit`) page with `search_after`; dropping an
+  id from `pits` simulates an expired snapshot.
+• `start_fake_redis` – fakeredis' RESP server on a local port, so the app
+  connects with its normal client (no patching).
+
+Both HTTP stubs count calls and service time per route; `stats()` is read
+by the load driver for the per-stage report.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+RECORDINGS_PATH = Path(__file__).with_name("recordings.json")
+
+
+class _StubServer:
+    """ThreadingHTTPServer on 127.0.0.1 with per-route call/time counters."""
+
+    def __init__(self, handler_cls: type, port: int = 0):
+        handler = type(handler_cls.__name__, (handler_cls,), {"stub": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def record(self, route: str, elapsed_s: float) -> None:
+        with self._lock:
+            bucket = self._stats.setdefault(route, {"calls": 0, "total_ms": 0.0})
+            bucket["calls"] += 1
+            bucket["total_ms"] += elapsed_s * 1000.0
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {route: dict(b) for route, b in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub: Any = None
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+# ────────────────────────────────────────────────────────
+# Anthropic
+# ────────────────────────────────────────────────────────
+
+def synthesize(schema: Dict[str, Any], name: str = "") -> Any:
+    """Smallest plausible value for a JSON schema (first enum, minItems, required + declared props)."""
+    if not isinstance(schema, dict):
+        return None
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "string")
+    if kind == "object" or "properties" in schema:
+        props = schema.get("properties") or {}
+        return {key: synthesize(sub, key) for key, sub in props.items()}
+    if kind == "array":
+        count = int(schema.get("minItems") or 0)
+        return [synthesize(schema.get("items") or {"type": "string"}, name) for _ in range(count)]
+    if kind == "boolean":
+        return False
+    if kind in ("number", "integer"):
+        return schema.get("minimum", 0)
+    return f"bench {name}".strip()
+
+
+class StubAnthropic(_StubServer):
+    def __init__(
+        self,
+        *,
+        port: int = 0,
+        first_token_ms: float = 400.0,
+        delta_ms: float = 15.0,
+        recordings: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        seed: int = 7,
+    ):
+        super().__init__(_AnthropicHandler, port)
+        self.first_token_ms = first_token_ms
+        self.delta_ms = delta_ms
+        self.recordings = recordings if recordings is not None else load_recordings()
+        self._cursors: Dict[str, Iterator[Dict[str, Any]]] = {}
+        self._cursor_lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+    def tool_input(self, tool: Dict[str, Any]) -> Dict[str, Any]:
+        name = tool.get("name", "")
+        recorded = self.recordings.get(name)
+        if not recorded:
+            return synthesize(tool.get("input_schema") or {}, name) or {}
+        with self._cursor_lock:
+            cursor = self._cursors.setdefault(name, itertools.cycle(recorded))
+            return next(cursor)
+
+    def split(self, text: str) -> List[str]:
+        """Anthropic-sized deltas (1-24 chars)."""
+        out, i = [], 0
+        with self._cursor_lock:
+            while i < len(text):
+                size = self._rng.randint(1, 24)
+                out.append(text[i:i + size])
+                i += size
+        return out
+
+
+class _AnthropicHandler(_JSONHandler):
+    stub: StubAnthropic
+
+    def do_POST(self) -> None:  # noqa: N802 - stdlib naming
+        started = time.perf_counter()
+        try:
+            request = json.loads(self._body() or b"{}")
+        except ValueError:
+            self._send_json({"type": "error", "error": {"type": "invalid_request_error", "message": "bad json"}}, 400)
+            return
+        if not self.path.rstrip("/").endswith("/messages"):
+            self._send_json({"type": "error", "error": {"type": "not_found_error", "message": self.path}}, 404)
+            return
+
+        block, route = self._answer(request)
+        time.sleep(self.stub.first_token_ms / 1000.0)
+        if request.get("stream"):
+            self._stream(request, block)
+        else:
+            self._send_json(self._message(request, [block], "tool_use" if block["type"] == "tool_use" else "end_turn"))
+        self.stub.record(route, time.perf_counter() - started)
+
+    def _answer(self, request: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        choice = request.get("tool_choice") or {}
+        tools = request.get("tools") or []
+        tool = None
+        if choice.get("type") == "tool":
+            tool = next((t for t in tools if t.get("name") == choice.get("name")), None)
+        elif tools and choice.get("type") != "none":
+            tool = tools[0]
+        if tool is not None:
+            block = {"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": tool["name"], "input": self.stub.tool_input(tool)}
+            return block, f"llm.{tool['name']}"
+        return {"type": "text", "text": "Here are a few options that fit what you asked for."}, "llm.text"
+
+    @staticmethod
+    def _message(request: Dict[str, Any], content: List[Dict[str, Any]], stop_reason: Optional[str]) -> Dict[str, Any]:
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "stub"),
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {"input_tokens": 1200, "output_tokens": 180, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0},
+        }
+
+    def _event(self, name: str, data: Dict[str, Any]) -> None:
+        self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream(self, request: Dict[str, Any], block: Dict[str, Any]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        start = self._message(request, [], None)
+        start["usage"]["output_tokens"] = 1
+        self._event("message_start", {"type": "message_start", "message": start})
+        if block["type"] == "tool_use":
+            opening = {**block, "input": {}}
+            pieces = [{"type": "input_json_delta", "partial_json": p} for p in self.stub.split(json.dumps(block["input"]))]
+            stop_reason = "tool_use"
+        else:
+            opening = {"type": "text", "text": ""}
+            pieces = [{"type": "text_delta", "text": p} for p in self.stub.split(block["text"])]
+            stop_reason = "end_turn"
+        self._event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": opening})
+        for delta in pieces:
+            if self.stub.delta_ms:
+                time.sleep(self.stub.delta_ms / 1000.0)
+            self._event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": delta})
+        self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._event("message_delta", {"type": "message_delta", "delta": {"stop_reason": stop_reason, "stop_sequence": None}, "usage": {"output_tokens": 180}})
+        self._event("message_stop", {"type": "message_stop"})
+
+
+def load_recordings(path: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Tool name -> list of recorded tool inputs (replayed round-robin)."""
+    with open(path or RECORDINGS_PATH, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    return {name: (v if isinstance(v, list) else [v]) for name, v in data.items() if not name.startswith("_")}
+
+
+# ────────────────────────────────────────────────────────
+# Elasticsearch
+# ────────────────────────────────────────────────────────
+
+_BRANDS = ("Lay's", "Bingo", "Too Yumm", "Haldiram's", "Britannia", "Yoga Bar", "Cetaphil", "Minimalist", "Mamaearth", "Dove")
+_NOUNS = ("potato chips", "banana chips", "protein bar", "digestive biscuits", "roasted makhana", "dark chocolate",
+          "peanut butter", "muesli", "face wash", "sunscreen", "shampoo", "moisturizer")
+
+
+def synthetic_catalogue(count: int = 500, seed: int = 11) -> List[Dict[str, Any]]:
+    """Deterministic product `_source` documents shaped like the products index."""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(count):
+        noun = _NOUNS[i % len(_NOUNS)]
+        personal_care = noun in ("face wash", "sunscreen", "shampoo", "moisturizer")
+        price = rng.randint(20, 900)
+        docs.append({
+            "id": f"bench_{i:05d}",
+            "name": f"{_BRANDS[i % len(_BRANDS)]} {noun.title()} {rng.randint(50, 500)}g",
+            "brand": _BRANDS[i % len(_BRANDS)],
+            "price": price,
+            "mrp": price + rng.randint(0, 60),
+            "category_group": "personal_care" if personal_care else "f_and_b",
+            "category_paths": [f"{'personal_care/skin' if personal_care else 'f_and_b/food/snacks'}/{noun.replace(' ', '_')}"],
+            "description": f"<p>{noun.title()} for everyday use. Batch {i}.</p>",
+            "package_claims": {"health_claims": ["high protein"] if i % 3 == 0 else [], "dietary_labels": ["VEGETARIAN"] if i % 2 else ["VEGAN"]},
+            "category_data": {"nutritional": {"nutri_breakdown": {
+                "protein_g": round(rng.uniform(1, 25), 1), "carbs_g": round(rng.uniform(5, 70), 1),
+                "fat_g": round(rng.uniform(0, 35), 1), "energy_kcal": rng.randint(80, 560),
+            }}},
+            "stats": {
+                "adjusted_score_percentiles": {"subcategory_percentile": round(rng.uniform(1, 99), 2)},
+                "protein_percentiles": {"subcategory_percentile": round(rng.uniform(1, 99), 2)},
+                "sugar_penalty_percentiles": {"subcategory_percentile": round(rng.uniform(1, 99), 2)},
+            },
+            "flean_score": {"adjusted_score": round(rng.uniform(0, 10), 2)},
+            "review_stats": {"avg_rating": round(rng.uniform(3, 5), 1), "total_reviews": rng.randint(0, 4000)},
+            "hero_image": {"640": f"https://img.example/bench_{i:05d}.jpg"},
+            "ingredients": {"raw_text": "Potato, edible vegetable oil, salt."},
+        })
+    return docs
+
+
+class StubElasticsearch(_StubServer):
+    def __init__(self, *, port: int = 0, latency_ms: float = 25.0, catalogue: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(_ESHandler, port)
+        self.latency_ms = latency_ms
+        self.docs = catalogue if catalogue is not None else synthetic_catalogue()
+        self.by_id = {d["id"]: d for d in self.docs}
+        self.pits: Dict[str, int] = {}  # open PIT id -> searches served
+        self._pit_ids = itertools.count(1)
+
+    def open_pit(self) -> Dict[str, Any]:
+        pit_id = f"pit-{next(self._pit_ids)}"
+        self.pits[pit_id] = 0
+        return {"id": pit_id}
+
+    def close_pit(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        ids = body.get("id")
+        closed = [i for i in (ids if isinstance(ids, list) else [ids]) if self.pits.pop(i, None) is not None]
+        return {"succeeded": bool(closed), "num_freed": len(closed)}
+
+    def pit_search_response(self, body: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """Search over a snapshot: the window never wraps, and `sort` = [score, position]."""
+        pit_id = (body.get("pit") or {}).get("id")
+        if pit_id not in self.pits:
+            return {"error": {"type": "search_context_missing_exception", "reason": f"No search context found for id [{pit_id}]"}, "status": 404}, 404
+        self.pits[pit_id] += 1
+        size = max(0, int(body.get("size", 10) or 0))
+        after = body.get("search_after")
+        start = int(after[-1]) + 1 if after else 0
+        offset = zlib.crc32(json.dumps(body.get("query"), sort_keys=True, default=str).encode("utf-8")) % len(self.docs)
+        positions = range(start, min(start + size, len(self.docs)))
+        hits = []
+        for pos in positions:
+            doc = self.docs[(offset + pos) % len(self.docs)]
+            score = round(12.5 - pos * 0.01, 3)
+            hits.append({"_index": "bench", "_id": doc["id"], "_score": score, "_source": doc, "sort": [score, pos]})
+        block: Dict[str, Any] = {"max_score": hits[0]["_score"] if hits else None, "hits": hits}
+        if body.get("track_total_hits", True) is not False:
+            block["total"] = {"value": len(self.docs), "relation": "eq"}
+        return {"took": int(self.latency_ms), "timed_out": False, "pit_id": pit_id, "hits": block}, 200
+
+    def search_response(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        size = max(0, int(body.get("size", 10) or 0))
+        start = max(0, int(body.get("from", 0) or 0))
+        # Stable but query-dependent window so different queries return different hits
+        offset = (zlib.crc32(json.dumps(body.get("query"), sort_keys=True, default=str).encode("utf-8")) + start) % len(self.docs)
+        hits = [self.docs[(offset + i) % len(self.docs)] for i in range(size)]
+        response = {
+            "took": int(self.latency_ms),
+            "timed_out": False,
+            "hits": {
+                "total": {"value": len(self.docs), "relation": "eq"},
+                "max_score": 12.5,
+                "hits": [{"_index": "bench", "_id": d["id"], "_score": round(12.5 - i * 0.1, 3), "_source": d} for i, d in enumerate(hits)],
+            },
+        }
+        if body.get("aggs"):
+            response["aggregations"] = self.aggregate(self.docs, body["aggs"])
+        return response
+
+    def aggregate(self, docs: List[Dict[str, Any]], aggs: Dict[str, Any]) -> Dict[str, Any]:
+        """`terms` aggregations (with sub-aggs) over the whole catalogue; the query is ignored."""
+        out: Dict[str, Any] = {}
+        for name, spec in aggs.items():
+            terms = spec.get("terms") or {}
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for doc in docs:
+                if doc.get(terms.get("field")) is not None:
+                    groups.setdefault(str(doc[terms["field"]]), []).append(doc)
+            ranked = sorted(groups.items(), key=lambda kv: (-len(kv[1]), kv[0]))
+            size = int(terms.get("size", 10))
+            buckets = []
+            for key, members in ranked[:size]:
+                bucket: Dict[str, Any] = {"key": key, "doc_count": len(members)}
+                bucket.update(self.aggregate(members, spec.get("aggs") or {}))
+                buckets.append(bucket)
+            out[name] = {"doc_count_error_upper_bound": 0, "sum_other_doc_count": sum(len(m) for _, m in ranked[size:]), "buckets": buckets}
+        return out
+
+    def template_response(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Search template request: stored `id` + params (size/query used as-is) or inline `source`."""
+        if isinstance(body.get("source"), dict):
+            return self.search_response(body["source"])
+        return self.search_response(body.get("params") or {})
+
+    def mget_response(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        ids = body.get("ids") or [d.get("_id") for d in body.get("docs") or []]
+        docs = []
+        for doc_id in ids:
+            src = self.by_id.get(doc_id)
+            docs.append({"_index": "bench", "_id": doc_id, "found": src is not None, **({"_source": src} if src else {})})
+        return {"docs": docs}
+
+
+class _ESHandler(_JSONHandler):
+    stub: StubElasticsearch
+
+    def _route(self) -> str:
+        parts = self.path.split("?", 1)[0].rstrip("/").rsplit("/", 2)
+        if parts[-1] == "template" and len(parts) > 1:
+            return f"{parts[-2]}/template"
+        if len(parts) > 1 and parts[-2] == "_scripts":
+            return "_scripts"
+        return parts[-1] if parts[-1].startswith("_") else "_root"
+
+    def _handle(self) -> None:
+        started = time.perf_counter()
+        route = self._route()
+        raw = self._body()
+        time.sleep(self.stub.latency_ms / 1000.0)
+        status = 200
+        if route == "_search":
+            body = json.loads(raw or b"{}")
+            payload, status = self.stub.pit_search_response(body) if "pit" in body else (self.stub.search_response(body), 200)
+        elif route == "_pit":
+            payload = self.stub.close_pit(json.loads(raw or b"{}")) if self.command == "DELETE" else self.stub.open_pit()
+        elif route == "_mget":
+            payload = self.stub.mget_response(json.loads(raw or b"{}"))
+        elif route == "_msearch":
+            lines = [json.loads(line) for line in raw.decode("utf-8").splitlines() if line.strip()]
+            payload = {"took": int(self.stub.latency_ms), "responses": [self.stub.search_response(b) for b in lines[1::2]]}
+        elif route == "_search/template":
+            payload = self.stub.template_response(json.loads(raw or b"{}"))
+        elif route == "_msearch/template":
+            lines = [json.loads(line) for line in raw.decode("utf-8").splitlines() if line.strip()]
+            payload = {"took": int(self.stub.latency_ms), "responses": [self.stub.template_response(b) for b in lines[1::2]]}
+        elif route == "_scripts":
+            payload = {"acknowledged": True}
+        elif route == "_mapping":
+            payload = {"bench": {"mappings": {"properties": {"category_paths": {"type": "text", "fields": {"keyword": {"type": "keyword"}}}}}}}
+        else:
+            payload = {"name": "stub-es", "version": {"number": "8.11.0"}, "tagline": "You Know, for Search"}
+        self._send_json(payload, status)
+        self.stub.record(f"es.{route}", time.perf_counter() - started)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle  # noqa: N815 - stdlib naming
+
+
+# ────────────────────────────────────────────────────────
+# Redis
+# ────────────────────────────────────────────────────────
+
+def start_fake_redis(port: int = 0) -> Tuple[Any, Tuple[str, int]]:
+    """Serve fakeredis over RESP on 127.0.0.1; returns (server, (host, port))."""
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, name="FakeRedis", daemon=True).start()
+    return server, server.server_address[:2]
@@ -12,15 +12,16 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
+from . import speculation
 from .bot_helpers import (build_question, compute_still_missing,
                           get_func_value, is_user_slot, snapshot_and_trim,
                           store_user_answer)
 from .config import get_config
-from .data_fetchers import get_fetcher
+from .data_fetchers import FetchOutcome, run_fetchers
 from .enums import BackendFunction, ResponseType, UserSlot
-from .llm_service import LLMService, map_leaf_to_query_intent
+from .llm_service import get_llm_service, map_leaf_to_query_intent
 from .models import BotResponse, UserContext
 from .redis_manager import RedisContextManager
 from .utils.helpers import safe_get
@@ -46,7 +47,7 @@ SERIOUS_PRODUCT_INTENTS = {
 class ShoppingBotCore:
     def __init__(self, context_mgr: RedisContextManager) -> None:
         self.ctx_mgr = context_mgr
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
         self.smart_log = get_smart_logger("bot_core")
 
     # ────────────────────────────────────────────────────────
@@ -78,6 +79,9 @@ class ShoppingBotCore:
                 self.smart_log.flow_decision(ctx.user_id, "CONTINUE_ASSESSMENT")
                 return await self._continue_assessment(query, ctx)
 
+            # Classification comes next: overlap ES-param extraction with it (flag-gated)
+            speculation.maybe_start(query, ctx)
+
             # 2) Follow-up handling (flag-gated): optionally skip LLM follow-up classifier
             if getattr(cfg, "USE_CONVERSATION_AWARE_CLASSIFIER", False):
                 # Treat as new/continue; rely on ES param extraction for deltas
@@ -111,6 +115,9 @@ class ShoppingBotCore:
                 ResponseType.ERROR,
                 {"message": "Sorry, something went wrong.", "error": str(exc)},
             )
+        finally:
+            # Routed away from the product search (or it never ran): drop the speculative work
+            speculation.discard(ctx, "unused")
 
     # ────────────────────────────────────────────────────────
     # Follow-up path (UPDATED for 4-intent support)
@@ -217,23 +224,7 @@ class ShoppingBotCore:
         if fetch_list:
             self.smart_log.data_operations(ctx.user_id, [f.value for f in fetch_list])
 
-        fetched: Dict[str, Any] = {}
-        success_count = 0
-        for func in fetch_list:
-            try:
-                result = await get_fetcher(func)(ctx)
-                fetched[func.value] = result
-                ctx.fetched_data[func.value] = {
-                    "data": result,
-                    "timestamp": datetime.now().isoformat(),
-                }
-                success_count += 1
-                self.smart_log.performance_metric(
-                    ctx.user_id, func.value, data_size=len(str(result)) if result else 0
-                )
-            except Exception as exc:
-                self.smart_log.warning(ctx.user_id, "DATA_FETCH_FAILED", f"{func.value}: {exc}")
-                fetched[func.value] = {"error": str(exc)}
+        fetched, success_count = await self._run_backend_fetchers(fetch_list, ctx)
 
         if fetch_list:
             self.smart_log.data_operations(
@@ -911,25 +902,7 @@ class ShoppingBotCore:
         if backend_fetchers:
             self.smart_log.data_operations(ctx.user_id, [f.value for f in backend_fetchers])
 
-        fetched: Dict[str, Any] = {}
-        success_count = 0
-        for func in backend_fetchers:
-            try:
-                result = await get_fetcher(func)(ctx)
-                fetched[func.value] = result
-                ctx.fetched_data[func.value] = {
-                    "data": result,
-                    "timestamp": datetime.now().isoformat(),
-                }
-                success_count += 1
-                self.smart_log.performance_metric(
-                    ctx.user_id, func.value, data_size=len(str(result)) if result else 0
-                )
-            except Exception as exc:
-                self.smart_log.warning(
-                    ctx.user_id, "DATA_FETCH_FAILED", f"{func.value}: {exc}"
-                )
-                fetched[func.value] = {"error": str(exc)}
+        fetched, success_count = await self._run_backend_fetchers(backend_fetchers, ctx)
 
         if backend_fetchers:
             self.smart_log.data_operations(
@@ -1088,6 +1061,32 @@ class ShoppingBotCore:
     # ────────────────────────────────────────────────────────
     # Background policy helper
     # ────────────────────────────────────────────────────────
+    async def _run_backend_fetchers(
+        self, fetchers: List[BackendFunction], ctx: UserContext
+    ) -> Tuple[Dict[str, Any], int]:
+        """Run fetchers as one concurrent group; returns (fetched, success_count)."""
+        fetched: Dict[str, Any] = {}
+
+        def _record(func: BackendFunction, outcome: FetchOutcome) -> None:
+            if outcome.ok:
+                fetched[func.value] = outcome.result
+                ctx.fetched_data[func.value] = {
+                    "data": outcome.result,
+                    "timestamp": datetime.now().isoformat(),
+                }
+                self.smart_log.performance_metric(
+                    ctx.user_id, func.value, duration_ms=outcome.elapsed_ms,
+                    data_size=len(str(outcome.result)) if outcome.result else 0,
+                )
+            else:
+                self.smart_log.warning(ctx.user_id, "DATA_FETCH_FAILED", f"{func.value}: {outcome.error}")
+                fetched[func.value] = {"error": str(outcome.error)}
+
+        outcomes = await run_fetchers(fetchers, ctx, on_done=_record)
+        # Keep the request order for functions_executed
+        fetched = {func.value: fetched[func.value] for func in outcomes}
+        return fetched, sum(1 for o in outcomes.values() if o.ok)
+
     def _needs_background(self, intent) -> bool:
         try:
             return str(intent).lower() in {"queryintent.recommendation"}
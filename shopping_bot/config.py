@@ -20,6 +20,10 @@ class BaseConfig:
     REDIS_DB: int = int(os.getenv("REDIS_DB", 0))
     REDIS_DECODE_RESPONSES: bool = True
     REDIS_TTL_SECONDS: int = int(os.getenv("REDIS_TTL_SECONDS", 3600))
+    # Value codec for Redis payloads (utils/codec.py): orjson | msgpack | json
+    REDIS_CODEC: str = os.getenv("REDIS_CODEC", "orjson")
+    REDIS_COMPRESSION: str = os.getenv("REDIS_COMPRESSION", "zstd")
+    REDIS_COMPRESS_MIN_BYTES: int = int(os.getenv("REDIS_COMPRESS_MIN_BYTES", "4096"))
 
     # Anthropic - MUST be set via environment variable
     ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
@@ -35,16 +39,26 @@ class BaseConfig:
     LLM_MODEL: str = os.getenv("LLM_MODEL", "claude-3-5-sonnet-20241022")
     LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0.1"))
     LLM_MAX_TOKENS: int = int(os.getenv("LLM_MAX_TOKENS", "1000"))
+    # Anthropic prompt-prefix caching (cache_control breakpoints on static prompt prefixes)
+    ENABLE_PROMPT_CACHE: bool = os.getenv("ENABLE_PROMPT_CACHE", "true").lower() in {"1", "true", "yes", "on"}
 
     # History / follow-up
     HISTORY_MAX_SNAPSHOTS: int = int(os.getenv("HISTORY_MAX_SNAPSHOTS", "5"))
 
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
+    # ASGI serving mode (shopping_bot/asgi.py, `hypercorn run:asgi_app`)
+    ASGI_THREADS: int = int(os.getenv("ASGI_THREADS", "256"))
+    ASGI_SHUTDOWN_GRACE_SECONDS: float = float(os.getenv("ASGI_SHUTDOWN_GRACE_SECONDS", "30"))
+    ASGI_MAX_BODY_BYTES: int = int(os.getenv("ASGI_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+
     # Background Processing (simplified)
     ENABLE_ASYNC: bool = os.getenv("ENABLE_ASYNC", "false").lower() in {"1", "true", "yes", "on"}
     # Streaming (SSE/WebSocket) feature gate
     ENABLE_STREAMING: bool = os.getenv("ENABLE_STREAMING", "false").lower() in {"1", "true", "yes", "on"}
+    # SSE: heartbeat while the pipeline is quiet; open streams allowed per worker (0 = unlimited)
+    STREAM_HEARTBEAT_SECONDS: float = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+    STREAM_MAX_CONCURRENT: int = int(os.getenv("STREAM_MAX_CONCURRENT", "200"))
     
     # Elasticsearch (if used)
     # Prefer ES_URL; fallback to legacy ELASTIC_BASE; normalize leading '@' and whitespace
@@ -54,11 +68,20 @@ class BaseConfig:
     ELASTIC_API_KEY: str = os.getenv("ES_API_KEY") or os.getenv("ELASTIC_API_KEY", "")
     ELASTIC_TIMEOUT_SECONDS: int = int(os.getenv("ELASTIC_TIMEOUT_SECONDS", "10"))
     ELASTIC_MAX_RESULTS: int = int(os.getenv("ELASTIC_MAX_RESULTS", "50"))
+    # Keep-alive connection pool shared by the sync and async ES transports
+    ELASTIC_POOL_SIZE: int = int(os.getenv("ELASTIC_POOL_SIZE", "32"))
+    ELASTIC_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("ELASTIC_CONNECT_TIMEOUT_SECONDS", "3"))
+    ELASTIC_KEEPALIVE_SECONDS: float = float(os.getenv("ELASTIC_KEEPALIVE_SECONDS", "30"))
+    # Per-fetcher timeout for the concurrent fetcher group (register_fetcher(timeout_s=...) overrides)
+    FETCHER_TIMEOUT_SECONDS: float = float(os.getenv("FETCHER_TIMEOUT_SECONDS", "30"))
 
     # Feature flags
     USE_COMBINED_CLASSIFY_ASSESS: bool = os.getenv("USE_COMBINED_CLASSIFY_ASSESS", "false").lower() in {"1", "true", "yes", "on"}
     USE_CONVERSATION_AWARE_CLASSIFIER: bool = os.getenv("USE_CONVERSATION_AWARE_CLASSIFIER", "false").lower() in {"1", "true", "yes", "on"}
     USE_TWO_CALL_ES_PIPELINE: bool = os.getenv("USE_TWO_CALL_ES_PIPELINE", "false").lower() in {"1", "true", "yes", "on"}
+    # Speculation: start ES-param extraction (and optionally the ES query) while classification runs
+    SPECULATIVE_ES_PARAMS: bool = os.getenv("SPECULATIVE_ES_PARAMS", "false").lower() in {"1", "true", "yes", "on"}
+    SPECULATIVE_ES_PREFETCH: bool = os.getenv("SPECULATIVE_ES_PREFETCH", "false").lower() in {"1", "true", "yes", "on"}
     # Ask-only mode: bypass assessment state machine except for sequential ASK_* prompts
     ASK_ONLY_MODE: bool = os.getenv("ASK_ONLY_MODE", "false").lower() in {"1", "true", "yes", "on"}
     # New: Use assessment only for ask_user; ignore for ES planning/anchoring
@@ -129,7 +152,7 @@ def get_config() -> BaseConfig:
         log.info(f"⚙️ FEATURE_FLAGS | USE_TWO_CALL_ES_PIPELINE={cfg.USE_TWO_CALL_ES_PIPELINE} | ASK_ONLY_MODE={cfg.ASK_ONLY_MODE} | USE_ASSESSMENT_FOR_ASK_ONLY={cfg.USE_ASSESSMENT_FOR_ASK_ONLY}")
         log.info(f"📡 STREAMING_CONFIG | enable_streaming={getattr(cfg, 'ENABLE_STREAMING', False)}")
         log.info(f"💾 REDIS_CONFIG | host={cfg.REDIS_HOST} | port={cfg.REDIS_PORT} | db={cfg.REDIS_DB} | ttl={cfg.REDIS_TTL_SECONDS}s")
-        log.info(f"🔍 ES_CONFIG | index={cfg.ELASTIC_INDEX} | timeout={cfg.ELASTIC_TIMEOUT_SECONDS}s | max_results={cfg.ELASTIC_MAX_RESULTS}")
+        log.info(f"🔍 ES_CONFIG | index={cfg.ELASTIC_INDEX} | timeout={cfg.ELASTIC_TIMEOUT_SECONDS}s | max_results={cfg.ELASTIC_MAX_RESULTS} | pool_size={cfg.ELASTIC_POOL_SIZE}")
         log.info(f"📊 HISTORY_CONFIG | max_snapshots={cfg.HISTORY_MAX_SNAPSHOTS}")
         log.info(f"🚀 ASYNC_CONFIG | enable_async={cfg.ENABLE_ASYNC}")
         if cfg.HEALTH_THRESHOLD_PERCENTILE > 0:
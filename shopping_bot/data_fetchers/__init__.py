@@ -5,19 +5,31 @@ All product-related functions route to the ES implementation.
 """
 
 from __future__ import annotations
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
 
 from ..enums import BackendFunction
 
 # Registry for all data fetchers
 _REGISTRY: Dict[BackendFunction, Callable[..., Awaitable[Any]]] = {}
+# Fetchers that must finish first (their results are read from ctx.fetched_data)
+_DEPENDENCIES: Dict[BackendFunction, Tuple[BackendFunction, ...]] = {}
+# Per-fetcher timeout overrides (seconds); FETCHER_TIMEOUT_SECONDS otherwise
+_TIMEOUTS: Dict[BackendFunction, float] = {}
 
 def register_fetcher(
     function: BackendFunction,
     handler: Callable[..., Awaitable[Any]],
+    *,
+    depends_on: Iterable[BackendFunction] = (),
+    timeout_s: Optional[float] = None,
 ) -> None:
     """Register a fetcher function with its handler"""
     _REGISTRY[function] = handler
+    _DEPENDENCIES[function] = tuple(depends_on)
+    if timeout_s is not None:
+        _TIMEOUTS[function] = float(timeout_s)
+    else:
+        _TIMEOUTS.pop(function, None)
 
 def get_fetcher(function: BackendFunction) -> Callable[..., Awaitable[Any]]:
     """Get the handler for a specific function"""
@@ -25,6 +37,14 @@ def get_fetcher(function: BackendFunction) -> Callable[..., Awaitable[Any]]:
         raise ValueError(f"No fetcher registered for {function}")
     return _REGISTRY[function]
 
+def get_dependencies(function: BackendFunction) -> Tuple[BackendFunction, ...]:
+    """Fetchers that must complete before `function` runs"""
+    return _DEPENDENCIES.get(function, ())
+
+def get_timeout(function: BackendFunction) -> Optional[float]:
+    """Registered timeout override for `function`, if any"""
+    return _TIMEOUTS.get(function)
+
 # Import the ES implementation (this registers the handlers)
 from . import es_products  # noqa: E402, F401
 
@@ -44,4 +64,14 @@ def verify_registry():
 # Run verification on import
 verify_registry()
 
-__all__ = ["register_fetcher", "get_fetcher"]
\ No newline at end of file
+from .fetch_group import FetchOutcome, FetcherDependencyError, run_fetchers  # noqa: E402
+
+__all__ = [
+    "register_fetcher",
+    "get_fetcher",
+    "get_dependencies",
+    "get_timeout",
+    "run_fetchers",
+    "FetchOutcome",
+    "FetcherDependencyError",
+]
\ No newline at end of file
@@ -0,0 +1,308 @@
+# shopping_bot/data_fetchers/brand_index.py
+"""
+Brand Dictionary
+────────────────
+In-process replacement for the wildcard `suggest_brand` query. It is
+rebuilt from a `terms` aggregation dump of `brand`: one dump per
+category_group plus one over all groups.
+
+Each `BrandIndex` answers `match(hint)` from memory, best tier first:
+
+1. exact: the normalized hint is a brand (case / punctuation insensitive)
+2. substring: a prefix trie over each brand and each of its words, plus
+   trigram postings for infix matches (what ES did with `hint*` and
+   `*hint*`). The most frequent matching brand wins, like the terms
+   aggregation ordered by doc_count.
+3. fuzzy: trigram overlap picks candidates (trigrams of the brand and of
+   each word, filtered by the q-gram count bound), and a bounded edit distance
+   (against the whole brand or one of its words) accepts them. The
+   closest wins, with ties going to the more frequent brand. ES never
+   matched typos at all.
+
+Brand ids are frequency ranks (0 = most products), so "most frequent" is
+"smallest id" everywhere.
+
+`BrandDictionary` holds the indices for every group. They are swapped in
+atomically by `load(aggregation_response)`, which a daemon thread repeats
+every BRAND_INDEX_REFRESH_SECONDS. `suggest` returns (answered, brand).
+answered=False means the fetcher should ask ES: the dictionary isn't loaded
+yet, or the dump was truncated (sum_other_doc_count > 0) and nothing
+matched locally. A group without an index is final only when the group
+aggregation itself was complete; otherwise it may just have been cut off.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+BRAND_INDEX_ENABLED = os.getenv("BRAND_INDEX_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+BRAND_INDEX_REFRESH_SECONDS = float(os.getenv("BRAND_INDEX_REFRESH_SECONDS", "3600"))
+BRAND_INDEX_MAX_BRANDS = int(os.getenv("BRAND_INDEX_MAX_BRANDS", "10000"))
+
+ALL_GROUPS = "*"
+_FUZZY_CANDIDATES = 20
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """Casefolded brand key: apostrophes dropped, other punctuation → single spaces."""
+    return _NON_WORD.sub(" ", (text or "").casefold().replace("'", "").replace("’", "")).strip()
+
+
+def _trigrams(key: str, *, padded: bool) -> List[str]:
+    s = f" {key} " if padded else key
+    return [s[i:i + 3] for i in range(len(s) - 2)]
+
+
+def _max_edits(length: int) -> int:
+    return 0 if length <= 2 else 1 if length <= 5 else 2
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _Node:
+    __slots__ = ("children", "best")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.best: Optional[int] = None  # most frequent brand whose key or a word starts here
+
+
+class BrandIndex:
+    """Immutable matcher over one group's (brand, doc_count) pairs."""
+
+    def __init__(self, counts: Iterable[Tuple[str, int]], *, complete: bool = True):
+        ranked = sorted(((str(b).strip(), int(n)) for b, n in counts if str(b).strip()), key=lambda x: (-x[1], x[0]))
+        self.complete = complete
+        self.brands: List[str] = [b for b, _ in ranked]
+        self.counts: List[int] = [n for _, n in ranked]
+        self._keys: List[str] = [normalize(b) for b in self.brands]
+        self._words: List[List[str]] = [k.split() for k in self._keys]
+        self._exact: Dict[str, int] = {}
+        self._root = _Node()
+        self._postings: Dict[str, List[int]] = {}
+        for bid, key in enumerate(self._keys):
+            if not key:
+                continue
+            self._exact.setdefault(key, bid)
+            starts = [0] + [m.end() for m in re.finditer(" ", key)]
+            for start in starts:
+                self._insert(key[start:], bid)
+            grams = _trigrams(key, padded=True) + [g for word in self._words[bid] for g in _trigrams(word, padded=True)]
+            for gram in dict.fromkeys(grams):
+                self._postings.setdefault(gram, []).append(bid)
+
+    def __len__(self) -> int:
+        return len(self.brands)
+
+    def _insert(self, suffix: str, bid: int) -> None:
+        node = self._root
+        for ch in suffix:
+            node = node.children.setdefault(ch, _Node())
+            if node.best is None:  # ids arrive in frequency order
+                node.best = bid
+
+    def _prefix_best(self, key: str) -> Optional[int]:
+        node = self._root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node.best
+
+    def _infix_best(self, key: str, bound: Optional[int]) -> Optional[int]:
+        """Most frequent brand containing `key`, scanning only ids ranked above `bound`."""
+        if len(key) < 3:  # no trigram to look up: walk the ranks (stops at the trie's answer)
+            candidates: Iterable[int] = range(len(self._keys) if bound is None else bound)
+        else:
+            postings = [self._postings.get(g) for g in _trigrams(key, padded=False)]
+            if any(p is None for p in postings):
+                return None
+            candidates = min(postings, key=len)
+        for bid in candidates:
+            if bound is not None and bid >= bound:
+                break
+            if key in self._keys[bid]:
+                return bid
+        return None
+
+    def _fuzzy_best(self, key: str) -> Optional[int]:
+        limit = _max_edits(len(key))
+        if not limit:
+            return None
+        grams = set(_trigrams(key, padded=True))
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        # q-gram lemma: each edit breaks at most 3 trigrams, so closer targets share at least this many
+        need = max(1, len(grams) - 3 * limit)
+        candidates = sorted((-n, bid) for bid, n in shared.items() if n >= need)[:_FUZZY_CANDIDATES]
+        best: Optional[Tuple[int, int]] = None
+        for _n, bid in candidates:
+            if best is not None and (1, bid) > best:  # exact matches never get here: 1 is the floor
+                continue
+            targets = [t for t in (self._keys[bid], *self._words[bid]) if abs(len(t) - len(key)) <= limit]
+            distance = min((_edit_distance(key, t, limit) for t in targets), default=limit + 1)
+            if distance <= limit and (best is None or (distance, bid) < best):
+                best = (distance, bid)
+        return best[1] if best else None
+
+    def match(self, hint: str) -> Optional[str]:
+        key = normalize(hint)
+        if not key:
+            return None
+        bid = self._exact.get(key)
+        if bid is None:
+            bid = self._prefix_best(key)
+            infix = self._infix_best(key, bid)
+            bid = infix if infix is not None else bid
+        if bid is None:
+            bid = self._fuzzy_best(key)
+        return self.brands[bid] if bid is not None else None
+
+
+def _bucket_counts(agg: Dict[str, Any]) -> Tuple[List[Tuple[str, int]], bool]:
+    buckets = (agg or {}).get("buckets") or []
+    counts = [(str(b.get("key", "")), int(b.get("doc_count", 0) or 0)) for b in buckets]
+    return counts, not (agg or {}).get("sum_other_doc_count")
+
+
+class BrandDictionary:
+    """Per-category_group `BrandIndex`es, refreshed from ES in the background."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = BRAND_INDEX_ENABLED,
+        refresh_seconds: float = BRAND_INDEX_REFRESH_SECONDS,
+        max_brands: int = BRAND_INDEX_MAX_BRANDS,
+    ):
+        self.enabled = bool(enabled)
+        self.refresh_seconds = max(1.0, float(refresh_seconds))
+        self.max_brands = max(1, int(max_brands))
+        self._indices: Optional[Dict[str, BrandIndex]] = None
+        self._groups_complete = False  # the category_group terms agg listed every group
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats = {"lookups": 0, "local_hits": 0, "local_misses": 0, "es_fallbacks": 0, "refreshes": 0, "refresh_errors": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self._indices is not None
+
+    def dump_body(self) -> Dict[str, Any]:
+        """One request: brand counts over every group, and per category_group."""
+        brands = {"terms": {"field": "brand", "size": self.max_brands}}
+        return {
+            "size": 0,
+            "track_total_hits": False,
+            "aggs": {
+                "brands": brands,
+                "groups": {"terms": {"field": "category_group", "size": 50}, "aggs": {"brands": brands}},
+            },
+        }
+
+    def load(self, data: Dict[str, Any]) -> Dict[str, int]:
+        """Build every index from a `dump_body` response and swap them in; returns brands per group."""
+        aggs = (data or {}).get("aggregations") or {}
+        counts, complete = _bucket_counts(aggs.get("brands"))
+        indices = {ALL_GROUPS: BrandIndex(counts, complete=complete)}
+        groups = aggs.get("groups") or {}
+        for bucket in groups.get("buckets") or []:
+            counts, complete = _bucket_counts(bucket.get("brands"))
+            indices[str(bucket.get("key", "")).strip()] = BrandIndex(counts, complete=complete)
+        with self._lock:
+            self._indices = indices
+            self._groups_complete = not groups.get("sum_other_doc_count")
+            self._loaded_at = time.time()
+            self._stats["refreshes"] += 1
+        return {group: len(index) for group, index in indices.items()}
+
+    def suggest(self, hint: str, category_group: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """(answered, brand); answered=False → ask ES."""
+        if not self.enabled:
+            return False, None
+        with self._lock:  # one consistent (indices, groups_complete) pair across a refresh
+            indices, groups_complete = self._indices, self._groups_complete
+        if indices is None:
+            with self._lock:
+                self._stats["es_fallbacks"] += 1
+            return False, None
+        group = (category_group or "").strip() if isinstance(category_group, str) else ""
+        index = indices.get(group or ALL_GROUPS)
+        brand = index.match(hint) if index is not None else None
+        # A group missing from a complete dump has no products at all; if the
+        # group list was cut off it may simply not have made the top buckets
+        complete = index.complete if index is not None else groups_complete and indices[ALL_GROUPS].complete
+        with self._lock:
+            self._stats["lookups"] += 1
+            if brand is not None:
+                self._stats["local_hits"] += 1
+            elif complete:
+                self._stats["local_misses"] += 1
+            else:
+                self._stats["es_fallbacks"] += 1
+        return brand is not None or complete, brand
+
+    def start(self, loader: Callable[[], Dict[str, Any]]) -> Optional[threading.Thread]:
+        """Load now and every refresh_seconds in a daemon thread (idempotent)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, args=(loader,), name="brand-index-refresh", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _refresh_loop(self, loader: Callable[[], Dict[str, Any]]) -> None:
+        while not self._stop.is_set():
+            try:
+                sizes = self.load(loader())
+                log.info("BRAND_INDEX_REFRESHED | groups=%s", sizes)
+            except Exception as exc:  # keep serving the previous indices
+                with self._lock:
+                    self._stats["refresh_errors"] += 1
+                log.warning("BRAND_INDEX_REFRESH_FAILED | error=%s", exc)
+            self._stop.wait(self.refresh_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            indices = self._indices or {}
+            loaded_at = self._loaded_at
+            groups_complete = self._groups_complete
+        out["enabled"] = self.enabled
+        out["loaded"] = bool(indices)
+        out["age_seconds"] = round(time.time() - loaded_at, 1) if loaded_at else None
+        out["groups_complete"] = groups_complete if indices else None
+        out["groups"] = {group: {"brands": len(index), "complete": index.complete} for group, index in indices.items()}
+        out["local_rate"] = round((out["local_hits"] + out["local_misses"]) / out["lookups"], 4) if out["lookups"] else 0.0
+        return out
@@ -0,0 +1,396 @@
+# shopping_bot/data_fetchers/doc_cache.py
+"""
+Product Document Cache
+──────────────────────
+Read-through cache of product `_source` documents keyed by product id, in
+front of `mget_products` / `search_by_ids`:
+
+• L1: in-process LRU bounded by *bytes* (entries are codec-encoded payloads,
+  so the bound is what they actually cost; each hit decodes a fresh copy)
+• L2: shared Redis tier, read for all L1 misses in one MGET
+
+`get_many` returns (docs, missing); the fetcher sends only `missing` to ES in
+one `_mget` and hands the result to `put_many`. Unknown ids are not cached.
+
+Invalidation is per index via a version stamp (Redis `es:doc:version:<index>`,
+bumped by `invalidate(index)` after a reindex or catalogue update). Cache keys
+embed the stamp, so old Redis entries are simply never read again and expire;
+each worker re-reads the stamp every DOC_CACHE_VERSION_CHECK_SECONDS and drops
+its L1 entries for that index when it moves.
+
+Access counts are kept per id and flushed to a Redis sorted set
+(`es:doc:popular:<index>`) by a background thread every
+DOC_CACHE_POPULAR_FLUSH_SECONDS; `popular()` returns the top ids for the
+startup warm-up. Redis failures never fail a lookup; they count as misses.
+
+Async callers use `aget_many` / `aput_many`, which run the Redis round trips
+off the event loop.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..utils import codec
+from ..utils.redis_client import aux_client, to_thread
+
+log = logging.getLogger(__name__)
+
+DOC_CACHE_ENABLED = os.getenv("DOC_CACHE_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+DOC_CACHE_REDIS_ENABLED = os.getenv("DOC_CACHE_REDIS_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+DOC_CACHE_TTL_SECONDS = int(os.getenv("DOC_CACHE_TTL_SECONDS", "3600"))
+DOC_CACHE_REDIS_TTL_SECONDS = int(os.getenv("DOC_CACHE_REDIS_TTL_SECONDS", "21600"))
+DOC_CACHE_VERSION_CHECK_SECONDS = float(os.getenv("DOC_CACHE_VERSION_CHECK_SECONDS", "5"))
+DOC_CACHE_POPULAR_FLUSH_SECONDS = float(os.getenv("DOC_CACHE_POPULAR_FLUSH_SECONDS", "30"))
+DOC_CACHE_WARMUP_TOP_N = int(os.getenv("DOC_CACHE_WARMUP_TOP_N", "200"))
+KEY_PREFIX = "es:doc:"
+_POPULAR_TTL_SECONDS = 7 * 24 * 3600
+
+
+class ProductDocCache:
+    """Byte-bounded LRU of product docs in front of an optional Redis tier."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = DOC_CACHE_ENABLED,
+        max_bytes: int = DOC_CACHE_MAX_BYTES,
+        ttl_seconds: int = DOC_CACHE_TTL_SECONDS,
+        redis_client: Any = None,
+        redis_ttl_seconds: int = DOC_CACHE_REDIS_TTL_SECONDS,
+        use_redis: bool = DOC_CACHE_REDIS_ENABLED,
+        version_check_seconds: float = DOC_CACHE_VERSION_CHECK_SECONDS,
+        popular_flush_seconds: float = DOC_CACHE_POPULAR_FLUSH_SECONDS,
+    ):
+        self.enabled = bool(enabled)
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl_seconds = max(1, int(ttl_seconds))
+        self.redis_ttl_seconds = max(1, int(redis_ttl_seconds))
+        self.use_redis = bool(use_redis)
+        self.version_check_seconds = max(0.0, float(version_check_seconds))
+        self.popular_flush_seconds = max(0.0, float(popular_flush_seconds))
+        self._redis = redis_client
+
+        # (index, version, id) -> (expires_at, payload)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        # index -> (version, checked_at)
+        self._versions: Dict[str, Tuple[str, float]] = {}
+        self._accesses: Dict[str, Counter] = {}
+        self._flusher_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "redis_errors": 0,
+        }
+
+    # ────────────────────────────────────────────────────────
+    # Redis tier
+    # ────────────────────────────────────────────────────────
+
+    def _get_redis(self):
+        if not self.use_redis:
+            return None
+        return self._redis if self._redis is not None else aux_client()
+
+    @staticmethod
+    def _redis_key(index: str, version: str, pid: str) -> str:
+        return f"{KEY_PREFIX}{index}:v{version}:{pid}"
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + n
+
+    # ────────────────────────────────────────────────────────
+    # Version stamps
+    # ────────────────────────────────────────────────────────
+
+    def _fresh_version(self, index: str) -> Optional[str]:
+        """The known stamp for `index` while it needs no re-read, else None."""
+        with self._lock:
+            current = self._versions.get(index)
+        if current is not None and time.monotonic() - current[1] < self.version_check_seconds:
+            return current[0]
+        return None
+
+    def version(self, index: str) -> str:
+        """Current version stamp for `index` (re-read from Redis at most every few seconds)."""
+        fresh = self._fresh_version(index)
+        if fresh is not None:
+            return fresh
+        now = time.monotonic()
+        with self._lock:
+            current = self._versions.get(index)
+        version = current[0] if current is not None else "0"
+        client = self._get_redis()
+        if client is not None:
+            try:
+                raw = client.get(f"{KEY_PREFIX}version:{index}")
+                version = (raw.decode() if isinstance(raw, bytes) else str(raw)) if raw is not None else "0"
+            except Exception as exc:
+                self._count("redis_errors")
+                log.debug(f"DOC_CACHE_VERSION_ERROR | index={index} | error={exc}")
+        self._set_version(index, version, now)
+        return version
+
+    def _set_version(self, index: str, version: str, now: float) -> None:
+        with self._lock:
+            previous = self._versions.get(index)
+            self._versions[index] = (version, now)
+            if previous is None or previous[0] == version:
+                return
+            stale = [k for k in self._entries if k[0] == index and k[1] != version]
+            for k in stale:
+                self._bytes -= len(self._entries.pop(k)[1])
+            self._stats["invalidations"] += 1
+        log.info(f"DOC_CACHE_INVALIDATED | index={index} | version={version} | dropped={len(stale)}")
+
+    def invalidate(self, index: str) -> str:
+        """Bump the version stamp of `index`; every worker stops serving its old entries."""
+        client = self._get_redis()
+        version: Optional[str] = None
+        if client is not None:
+            try:
+                version = str(client.incr(f"{KEY_PREFIX}version:{index}"))
+            except Exception as exc:
+                self._count("redis_errors")
+                log.warning(f"DOC_CACHE_INVALIDATE_REDIS_ERROR | index={index} | error={exc}")
+        if version is None:
+            # Local-only bump (no Redis tier): other workers age out via TTL
+            with self._lock:
+                current = self._versions.get(index, ("0", 0.0))[0]
+            version = f"{current}+"
+        self._set_version(index, version, time.monotonic())
+        return version
+
+    # ────────────────────────────────────────────────────────
+    # Public API
+    # ────────────────────────────────────────────────────────
+
+    def get_many(self, index: str, ids: Iterable[str], *, track: bool = True) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """(docs by id, missing ids in request order, de-duplicated); `track` counts popularity."""
+        wanted = list(dict.fromkeys(ids))
+        if not self.enabled or not wanted:
+            return {}, wanted
+        if track:
+            self._note_access(index, wanted)
+        version = self.version(index)
+        found, missing = self._get_local(index, version, wanted)
+        client = self._get_redis() if missing else None
+        if client is not None:
+            missing = self._absorb_remote(index, version, found, missing, self._mget_remote(client, index, version, missing))
+        return self._decoded(found, missing)
+
+    async def aget_many(self, index: str, ids: Iterable[str], *, track: bool = True) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """`get_many` for async callers: Redis reads (stamp, MGET) run off the event loop."""
+        wanted = list(dict.fromkeys(ids))
+        if not self.enabled or not wanted:
+            return {}, wanted
+        if track:
+            self._note_access(index, wanted)
+        version = self._fresh_version(index)
+        if version is None:
+            version = await to_thread(self.version, index) if self._get_redis() is not None else self.version(index)
+        found, missing = self._get_local(index, version, wanted)
+        client = self._get_redis() if missing else None
+        if client is not None:
+            payloads = await to_thread(self._mget_remote, client, index, version, missing)
+            missing = self._absorb_remote(index, version, found, missing, payloads)
+        return self._decoded(found, missing)
+
+    def _get_local(self, index: str, version: str, wanted: List[str]) -> Tuple[Dict[str, bytes], List[str]]:
+        now = time.time()
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for pid in wanted:
+                key = (index, version, pid)
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[pid] = entry[1]
+                else:
+                    self._bytes -= len(self._entries.pop(key)[1])
+            self._stats["l1_hits"] += len(found)
+        return found, [pid for pid in wanted if pid not in found]
+
+    def _mget_remote(self, client: Any, index: str, version: str, missing: List[str]) -> List[Optional[bytes]]:
+        try:
+            return client.mget([self._redis_key(index, version, pid) for pid in missing])
+        except Exception as exc:
+            self._count("redis_errors")
+            log.debug(f"DOC_CACHE_REDIS_GET_ERROR | error={exc}")
+            return [None] * len(missing)
+
+    def _absorb_remote(self, index: str, version: str, found: Dict[str, bytes], missing: List[str], payloads: List[Optional[bytes]]) -> List[str]:
+        """Backfill L1 with the Redis hits; returns what is still missing."""
+        l2 = {pid: p for pid, p in zip(missing, payloads) if p}
+        for pid, payload in l2.items():
+            self._put_local(index, version, pid, payload)
+        found.update(l2)
+        self._count("l2_hits", len(l2))
+        return [pid for pid in missing if pid not in l2]
+
+    def _decoded(self, found: Dict[str, bytes], missing: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        self._count("misses", len(missing))
+        docs: Dict[str, Dict[str, Any]] = {}
+        for pid, payload in found.items():
+            try:
+                docs[pid] = codec.decode(payload)
+            except Exception:
+                missing.append(pid)
+        return docs, missing
+
+    def put_many(self, index: str, docs: Dict[str, Dict[str, Any]]) -> None:
+        """Store freshly fetched docs (id -> _source) in both tiers."""
+        if not self.enabled or not docs:
+            return
+        version = self.version(index)
+        payloads = self._put_local_many(index, version, docs)
+        client = self._get_redis()
+        if client is not None and payloads:
+            self._set_remote(client, index, version, payloads)
+
+    async def aput_many(self, index: str, docs: Dict[str, Dict[str, Any]]) -> None:
+        """`put_many` for async callers: the Redis writes run off the event loop."""
+        if not self.enabled or not docs:
+            return
+        client = self._get_redis()
+        if client is None:
+            self.put_many(index, docs)
+            return
+        version = self._fresh_version(index)
+        if version is None:
+            version = await to_thread(self.version, index)
+        payloads = self._put_local_many(index, version, docs)
+        if payloads:
+            await to_thread(self._set_remote, client, index, version, payloads)
+
+    def _put_local_many(self, index: str, version: str, docs: Dict[str, Dict[str, Any]]) -> Dict[str, bytes]:
+        payloads: Dict[str, bytes] = {}
+        for pid, doc in docs.items():
+            try:
+                payloads[pid] = codec.encode(doc)
+            except Exception:
+                continue
+        for pid, payload in payloads.items():
+            self._put_local(index, version, pid, payload)
+        self._count("sets", len(payloads))
+        return payloads
+
+    def _set_remote(self, client: Any, index: str, version: str, payloads: Dict[str, bytes]) -> None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for pid, payload in payloads.items():
+                pipe.set(self._redis_key(index, version, pid), payload, ex=self.redis_ttl_seconds)
+            pipe.execute()
+        except Exception as exc:
+            self._count("redis_errors")
+            log.debug(f"DOC_CACHE_REDIS_SET_ERROR | error={exc}")
+
+    def _put_local(self, index: str, version: str, pid: str, payload: bytes) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        key = (index, version, pid)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (time.time() + self.ttl_seconds, payload)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+
+    # ────────────────────────────────────────────────────────
+    # Popularity (warm-up source)
+    # ────────────────────────────────────────────────────────
+
+    def _note_access(self, index: str, ids: List[str]) -> None:
+        with self._lock:
+            self._accesses.setdefault(index, Counter()).update(ids)
+        if self.use_redis:
+            self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        # One flusher thread per process; re-armed after a fork (gunicorn preload)
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name="doc-cache-popular", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(max(1.0, self.popular_flush_seconds))
+            self.flush_popularity()
+
+    def flush_popularity(self) -> None:
+        """Push the pending access counts to Redis (the flusher thread calls this)."""
+        client = self._get_redis()
+        if client is None:
+            return  # counts stay local and serve `popular()` directly
+        with self._lock:
+            pending, self._accesses = self._accesses, {}
+        if not pending:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for index, counts in pending.items():
+                key = f"{KEY_PREFIX}popular:{index}"
+                for pid, n in counts.items():
+                    pipe.zincrby(key, n, pid)
+                pipe.expire(key, _POPULAR_TTL_SECONDS)
+            pipe.execute()
+        except Exception as exc:
+            self._count("redis_errors")
+            log.debug(f"DOC_CACHE_POPULAR_FLUSH_ERROR | error={exc}")
+
+    def popular(self, index: str, n: int) -> List[str]:
+        """Top `n` most requested ids across workers (local counts when Redis is off)."""
+        if n <= 0:
+            return []
+        client = self._get_redis()
+        if client is not None:
+            try:
+                return [p.decode() if isinstance(p, bytes) else str(p) for p in client.zrevrange(f"{KEY_PREFIX}popular:{index}", 0, n - 1)]
+            except Exception as exc:
+                self._count("redis_errors")
+                log.debug(f"DOC_CACHE_POPULAR_READ_ERROR | error={exc}")
+        with self._lock:
+            return [pid for pid, _ in self._accesses.get(index, Counter()).most_common(n)]
+
+    def clear(self) -> None:
+        """Drop the in-process tier (Redis entries age out via TTL)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["l1_size"] = len(self._entries)
+            out["l1_bytes"] = self._bytes
+            out["versions"] = {index: v for index, (v, _) in self._versions.items()}
+        lookups = out["l1_hits"] + out["l2_hits"] + out["misses"]
+        out["hit_rate"] = round((out["l1_hits"] + out["l2_hits"]) / lookups, 4) if lookups else 0.0
+        out["max_bytes"] = self.max_bytes
+        out["enabled"] = self.enabled
+        out["redis_tier"] = self._get_redis() is not None
+        return out
@@ -0,0 +1,218 @@
+# shopping_bot/data_fetchers/es_cache.py
+"""
+ES Search Result Cache
+──────────────────────
+Two-tier cache for transformed search results:
+
+• L1: in-process LRU (bounded by entry count, per-entry TTL)
+• L2: shared Redis tier (TTL only; optional)
+
+Keys are a canonical hash of the *built* query body plus the index, so any
+param set that compiles to the same ES request shares one entry no matter
+which user or code path produced it. Values are stored as JSON strings and
+decoded per hit, so callers are free to mutate what they get back (the
+fallback ladder stamps `meta.fallback_applied` on results).
+
+Only successful results are cached. Redis failures never fail a search;
+they just count as misses. Async callers use `aget` / `aset`, which run the
+Redis round trip off the event loop.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..utils.redis_client import aux_client, to_thread
+
+log = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("ES_CACHE_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+CACHE_REDIS_ENABLED = os.getenv("ES_CACHE_REDIS_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+CACHE_MAX_ENTRIES = int(os.getenv("ES_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = int(os.getenv("ES_CACHE_TTL_SECONDS", "300"))
+CACHE_REDIS_TTL_SECONDS = int(os.getenv("ES_CACHE_REDIS_TTL_SECONDS", "900"))
+CACHE_KEY_PREFIX = "es:search:"
+
+
+def canonical_query_key(index: str, body: Dict[str, Any], variant: str = "") -> str:
+    """Stable hash of an ES request body (key order independent).
+
+    `variant` separates results that the same body produces under different
+    client-side processing (e.g. the rerank mode).
+    """
+    raw = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha1(f"{index}|{variant}|{raw}".encode("utf-8")).hexdigest()
+
+
+class SearchResultCache:
+    """In-process LRU in front of an optional Redis tier."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = CACHE_ENABLED,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+        redis_client: Any = None,
+        redis_ttl_seconds: int = CACHE_REDIS_TTL_SECONDS,
+        use_redis: bool = CACHE_REDIS_ENABLED,
+    ):
+        self.enabled = bool(enabled)
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = max(1, int(ttl_seconds))
+        self.redis_ttl_seconds = max(1, int(redis_ttl_seconds))
+        self.use_redis = bool(use_redis)
+        self._redis = redis_client
+
+        self._entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "bypassed": 0,
+            "evictions": 0,
+            "redis_errors": 0,
+        }
+
+    # ────────────────────────────────────────────────────────
+    # Redis tier
+    # ────────────────────────────────────────────────────────
+
+    def _get_redis(self):
+        if not self.use_redis:
+            return None
+        return self._redis if self._redis is not None else aux_client(decode_responses=True)
+
+    # ────────────────────────────────────────────────────────
+    # Public API
+    # ────────────────────────────────────────────────────────
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + n
+
+    def note_bypass(self) -> None:
+        self._count("bypassed")
+
+    def _get_local(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["l1_hits"] += 1
+                    return payload
+                self._entries.pop(key, None)
+        return None
+
+    def _remote_hit(self, key: str, payload: Optional[str]) -> Optional[Dict[str, Any]]:
+        if payload:
+            self._put_local(key, payload)
+            self._count("l2_hits")
+            return json.loads(payload)
+        self._count("misses")
+        return None
+
+    def _remote_error(self, op: str, exc: Exception) -> None:
+        self._count("redis_errors")
+        log.debug(f"ES_CACHE_REDIS_{op}_ERROR | error={exc}")
+
+    def _encode(self, result: Dict[str, Any]) -> Optional[str]:
+        if not self.enabled or not ((result or {}).get("meta") or {}).get("query_successful"):
+            return None
+        try:
+            return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
+        except Exception:
+            return None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        payload = self._get_local(key)
+        if payload is not None:
+            return json.loads(payload)
+        client = self._get_redis()
+        payload = None
+        if client is not None:
+            try:
+                payload = client.get(CACHE_KEY_PREFIX + key)
+            except Exception as exc:
+                self._remote_error("GET", exc)
+        return self._remote_hit(key, payload)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """`get` for async callers: the Redis round trip runs off the event loop."""
+        if not self.enabled:
+            return None
+        payload = self._get_local(key)
+        if payload is not None:
+            return json.loads(payload)
+        client = self._get_redis()
+        payload = None
+        if client is not None:
+            try:
+                payload = await to_thread(client.get, CACHE_KEY_PREFIX + key)
+            except Exception as exc:
+                self._remote_error("GET", exc)
+        return self._remote_hit(key, payload)
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        payload = self._encode(result)
+        if payload is None:
+            return
+        self._put_local(key, payload)
+        self._count("sets")
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.setex(CACHE_KEY_PREFIX + key, self.redis_ttl_seconds, payload)
+            except Exception as exc:
+                self._remote_error("SET", exc)
+
+    async def aset(self, key: str, result: Dict[str, Any]) -> None:
+        """`set` for async callers: the Redis round trip runs off the event loop."""
+        payload = self._encode(result)
+        if payload is None:
+            return
+        self._put_local(key, payload)
+        self._count("sets")
+        client = self._get_redis()
+        if client is not None:
+            try:
+                await to_thread(client.setex, CACHE_KEY_PREFIX + key, self.redis_ttl_seconds, payload)
+            except Exception as exc:
+                self._remote_error("SET", exc)
+
+    def _put_local(self, key: str, payload: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Drop the in-process tier (Redis entries age out via TTL)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["l1_size"] = len(self._entries)
+        lookups = out["l1_hits"] + out["l2_hits"] + out["misses"]
+        out["hit_rate"] = round((out["l1_hits"] + out["l2_hits"]) / lookups, 4) if lookups else 0.0
+        out["enabled"] = self.enabled
+        out["redis_tier"] = self._get_redis() is not None
+        return out
@@ -7,6 +7,13 @@ Enhanced with:
 • Function score for percentile-based ranking
 • Result quality checks with fallback strategies
 • Minimum score thresholds
+• Pooled keep-alive transport with native async variants (asearch, amget_products, ...)
+• Two-tier (LRU + Redis) result cache keyed on the built query body
+• Single-flight: concurrent identical searches share one ES request
+• Product-doc cache (LRU + Redis, byte-bounded) in front of mget / ids lookups
+• Optional client-side rerank of BM25 candidates instead of script_score (rerank.py)
+• search_after paging over point-in-time snapshots (search_page / asearch_page)
+• In-process brand dictionary in front of suggest_brand (brand_index.py)
 """
 
 from __future__ import annotations
@@ -15,14 +22,24 @@ import asyncio
 from logging import log
 import os
 import re
+import threading
 from typing import Any, Dict, List, Optional
-import json
 
+import aiohttp
 import requests
 
+from .. import speculation
 from ..enums import BackendFunction
 from . import register_fetcher
-from ..scoring_config import build_function_score_functions
+from . import es_templates, rerank
+from .brand_index import BrandDictionary
+from .doc_cache import DOC_CACHE_WARMUP_TOP_N, ProductDocCache
+from .es_cache import SearchResultCache, canonical_query_key
+from .es_transport import ESTransport
+from .product_record import Product, clean_text
+from ..utils.metrics import inc, span, timed
+from ..utils.single_flight import single_flight
+from ..utils.tracing import get_tracer
 
 # ES Configuration (env-only; robust normalization)
 def _normalize_es_base(raw_url: Optional[str], index: Optional[str]) -> str:
@@ -55,42 +72,42 @@ ES_API_KEY_ENV = os.getenv("ES_API_KEY")
 ELASTIC_API_KEY_ENV = os.getenv("ELASTIC_API_KEY")
 ELASTIC_TIMEOUT_ENV = os.getenv("ELASTIC_TIMEOUT_SECONDS")
 
-print("="*80)
-print("🔍🔍🔍 ELASTICSEARCH ENV VARIABLES FETCHED 🔍🔍🔍")
-print(f"🌐 ES_URL: {ES_URL_ENV}")
-print(f"🌐 ELASTIC_BASE: {ELASTIC_BASE_ENV}")
-print(f"📇 ELASTIC_INDEX: {ELASTIC_INDEX_ENV}")
-print(f"🔑 ES_API_KEY: {'***SET***' if ES_API_KEY_ENV else 'NOT SET'}")
-print(f"🔑 ELASTIC_API_KEY: {'***SET***' if ELASTIC_API_KEY_ENV else 'NOT SET'}")
-print(f"⏱️  ELASTIC_TIMEOUT_SECONDS: {ELASTIC_TIMEOUT_ENV}")
-print("="*80)
+_trace = get_tracer(__name__)
+
+_trace.debug(
+    "ES_ENV | ES_URL=%s | ELASTIC_BASE=%s | ELASTIC_INDEX=%s | ES_API_KEY=%s | ELASTIC_API_KEY=%s | ELASTIC_TIMEOUT_SECONDS=%s",
+    ES_URL_ENV,
+    ELASTIC_BASE_ENV,
+    ELASTIC_INDEX_ENV,
+    "***SET***" if ES_API_KEY_ENV else "NOT SET",
+    "***SET***" if ELASTIC_API_KEY_ENV else "NOT SET",
+    ELASTIC_TIMEOUT_ENV,
+)
 
 ELASTIC_INDEX = os.getenv("ELASTIC_INDEX", "products-v2")
 _RAW_ES_URL = os.getenv("ES_URL") or os.getenv("ELASTIC_BASE", "")
 ELASTIC_BASE = _normalize_es_base(_RAW_ES_URL, ELASTIC_INDEX)
 ELASTIC_API_KEY = (os.getenv("ES_API_KEY") or os.getenv("ELASTIC_API_KEY", "")).strip().strip("'\"")
 TIMEOUT = int(os.getenv("ELASTIC_TIMEOUT_SECONDS", "10"))
-
-# Debug ES config on module load
-print("="*80)
-print("✅✅✅ ELASTICSEARCH CONFIGURATION FINALIZED ✅✅✅")
-print(f"📍 RAW_ES_URL: {_RAW_ES_URL}")
-print(f"📍 ELASTIC_BASE (normalized): {ELASTIC_BASE}")
-print(f"📍 ELASTIC_INDEX: {ELASTIC_INDEX}")
-print(f"🔑 API_KEY: {'***SET***' if ELASTIC_API_KEY else 'NOT SET'}")
-print(f"⏱️  TIMEOUT: {TIMEOUT}s")
-print("="*80)
-
-# Text cleaning
-TAG_RE = re.compile(r"<[^>]+>")
-WS_RE = re.compile(r"\s+")
-
-def _clean_text(s: Optional[str]) -> Optional[str]:
-    if not s:
-        return s
-    s = TAG_RE.sub("", s)
-    s = WS_RE.sub(" ", s).strip()
-    return s
+# Point-in-time snapshots behind cursor pagination (ES duration syntax, renewed on every page)
+PIT_KEEP_ALIVE = os.getenv("ES_PIT_KEEP_ALIVE", "2m").strip()
+
+# ES config on module load (once per process)
+_trace.info(
+    "ES_CONFIG | raw_url=%s | base=%s | index=%s | api_key=%s | timeout=%ss",
+    _RAW_ES_URL,
+    ELASTIC_BASE,
+    ELASTIC_INDEX,
+    "***SET***" if ELASTIC_API_KEY else "NOT SET",
+    TIMEOUT,
+)
+
+# Text cleaning (shared with product_record)
+_clean_text = clean_text
+
+def _query_successful(result: Dict[str, Any]) -> bool:
+    """Only successful searches are shared across workers (same rule as the result cache)."""
+    return bool(((result or {}).get("meta") or {}).get("query_successful"))
 
 def _extract_protein(src: Dict[str, Any]) -> Optional[float]:
     try:
@@ -104,26 +121,6 @@ def _extract_protein(src: Dict[str, Any]) -> Optional[float]:
     except (TypeError, ValueError):
         return None
 
-def _get_best_image(hero: Dict[str, Any]) -> Optional[str]:
-    if not isinstance(hero, dict):
-        return None
-    # Try standard resolutions first
-    for size in ["640", "750", "828", "1080", "256", "384"]:
-        if hero.get(size):
-            return hero[size]
-    # Fallback to any available image
-    for v in hero.values():
-        if isinstance(v, str) and v.strip():
-            return v
-    return None
-
-def _extract_highlight(hit: Dict[str, Any]) -> Optional[str]:
-    hl = hit.get("highlight", {})
-    for field in ["name", "package_claims.dietary_labels", "ingredients.raw_text"]:
-        if field in hl and hl[field]:
-            return _clean_text(hl[field][0])
-    return None
-
 def _get_current_user_text(ctx) -> str:
     """Best-effort extraction of the CURRENT user utterance.
 
@@ -145,7 +142,7 @@ def _get_current_user_text(ctx) -> str:
             value = getattr(ctx, attr, None)
             if isinstance(value, str) and value.strip():
                 try:
-                    print(f"DEBUG: CURRENT_TEXT_ATTR | attr={attr} | value='{value.strip()}'")
+                    _trace.debug("CURRENT_TEXT_ATTR | attr=%s | value='%s'", attr, value.strip())
                 except Exception:
                     pass
                 return value.strip()
@@ -165,7 +162,7 @@ def _get_current_user_text(ctx) -> str:
             val = session.get(key)
             if isinstance(val, str) and val.strip():
                 try:
-                    print(f"DEBUG: CURRENT_TEXT_SESSION | key={key} | value='{val.strip()}'")
+                    _trace.debug("CURRENT_TEXT_SESSION | key=%s | value='%s'", key, val.strip())
                 except Exception:
                     pass
                 return val.strip()
@@ -178,7 +175,7 @@ def _get_current_user_text(ctx) -> str:
         val = assessment.get("original_query")
         if isinstance(val, str) and val.strip():
             try:
-                print(f"DEBUG: CURRENT_TEXT_ASSESSMENT | value='{val.strip()}'")
+                _trace.debug("CURRENT_TEXT_ASSESSMENT | value='%s'", val.strip())
             except Exception:
                 pass
             return val.strip()
@@ -186,7 +183,7 @@ def _get_current_user_text(ctx) -> str:
         pass
 
     try:
-        print("DEBUG: CURRENT_TEXT_FALLBACK_EMPTY")
+        _trace.debug("CURRENT_TEXT_FALLBACK_EMPTY")
     except Exception:
         pass
     return ""
@@ -229,10 +226,14 @@ def _mentions_budget_or_price(text: str) -> bool:
     
     return False
 
-def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
+def _build_enhanced_es_query(params: Dict[str, Any], *, keyword_paths: bool = False) -> Dict[str, Any]:
     """
     Build ES query with improved brand handling and percentile-based ranking.
     Uses function_score for quality-based ranking.
+
+    Static parts (_source, sort, highlight, scoring functions, field lists) are the
+    shared fragments from es_templates; `keyword_paths` is the mapping hint for
+    exact `category_paths.keyword` terms.
     """
     p = params or {}
 
@@ -243,33 +244,9 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
     body: Dict[str, Any] = {
         "size": int(p.get("size", desired_size)) if isinstance(p.get("size"), int) else desired_size,
         "track_total_hits": True,
-        "_source": {
-            "includes": [
-                "id", "name", "brand", "price", "mrp", "hero_image.*",
-                "package_claims.*", "category_group", "category_paths", 
-                "description", "use", "flean_score.*",
-                "stats.adjusted_score_percentiles.*",
-                "stats.wholefood_percentiles.*",
-                "stats.protein_percentiles.*",
-                "stats.fiber_percentiles.*",
-                "stats.fortification_percentiles.*",
-                "stats.simplicity_percentiles.*",
-                "stats.sugar_penalty_percentiles.*",
-                "stats.sodium_penalty_percentiles.*",
-                "stats.trans_fat_penalty_percentiles.*",
-                "stats.saturated_fat_penalty_percentiles.*",
-                "stats.oil_penalty_percentiles.*",
-                "stats.sweetener_penalty_percentiles.*",
-                "stats.calories_penalty_percentiles.*",
-                "stats.empty_food_penalty_percentiles.*",
-                # Nutritional data for macro-aware search
-                "category_data.nutritional.nutri_breakdown_updated.*",
-                "category_data.nutritional.qty",
-                "category_data.nutritional.raw_text",
-            ]
-        },
+        "_source": es_templates.FNB_SOURCE,
         "query": {"bool": {"filter": [], "should": [], "minimum_should_match": 0}},
-        "sort": [{"_score": "desc"}],
+        "sort": es_templates.SCORE_SORT,
         "min_score": 0.5,  # Add minimum score threshold
     }
 
@@ -328,15 +305,15 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
                 uniq.append(path)
         
         should_cat: List[Dict[str, Any]] = []
-        prefer_keyword = bool(p.get("_has_category_paths_keyword"))
+        prefer_keyword = keyword_paths
         if prefer_keyword:
             try:
-                print("DEBUG: CAT_PATH_FILTER | using category_paths.keyword exact terms")
+                _trace.debug("CAT_PATH_FILTER | using category_paths.keyword exact terms")
             except Exception:
                 pass
         else:
             try:
-                print("DEBUG: CAT_PATH_FILTER | using wildcard on category_paths (no .keyword)")
+                _trace.debug("CAT_PATH_FILTER | using wildcard on category_paths (no .keyword)")
             except Exception:
                 pass
         
@@ -490,7 +467,7 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
                 shoulds.append({
                     "multi_match": {
                         "query": str(label).strip(),
-                        "fields": ["package_claims.dietary_labels^3.0"],
+                        "fields": es_templates.DIETARY_LABEL_FIELDS,
                         "type": "best_fields",
                         "fuzziness": "AUTO"
                     }
@@ -514,12 +491,12 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
     q_text = str(p.get("q", "")).strip()
     keywords = p.get("keywords") or []
     field_boosts = p.get("field_boosts") or []
-    dynamic_fields = ["name^4", "description^2", "use", "combined_text"]
+    dynamic_fields: List[str] = es_templates.TEXT_FIELDS
     if isinstance(field_boosts, list) and field_boosts:
         try:
-            for fb in field_boosts:
-                if isinstance(fb, str) and fb.strip():
-                    dynamic_fields.append(fb.strip())
+            extra_fields = [fb.strip() for fb in field_boosts if isinstance(fb, str) and fb.strip()]
+            if extra_fields:
+                dynamic_fields = [*es_templates.TEXT_FIELDS, *extra_fields]
         except Exception:
             pass
     
@@ -560,7 +537,7 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
                     "multi_match": {
                         "query": kw_str,
                         "type": "best_fields",
-                        "fields": ["name^6", "description^2", "combined_text"],
+                        "fields": es_templates.MUST_KEYWORD_FIELDS,
                         "fuzziness": "AUTO"
                     }
                 })
@@ -582,6 +559,7 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
                 pass
 
     # 3.5) MACRO FILTERING: Nutritional constraints (if user specified)
+    macro_soft_boosts: List[Dict[str, Any]] = []
     try:
         user_macro_filters = p.get("macro_filters", [])
         
@@ -611,7 +589,7 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
             hard_filters_list = merged_constraints.get("hard_filters", [])
             soft_boosts_list = merged_constraints.get("soft_boosts", [])
             
-            print(f"DEBUG: MACRO_FILTERING | user_specified={len(user_macro_filters)} | hard_filters={len(hard_filters_list)} | soft_boosts={len(soft_boosts_list)}")
+            _trace.debug("MACRO_FILTERING | user_specified=%s | hard_filters=%s | soft_boosts=%s", len(user_macro_filters), len(hard_filters_list), len(soft_boosts_list))
             
             # Apply hard filters as ES range queries + exists check
             for hf in hard_filters_list:
@@ -642,15 +620,14 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
                 # Add range filter (implicitly requires field to exist and have value)
                 filters.append(range_query)
                 
-                print(f"DEBUG: MACRO_HARD_FILTER | {nutrient} {operator} {value} (source: {hf.get('source')})")
+                _trace.debug("MACRO_HARD_FILTER | %s %s %s (source: %s)", nutrient, operator, value, hf.get('source'))
             
-            # Store soft_boosts for function_score integration (will be added later)
-            # These will be merged with existing scoring_functions
-            p["_macro_soft_boosts"] = soft_boosts_list
+            # Keep soft_boosts for function_score integration (merged with scoring_functions below)
+            macro_soft_boosts = soft_boosts_list
         else:
-            print(f"DEBUG: MACRO_FILTERING | skipped (no user-specified constraints)")
+            _trace.debug("MACRO_FILTERING | skipped (no user-specified constraints)")
     except Exception as e:
-        print(f"ERROR: MACRO_FILTERING failed: {e}")
+        _trace.error("MACRO_FILTERING_FAILED | error=%s", e)
         import traceback
         traceback.print_exc()
 
@@ -705,15 +682,15 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
                     filters.append({
                         "bool": {"should": should_brand, "minimum_should_match": 1}
                     })
-                    print(f"DEBUG: Enforcing brand filter | brand='{brand_clean}' | variants={brand_variants}")
+                    _trace.debug("Enforcing brand filter | brand='%s' | variants=%s", brand_clean, brand_variants)
         except Exception:
             pass
-        # Get category-specific scoring functions
-        scoring_functions = build_function_score_functions(subcategory, include_flean=True)
+        # Category-specific scoring functions (precompiled, shared across requests)
+        scoring_functions = es_templates.scoring_functions(subcategory)
         
         # Merge macro-based soft boosts (if user specified constraints)
-        macro_soft_boosts = p.get("_macro_soft_boosts", [])
         if macro_soft_boosts:
+            scoring_functions = list(scoring_functions)
             for sb in macro_soft_boosts:
                 nutrient = sb.get("nutrient")
                 operator = sb.get("operator")
@@ -737,7 +714,7 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
                     "weight": weight
                 })
                 
-                print(f"DEBUG: MACRO_SOFT_BOOST | {nutrient} {operator} {value} weight={weight} (source: {sb.get('source')})")
+                _trace.debug("MACRO_SOFT_BOOST | %s %s %s weight=%s (source: %s)", nutrient, operator, value, weight, sb.get('source'))
         
         body["query"] = {
             "function_score": {
@@ -749,7 +726,7 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
         }
         
         if macro_soft_boosts:
-            print(f"DEBUG: MACRO_SCORING | Added {len(macro_soft_boosts)} macro-based scoring functions to total {len(scoring_functions)} functions")
+            _trace.debug("MACRO_SCORING | Added %s macro-based scoring functions to total %s functions", len(macro_soft_boosts), len(scoring_functions))
 
     # Set minimum_should_match: 0 when q is MUST; else 1 if textual SHOULD present
     try:
@@ -764,21 +741,15 @@ def _build_enhanced_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
         bq["minimum_should_match"] = 0
 
     # Debug logs
-    print(f"DEBUG: ES filters={len(filters)} filters")
-    print(f"DEBUG: ES should={len(shoulds)} clauses")
-    print(f"DEBUG: Using dynamic scoring for subcategory='{subcategory}'")
-    print(f"DEBUG: Applied {len(scoring_functions)} scoring functions")
+    _trace.debug("ES filters=%s filters", len(filters))
+    _trace.debug("ES should=%s clauses", len(shoulds))
+    _trace.debug("Using dynamic scoring for subcategory='%s'", subcategory)
+    _trace.debug("Applied %s scoring functions", len(scoring_functions))
     
     # Add highlight section if there is a query text component
     try:
         if q_text or keywords:
-            body["highlight"] = {
-                "fields": {
-                    "name": {"number_of_fragments": 0},
-                    "package_claims.dietary_labels": {"number_of_fragments": 0},
-                    "ingredients.raw_text": {"fragment_size": 120, "number_of_fragments": 1}
-                }
-            }
+            body["highlight"] = es_templates.FNB_HIGHLIGHT
     except Exception:
         pass
 
@@ -925,8 +896,12 @@ def _parse_product_type(anchor: str) -> Dict[str, Any]:
     }
 
 
-def _build_skin_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
-    """Build a personal care (skin) ES query matching the working Postman shape."""
+def _build_skin_es_query(params: Dict[str, Any], *, keyword_paths: bool = False) -> Dict[str, Any]:
+    """Build a personal care (skin) ES query matching the working Postman shape.
+
+    `keyword_paths` is accepted for parity with the F&B builder; personal care
+    never filters on category paths.
+    """
     p = params or {}
     # Global flags
     is_image_query: bool = bool(p.get("is_image_query"))
@@ -940,43 +915,16 @@ def _build_skin_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
     body: Dict[str, Any] = {
         "size": size,
         "track_total_hits": True,
-        "_source": {
-            "includes": [
-                "id", "name", "brand", "price", "mrp",
-                "category_group", "category_paths", "hero_image.1080",
-                "review_stats.avg_rating", "review_stats.total_reviews",
-                "skin_compatibility.skin_type", "skin_compatibility.sentiment_score", "skin_compatibility.confidence_score",
-                "efficacy.aspect_name", "efficacy.sentiment_score", "efficacy.mention_count",
-                "side_effects.effect_name", "side_effects.severity_score", "side_effects.sentiment_score",
-                "package_claims.health_claims", "package_claims.dietary_labels",
-            ]
-        },
+        "_source": es_templates.SKIN_SOURCE,
         "query": {
             "function_score": {
                 "query": {"bool": {"filter": [], "must": [], "should": [], "must_not": [], "minimum_should_match": 0}},
-                "functions": [
-                    {
-                        "field_value_factor": {
-                            "field": "review_stats.avg_rating",
-                            "factor": 1.2,
-                            "modifier": "sqrt",
-                            "missing": 3.0,
-                        }
-                    },
-                    {
-                        "field_value_factor": {
-                            "field": "review_stats.total_reviews",
-                            "factor": 1.0,
-                            "modifier": "log1p",
-                            "missing": 1,
-                        }
-                    },
-                ],
+                "functions": es_templates.SKIN_FUNCTIONS,
                 "score_mode": "multiply",
                 "boost_mode": "multiply",
             }
         },
-        "sort": [{"_score": "desc"}],
+        "sort": es_templates.SCORE_SORT,
         "min_score": 0.5,
     }
 
@@ -993,7 +941,7 @@ def _build_skin_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
     # We intentionally do NOT add any category_paths filter for personal_care
     try:
         if p.get("category_path") or p.get("category_paths"):
-            print("DEBUG: SKIN_CATEGORY_PATH_IGNORED | personal care has no enforced hierarchy")
+            _trace.debug("SKIN_CATEGORY_PATH_IGNORED | personal care has no enforced hierarchy")
     except Exception:
         pass
     
@@ -1008,7 +956,7 @@ def _build_skin_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
         exclude_terms = parsed.get("exclude_terms", [])
         
         try:
-            print(f"DEBUG: PRODUCT_TYPE_PARSE | anchor='{anchor_noun}' | category={category_terms} | type={type_terms} | exclude={exclude_terms}")
+            _trace.debug("PRODUCT_TYPE_PARSE | anchor='%s' | category=%s | type=%s | exclude=%s", anchor_noun, category_terms, type_terms, exclude_terms)
         except Exception:
             pass
         
@@ -1119,7 +1067,7 @@ def _build_skin_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
                     filters.append({
                         "bool": {"should": should_brand, "minimum_should_match": 1}
                     })
-                    print(f"DEBUG: Enforcing brand filter (skin) | brand='{brand_clean}' | variants={brand_variants}")
+                    _trace.debug("Enforcing brand filter (skin) | brand='%s' | variants=%s", brand_clean, brand_variants)
                 else:
                     # Fallback to simple terms when brand is empty after cleaning
                     filters.append({"terms": {"brand": p["brands"]}})
@@ -1296,141 +1244,48 @@ def _build_skin_es_query(params: Dict[str, Any]) -> Dict[str, Any]:
     # Personal care: treat should as pure boosts (ensure the four sections exist)
     bq["minimum_should_match"] = 0
     try:
-        print(
-            f"DEBUG: PC_SECTIONS | efficacy_terms={efficacy_terms} | avoid_terms={avoid_terms} | skin_types={p.get('skin_types')} | hair_types={p.get('hair_types')}"
+        _trace.debug(
+            "PC_SECTIONS | efficacy_terms=%s | avoid_terms=%s | skin_types=%s | hair_types=%s",
+            efficacy_terms, avoid_terms, p.get('skin_types'), p.get('hair_types'),
         )
     except Exception:
         pass
 
     # Highlight
-    body["highlight"] = {
-        "fields": {
-            "name": {"number_of_fragments": 0},
-            "ingredients.raw_text": {"fragment_size": 120, "number_of_fragments": 1},
-        }
-    }
+    body["highlight"] = es_templates.SKIN_HIGHLIGHT
 
     return body
 
+@timed("es.transform")
 def _transform_results(raw_response: Dict[str, Any]) -> Dict[str, Any]:
-    """Transform ES response with enhanced field coverage"""
+    """Project ES hits into product dicts (see product_record.Product), best flean percentile first."""
     hits = raw_response.get("hits", {}).get("hits", [])
     total = raw_response.get("hits", {}).get("total", {}).get("value", len(hits))
     took = raw_response.get("took", 0)
-    
-    products = []
-    for rank, hit in enumerate(hits, 1):
-        src = hit.get("_source", {})
-        score = hit.get("_score", 0)
-        
-        # Extract nutritional info
-        nutrition = src.get("category_data", {}).get("nutritional", {}).get("nutri_breakdown", {})
-        
-        # Extract package claims
-        package_claims = src.get("package_claims", {})
-        health_claims = package_claims.get("health_claims", [])
-        dietary_labels = package_claims.get("dietary_labels", [])
-        
-        # Extract percentile scores
-        stats = src.get("stats", {})
-        flean_percentile = None
-        if stats.get("adjusted_score_percentiles"):
-            flean_percentile = stats["adjusted_score_percentiles"].get("subcategory_percentile")
-        # Prepare bonus/penalty percentile bundle for LLM persuasion
-        bonus_percentiles = {
-            "protein": (stats.get("protein_percentiles", {}) or {}).get("subcategory_percentile"),
-            "fiber": (stats.get("fiber_percentiles", {}) or {}).get("subcategory_percentile"),
-            "wholefood": (stats.get("wholefood_percentiles", {}) or {}).get("subcategory_percentile"),
-            "fortification": (stats.get("fortification_percentiles", {}) or {}).get("subcategory_percentile"),
-            "simplicity": (stats.get("simplicity_percentiles", {}) or {}).get("subcategory_percentile"),
-        }
-        penalty_percentiles = {
-            "sugar": (stats.get("sugar_penalty_percentiles", {}) or {}).get("subcategory_percentile"),
-            "sodium": (stats.get("sodium_penalty_percentiles", {}) or {}).get("subcategory_percentile"),
-            "trans_fat": (stats.get("trans_fat_penalty_percentiles", {}) or {}).get("subcategory_percentile"),
-            "saturated_fat": (stats.get("saturated_fat_penalty_percentiles", {}) or {}).get("subcategory_percentile"),
-            "oil": (stats.get("oil_penalty_percentiles", {}) or {}).get("subcategory_percentile"),
-            "sweetener": (stats.get("sweetener_penalty_percentiles", {}) or {}).get("subcategory_percentile"),
-            "calories": (stats.get("calories_penalty_percentiles", {}) or {}).get("subcategory_percentile"),
-            "empty_food": (stats.get("empty_food_penalty_percentiles", {}) or {}).get("subcategory_percentile"),
-        }
-        
-        product = {
-            "rank": rank,
-            "score": round(score, 3) if isinstance(score, (int, float)) else score,
-            "id": src.get("id", f"prod_{rank}"),
-            "name": _clean_text(src.get("name", "")),
-            "brand": src.get("brand", ""),
-            "price": src.get("price"),
-            "mrp": src.get("mrp"),
-            "category": src.get("category_group", ""),
-            "category_paths": src.get("category_paths", []),
-            "description": _clean_text(src.get("description", "")),
-            
-            # Nutritional information
-            "protein_g": nutrition.get("protein_g"),
-            "carbs_g": nutrition.get("carbs_g"),
-            "fat_g": nutrition.get("fat_g"),
-            "calories": nutrition.get("energy_kcal"),
-            
-            # Claims and labels
-            "health_claims": health_claims if isinstance(health_claims, list) else [],
-            "dietary_labels": dietary_labels if isinstance(dietary_labels, list) else [],
-            
-            # Quality scores
-            "flean_percentile": flean_percentile,
-            "flean_score": src.get("flean_score", {}).get("adjusted_score"),
-            "bonus_percentiles": {k: v for k, v in bonus_percentiles.items() if v is not None},
-            "penalty_percentiles": {k: v for k, v in penalty_percentiles.items() if v is not None},
-            
-            # Image
-            "image": _get_best_image(src.get("hero_image", {})),
-            
-            # Ingredients
-            "ingredients": _clean_text(src.get("ingredients", {}).get("raw_text", "")),
-            # Reviews (surface to LLM for stars)
-            "avg_rating": (src.get("review_stats", {}) or {}).get("avg_rating"),
-            "total_reviews": (src.get("review_stats", {}) or {}).get("total_reviews"),
-        }
-        
-        # Add highlight if available
-        highlight = _extract_highlight(hit)
-        if highlight:
-            product["highlight"] = highlight
-            
-        products.append(product)
-    
-    # Re-rank products by flean_percentile (descending: best at top, worst at bottom)
-    # Products with None flean_percentile are placed at the end
-    def _get_sort_key(product: Dict[str, Any]) -> float:
-        """Get sort key for flean_percentile. None values go to the end."""
-        flean = product.get("flean_percentile")
-        if flean is None:
-            return -1.0  # Put None values at the end (after all numeric values)
-        try:
-            return float(flean)
-        except (TypeError, ValueError):
-            return -1.0
-    
-    # Sort by flean_percentile descending (highest first)
-    products.sort(key=_get_sort_key, reverse=True)
-    
-    # Update rank field after re-ranking
-    for new_rank, product in enumerate(products, 1):
-        product["rank"] = new_rank
-    
+
+    records = [Product.from_hit(hit, rank) for rank, hit in enumerate(hits, 1)]
+    # Re-rank by flean_percentile (descending); products without one go last
+    records.sort(key=Product.sort_key, reverse=True)
+    for new_rank, record in enumerate(records, 1):
+        record.rank = new_rank
+
     return {
         "meta": {
             "total_hits": total,
-            "returned": len(products),
+            "returned": len(records),
             "took_ms": took,
             "query_successful": True
         },
-        "products": products
+        "products": [record.to_dict() for record in records],
     }
 
 class ElasticsearchProductsFetcher:
-    """Elasticsearch fetcher with enhanced query capabilities."""
+    """Elasticsearch fetcher with enhanced query capabilities.
+
+    Every call has a sync and an async flavour (`search`/`asearch`, ...).
+    Both go through a pooled keep-alive `ESTransport`; async handlers should
+    prefer the `a*` methods instead of pushing the sync ones into an executor.
+    """
     
     def __init__(self, base_url: str = None, index: str = None, api_key: str = None):
         self.base_url = (base_url or ELASTIC_BASE)
@@ -1445,294 +1300,766 @@ class ElasticsearchProductsFetcher:
             
         self.endpoint = f"{self.base_url}/{self.index}/_search"
         self.mget_endpoint = f"{self.base_url}/{self.index}/_mget"
+        self.msearch_endpoint = f"{self.base_url}/{self.index}/_msearch"
+        # PIT searches name their snapshot in the body, not the index in the path
+        self.pit_endpoint = f"{self.base_url}/_pit"
+        self.pit_search_endpoint = f"{self.base_url}/_search"
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"ApiKey {self.api_key}"
         } if self.api_key else {}
+        self.template_endpoint = f"{self.base_url}/{self.index}/_search/template"
+        self.msearch_template_endpoint = f"{self.base_url}/{self.index}/_msearch/template"
+        self.transport = ESTransport(self.headers, timeout=TIMEOUT)
+        self.cache = SearchResultCache()
+        # Concurrent identical searches share one in-flight request
+        self.flight = single_flight("es.search")
+        self.docs = ProductDocCache()
+        # Brand hints resolve from memory; ES wildcard aggregation is the fallback
+        self.brands = BrandDictionary()
+        # stored template id -> registered (False: registration failed, send inline)
+        self._stored_templates: Dict[str, bool] = {}
         
-        # Debug output with emojis
-        print("="*80)
-        print("🚀🚀🚀 ELASTICSEARCH FETCHER INITIALIZED 🚀🚀🚀")
-        print(f"🌐 BASE_URL: {self.base_url}")
-        print(f"📇 INDEX: {self.index}")
-        print(f"🔗 SEARCH_ENDPOINT: {self.endpoint}")
-        print(f"🔗 MGET_ENDPOINT: {self.mget_endpoint}")
-        print(f"🔑 API_KEY: {'***SET***' if self.api_key else 'NOT SET'}")
-        print("="*80)
-    
+        _trace.info(
+            "ES_FETCHER_INIT | base=%s | index=%s | search=%s | mget=%s | api_key=%s | pool_size=%s",
+            self.base_url,
+            self.index,
+            self.endpoint,
+            self.mget_endpoint,
+            "***SET***" if self.api_key else "NOT SET",
+            self.transport.pool_size,
+        )
+
+    # ────────────────────────────────────────────────────────
+    # Mapping hints
+    # ────────────────────────────────────────────────────────
+
+    def _apply_mapping_hints(self, data: Dict[str, Any]) -> None:
+        """Detect 'category_paths.keyword' in a _mapping response and cache the hint."""
+        has_kw = False
+        try:
+            # mappings can be keyed by index name
+            for _idx, payload in (data or {}).items():
+                mappings = (payload or {}).get("mappings", {}) or {}
+                props = mappings.get("properties", {}) or {}
+                cat = props.get("category_paths", {}) or {}
+                fields = cat.get("fields", {}) or {}
+                if isinstance(fields.get("keyword"), dict):
+                    has_kw = True
+                    break
+        except Exception:
+            has_kw = False
+        self._has_category_paths_keyword = has_kw
+        try:
+            _trace.debug("MAPPING_HINT | category_paths.keyword=%s", 'yes' if has_kw else 'no')
+        except Exception:
+            pass
+
     def _ensure_mapping_hints(self) -> None:
         """Lazy-load index mapping to detect availability of 'category_paths.keyword'."""
         if self._has_category_paths_keyword is not None:
             return
         try:
             mapping_endpoint = f"{self.base_url}/{self.index}/_mapping"
-            print(f"DEBUG: ES_MAPPING_REQUEST | endpoint={mapping_endpoint} | method=GET | timeout={TIMEOUT}s")
-            resp = requests.get(mapping_endpoint, headers=self.headers, timeout=TIMEOUT)
-            resp.raise_for_status()
-            data = resp.json() or {}
-            # Traverse to detect 'category_paths.keyword'
-            has_kw = False
-            try:
-                # mappings can be keyed by index name
-                for _idx, payload in (data or {}).items():
-                    mappings = (payload or {}).get("mappings", {}) or {}
-                    props = mappings.get("properties", {}) or {}
-                    cat = props.get("category_paths", {}) or {}
-                    fields = cat.get("fields", {}) or {}
-                    if isinstance(fields.get("keyword"), dict):
-                        has_kw = True
-                        break
-            except Exception:
-                has_kw = False
-            self._has_category_paths_keyword = has_kw
+            _trace.debug("ES_MAPPING_REQUEST | endpoint=%s | method=GET | timeout=%ss", mapping_endpoint, TIMEOUT)
+            self._apply_mapping_hints(self.transport.get(mapping_endpoint))
+        except Exception as exc:
             try:
-                print(f"DEBUG: MAPPING_HINT | category_paths.keyword={'yes' if has_kw else 'no'}")
+                _trace.debug("MAPPING_HINT_ERROR | %s", exc)
             except Exception:
                 pass
+            self._has_category_paths_keyword = False
+
+    async def _aensure_mapping_hints(self) -> None:
+        """Async variant of `_ensure_mapping_hints`."""
+        if self._has_category_paths_keyword is not None:
+            return
+        try:
+            mapping_endpoint = f"{self.base_url}/{self.index}/_mapping"
+            _trace.debug("ES_MAPPING_REQUEST | endpoint=%s | method=GET | timeout=%ss", mapping_endpoint, TIMEOUT)
+            self._apply_mapping_hints(await self.transport.aget(mapping_endpoint))
         except Exception as exc:
             try:
-                print(f"DEBUG: MAPPING_HINT_ERROR | {exc}")
+                _trace.debug("MAPPING_HINT_ERROR | %s", exc)
             except Exception:
                 pass
             self._has_category_paths_keyword = False
+
+    # ────────────────────────────────────────────────────────
+    # Stored search templates
+    # ────────────────────────────────────────────────────────
+
+    def _template_match(self, body: Dict[str, Any]) -> Optional[tuple]:
+        if not es_templates.STORED_TEMPLATES:
+            return None
+        match = es_templates.template_request(body)
+        if match is None or self._stored_templates.get(match[0].id) is False:
+            return None
+        return match
+
+    def _template_registered(self, template: es_templates.QueryTemplate, error: Optional[BaseException]) -> bool:
+        self._stored_templates[template.id] = error is None
+        if error is not None:
+            _trace.warning("ES_TEMPLATE_REGISTER_FAILED | id=%s | error=%s | sending inline bodies", template.id, error)
+        else:
+            _trace.info("ES_TEMPLATE_REGISTERED | id=%s | bytes=%s", template.id, len(template.source))
+        return error is None
+
+    def _register_template(self, template: es_templates.QueryTemplate) -> bool:
+        if template.id in self._stored_templates:
+            return self._stored_templates[template.id]
+        try:
+            self.transport.request("PUT", f"{self.base_url}/_scripts/{template.id}", {"script": {"lang": "mustache", "source": template.source}})
+        except Exception as exc:
+            return self._template_registered(template, exc)
+        return self._template_registered(template, None)
+
+    async def _aregister_template(self, template: es_templates.QueryTemplate) -> bool:
+        if template.id in self._stored_templates:
+            return self._stored_templates[template.id]
+        try:
+            await self.transport.arequest("PUT", f"{self.base_url}/_scripts/{template.id}", {"script": {"lang": "mustache", "source": template.source}})
+        except Exception as exc:
+            return self._template_registered(template, exc)
+        return self._template_registered(template, None)
+
+    def _wire(self, body: Dict[str, Any]) -> tuple:
+        """(url, payload) for one search: stored template reference when available, else the body."""
+        match = self._template_match(body)
+        if match is not None and self._register_template(match[0]):
+            return self.template_endpoint, {"id": match[0].id, "params": match[1]}
+        return self.endpoint, body
+
+    async def _awire(self, body: Dict[str, Any]) -> tuple:
+        match = self._template_match(body)
+        if match is not None and await self._aregister_template(match[0]):
+            return self.template_endpoint, {"id": match[0].id, "params": match[1]}
+        return self.endpoint, body
+
+    def _msearch_wire(self, lines: List[Dict[str, Any]], matches: List[Optional[tuple]]) -> tuple:
+        """(url, lines) for _msearch; `matches[i]` is body i's registered (template, params) or None."""
+        if not any(matches):
+            return self.msearch_endpoint, lines
+        out: List[Dict[str, Any]] = []
+        for header, body, match in zip(lines[0::2], lines[1::2], matches):
+            out.append(header)
+            out.append({"id": match[0].id, "params": match[1]} if match is not None else {"source": body})
+        return self.msearch_template_endpoint, out
+
+    # ────────────────────────────────────────────────────────
+    # Search
+    # ────────────────────────────────────────────────────────
+
+    def _build_search_body(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Route params to the domain query builder (mapping hints must be loaded)."""
+        p = params or {}
+        keyword_paths = bool(self._has_category_paths_keyword)
+        # Route by domain: personal_care → skin builder; else generic
+        if str(p.get("category_group") or "").strip() == "personal_care":
+            query_body = _build_skin_es_query(p, keyword_paths=keyword_paths)
+        else:
+            query_body = _build_enhanced_es_query(p, keyword_paths=keyword_paths)
+        
+        _trace.debug(
+            "ES_QUERY | q=%s | category=%s | brands=%s | price=%s-%s | dietary=%s",
+            p.get('q', ''),
+            p.get('category_group', 'all'),
+            p.get('brands', []),
+            p.get('price_min', 'no min'),
+            p.get('price_max', 'no max'),
+            p.get('dietary_labels', []),
+        )
+        # Keep the exact body for Postman reproduction (GET /rs/debug/es/queries)
+        _trace.capture("es_query", query_body, endpoint=self.endpoint, q=p.get('q', ''))
+        return query_body
+
+    def _search_success(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
+        result = _transform_results(raw_data)
+        _trace.debug(
+            "ES_SEARCH_OK | index=%s | total_hits=%s | returned=%s | took_ms=%s",
+            self.index,
+            result['meta']['total_hits'],
+            result['meta']['returned'],
+            result['meta']['took_ms'],
+        )
+        return result
+
+    def _search_failure(self, kind: str, exc: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Log a failed search and return the empty-result envelope callers expect."""
+        if kind == "timeout":
+            _trace.warning("ES_SEARCH_TIMEOUT | endpoint=%s | timeout=%ss", self.endpoint, TIMEOUT)
+            error = "timeout"
+        else:
+            event = "ES_SEARCH_FAILED" if kind == "request" else "ES_SEARCH_UNEXPECTED_ERROR"
+            _trace.error("%s | endpoint=%s | index=%s | error=%s", event, self.endpoint, self.index, exc)
+            error = str(exc)
+        return {"meta": {"total_hits": 0, "returned": 0, "took_ms": 0, "query_successful": False, "error": error}, "products": []}
     
-    def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _search_key(self, query_body: Dict[str, Any]) -> str:
+        """Cache / single-flight key: the canonical body hash under the current rerank mode."""
+        return canonical_query_key(self.index, query_body, f"rerank={rerank.mode()}")
+
+    def _cache_lookup(self, query_body: Dict[str, Any], use_cache: bool) -> tuple:
+        """Return (cache_key, cached_result); key is None when the cache is bypassed."""
+        if not self.cache.enabled:
+            return None, None
+        if not use_cache:
+            self.cache.note_bypass()
+            return None, None
+        key = self._search_key(query_body)
+        cached = self.cache.get(key)
+        if cached is not None:
+            _trace.debug("ES_CACHE_HIT | key=%s | total_hits=%s", key[:12], (cached.get('meta') or {}).get('total_hits'))
+        return key, cached
+
+    async def _acache_lookup(self, query_body: Dict[str, Any], use_cache: bool) -> tuple:
+        """Async `_cache_lookup`: the Redis tier is read off the event loop."""
+        if not self.cache.enabled:
+            return None, None
+        if not use_cache:
+            self.cache.note_bypass()
+            return None, None
+        key = self._search_key(query_body)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            _trace.debug("ES_CACHE_HIT | key=%s | total_hits=%s", key[:12], (cached.get('meta') or {}).get('total_hits'))
+        return key, cached
+
+    @staticmethod
+    def _rerank_plan(query_body: Dict[str, Any]) -> Optional[rerank.RerankPlan]:
+        """Candidate request + local scoring plan when ES_RERANK_MODE=client applies to this body."""
+        return rerank.plan(query_body) if rerank.enabled() else None
+
+    @staticmethod
+    @timed("es.rerank")
+    def _reranked(plan: Optional[rerank.RerankPlan], raw_data: Dict[str, Any]) -> Dict[str, Any]:
+        return plan.apply(raw_data) if plan else raw_data
+
+    def _flight_key(self, query_body: Dict[str, Any], cache_key: Optional[str]) -> str:
+        """Single-flight key: the cache key when there is one (same canonical hash)."""
+        if cache_key or not self.flight.enabled:
+            return cache_key or ""
+        return self._search_key(query_body)
+
+    @timed("es.search")
+    def search(self, params: Dict[str, Any], *, timeout: Optional[float] = None, use_cache: bool = True) -> Dict[str, Any]:
         """Execute search against Elasticsearch with fallback strategies."""
         try:
             # Ensure mapping hints for category_paths.keyword usage
             self._ensure_mapping_hints()
-            p = dict(params or {})
-            p["_has_category_paths_keyword"] = bool(self._has_category_paths_keyword)
-            # Route by domain: personal_care → skin builder; else generic
-            if str(p.get("category_group") or "").strip() == "personal_care":
-                query_body = _build_skin_es_query(p)
-            else:
-                query_body = _build_enhanced_es_query(p)
-            
-            # Debug logging
-            print(f"DEBUG: Enhanced ES Query Structure:")
-            print(f"  - Query: {params.get('q', '')}")
-            print(f"  - Category: {params.get('category_group', 'all')}")
-            print(f"  - Brands: {params.get('brands', [])}")
-            print(f"  - Price range: {params.get('price_min', 'no min')}-{params.get('price_max', 'no max')}")
-            print(f"  - Dietary: {params.get('dietary_labels', [])}")
-            try:
-                print(f"DEBUG: ES endpoint: {self.endpoint}")
-                # Pretty-print the actual JSON body for Postman reproduction
-                body_str = json.dumps(query_body, ensure_ascii=False, indent=2)
-                # Truncate extremely long outputs to keep logs readable
-                if len(body_str) > 40000:
-                    print(body_str[:40000] + "\n... (truncated) ...")
-                else:
-                    print(body_str)
-            except Exception:
-                pass
-            
-            # Debug: Print endpoint before making request
-            print(f"DEBUG: ES_REQUEST | endpoint={self.endpoint} | method=POST | timeout={TIMEOUT}s")
-            
-            response = requests.post(
-                self.endpoint,
-                headers=self.headers,
-                json=query_body,
-                timeout=TIMEOUT
-            )
-            response.raise_for_status()
-            
-            raw_data = response.json()
-            result = _transform_results(raw_data)
-            
-            print("="*80)
-            print("✅✅✅ ELASTICSEARCH REQUEST SUCCESSFUL ✅✅✅")
-            print(f"🔗 ENDPOINT: {self.endpoint}")
-            print(f"📇 INDEX: {self.index}")
-            print(f"📊 TOTAL_HITS: {result['meta']['total_hits']}")
-            print(f"📦 RETURNED: {result['meta']['returned']}")
-            print(f"⏱️  TOOK: {result['meta']['took_ms']}ms")
-            print("="*80)
-            
-            # No brand-specific fallback; brand handling is disabled (see note above)
-            
-            # Suppressed: verbose top results logging
-            
-            return result
-            
+            query_body = self._build_search_body(params)
+            cache_key, cached = self._cache_lookup(query_body, use_cache)
+            if cached is not None:
+                return cached
+
+            def _fetch() -> Dict[str, Any]:
+                _trace.debug("ES_REQUEST | endpoint=%s | method=POST | timeout=%ss", self.endpoint, timeout or TIMEOUT)
+                plan = self._rerank_plan(query_body)
+                url, payload = self._wire(plan.body if plan else query_body)
+                raw_data = self.transport.post(url, payload, timeout=timeout)
+                result = self._search_success(self._reranked(plan, raw_data))
+                if cache_key:
+                    self.cache.set(cache_key, result)
+                return result
+
+            return self.flight.run_sync(self._flight_key(query_body, cache_key), _fetch, store_if=_query_successful)
         except requests.exceptions.Timeout:
-            print("="*80)
-            print("⏱️⏱️⏱️  ELASTICSEARCH REQUEST TIMEOUT ⏱️⏱️⏱️")
-            print(f"🔗 ENDPOINT: {self.endpoint}")
-            print(f"⏱️  TIMEOUT: {TIMEOUT}s")
-            print("="*80)
-            return {"meta": {"total_hits": 0, "returned": 0, "took_ms": 0, "query_successful": False, "error": "timeout"}, "products": []}
+            return self._search_failure("timeout")
         except requests.exceptions.RequestException as e:
-            print("="*80)
-            print("❌❌❌ ELASTICSEARCH REQUEST FAILED ❌❌❌")
-            print(f"🔗 ENDPOINT: {self.endpoint}")
-            print(f"📇 INDEX: {self.index}")
-            print(f"🌐 BASE_URL: {self.base_url}")
-            print(f"⚠️  ERROR: {e}")
-            print("="*80)
-            return {"meta": {"total_hits": 0, "returned": 0, "took_ms": 0, "query_successful": False, "error": str(e)}, "products": []}
+            return self._search_failure("request", e)
         except Exception as e:
-            print("="*80)
-            print("⚠️⚠️⚠️  UNEXPECTED ELASTICSEARCH ERROR ⚠️⚠️⚠️")
-            print(f"🔗 ENDPOINT: {self.endpoint}")
-            print(f"📇 INDEX: {self.index}")
-            print(f"🌐 BASE_URL: {self.base_url}")
-            print(f"💥 ERROR: {e}")
-            print("="*80)
-            return {"meta": {"total_hits": 0, "returned": 0, "took_ms": 0, "query_successful": False, "error": str(e)}, "products": []}
-
-    def mget_products(self, ids: List[str]) -> List[Dict[str, Any]]:
-        """Fetch full product documents via _mget for the given IDs.
+            return self._search_failure("unexpected", e)
+
+    @timed("es.search")
+    async def asearch(self, params: Dict[str, Any], *, timeout: Optional[float] = None, use_cache: bool = True) -> Dict[str, Any]:
+        """Async variant of `search` using the pooled aiohttp transport."""
+        try:
+            await self._aensure_mapping_hints()
+            query_body = self._build_search_body(params)
+            cache_key, cached = await self._acache_lookup(query_body, use_cache)
+            if cached is not None:
+                return cached
+
+            async def _fetch() -> Dict[str, Any]:
+                _trace.debug("ES_REQUEST | endpoint=%s | method=POST | timeout=%ss | transport=async", self.endpoint, timeout or TIMEOUT)
+                plan = self._rerank_plan(query_body)
+                url, payload = await self._awire(plan.body if plan else query_body)
+                raw_data = await self.transport.apost(url, payload, timeout=timeout)
+                result = self._search_success(self._reranked(plan, raw_data))
+                if cache_key:
+                    await self.cache.aset(cache_key, result)
+                return result
+
+            return await self.flight.run(self._flight_key(query_body, cache_key), _fetch, store_if=_query_successful)
+        except asyncio.TimeoutError:
+            return self._search_failure("timeout")
+        except aiohttp.ClientError as e:
+            return self._search_failure("request", e)
+        except Exception as e:
+            return self._search_failure("unexpected", e)
 
-        Returns a list of _source dicts (with selected fields prioritized) in the same order as requested IDs
-        when possible.
+    def _msearch_plan(self, params_list: List[Dict[str, Any]], use_cache: bool) -> tuple:
+        """Build bodies, serve cache hits, and return (results, pending, lines).
+
+        `results` has cached entries filled in and None for misses; `pending` lists
+        (position, cache_key, rerank plan) for every miss in the order its body
+        appears in `lines`.
+        """
+        bodies = [self._build_search_body(params) for params in params_list]
+        return self._msearch_pending(bodies, [self._cache_lookup(body, use_cache) for body in bodies])
+
+    async def _amsearch_plan(self, params_list: List[Dict[str, Any]], use_cache: bool) -> tuple:
+        """Async `_msearch_plan`; the cache lookups run concurrently off the event loop."""
+        bodies = [self._build_search_body(params) for params in params_list]
+        return self._msearch_pending(bodies, await asyncio.gather(*(self._acache_lookup(body, use_cache) for body in bodies)))
+
+    def _msearch_pending(self, bodies: List[Dict[str, Any]], lookups: List[tuple]) -> tuple:
+        results: List[Optional[Dict[str, Any]]] = []
+        pending: List[tuple] = []
+        lines: List[Dict[str, Any]] = []
+        for i, (body, (cache_key, cached)) in enumerate(zip(bodies, lookups)):
+            results.append(cached)
+            if cached is None:
+                plan = self._rerank_plan(body)
+                pending.append((i, cache_key, plan))
+                lines.append({})  # index comes from the endpoint path
+                lines.append(plan.body if plan else body)
+        return results, pending, lines
+
+    def _msearch_split(self, data: Dict[str, Any], results: List[Optional[Dict[str, Any]]], pending: List[tuple]) -> List[tuple]:
+        """Split an _msearch response into per-query results (errors become empty results).
+
+        Returns the (cache_key, result) pairs worth caching.
         """
-        if not ids:
+        responses = (data or {}).get("responses", []) or []
+        to_cache: List[tuple] = []
+        for j, (i, cache_key, plan) in enumerate(pending):
+            item = responses[j] if j < len(responses) else {"error": "missing_response"}
+            if not isinstance(item, dict) or item.get("error"):
+                err = (item or {}).get("error") if isinstance(item, dict) else item
+                _trace.debug("ES_MSEARCH_ITEM_ERROR | index=%s | error=%s", i, str(err)[:200])
+                results[i] = {"meta": {"total_hits": 0, "returned": 0, "took_ms": 0, "query_successful": False, "error": str(err)}, "products": []}
+                continue
+            results[i] = _transform_results(self._reranked(plan, item))
+            if cache_key:
+                to_cache.append((cache_key, results[i]))
+        _trace.debug("ES_MSEARCH_DONE | queries=%s | sent=%s | hits=%s", len(results), len(pending), [r['meta']['total_hits'] for r in results])
+        return to_cache
+
+    def _msearch_fill(self, data: Dict[str, Any], results: List[Optional[Dict[str, Any]]], pending: List[tuple]) -> List[Dict[str, Any]]:
+        for cache_key, result in self._msearch_split(data, results, pending):
+            self.cache.set(cache_key, result)
+        return results
+
+    async def _amsearch_fill(self, data: Dict[str, Any], results: List[Optional[Dict[str, Any]]], pending: List[tuple]) -> List[Dict[str, Any]]:
+        to_cache = self._msearch_split(data, results, pending)
+        await asyncio.gather(*(self.cache.aset(cache_key, result) for cache_key, result in to_cache))
+        return results
+
+    @timed("es.msearch")
+    def msearch(self, params_list: List[Dict[str, Any]], *, timeout: Optional[float] = None, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Run several searches in one `_msearch` round trip; results keep input order."""
+        if not params_list:
             return []
         try:
-            print(f"DEBUG: ES mget request | endpoint={self.mget_endpoint} | id_count={len(ids)} | sample_ids={ids[:3]}")
-            body = {
-                "ids": [str(x).strip() for x in ids if str(x).strip()]
-            }
-            print(f"DEBUG: ES_MGET_REQUEST | endpoint={self.mget_endpoint} | method=POST | timeout={TIMEOUT}s")
-            response = requests.post(
-                self.mget_endpoint,
-                headers=self.headers,
-                json=body,
-                timeout=TIMEOUT
-            )
-            try:
-                print(f"DEBUG: ES mget response | status={response.status_code}")
-            except Exception:
-                pass
-            response.raise_for_status()
-            data = response.json() or {}
-            docs = data.get("docs", []) or []
-            print(f"DEBUG: ES mget parsed | docs_count={len(docs)}")
-            out: List[Dict[str, Any]] = []
-            for d in docs:
-                src = d.get("_source", {}) or {}
-                if src:
-                    out.append(src)
-            print(f"DEBUG: ES mget out | sources_count={len(out)}")
-            # If _mget by _id returned nothing, fallback to a terms search on field 'id'
-            if not out:
-                print("DEBUG: ES mget fallback → terms search on field 'id'")
-                return self.search_by_ids(ids)
-            return out
+            self._ensure_mapping_hints()
+            results, pending, lines = self._msearch_plan(params_list, use_cache)
+            if not pending:
+                return results
+            _trace.debug("ES_MSEARCH_REQUEST | endpoint=%s | queries=%s | timeout=%ss", self.msearch_endpoint, len(pending), timeout or TIMEOUT)
+            matches = [m if m is not None and self._register_template(m[0]) else None for m in map(self._template_match, lines[1::2])]
+            url, lines = self._msearch_wire(lines, matches)
+            data = self.transport.post_ndjson(url, lines, timeout=timeout)
+            return self._msearch_fill(data, results, pending)
         except requests.exceptions.Timeout:
-            print("DEBUG: ES mget timeout")
-            return []
-        except Exception as exc:
-            print(f"DEBUG: ES mget failed: {exc}")
+            return [self._search_failure("timeout") for _ in params_list]
+        except Exception as e:
+            return [self._search_failure("request", e) for _ in params_list]
+
+    @timed("es.msearch")
+    async def amsearch(self, params_list: List[Dict[str, Any]], *, timeout: Optional[float] = None, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Async variant of `msearch`."""
+        if not params_list:
             return []
+        try:
+            await self._aensure_mapping_hints()
+            results, pending, lines = await self._amsearch_plan(params_list, use_cache)
+            if not pending:
+                return results
+            _trace.debug("ES_MSEARCH_REQUEST | endpoint=%s | queries=%s | timeout=%ss | transport=async", self.msearch_endpoint, len(pending), timeout or TIMEOUT)
+            matches = [m if m is not None and await self._aregister_template(m[0]) else None for m in map(self._template_match, lines[1::2])]
+            url, lines = self._msearch_wire(lines, matches)
+            data = await self.transport.apost_ndjson(url, lines, timeout=timeout)
+            return await self._amsearch_fill(data, results, pending)
+        except asyncio.TimeoutError:
+            return [self._search_failure("timeout") for _ in params_list]
+        except Exception as e:
+            return [self._search_failure("request", e) for _ in params_list]
+
+    # ────────────────────────────────────────────────────────
+    # Cursor pagination (point-in-time + search_after)
+    # ────────────────────────────────────────────────────────
+
+    def _page_body(self, params: Dict[str, Any], pit_id: str, search_after: Optional[List[Any]], keep_alive: str) -> Dict[str, Any]:
+        """Search body for one page of a PIT snapshot.
+
+        The `_shard_doc` tiebreaker makes the sort total, so `search_after` never
+        skips or repeats a hit. Follow-up pages skip `track_total_hits`; the
+        route carries the first page's total in the cursor.
+        """
+        body = dict(self._build_search_body(params))
+        body["sort"] = [*(body.get("sort") or es_templates.SCORE_SORT), {"_shard_doc": "asc"}]
+        body["pit"] = {"id": pit_id, "keep_alive": keep_alive}
+        if search_after:
+            body["search_after"] = list(search_after)
+            body["track_total_hits"] = False
+        return body
+
+    def _page_result(self, raw_data: Dict[str, Any], body: Dict[str, Any]) -> tuple:
+        """Return (result, next_cursor); the cursor is None once the snapshot is exhausted."""
+        hits = (raw_data.get("hits") or {}).get("hits") or []
+        result = self._search_success(raw_data)
+        if len(hits) < int(body.get("size", 10)) or not hits[-1].get("sort"):
+            return result, None
+        pit_id = raw_data.get("pit_id") or body["pit"]["id"]
+        return result, {"pit_id": pit_id, "search_after": hits[-1]["sort"]}
+
+    def _page_failure(self, exc: BaseException) -> Dict[str, Any]:
+        """Failed page; a 404 means the PIT expired or was closed (`meta.error == "pit_expired"`)."""
+        status = getattr(getattr(exc, "response", None), "status_code", None) or getattr(exc, "status", None)
+        if status == 404:
+            _trace.info("ES_PIT_EXPIRED | index=%s", self.index)
+            failure = self._search_failure("request", exc)
+            failure["meta"]["error"] = "pit_expired"
+            return failure
+        if isinstance(exc, (requests.exceptions.Timeout, asyncio.TimeoutError)):
+            return self._search_failure("timeout")
+        return self._search_failure("request", exc)
+
+    def open_pit(self, *, keep_alive: str = PIT_KEEP_ALIVE, timeout: Optional[float] = None) -> str:
+        data = self.transport.request("POST", f"{self.base_url}/{self.index}/_pit?keep_alive={keep_alive}", None, timeout=timeout)
+        return data["id"]
+
+    async def aopen_pit(self, *, keep_alive: str = PIT_KEEP_ALIVE, timeout: Optional[float] = None) -> str:
+        data = await self.transport.arequest("POST", f"{self.base_url}/{self.index}/_pit?keep_alive={keep_alive}", None, timeout=timeout)
+        return data["id"]
+
+    def close_pit(self, pit_id: str, *, timeout: Optional[float] = None) -> bool:
+        """Release a snapshot early; failures are harmless (ES drops it after keep_alive)."""
+        try:
+            return bool(self.transport.request("DELETE", self.pit_endpoint, {"id": pit_id}, timeout=timeout).get("succeeded"))
+        except Exception as e:
+            _trace.debug("ES_PIT_CLOSE_FAILED | error=%s", e)
+            return False
+
+    async def aclose_pit(self, pit_id: str, *, timeout: Optional[float] = None) -> bool:
+        try:
+            data = await self.transport.arequest("DELETE", self.pit_endpoint, {"id": pit_id}, timeout=timeout)
+            return bool(data.get("succeeded"))
+        except Exception as e:
+            _trace.debug("ES_PIT_CLOSE_FAILED | error=%s", e)
+            return False
+
+    @timed("es.search_page")
+    def search_page(
+        self,
+        params: Dict[str, Any],
+        *,
+        pit_id: Optional[str] = None,
+        search_after: Optional[List[Any]] = None,
+        keep_alive: str = PIT_KEEP_ALIVE,
+        timeout: Optional[float] = None,
+    ) -> tuple:
+        """One page of `params` over a PIT snapshot: returns (result, next_cursor).
+
+        Without `pit_id` a snapshot is opened first (first page). `next_cursor`
+        is `{"pit_id", "search_after"}` for the following page, or None on the
+        last page, in which case the snapshot is closed. A snapshot opened by
+        a failed first page is closed too. Pages bypass the
+        result cache, single-flight and client rerank: they are per-snapshot
+        and ES has to own the sort for `search_after` to be exact.
+        """
+        opened = None
+        try:
+            self._ensure_mapping_hints()
+            if not pit_id:
+                pit_id = opened = self.open_pit(keep_alive=keep_alive, timeout=timeout)
+            body = self._page_body(params, pit_id, search_after, keep_alive)
+            _trace.debug("ES_PAGE_REQUEST | endpoint=%s | after=%s | timeout=%ss", self.pit_search_endpoint, search_after, timeout or TIMEOUT)
+            raw_data = self.transport.post(self.pit_search_endpoint, body, timeout=timeout)
+            result, cursor = self._page_result(raw_data, body)
+            if cursor is None:
+                self.close_pit(raw_data.get("pit_id") or pit_id, timeout=timeout)
+            return result, cursor
+        except Exception as e:
+            if opened:  # no cursor reaches the client, so nobody would ever close this snapshot
+                self.close_pit(opened, timeout=timeout)
+            return self._page_failure(e), None
+
+    @timed("es.search_page")
+    async def asearch_page(
+        self,
+        params: Dict[str, Any],
+        *,
+        pit_id: Optional[str] = None,
+        search_after: Optional[List[Any]] = None,
+        keep_alive: str = PIT_KEEP_ALIVE,
+        timeout: Optional[float] = None,
+    ) -> tuple:
+        """Async variant of `search_page`."""
+        opened = None
+        try:
+            await self._aensure_mapping_hints()
+            if not pit_id:
+                pit_id = opened = await self.aopen_pit(keep_alive=keep_alive, timeout=timeout)
+            body = self._page_body(params, pit_id, search_after, keep_alive)
+            _trace.debug("ES_PAGE_REQUEST | endpoint=%s | after=%s | timeout=%ss | transport=async", self.pit_search_endpoint, search_after, timeout or TIMEOUT)
+            raw_data = await self.transport.apost(self.pit_search_endpoint, body, timeout=timeout)
+            result, cursor = self._page_result(raw_data, body)
+            if cursor is None:
+                await self.aclose_pit(raw_data.get("pit_id") or pit_id, timeout=timeout)
+            return result, cursor
+        except Exception as e:
+            if opened:  # no cursor reaches the client, so nobody would ever close this snapshot
+                await self.aclose_pit(opened, timeout=timeout)
+            return self._page_failure(e), None
+
+    # ────────────────────────────────────────────────────────
+    # Document lookups
+    # ────────────────────────────────────────────────────────
+
+    def _mget_body(self, ids: List[str]) -> Dict[str, Any]:
+        _trace.debug("ES mget request | endpoint=%s | id_count=%s | sample_ids=%s", self.mget_endpoint, len(ids), ids[:3])
+        return {"ids": [str(x).strip() for x in ids if str(x).strip()]}
+
+    @staticmethod
+    def _doc_ids(ids: List[str]) -> List[str]:
+        return [str(x).strip() for x in (ids or []) if str(x).strip()]
+
+    @staticmethod
+    def _mget_docs(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        docs = (data or {}).get("docs", []) or []
+        _trace.debug("ES mget parsed | docs_count=%s", len(docs))
+        out: Dict[str, Dict[str, Any]] = {}
+        for d in docs:
+            src = d.get("_source", {}) or {}
+            if src:
+                out[str(d.get("_id", ""))] = src
+        _trace.debug("ES mget out | sources_count=%s", len(out))
+        return out
+
+    @timed("es.mget")
+    def mget_products(self, ids: List[str], *, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Fetch full product documents via _mget for the given IDs.
+
+        Returns a list of _source dicts in the same order as the requested IDs.
+        Docs come from the product-doc cache; only the missing ids go to ES, in
+        one _mget. On an ES error the cached subset is returned.
+        """
+        wanted = self._doc_ids(ids)
+        docs, missing = self.docs.get_many(self.index, wanted)
+        if missing:
+            try:
+                _trace.debug("ES_MGET_REQUEST | endpoint=%s | method=POST | timeout=%ss", self.mget_endpoint, timeout or TIMEOUT)
+                fetched = self._mget_docs(self.transport.post(self.mget_endpoint, self._mget_body(missing), timeout=timeout))
+                # If _mget by _id returned nothing, fallback to a terms search on field 'id'
+                if not fetched:
+                    _trace.debug("ES mget fallback → terms search on field 'id'")
+                    fetched = self._fetch_by_ids(missing, timeout=timeout)
+                self.docs.put_many(self.index, fetched)
+                docs.update(fetched)
+            except requests.exceptions.Timeout:
+                _trace.debug("ES mget timeout")
+            except Exception as exc:
+                _trace.debug("ES mget failed: %s", exc)
+        return [docs[i] for i in wanted if i in docs]
+
+    @timed("es.mget")
+    async def amget_products(self, ids: List[str], *, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Async variant of `mget_products`."""
+        wanted = self._doc_ids(ids)
+        docs, missing = await self.docs.aget_many(self.index, wanted)
+        if missing:
+            try:
+                _trace.debug("ES_MGET_REQUEST | endpoint=%s | method=POST | timeout=%ss | transport=async", self.mget_endpoint, timeout or TIMEOUT)
+                fetched = self._mget_docs(await self.transport.apost(self.mget_endpoint, self._mget_body(missing), timeout=timeout))
+                if not fetched:
+                    _trace.debug("ES mget fallback → terms search on field 'id'")
+                    fetched = await self._afetch_by_ids(missing, timeout=timeout)
+                await self.docs.aput_many(self.index, fetched)
+                docs.update(fetched)
+            except asyncio.TimeoutError:
+                _trace.debug("ES mget timeout")
+            except Exception as exc:
+                _trace.debug("ES mget failed: %s", exc)
+        return [docs[i] for i in wanted if i in docs]
+
+    def warm_up_docs(self, top_n: int = DOC_CACHE_WARMUP_TOP_N, *, batch_size: int = 100) -> int:
+        """Preload the most requested product docs into the doc cache; returns how many are cached."""
+        ids = self.docs.popular(self.index, top_n)
+        _, missing = self.docs.get_many(self.index, ids, track=False)
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            self.docs.put_many(self.index, self._mget_docs(self.transport.post(self.mget_endpoint, self._mget_body(batch))))
+        cached = len(ids) - len(self.docs.get_many(self.index, ids, track=False)[1])
+        _trace.info("ES_DOC_WARMUP | index=%s | requested=%s | fetched_from_es=%s | cached=%s", self.index, len(ids), len(missing), cached)
+        return cached
+
+    @staticmethod
+    def _brand_suggest_body(hint: str, category_group: Optional[str]) -> Dict[str, Any]:
+        should_terms: List[Dict[str, Any]] = [
+            {"term": {"brand": hint}},
+            {"wildcard": {"brand": {"value": f"{hint}*"}}},
+            {"wildcard": {"brand": {"value": f"*{hint}*"}}},
+        ]
+        filters: List[Dict[str, Any]] = []
+        if category_group and isinstance(category_group, str) and category_group.strip():
+            filters.append({"term": {"category_group": category_group.strip()}})
+        return {
+            "size": 0,
+            "query": {
+                "bool": {
+                    "filter": filters,
+                    "should": should_terms,
+                    "minimum_should_match": 1,
+                }
+            },
+            "aggs": {
+                "brand_suggest": {
+                    "terms": {"field": "brand", "size": 5}
+                }
+            }
+        }
+
+    @staticmethod
+    def _brand_suggestion(hint: str, data: Dict[str, Any]) -> Optional[str]:
+        buckets = ((((data or {}).get("aggregations", {}) or {}).get("brand_suggest", {}) or {}).get("buckets", []) or [])
+        if buckets:
+            suggestion = str(buckets[0].get("key", "")).strip()
+            _trace.debug("Brand suggest | hint='%s' → '%s'", hint, suggestion)
+            return suggestion or None
+        return None
+
+    def refresh_brand_index(self, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Terms-aggregation dump the brand dictionary is built from (run by its refresh thread)."""
+        _trace.debug("ES_BRAND_DUMP_REQUEST | endpoint=%s | max_brands=%s", self.endpoint, self.brands.max_brands)
+        return self.transport.post(self.endpoint, self.brands.dump_body(), timeout=timeout)
 
-    def suggest_brand(self, brand_hint: str, category_group: Optional[str] = None) -> Optional[str]:
-        """Suggest a canonical brand value from ES given a noisy hint.
+    def suggest_brand(self, brand_hint: str, category_group: Optional[str] = None, *, timeout: Optional[float] = None) -> Optional[str]:
+        """Suggest a canonical brand value given a noisy hint.
 
-        Uses a terms aggregation over `brand` filtered by wildcard matches of the hint.
-        Returns the top bucket key (most frequent brand) or None.
+        Answered from the in-process brand dictionary when it is loaded. Otherwise
+        ES runs a terms aggregation over `brand` filtered by wildcard matches of the
+        hint, and the top bucket key (most frequent brand) or None is returned.
         """
         try:
             hint = (brand_hint or "").strip().strip("'\" ")
             if not hint:
                 return None
-            should_terms: List[Dict[str, Any]] = [
-                {"term": {"brand": hint}},
-                {"wildcard": {"brand": {"value": f"{hint}*"}}},
-                {"wildcard": {"brand": {"value": f"*{hint}*"}}},
-            ]
-            filters: List[Dict[str, Any]] = []
-            if category_group and isinstance(category_group, str) and category_group.strip():
-                filters.append({"term": {"category_group": category_group.strip()}})
-            body: Dict[str, Any] = {
-                "size": 0,
-                "query": {
-                    "bool": {
-                        "filter": filters,
-                        "should": should_terms,
-                        "minimum_should_match": 1,
-                    }
-                },
-                "aggs": {
-                    "brand_suggest": {
-                        "terms": {"field": "brand", "size": 5}
-                    }
-                }
-            }
-            print(f"DEBUG: ES_BRAND_SUGGEST_REQUEST | endpoint={self.endpoint} | method=POST | timeout={TIMEOUT}s")
-            response = requests.post(
-                self.endpoint,
-                headers=self.headers,
-                json=body,
-                timeout=TIMEOUT
-            )
-            response.raise_for_status()
-            data = response.json() or {}
-            buckets = (((data.get("aggregations", {}) or {}).get("brand_suggest", {}) or {}).get("buckets", []) or [])
-            if buckets:
-                suggestion = str(buckets[0].get("key", "")).strip()
-                print(f"DEBUG: Brand suggest | hint='{hint}' → '{suggestion}'")
-                return suggestion or None
+            answered, brand = self.brands.suggest(hint, category_group)
+            if answered:
+                _trace.debug("Brand suggest (local) | hint='%s' → '%s'", hint, brand)
+                return brand
+            body = self._brand_suggest_body(hint, category_group)
+            _trace.debug("ES_BRAND_SUGGEST_REQUEST | endpoint=%s | method=POST | timeout=%ss", self.endpoint, timeout or TIMEOUT)
+            return self._brand_suggestion(hint, self.transport.post(self.endpoint, body, timeout=timeout))
+        except Exception as exc:
+            _trace.debug("Brand suggest failed: %s", exc)
+        return None
+
+    async def asuggest_brand(self, brand_hint: str, category_group: Optional[str] = None, *, timeout: Optional[float] = None) -> Optional[str]:
+        """Async variant of `suggest_brand`."""
+        try:
+            hint = (brand_hint or "").strip().strip("'\" ")
+            if not hint:
+                return None
+            answered, brand = self.brands.suggest(hint, category_group)
+            if answered:
+                _trace.debug("Brand suggest (local) | hint='%s' → '%s'", hint, brand)
+                return brand
+            body = self._brand_suggest_body(hint, category_group)
+            _trace.debug("ES_BRAND_SUGGEST_REQUEST | endpoint=%s | method=POST | timeout=%ss | transport=async", self.endpoint, timeout or TIMEOUT)
+            return self._brand_suggestion(hint, await self.transport.apost(self.endpoint, body, timeout=timeout))
         except Exception as exc:
-            print(f"DEBUG: Brand suggest failed: {exc}")
+            _trace.debug("Brand suggest failed: %s", exc)
         return None
 
-    def search_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _ids_search_body(ordered_ids: List[str]) -> Dict[str, Any]:
+        return {
+            "size": len(ordered_ids),
+            "_source": {
+                "includes": [
+                    "id", "name", "brand", "price", "mrp", "description", "use",
+                    "hero_image.*", "package_claims.*", "category_group", "category_paths",
+                    "category_data.*", "ingredients.*", "tags_and_sentiments.*",
+                    "flean_score.*", "stats.*"
+                ]
+            },
+            "query": {
+                "terms": {"id": ordered_ids}
+            }
+        }
+
+    @staticmethod
+    def _ids_search_docs(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        hits = ((data or {}).get("hits", {}) or {}).get("hits", []) or []
+        _trace.debug("ES ids-search parsed | hits_count=%s", len(hits))
+        out: Dict[str, Dict[str, Any]] = {}
+        for h in hits:
+            src = h.get("_source", {}) or {}
+            pid = str(src.get("id", "")).strip()
+            if pid:
+                out[pid] = src
+        _trace.debug("ES ids-search out | sources_count=%s", len(out))
+        return out
+
+    @timed("es.ids_search")
+    def _fetch_by_ids(self, ids: List[str], *, timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        body = self._ids_search_body(ids)
+        _trace.debug("ES ids-search request | endpoint=%s | id_count=%s", self.endpoint, len(ids))
+        _trace.debug("ES_SEARCH_REQUEST | endpoint=%s | method=POST | timeout=%ss", self.endpoint, timeout or TIMEOUT)
+        return self._ids_search_docs(self.transport.post(self.endpoint, body, timeout=timeout))
+
+    @timed("es.ids_search")
+    async def _afetch_by_ids(self, ids: List[str], *, timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        body = self._ids_search_body(ids)
+        _trace.debug("ES ids-search request | endpoint=%s | id_count=%s | transport=async", self.endpoint, len(ids))
+        return self._ids_search_docs(await self.transport.apost(self.endpoint, body, timeout=timeout))
+
+    def search_by_ids(self, ids: List[str], *, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
         """Fetch documents by matching the 'id' field using a terms query.
 
-        Returns list of _source dicts ordered to match the requested ids.
+        Returns list of _source dicts ordered to match the requested ids;
+        cached docs are served without a query.
         """
-        if not ids:
-            return []
-        try:
-            ordered_ids = [str(x).strip() for x in ids if str(x).strip()]
-            body = {
-                "size": len(ordered_ids),
-                "_source": {
-                    "includes": [
-                        "id", "name", "brand", "price", "mrp", "description", "use",
-                        "hero_image.*", "package_claims.*", "category_group", "category_paths",
-                        "category_data.*", "ingredients.*", "tags_and_sentiments.*",
-                        "flean_score.*", "stats.*"
-                    ]
-                },
-                "query": {
-                    "terms": {"id": ordered_ids}
-                }
-            }
-            search_endpoint = f"{self.base_url}/{self.index}/_search"
-            print(f"DEBUG: ES ids-search request | endpoint={search_endpoint} | id_count={len(ordered_ids)}")
-            print(f"DEBUG: ES_SEARCH_REQUEST | endpoint={search_endpoint} | method=POST | timeout={TIMEOUT}s")
-            response = requests.post(
-                search_endpoint,
-                headers=self.headers,
-                json=body,
-                timeout=TIMEOUT
-            )
-            print(f"DEBUG: ES ids-search response | status={response.status_code}")
-            response.raise_for_status()
-            data = response.json() or {}
-            hits = (data.get("hits", {}) or {}).get("hits", []) or []
-            print(f"DEBUG: ES ids-search parsed | hits_count={len(hits)}")
-            id_to_src: Dict[str, Dict[str, Any]] = {}
-            for h in hits:
-                src = h.get("_source", {}) or {}
-                pid = str(src.get("id", "")).strip()
-                if pid:
-                    id_to_src[pid] = src
-            # Reorder to match requested ids
-            out: List[Dict[str, Any]] = [id_to_src.get(i) for i in ordered_ids if id_to_src.get(i)]
-            print(f"DEBUG: ES ids-search out | sources_count={len(out)}")
-            return out
-        except requests.exceptions.Timeout:
-            print("DEBUG: ES ids-search timeout")
-            return []
-        except Exception as exc:
-            print(f"DEBUG: ES ids-search failed: {exc}")
-            return []
+        wanted = self._doc_ids(ids)
+        docs, missing = self.docs.get_many(self.index, wanted)
+        if missing:
+            try:
+                fetched = self._fetch_by_ids(missing, timeout=timeout)
+                self.docs.put_many(self.index, fetched)
+                docs.update(fetched)
+            except requests.exceptions.Timeout:
+                _trace.debug("ES ids-search timeout")
+            except Exception as exc:
+                _trace.debug("ES ids-search failed: %s", exc)
+        return [docs[i] for i in wanted if i in docs]
+
+    async def asearch_by_ids(self, ids: List[str], *, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Async variant of `search_by_ids`."""
+        wanted = self._doc_ids(ids)
+        docs, missing = await self.docs.aget_many(self.index, wanted)
+        if missing:
+            try:
+                fetched = await self._afetch_by_ids(missing, timeout=timeout)
+                await self.docs.aput_many(self.index, fetched)
+                docs.update(fetched)
+            except asyncio.TimeoutError:
+                _trace.debug("ES ids-search timeout")
+            except Exception as exc:
+                _trace.debug("ES ids-search failed: %s", exc)
+        return [docs[i] for i in wanted if i in docs]
 
 # Parameter extraction and normalization
 def _extract_defaults_from_context(ctx) -> Dict[str, Any]:
@@ -1797,7 +2124,7 @@ def _extract_defaults_from_context(ctx) -> Dict[str, Any]:
         # User didn't mention budget/price, so don't apply budget filters
         # This ensures old budget values don't persist for new queries
         try:
-            print(f"DEBUG: BUDGET_NOT_MENTIONED | current_text='{current_text[:50]}' | query='{query[:50]}' | skipping_budget_extraction")
+            _trace.debug("BUDGET_NOT_MENTIONED | current_text='%s' | query='%s' | skipping_budget_extraction", current_text[:50], query[:50])
         except Exception:
             pass
     
@@ -1914,8 +2241,8 @@ async def build_search_params(ctx) -> Dict[str, Any]:
                 domain = ""  # Force fallback to unified flow
             else:
                 # Domain validation passed, proceed with personal care flow
-                from ..llm_service import LLMService
-                llm_service = LLMService()
+                from ..llm_service import get_llm_service
+                llm_service = get_llm_service()
                 # Build unified params for personal care
                 try:
                     unified_pc = await llm_service.generate_unified_es_params(ctx)
@@ -1943,21 +2270,21 @@ async def build_search_params(ctx) -> Dict[str, Any]:
                         for it in lst:
                             if it and it not in merged:
                                 merged.append(it)
-                    print(f"DEBUG: USING_SKIN_PARAMS | q='{final_params.get('q')}' | types={final_params.get('product_types')} | skin_concerns={final_params.get('skin_concerns')} | hair_concerns={final_params.get('hair_concerns')} | merged_concerns={merged}")
+                    _trace.debug("USING_SKIN_PARAMS | q='%s' | types=%s | skin_concerns=%s | hair_concerns=%s | merged_concerns=%s", final_params.get('q'), final_params.get('product_types'), final_params.get('skin_concerns'), final_params.get('hair_concerns'), merged)
                     ctx.session.setdefault("debug", {})["last_skin_search_params"] = final_params
                 except Exception:
                     pass
                 return final_params
     except Exception as exc:
         try:
-            print(f"DEBUG: SKIN_BRANCH_FAILED | {exc}")
+            _trace.debug("SKIN_BRANCH_FAILED | %s", exc)
         except Exception:
             pass
 
     # 1) Try unified ES params directly (authoritative)
     try:
-        from ..llm_service import LLMService  # type: ignore
-        llm_service = LLMService()
+        from ..llm_service import get_llm_service  # type: ignore
+        llm_service = get_llm_service()
         unified = await llm_service.generate_unified_es_params(ctx)
         if isinstance(unified, dict) and unified.get("q"):
             final_params: Dict[str, Any] = dict(unified)
@@ -1976,14 +2303,14 @@ async def build_search_params(ctx) -> Dict[str, Any]:
                 final_params["size"] = 20
             # Persist for debugging
             try:
-                print(f"DEBUG: USING_UNIFIED_PARAMS_DIRECT | q='{final_params.get('q')}' | dietary={final_params.get('dietary_terms')}")
+                _trace.debug("USING_UNIFIED_PARAMS_DIRECT | q='%s' | dietary=%s", final_params.get('q'), final_params.get('dietary_terms'))
                 ctx.session.setdefault("debug", {})["last_search_params"] = final_params
             except Exception:
                 pass
             return final_params
     except Exception as exc:
         try:
-            print(f"DEBUG: UNIFIED_CALL_FAILED | {exc}")
+            _trace.debug("UNIFIED_CALL_FAILED | %s", exc)
         except Exception:
             pass
     
@@ -2002,7 +2329,7 @@ async def build_search_params(ctx) -> Dict[str, Any]:
             "product_intent": str(ctx.session.get("product_intent") or "show_me_options"),
             "protein_weight": 1.5,
         }
-        print(f"DEBUG: UNIFIED_MINIMAL_FALLBACK | q='{fallback['q']}'")
+        _trace.debug("UNIFIED_MINIMAL_FALLBACK | q='%s'", fallback['q'])
         ctx.session.setdefault("debug", {})["last_search_params"] = fallback
         return fallback
     except Exception:
@@ -2019,6 +2346,113 @@ def get_es_fetcher() -> ElasticsearchProductsFetcher:
         _es_fetcher = ElasticsearchProductsFetcher()
     return _es_fetcher
 
+
+def warm_up_product_docs(top_n: int = DOC_CACHE_WARMUP_TOP_N) -> Optional[threading.Thread]:
+    """Preload the most requested product docs in a background thread (startup job)."""
+    if top_n <= 0:
+        return None
+
+    def _run() -> None:
+        try:
+            fetcher = get_es_fetcher()
+            if fetcher.docs.enabled:
+                fetcher.warm_up_docs(top_n)
+        except Exception as exc:
+            _trace.warning("ES_DOC_WARMUP_FAILED | error=%s", exc)
+
+    thread = threading.Thread(target=_run, name="es-doc-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def start_brand_index() -> Optional[threading.Thread]:
+    """Load the brand dictionary now and keep refreshing it in a daemon thread (startup job)."""
+    try:
+        fetcher = get_es_fetcher()
+    except Exception as exc:
+        _trace.warning("BRAND_INDEX_START_FAILED | error=%s", exc)
+        return None
+    return fetcher.brands.start(fetcher.refresh_brand_index)
+
+# Zero-result fallback execution mode:
+#   sequential – one ES round trip per ladder step, stop at the first hit (default)
+#   concurrent – fire every step at once, keep the highest-priority step with hits
+#   msearch    – send every step in a single _msearch request, same selection rule
+FALLBACK_MODE = os.getenv("ES_FALLBACK_MODE", "sequential").strip().lower()
+
+
+async def _run_fallback_ladder(
+    fetcher: ElasticsearchProductsFetcher,
+    steps: List[tuple],
+    mode: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Execute ordered (label, params) fallback steps and return the first step with hits.
+
+    Priority is always the ladder order, so the chosen fallback is identical in every
+    mode; only the number of serial round trips changes.
+    """
+    if not steps:
+        return None
+    mode = (mode or FALLBACK_MODE or "sequential").lower()
+    with span("es.fallback", mode=mode):
+        picked = await _first_step_with_hits(fetcher, steps, mode)
+    if picked is None:
+        inc("shopbot_es_fallback_applied_total", step="none")
+        return None
+    label, res = picked
+    res.setdefault('meta', {})['fallback_applied'] = label
+    res['meta']['fallback_mode'] = mode
+    inc("shopbot_es_fallback_applied_total", step=label)
+    return res
+
+
+def _hits(res: Dict[str, Any]) -> int:
+    try:
+        return int(((res or {}).get('meta') or {}).get('total_hits') or 0)
+    except Exception:
+        return 0
+
+
+async def _first_step_with_hits(
+    fetcher: ElasticsearchProductsFetcher,
+    steps: List[tuple],
+    mode: str,
+) -> Optional[tuple]:
+    """(label, result) of the first ladder step with hits, or None."""
+    if mode == "msearch":
+        results = await fetcher.amsearch([p for _label, p in steps])
+        for (label, _p), res in zip(steps, results):
+            if _hits(res) > 0:
+                return label, res
+        return None
+
+    if mode == "concurrent":
+        tasks = [asyncio.ensure_future(fetcher.asearch(p)) for _label, p in steps]
+        try:
+            # Await in priority order; a lower step only wins if every step above it is empty
+            for (label, _p), task in zip(steps, tasks):
+                try:
+                    res = await task
+                except Exception:
+                    continue
+                if _hits(res) > 0:
+                    return label, res
+            return None
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    for label, p in steps:
+        try:
+            with span("es.fallback_step", step=label):
+                res = await fetcher.asearch(p)
+        except Exception:
+            continue
+        if _hits(res) > 0:
+            return label, res
+    return None
+
+
 # Async handlers for different functions
 async def search_products_handler(ctx) -> Dict[str, Any]:
     """Main product search handler with quality checks"""
@@ -2031,12 +2465,13 @@ async def search_products_handler(ctx) -> Dict[str, Any]:
     except Exception:
         pass
 
-    params = await build_search_params(ctx)
     fetcher = get_es_fetcher()
-    
-    # Run in thread to avoid blocking
-    loop = asyncio.get_running_loop()
-    results = await loop.run_in_executor(None, lambda: fetcher.search(params))
+    # Speculative extraction started alongside classification (same inputs → same params)
+    spec = await speculation.claim(ctx)
+    params = spec.params if spec is not None else await build_search_params(ctx)
+
+    # Await ES on the pooled async transport (no executor thread per call)
+    results = spec.results if spec is not None and spec.results is not None else await fetcher.asearch(params)
     
     # Additional quality check: if we got results but they're all low quality
     if results.get('products'):
@@ -2049,7 +2484,7 @@ async def search_products_handler(ctx) -> Dict[str, Any]:
             avg_flean = sum(numeric_fleans) / len(numeric_fleans)
             if avg_flean < 30 and params.get('brands'):
                 # Products are low quality, maybe try without brand constraint
-                print(f"DEBUG: Average flean percentile {avg_flean}% is low, considering fallback...")
+                _trace.debug("Average flean percentile %s%% is low, considering fallback...", avg_flean)
                 results['meta']['quality_warning'] = f'average_flean_percentile_{avg_flean:.1f}'
     
     # Zero-result fallback strategy (tree, ordered):
@@ -2064,7 +2499,7 @@ async def search_products_handler(ctx) -> Dict[str, Any]:
         group = str(params.get('category_group') or '').strip()
         # Personal care fallback branch (no category hierarchy)
         if group == 'personal_care':
-            print("DEBUG: ZERO_RESULT | applying PC fallback sequence")
+            _trace.debug("ZERO_RESULT | applying PC fallback sequence | mode=%s", FALLBACK_MODE)
 
             def _drop_price_pc(d: Dict[str, Any]) -> Dict[str, Any]:
                 x = dict(d)
@@ -2093,61 +2528,31 @@ async def search_products_handler(ctx) -> Dict[str, Any]:
                     x.pop(k, None)
                 return x
 
-            # PC Step 1: Drop price
-            try:
-                p_pc1 = _drop_price_pc(params)
-                if p_pc1 is not params:
-                    print("DEBUG: PC_FALLBACK[1] PRICE_ANY")
-                    alt_pc1 = await loop.run_in_executor(None, lambda: fetcher.search(p_pc1))
-                    alt_pc1_total = int(((alt_pc1.get('meta') or {}).get('total_hits')) or 0)
-                    if alt_pc1_total > 0:
-                        alt_pc1['meta']['fallback_applied'] = 'pc_price_any'
-                        return alt_pc1
-            except Exception:
-                pass
-
-            # PC Step 2: Relax reviews
-            try:
-                p_pc2 = _relax_reviews_pc(params)
-                print("DEBUG: PC_FALLBACK[2] RELAX_REVIEWS")
-                alt_pc2 = await loop.run_in_executor(None, lambda: fetcher.search(p_pc2))
-                alt_pc2_total = int(((alt_pc2.get('meta') or {}).get('total_hits')) or 0)
-                if alt_pc2_total > 0:
-                    alt_pc2['meta']['fallback_applied'] = 'pc_relax_reviews'
-                    return alt_pc2
-            except Exception:
-                pass
-
-            # PC Step 3: Drop hard/soft constraints
-            try:
-                p_pc3 = _drop_hard_soft_pc(params)
-                print("DEBUG: PC_FALLBACK[3] DROP_HARD_SOFT")
-                alt_pc3 = await loop.run_in_executor(None, lambda: fetcher.search(p_pc3))
-                alt_pc3_total = int(((alt_pc3.get('meta') or {}).get('total_hits')) or 0)
-                if alt_pc3_total > 0:
-                    alt_pc3['meta']['fallback_applied'] = 'pc_drop_hard_soft'
-                    return alt_pc3
-            except Exception:
-                pass
-
-            # PC Step 4: Expand size to 30
+            pc_steps: List[tuple] = []
             try:
+                # PC Step 1: Drop price
+                _trace.debug("PC_FALLBACK[1] PRICE_ANY")
+                pc_steps.append(('pc_price_any', _drop_price_pc(params)))
+                # PC Step 2: Relax reviews
+                _trace.debug("PC_FALLBACK[2] RELAX_REVIEWS")
+                pc_steps.append(('pc_relax_reviews', _relax_reviews_pc(params)))
+                # PC Step 3: Drop hard/soft constraints
+                _trace.debug("PC_FALLBACK[3] DROP_HARD_SOFT")
+                pc_steps.append(('pc_drop_hard_soft', _drop_hard_soft_pc(params)))
+                # PC Step 4: Expand size to 30
                 p_pc4 = dict(params)
                 p_pc4['size'] = max(20, int(p_pc4.get('size', 20) or 20), 30)
-                print("DEBUG: PC_FALLBACK[4] EXPAND_SIZE_30")
-                alt_pc4 = await loop.run_in_executor(None, lambda: fetcher.search(p_pc4))
-                alt_pc4_total = int(((alt_pc4.get('meta') or {}).get('total_hits')) or 0)
-                if alt_pc4_total > 0:
-                    alt_pc4['meta']['fallback_applied'] = 'pc_expand_size_30'
-                    return alt_pc4
+                _trace.debug("PC_FALLBACK[4] EXPAND_SIZE_30")
+                pc_steps.append(('pc_expand_size_30', p_pc4))
             except Exception:
                 pass
 
+            alt = await _run_fallback_ladder(fetcher, pc_steps)
             # If all PC fallbacks fail, return original results
-            return results
+            return alt if alt is not None else results
 
         # F&B fallback branch
-        print("DEBUG: ZERO_RESULT | applying 6-step fallback tree")
+        _trace.debug("ZERO_RESULT | applying 6-step fallback tree | mode=%s", FALLBACK_MODE)
 
         def _drop_price(d: Dict[str, Any]) -> Dict[str, Any]:
             x = dict(d)
@@ -2177,76 +2582,53 @@ async def search_products_handler(ctx) -> Dict[str, Any]:
                     return f"personal_care/{parts[1]}"
             return None
 
+        steps: List[tuple] = []
+
         # Step 1: Drop price only
         try:
-            p1 = _drop_price(params)
-            if p1 is not params:
-                print("DEBUG: FALLBACK[1] PRICE_ANY")
-                alt1 = await loop.run_in_executor(None, lambda: fetcher.search(p1))
-                alt1_total = int(((alt1.get('meta') or {}).get('total_hits')) or 0)
-                if alt1_total > 0:
-                    alt1['meta']['fallback_applied'] = 'price_any'
-                    return alt1
+            _trace.debug("FALLBACK[1] PRICE_ANY")
+            steps.append(('price_any', _drop_price(params)))
         except Exception:
             pass
 
         # Step 2: Drop hard and soft filters, keep category
         try:
-            p2 = _drop_hard_soft(params)
-            print("DEBUG: FALLBACK[2] DROP_HARD_SOFT_KEEP_CATEGORY")
-            alt2 = await loop.run_in_executor(None, lambda: fetcher.search(p2))
-            alt2_total = int(((alt2.get('meta') or {}).get('total_hits')) or 0)
-            if alt2_total > 0:
-                alt2['meta']['fallback_applied'] = 'drop_hard_soft_keep_category'
-                return alt2
+            _trace.debug("FALLBACK[2] DROP_HARD_SOFT_KEEP_CATEGORY")
+            steps.append(('drop_hard_soft_keep_category', _drop_hard_soft(params)))
         except Exception:
             pass
 
         # Prepare sibling L2 path (if available)
         sibling_l2 = _sibling_l2_path(params)
 
-        # Step 3: Sibling probe with full filters
         if sibling_l2:
+            # Step 3: Sibling probe with full filters
             try:
                 p3 = dict(params)
                 p3.pop('category_paths', None)
                 p3['category_path'] = sibling_l2
-                print(f"DEBUG: FALLBACK[3] SIBLING_L2_FULL | path={p3['category_path']}")
-                alt3 = await loop.run_in_executor(None, lambda: fetcher.search(p3))
-                alt3_total = int(((alt3.get('meta') or {}).get('total_hits')) or 0)
-                if alt3_total > 0:
-                    alt3['meta']['fallback_applied'] = 'sibling_l2_full'
-                    return alt3
+                _trace.debug("FALLBACK[3] SIBLING_L2_FULL | path=%s", p3['category_path'])
+                steps.append(('sibling_l2_full', p3))
             except Exception:
                 pass
 
-        # Step 4: Sibling probe with dropped price
-        if sibling_l2:
+            # Step 4: Sibling probe with dropped price
             try:
                 p4 = _drop_price(params)
                 p4.pop('category_paths', None)
                 p4['category_path'] = sibling_l2
-                print(f"DEBUG: FALLBACK[4] SIBLING_L2_PRICE_ANY | path={p4['category_path']}")
-                alt4 = await loop.run_in_executor(None, lambda: fetcher.search(p4))
-                alt4_total = int(((alt4.get('meta') or {}).get('total_hits')) or 0)
-                if alt4_total > 0:
-                    alt4['meta']['fallback_applied'] = 'sibling_l2_price_any'
-                    return alt4
+                _trace.debug("FALLBACK[4] SIBLING_L2_PRICE_ANY | path=%s", p4['category_path'])
+                steps.append(('sibling_l2_price_any', p4))
             except Exception:
                 pass
 
-        # Step 5: Sibling probe with dropped hard/soft
-        if sibling_l2:
+            # Step 5: Sibling probe with dropped hard/soft
             try:
                 p5 = _drop_hard_soft(params)
                 p5.pop('category_paths', None)
                 p5['category_path'] = sibling_l2
-                print(f"DEBUG: FALLBACK[5] SIBLING_L2_DROP_HARD_SOFT | path={p5['category_path']}")
-                alt5 = await loop.run_in_executor(None, lambda: fetcher.search(p5))
-                alt5_total = int(((alt5.get('meta') or {}).get('total_hits')) or 0)
-                if alt5_total > 0:
-                    alt5['meta']['fallback_applied'] = 'sibling_l2_drop_hard_soft'
-                    return alt5
+                _trace.debug("FALLBACK[5] SIBLING_L2_DROP_HARD_SOFT | path=%s", p5['category_path'])
+                steps.append(('sibling_l2_drop_hard_soft', p5))
             except Exception:
                 pass
 
@@ -2266,12 +2648,8 @@ async def search_products_handler(ctx) -> Dict[str, Any]:
             if truncated:
                 p6a.pop('category_paths', None)
                 p6a['category_path'] = truncated
-                print(f"DEBUG: FALLBACK[6A] DROP_CATEGORY_L4_TO_L3 | path={p6a['category_path']}")
-                alt6a = await loop.run_in_executor(None, lambda: fetcher.search(p6a))
-                alt6a_total = int(((alt6a.get('meta') or {}).get('total_hits')) or 0)
-                if alt6a_total > 0:
-                    alt6a['meta']['fallback_applied'] = 'drop_category_l4_to_l3'
-                    return alt6a
+                _trace.debug("FALLBACK[6A] DROP_CATEGORY_L4_TO_L3 | path=%s", p6a['category_path'])
+                steps.append(('drop_category_l4_to_l3', p6a))
         except Exception:
             pass
 
@@ -2284,15 +2662,15 @@ async def search_products_handler(ctx) -> Dict[str, Any]:
             if p6b.pop('category_path', None) is not None:
                 dropped = True
             if dropped:
-                print("DEBUG: FALLBACK[6B] DROP_CATEGORY_L3 (remove category_path(s))")
-                alt6b = await loop.run_in_executor(None, lambda: fetcher.search(p6b))
-                alt6b_total = int(((alt6b.get('meta') or {}).get('total_hits')) or 0)
-                if alt6b_total > 0:
-                    alt6b['meta']['fallback_applied'] = 'drop_category_l3'
-                    return alt6b
+                _trace.debug("FALLBACK[6B] DROP_CATEGORY_L3 (remove category_path(s))")
+                steps.append(('drop_category_l3', p6b))
         except Exception:
             pass
 
+        alt = await _run_fallback_ladder(fetcher, steps)
+        if alt is not None:
+            return alt
+
     return results
 
 async def fetch_user_profile_handler(ctx) -> Dict[str, Any]:
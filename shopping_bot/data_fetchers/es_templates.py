@@ -0,0 +1,230 @@
+# shopping_bot/data_fetchers/es_templates.py
+"""
+ES Query Templates
+──────────────────
+Precompiled, read-only fragments for the product query builders, plus
+optional ES stored search templates.
+
+• Fragments: the parts of a search body that never depend on the request:
+  `_source` lists, sort, highlight blocks, multi_match field lists and the
+  function_score functions per scoring subcategory (painless flean script +
+  `CATEGORY_SCORING_RULES` filters). They are frozen (`llm_registry.freeze`)
+  and shared by every body that uses them, so a build only allocates the
+  per-request clauses. `compile_all()` precomputes every subcategory at
+  startup.
+
+• Stored templates (ES_STORED_TEMPLATES=true): `template_request(body)`
+  recognises bodies whose static parts are the shared fragments themselves
+  (identity check, no deep compare) and maps them to a mustache template
+  registered once per process under `_scripts/<id>`. The wire body then
+  shrinks to `{"id", "params": {size, track_total_hits, min_score, query}}`.
+  Bodies with request-specific functions (macro soft boosts) or unusual
+  shapes return None and are sent inline. Template ids embed a hash of the
+  template source, so a change to the scoring rules registers a new id.
+
+Cache keys are still computed from the full built body (es_cache), so
+results cached before and after enabling templates are interchangeable.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..llm_registry import FrozenList, freeze
+from ..scoring_config import CATEGORY_SCORING_RULES, build_function_score_functions
+
+STORED_TEMPLATES = os.getenv("ES_STORED_TEMPLATES", "false").lower() in {"1", "true", "yes", "on"}
+TEMPLATE_PREFIX = os.getenv("ES_TEMPLATE_PREFIX", "shopbot")
+
+# ────────────────────────────────────────────────────────
+# Shared fragments
+# ────────────────────────────────────────────────────────
+
+FNB_SOURCE = freeze({
+    "includes": [
+        "id", "name", "brand", "price", "mrp", "hero_image.*",
+        "package_claims.*", "category_group", "category_paths",
+        "description", "use", "flean_score.*",
+        "stats.adjusted_score_percentiles.*",
+        "stats.wholefood_percentiles.*",
+        "stats.protein_percentiles.*",
+        "stats.fiber_percentiles.*",
+        "stats.fortification_percentiles.*",
+        "stats.simplicity_percentiles.*",
+        "stats.sugar_penalty_percentiles.*",
+        "stats.sodium_penalty_percentiles.*",
+        "stats.trans_fat_penalty_percentiles.*",
+        "stats.saturated_fat_penalty_percentiles.*",
+        "stats.oil_penalty_percentiles.*",
+        "stats.sweetener_penalty_percentiles.*",
+        "stats.calories_penalty_percentiles.*",
+        "stats.empty_food_penalty_percentiles.*",
+        # Nutritional data for macro-aware search
+        "category_data.nutritional.nutri_breakdown_updated.*",
+        "category_data.nutritional.qty",
+        "category_data.nutritional.raw_text",
+    ]
+})
+
+SKIN_SOURCE = freeze({
+    "includes": [
+        "id", "name", "brand", "price", "mrp",
+        "category_group", "category_paths", "hero_image.1080",
+        "review_stats.avg_rating", "review_stats.total_reviews",
+        "skin_compatibility.skin_type", "skin_compatibility.sentiment_score", "skin_compatibility.confidence_score",
+        "efficacy.aspect_name", "efficacy.sentiment_score", "efficacy.mention_count",
+        "side_effects.effect_name", "side_effects.severity_score", "side_effects.sentiment_score",
+        "package_claims.health_claims", "package_claims.dietary_labels",
+    ]
+})
+
+SCORE_SORT = freeze([{"_score": "desc"}])
+
+FNB_HIGHLIGHT = freeze({
+    "fields": {
+        "name": {"number_of_fragments": 0},
+        "package_claims.dietary_labels": {"number_of_fragments": 0},
+        "ingredients.raw_text": {"fragment_size": 120, "number_of_fragments": 1},
+    }
+})
+
+SKIN_HIGHLIGHT = freeze({
+    "fields": {
+        "name": {"number_of_fragments": 0},
+        "ingredients.raw_text": {"fragment_size": 120, "number_of_fragments": 1},
+    }
+})
+
+# Review-driven multipliers for personal care
+SKIN_FUNCTIONS = freeze([
+    {
+        "field_value_factor": {
+            "field": "review_stats.avg_rating",
+            "factor": 1.2,
+            "modifier": "sqrt",
+            "missing": 3.0,
+        }
+    },
+    {
+        "field_value_factor": {
+            "field": "review_stats.total_reviews",
+            "factor": 1.0,
+            "modifier": "log1p",
+            "missing": 1,
+        }
+    },
+])
+
+TEXT_FIELDS = freeze(["name^4", "description^2", "use", "combined_text"])
+MUST_KEYWORD_FIELDS = freeze(["name^6", "description^2", "combined_text"])
+DIETARY_LABEL_FIELDS = freeze(["package_claims.dietary_labels^3.0"])
+
+
+def scoring_key(subcategory: Optional[str]) -> str:
+    """`CATEGORY_SCORING_RULES` key used for a subcategory (same normalisation as get_scoring_rules)."""
+    key = str(subcategory or "").lower().replace(" ", "_").replace("-", "_")
+    return key if key in CATEGORY_SCORING_RULES else "_default"
+
+
+@functools.lru_cache(maxsize=None)
+def _functions_for(key: str) -> FrozenList:
+    return freeze(build_function_score_functions(key, include_flean=True))
+
+
+def scoring_functions(subcategory: Optional[str]) -> FrozenList:
+    """Shared function_score functions (flean multiplier + subcategory rules)."""
+    return _functions_for(scoring_key(subcategory))
+
+
+def compile_all() -> int:
+    """Precompute every subcategory's functions and templates; returns the template count."""
+    for key in CATEGORY_SCORING_RULES:
+        _functions_for(key)
+    return len(_fragment_index())
+
+
+# ────────────────────────────────────────────────────────
+# Stored search templates
+# ────────────────────────────────────────────────────────
+
+# Body keys that every templated shape has; "highlight" is part of the shape key
+_BODY_KEYS = frozenset({"size", "track_total_hits", "_source", "query", "sort", "min_score"})
+_SLOTS = {
+    '"@@size@@"': "{{size}}",
+    '"@@track_total_hits@@"': "{{track_total_hits}}",
+    '"@@min_score@@"': "{{min_score}}",
+    '"@@query@@"': "{{#toJson}}query{{/toJson}}",
+}
+
+
+@dataclass(frozen=True)
+class QueryTemplate:
+    id: str
+    source: str  # mustache source registered under _scripts/<id>
+
+
+def _template(name: str, source_fields: Any, functions: Any, highlight: Any) -> QueryTemplate:
+    skeleton: Dict[str, Any] = {
+        "size": "@@size@@",
+        "track_total_hits": "@@track_total_hits@@",
+        "_source": source_fields,
+        "query": {
+            "function_score": {
+                "query": "@@query@@",
+                "functions": functions,
+                "score_mode": "multiply",
+                "boost_mode": "multiply",
+            }
+        },
+        "sort": SCORE_SORT,
+        "min_score": "@@min_score@@",
+    }
+    if highlight is not None:
+        skeleton["highlight"] = highlight
+    source = json.dumps(skeleton, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    for slot, tag in _SLOTS.items():
+        source = source.replace(slot, tag)
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+    return QueryTemplate(id=f"{TEMPLATE_PREFIX}-{name}-{digest}", source=source)
+
+
+@functools.lru_cache(maxsize=1)
+def _fragment_index() -> Dict[Tuple[int, bool], Tuple[Any, Any, QueryTemplate]]:
+    """(id(functions), has_highlight) → (source fields, highlight, template) for every family."""
+    families: List[Tuple[str, Any, Any, Any]] = [("pc", SKIN_SOURCE, SKIN_FUNCTIONS, SKIN_HIGHLIGHT)]
+    for key in CATEGORY_SCORING_RULES:
+        families.append((f"fnb-{key.strip('_').replace('_', '-')}", FNB_SOURCE, _functions_for(key), FNB_HIGHLIGHT))
+    index: Dict[Tuple[int, bool], Tuple[Any, Any, QueryTemplate]] = {}
+    for name, source_fields, functions, highlight in families:
+        index[(id(functions), True)] = (source_fields, highlight, _template(f"{name}-hl", source_fields, functions, highlight))
+        index[(id(functions), False)] = (source_fields, None, _template(name, source_fields, functions, None))
+    return index
+
+
+def template_request(body: Dict[str, Any]) -> Optional[Tuple[QueryTemplate, Dict[str, Any]]]:
+    """(template, params) when `body` was assembled from shared fragments, else None."""
+    if set(body) - {"highlight"} != _BODY_KEYS:
+        return None
+    fs = (body.get("query") or {}).get("function_score")
+    if not isinstance(fs, dict) or set(fs) != {"query", "functions", "score_mode", "boost_mode"}:
+        return None
+    if fs["score_mode"] != "multiply" or fs["boost_mode"] != "multiply" or body["sort"] is not SCORE_SORT:
+        return None
+    entry = _fragment_index().get((id(fs["functions"]), "highlight" in body))
+    if entry is None:
+        return None
+    source_fields, highlight, template = entry
+    if body["_source"] is not source_fields or body.get("highlight") is not highlight:
+        return None
+    params = {
+        "size": int(body["size"]),
+        "track_total_hits": body["track_total_hits"],
+        "min_score": body["min_score"],
+        "query": fs["query"],
+    }
+    return template, params
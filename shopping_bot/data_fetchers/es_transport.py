@@ -0,0 +1,182 @@
+# shopping_bot/data_fetchers/es_transport.py
+"""
+Elasticsearch HTTP Transport
+────────────────────────────
+Pooled, keep-alive HTTP plumbing shared by the ES fetcher:
+
+• Sync path: one `requests.Session` with a sized connection pool, so routes
+  that call the fetcher synchronously stop paying a TLS handshake per call.
+• Async path: one `aiohttp.ClientSession` per running event loop, so async
+  handlers can await ES directly instead of borrowing executor threads.
+  Under WSGI, flask[async] runs every async view on its own `asyncio.run`
+  loop; each session is closed on its loop during that loop's
+  `shutdown_asyncgens()`, so per-request loops don't leak connectors.
+
+Both paths accept a per-call timeout and return the decoded JSON body.
+Errors are raised to the caller (requests / aiohttp exception types) so the
+fetcher keeps its existing error-to-empty-result mapping.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config import get_config
+
+_cfg = get_config()
+POOL_SIZE = _cfg.ELASTIC_POOL_SIZE
+CONNECT_TIMEOUT = _cfg.ELASTIC_CONNECT_TIMEOUT_SECONDS
+KEEPALIVE_SECONDS = _cfg.ELASTIC_KEEPALIVE_SECONDS
+
+NDJSON_HEADERS = {"Content-Type": "application/x-ndjson"}
+
+
+def _ndjson(lines: List[Dict[str, Any]]) -> str:
+    # Bulk-style bodies must end with a trailing newline
+    return "".join(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n" for line in lines)
+
+
+class ESTransport:
+    """Keep-alive connection pools for ES, sync and asyncio flavours."""
+
+    def __init__(
+        self,
+        headers: Dict[str, str],
+        *,
+        timeout: float,
+        pool_size: int = POOL_SIZE,
+        connect_timeout: float = CONNECT_TIMEOUT,
+    ):
+        self.headers = dict(headers or {})
+        self.timeout = float(timeout)
+        self.pool_size = max(1, int(pool_size))
+        self.connect_timeout = float(connect_timeout)
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers.update(self.headers)
+
+        # loop id -> (loop, session, closer); pruned lazily when a loop has closed
+        self._aio_sessions: Dict[int, Tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession, AsyncIterator[None]]] = {}
+        self._aio_lock = threading.Lock()
+
+    # ────────────────────────────────────────────────────────
+    # Sync API
+    # ────────────────────────────────────────────────────────
+
+    def request(self, method: str, url: str, body: Optional[Dict[str, Any]] = None, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        total = float(timeout if timeout is not None else self.timeout)
+        response = self._session.request(
+            method,
+            url,
+            json=body,
+            timeout=(min(self.connect_timeout, total), total),
+        )
+        response.raise_for_status()
+        return response.json() or {}
+
+    def post(self, url: str, body: Dict[str, Any], *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.request("POST", url, body, timeout=timeout)
+
+    def post_ndjson(self, url: str, lines: List[Dict[str, Any]], *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POST newline-delimited JSON (bulk-style endpoints such as _msearch)."""
+        total = float(timeout if timeout is not None else self.timeout)
+        response = self._session.post(
+            url,
+            data=_ndjson(lines),
+            headers=NDJSON_HEADERS,
+            timeout=(min(self.connect_timeout, total), total),
+        )
+        response.raise_for_status()
+        return response.json() or {}
+
+    def get(self, url: str, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.request("GET", url, None, timeout=timeout)
+
+    # ────────────────────────────────────────────────────────
+    # Async API
+    # ────────────────────────────────────────────────────────
+
+    @staticmethod
+    async def _closed_with_loop(session: aiohttp.ClientSession) -> AsyncIterator[None]:
+        """Parked async generator: the loop's `shutdown_asyncgens()` finalizes it, closing `session` there."""
+        try:
+            yield
+        finally:
+            if not session.closed:
+                await session.close()
+
+    async def _get_aio_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session bound to the running loop (created on first use)."""
+        loop = asyncio.get_running_loop()
+        key = id(loop)
+        with self._aio_lock:
+            entry = self._aio_sessions.get(key)
+            if entry and entry[0] is loop and not entry[1].closed:
+                return entry[1]
+            # Forget sessions of finished loops; their closers already ran on shutdown_asyncgens
+            for k, (other_loop, _sess, _closer) in list(self._aio_sessions.items()):
+                if other_loop.is_closed():
+                    self._aio_sessions.pop(k, None)
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+            )
+            closer = self._closed_with_loop(session)
+            self._aio_sessions[key] = (loop, session, closer)
+        # First iteration registers the generator with this loop's asyncgen hooks
+        await closer.__anext__()
+        return session
+
+    async def arequest(self, method: str, url: str, body: Optional[Dict[str, Any]] = None, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        session = await self._get_aio_session()
+        total = float(timeout if timeout is not None else self.timeout)
+        client_timeout = aiohttp.ClientTimeout(total=total, connect=min(self.connect_timeout, total))
+        async with session.request(method, url, json=body, timeout=client_timeout) as resp:
+            resp.raise_for_status()
+            return (await resp.json(content_type=None)) or {}
+
+    async def apost(self, url: str, body: Dict[str, Any], *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self.arequest("POST", url, body, timeout=timeout)
+
+    async def apost_ndjson(self, url: str, lines: List[Dict[str, Any]], *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Async variant of `post_ndjson`."""
+        session = await self._get_aio_session()
+        total = float(timeout if timeout is not None else self.timeout)
+        client_timeout = aiohttp.ClientTimeout(total=total, connect=min(self.connect_timeout, total))
+        async with session.post(url, data=_ndjson(lines), headers=NDJSON_HEADERS, timeout=client_timeout) as resp:
+            resp.raise_for_status()
+            return (await resp.json(content_type=None)) or {}
+
+    async def aget(self, url: str, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self.arequest("GET", url, None, timeout=timeout)
+
+    async def aclose(self) -> None:
+        """Close the session bound to the running loop (call from shutdown hooks)."""
+        loop = asyncio.get_running_loop()
+        with self._aio_lock:
+            entry = self._aio_sessions.pop(id(loop), None)
+        if entry:
+            await entry[2].aclose()
+
+    def close(self) -> None:
+        """Close the sync pool; async sessions are closed via `aclose` on their loop."""
+        try:
+            self._session.close()
+        except Exception:
+            pass
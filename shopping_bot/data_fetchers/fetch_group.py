@@ -0,0 +1,127 @@
+"""
+Run a turn's backend fetchers as one concurrent, dependency-aware group.
+
+Every fetcher starts as soon as the fetchers it depends on (registered with
+`register_fetcher(..., depends_on=...)`) have finished, so independent
+fetchers overlap and turn latency is bounded by the slowest dependency chain
+instead of the sum of all fetchers. Each fetcher gets its own timeout; a
+fetcher whose dependency failed is not started. Cancelling the caller cancels
+every fetcher still running.
+
+`on_done(func, outcome)` runs synchronously as each fetcher settles and before
+its dependents start, so callers can record results in `ctx.fetched_data`
+(where dependents read them) and persist everything in one write afterwards.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from ..config import get_config
+from ..enums import BackendFunction
+from . import get_dependencies, get_fetcher, get_timeout
+
+log = logging.getLogger(__name__)
+
+
+class FetcherDependencyError(RuntimeError):
+    """A fetcher was skipped because one of its dependencies failed."""
+
+
+@dataclass
+class FetchOutcome:
+    result: Any = None
+    error: Optional[BaseException] = None
+    elapsed_ms: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def run_fetchers(
+    fetchers: Iterable[BackendFunction],
+    ctx: Any,
+    *,
+    on_done: Optional[Callable[[BackendFunction, FetchOutcome], None]] = None,
+    timeout_s: Optional[float] = None,
+) -> Dict[BackendFunction, FetchOutcome]:
+    """
+    Execute `fetchers` for `ctx` concurrently; return outcomes in request order.
+
+    Dependencies outside the group are ignored (their data, if any, is
+    already in `ctx.fetched_data`). `timeout_s` overrides both the per-fetcher
+    registration and FETCHER_TIMEOUT_SECONDS.
+    """
+    order = list(dict.fromkeys(fetchers))
+    if not order:
+        return {}
+    default_timeout = float(getattr(get_config(), "FETCHER_TIMEOUT_SECONDS", 30))
+    group = set(order)
+    outcomes: Dict[BackendFunction, FetchOutcome] = {}
+    tasks: Dict[BackendFunction, asyncio.Task] = {}
+
+    def _settle(func: BackendFunction, outcome: FetchOutcome) -> FetchOutcome:
+        outcomes[func] = outcome
+        if on_done is not None:
+            try:
+                on_done(func, outcome)
+            except Exception as exc:
+                log.error(f"FETCHER_ON_DONE_ERROR | fetcher={func.value} | error={exc}", exc_info=True)
+        return outcome
+
+    async def _run(func: BackendFunction) -> FetchOutcome:
+        deps = [d for d in get_dependencies(func) if d in group and d is not func]
+        if deps:
+            await asyncio.gather(*(tasks[d] for d in deps))
+            failed = [d.value for d in deps if not outcomes[d].ok]
+            if failed:
+                return _settle(func, FetchOutcome(error=FetcherDependencyError(f"dependency failed: {failed}")))
+
+        limit = timeout_s if timeout_s is not None else (get_timeout(func) or default_timeout)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(get_fetcher(func)(ctx), timeout=limit)
+            outcome = FetchOutcome(result=result)
+        except asyncio.TimeoutError:
+            outcome = FetchOutcome(error=asyncio.TimeoutError(f"{func.value} timed out after {limit:g}s"))
+        except Exception as exc:
+            outcome = FetchOutcome(error=exc)
+        outcome.elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return _settle(func, outcome)
+
+    _check_acyclic(order, group)
+    for func in order:
+        tasks[func] = asyncio.ensure_future(_run(func))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        # Caller cancelled (or a bug escaped _run): don't leave fetchers running
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+    return {func: outcomes[func] for func in order}
+
+
+def _check_acyclic(order: list, group: set) -> None:
+    visiting: set = set()
+    done: set = set()
+
+    def visit(func: BackendFunction) -> None:
+        if func in done:
+            return
+        if func in visiting:
+            raise ValueError(f"Fetcher dependency cycle through {func.value}")
+        visiting.add(func)
+        for dep in get_dependencies(func):
+            if dep in group and dep is not func:
+                visit(dep)
+        visiting.discard(func)
+        done.add(func)
+
+    for func in order:
+        visit(func)
@@ -0,0 +1,284 @@
+# shopping_bot/data_fetchers/product_record.py
+"""
+Product Record
+──────────────
+Compact projection of one ES hit, built from a field-spec table:
+
+• `Product.from_hit` resolves every plain field in one pass over `FIELD_SPECS`
+  (nested paths are walked once, tolerating missing/None parents).
+• Text cleaning, image choice and the percentile bundles are derived lazily
+  from the retained `_source` and memoized, so consumers that never read them
+  never pay for them.
+• Views: `to_dict()` is the full legacy shape returned by `_transform_results`;
+  `to_llm_dict()` / `to_fe_dict()` carry only what prompts / the frontend use.
+
+`llm_view` / `fe_view` apply the same projections to already-materialized
+product dicts (cache hits, session copies).
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def clean_text(s: Optional[str]) -> Optional[str]:
+    """Strip tags and collapse whitespace (regex only when a tag is present)."""
+    if not s:
+        return s
+    if "<" in s:
+        s = _TAG_RE.sub("", s)
+    # str.split() splits on exactly the characters `\s` matches
+    return " ".join(s.split())
+
+
+def _dig(src: Mapping[str, Any], path: Tuple[str, ...]) -> Any:
+    node: Any = src
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+# output key -> path in _source (plain fields, copied as-is)
+FIELD_SPECS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("brand", ("brand",)),
+    ("price", ("price",)),
+    ("mrp", ("mrp",)),
+    ("category", ("category_group",)),
+    ("category_paths", ("category_paths",)),
+    ("protein_g", ("category_data", "nutritional", "nutri_breakdown", "protein_g")),
+    ("carbs_g", ("category_data", "nutritional", "nutri_breakdown", "carbs_g")),
+    ("fat_g", ("category_data", "nutritional", "nutri_breakdown", "fat_g")),
+    ("calories", ("category_data", "nutritional", "nutri_breakdown", "energy_kcal")),
+    ("health_claims", ("package_claims", "health_claims")),
+    ("dietary_labels", ("package_claims", "dietary_labels")),
+    ("flean_percentile", ("stats", "adjusted_score_percentiles", "subcategory_percentile")),
+    ("flean_score", ("flean_score", "adjusted_score")),
+    ("avg_rating", ("review_stats", "avg_rating")),
+    ("total_reviews", ("review_stats", "total_reviews")),
+)
+
+# Defaults for FIELD_SPECS keys when the path is missing (lists are copied per product)
+_DEFAULTS: Dict[str, Any] = {"brand": "", "category": "", "category_paths": [], "health_claims": [], "dietary_labels": []}
+# Must be lists; anything else becomes []
+_LIST_FIELDS = frozenset({"health_claims", "dietary_labels"})
+
+
+def _group_specs() -> Tuple[Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]], ...]:
+    # parent path -> ((out key, leaf key), ...) so shared parents are walked once per hit
+    groups: Dict[Tuple[str, ...], list] = {}
+    for key, path in FIELD_SPECS:
+        groups.setdefault(path[:-1], []).append((key, path[-1]))
+    return tuple((parent, tuple(leaves)) for parent, leaves in groups.items())
+
+
+_GROUPED_SPECS = _group_specs()
+
+# bundle key -> stats.<name>.subcategory_percentile
+BONUS_PERCENTILES: Tuple[Tuple[str, str], ...] = (
+    ("protein", "protein_percentiles"),
+    ("fiber", "fiber_percentiles"),
+    ("wholefood", "wholefood_percentiles"),
+    ("fortification", "fortification_percentiles"),
+    ("simplicity", "simplicity_percentiles"),
+)
+PENALTY_PERCENTILES: Tuple[Tuple[str, str], ...] = (
+    ("sugar", "sugar_penalty_percentiles"),
+    ("sodium", "sodium_penalty_percentiles"),
+    ("trans_fat", "trans_fat_penalty_percentiles"),
+    ("saturated_fat", "saturated_fat_penalty_percentiles"),
+    ("oil", "oil_penalty_percentiles"),
+    ("sweetener", "sweetener_penalty_percentiles"),
+    ("calories", "calories_penalty_percentiles"),
+    ("empty_food", "empty_food_penalty_percentiles"),
+)
+
+_IMAGE_SIZES = ("640", "750", "828", "1080", "256", "384")
+
+# Legacy `_transform_results` key order
+DICT_FIELDS: Tuple[str, ...] = (
+    "rank", "score", "id", "name", "brand", "price", "mrp", "category", "category_paths", "description",
+    "protein_g", "carbs_g", "fat_g", "calories",
+    "health_claims", "dietary_labels",
+    "flean_percentile", "flean_score", "bonus_percentiles", "penalty_percentiles",
+    "image", "ingredients", "avg_rating", "total_reviews",
+)
+# What product-answer prompts reason over (no images, paths or ranking internals)
+LLM_FIELDS: Tuple[str, ...] = (
+    "id", "name", "brand", "price", "mrp", "category", "description",
+    "protein_g", "carbs_g", "fat_g", "calories",
+    "health_claims", "dietary_labels",
+    "flean_percentile", "flean_score", "bonus_percentiles", "penalty_percentiles",
+    "ingredients", "avg_rating", "total_reviews", "highlight",
+)
+# What product cards render
+FE_FIELDS: Tuple[str, ...] = (
+    "id", "name", "brand", "price", "mrp", "image", "flean_score", "flean_percentile", "avg_rating", "total_reviews",
+)
+LLM_TEXT_LIMIT = 300
+
+_KNOWN = frozenset(DICT_FIELDS) | {"highlight"}
+_EMPTY: Dict[str, Any] = {}
+
+
+def _bundle(stats: Any, spec: Tuple[Tuple[str, str], ...]) -> Dict[str, Any]:
+    if not isinstance(stats, dict):
+        return {}
+    out: Dict[str, Any] = {}
+    for key, name in spec:
+        block = stats.get(name)
+        if isinstance(block, dict):
+            value = block.get("subcategory_percentile")
+            if value is not None:
+                out[key] = value
+    return out
+
+
+def best_image(hero: Any) -> Optional[str]:
+    if not isinstance(hero, dict):
+        return None
+    for size in _IMAGE_SIZES:
+        if hero.get(size):
+            return hero[size]
+    for v in hero.values():
+        if isinstance(v, str) and v.strip():
+            return v
+    return None
+
+
+class Product:
+    """One search hit; plain fields eager, text/image/percentile bundles lazy."""
+
+    __slots__ = (
+        "rank", "score", "id", "highlight", "_src", "_lazy",
+        *(key for key, _path in FIELD_SPECS),
+    )
+
+    def __init__(self, src: Mapping[str, Any], *, rank: int, score: Any = 0, highlight: Optional[str] = None):
+        self._src = src
+        self._lazy: Dict[str, Any] = {}
+        self.rank = rank
+        self.score = round(score, 3) if isinstance(score, (int, float)) else score
+        self.id = src.get("id", f"prod_{rank}")
+        self.highlight = highlight
+        for parent, leaves in _GROUPED_SPECS:
+            node = src
+            for step in parent:
+                node = node.get(step) if isinstance(node, dict) else None
+            if not isinstance(node, dict):
+                node = _EMPTY
+            for key, leaf in leaves:
+                value = node.get(leaf)
+                if value is None or (key in _LIST_FIELDS and not isinstance(value, list)):
+                    value = _DEFAULTS.get(key)
+                    if isinstance(value, list):
+                        value = []
+                setattr(self, key, value)
+
+    @classmethod
+    def from_hit(cls, hit: Mapping[str, Any], rank: int) -> "Product":
+        highlight = None
+        hl = hit.get("highlight") or {}
+        for field in ("name", "package_claims.dietary_labels", "ingredients.raw_text"):
+            if hl.get(field):
+                highlight = clean_text(hl[field][0])
+                break
+        return cls(hit.get("_source") or {}, rank=rank, score=hit.get("_score", 0), highlight=highlight)
+
+    # ── lazily derived fields ──
+
+    def _derive(self, key: str) -> Any:
+        lazy = self._lazy
+        if key not in lazy:
+            lazy[key] = _DERIVED[key](self._src)
+        return lazy[key]
+
+    name = property(lambda self: self._derive("name"))
+    description = property(lambda self: self._derive("description"))
+    ingredients = property(lambda self: self._derive("ingredients"))
+    image = property(lambda self: self._derive("image"))
+    bonus_percentiles = property(lambda self: self._derive("bonus_percentiles"))
+    penalty_percentiles = property(lambda self: self._derive("penalty_percentiles"))
+
+    def sort_key(self) -> float:
+        """flean_percentile descending order key; missing/invalid values sort last."""
+        if self.flean_percentile is None:
+            return -1.0
+        try:
+            return float(self.flean_percentile)
+        except (TypeError, ValueError):
+            return -1.0
+
+    # ── views ──
+
+    def _project(self, plan: Tuple[Tuple[str, Any], ...]) -> Dict[str, Any]:
+        # derived fields are read through the memo without the property hop
+        lazy, src = self._lazy, self._src
+        out: Dict[str, Any] = {}
+        for key, derive in plan:
+            if derive is None:
+                out[key] = getattr(self, key)
+            elif key in lazy:
+                out[key] = lazy[key]
+            else:
+                out[key] = lazy[key] = derive(src)
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = self._project(_DICT_PLAN)
+        if self.highlight:
+            out["highlight"] = self.highlight
+        return out
+
+    def to_llm_dict(self) -> Dict[str, Any]:
+        return _trim_for_llm({k: v for k, v in self._project(_LLM_PLAN).items() if v not in (None, "", [], {})})
+
+    def to_fe_dict(self) -> Dict[str, Any]:
+        return self._project(_FE_PLAN)
+
+    def __repr__(self) -> str:
+        return f"Product(id={self.id!r}, rank={self.rank})"
+
+
+# derived key -> builder over `_source`
+_DERIVED: Dict[str, Callable[[Mapping[str, Any]], Any]] = {
+    "name": lambda src: clean_text(src.get("name", "")),
+    "description": lambda src: clean_text(src.get("description", "")),
+    "ingredients": lambda src: clean_text(_dig(src, ("ingredients", "raw_text")) or ""),
+    "image": lambda src: best_image(src.get("hero_image", {})),
+    "bonus_percentiles": lambda src: _bundle(src.get("stats"), BONUS_PERCENTILES),
+    "penalty_percentiles": lambda src: _bundle(src.get("stats"), PENALTY_PERCENTILES),
+}
+_DICT_PLAN = tuple((key, _DERIVED.get(key)) for key in DICT_FIELDS)
+_LLM_PLAN = tuple((key, _DERIVED.get(key)) for key in LLM_FIELDS)
+_FE_PLAN = tuple((key, _DERIVED.get(key)) for key in FE_FIELDS)
+
+
+def _trim_for_llm(out: Dict[str, Any]) -> Dict[str, Any]:
+    for key in ("description", "ingredients"):
+        text = out.get(key)
+        if isinstance(text, str) and len(text) > LLM_TEXT_LIMIT:
+            out[key] = text[:LLM_TEXT_LIMIT].rstrip() + "…"
+    return out
+
+
+def llm_view(product: Mapping[str, Any]) -> Dict[str, Any]:
+    """`to_llm_dict` for a product dict; keys this module does not produce pass through."""
+    if isinstance(product, Product):
+        return product.to_llm_dict()
+    keep = set(LLM_FIELDS)
+    return _trim_for_llm({
+        k: v for k, v in product.items()
+        if (k in keep or k not in _KNOWN) and v not in (None, "", [], {})
+    })
+
+
+def fe_view(product: Mapping[str, Any]) -> Dict[str, Any]:
+    """`to_fe_dict` for a product dict."""
+    if isinstance(product, Product):
+        return product.to_fe_dict()
+    return {k: product.get(k) for k in FE_FIELDS}
@@ -0,0 +1,247 @@
+# shopping_bot/data_fetchers/rerank.py
+"""
+Client-side Re-ranking
+──────────────────────
+ES_RERANK_MODE=client moves the F&B function_score stage out of ES:
+
+1. `plan(body)` strips the function_score wrapper, so ES only runs the
+   cheap BM25 bool query. It asks for ES_RERANK_CANDIDATES hits (default
+   200) with the fields the functions read, and drops `min_score`.
+2. `RerankPlan.apply(raw)` recomputes the function_score locally over
+   column arrays and applies `min_score`. It re-sorts the candidates and
+   cuts the original `size`. The result is a normal ES response, so
+   `_transform_results` and everything after it are unchanged.
+
+Supported functions are exactly what the F&B builders emit:
+
+• the flean multiplier (`scoring_config.FLEAN_SCRIPT_SOURCE`):
+  1 + clamp(p, 0, 100) / 100, where a missing p counts as 50
+• filter + range + weight (`CATEGORY_SCORING_RULES` bonuses / penalties,
+  macro soft boosts): multiply by weight when the value is in range
+
+With score_mode=boost_mode=multiply, the final score is
+bm25 × Π(factors), computed in double and stored as float like ES does.
+Ties keep ES's candidate order. Any other function (e.g. personal-care
+field_value_factor) makes `plan` return None, and the body goes to ES
+unchanged.
+
+The ordering equals the script version whenever the BM25 candidate set
+holds every hit that would make the script top-k. That always holds when a
+query matches no more than ES_RERANK_CANDIDATES docs. Otherwise a hit past
+the candidate cut is lost and the best-scoring candidates take its place.
+`total_hits` counts BM25 matches, before `min_score`. The search cache and
+single-flight keys include the mode, so the two rankings never mix.
+
+NumPy is optional: without it the same arithmetic runs in a plain loop.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import math
+import os
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:  # optional: vectorized scoring
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised via monkeypatch in tests
+    np = None
+
+from ..scoring_config import FLEAN_PERCENTILE_FIELD, FLEAN_SCRIPT_SOURCE
+
+RERANK_MODE = os.getenv("ES_RERANK_MODE", "script").strip().lower()
+RERANK_CANDIDATES = int(os.getenv("ES_RERANK_CANDIDATES", "200"))
+
+_RANGE_OPS = ("gt", "gte", "lt", "lte")
+
+
+def enabled() -> bool:
+    return RERANK_MODE == "client"
+
+
+def mode() -> str:
+    """Active mode; part of the search cache key, since the modes rank differently."""
+    return RERANK_MODE
+
+
+@dataclass(frozen=True)
+class _Factor:
+    field: str
+    weight: float = 1.0
+    bounds: Tuple[Tuple[str, float], ...] = ()  # range ops; empty → flean multiplier
+
+    @property
+    def is_flean(self) -> bool:
+        return not self.bounds
+
+
+def _parse_function(fn: Any) -> Optional[_Factor]:
+    if not isinstance(fn, dict):
+        return None
+    if "script_score" in fn:
+        script = (fn.get("script_score") or {}).get("script")
+        if set(fn) == {"script_score"} and isinstance(script, dict) and script.get("source") == FLEAN_SCRIPT_SOURCE and not script.get("params"):
+            return _Factor(field=FLEAN_PERCENTILE_FIELD)
+        return None
+    if set(fn) != {"filter", "weight"}:
+        return None
+    rng = (fn.get("filter") or {}).get("range")
+    if not isinstance(rng, dict) or len(fn["filter"]) != 1 or len(rng) != 1:
+        return None
+    (field, spec), = rng.items()
+    if not isinstance(spec, dict) or not spec or set(spec) - set(_RANGE_OPS):
+        return None
+    try:
+        bounds = tuple((op, float(spec[op])) for op in _RANGE_OPS if op in spec)
+        return _Factor(field=field, weight=float(fn["weight"]), bounds=bounds)
+    except (TypeError, ValueError):
+        return None
+
+
+def _with_fields(source: Any, fields: Sequence[str]) -> Any:
+    """`_source` filter extended with any rerank field its includes don't already cover."""
+    if not isinstance(source, dict) or not isinstance(source.get("includes"), (list, tuple)):
+        return source
+    includes = list(source["includes"])
+    missing = [f for f in fields if not any(fnmatch.fnmatchcase(f, pat) for pat in includes)]
+    if not missing:
+        return source
+    return {**source, "includes": includes + missing}
+
+
+@dataclass
+class RerankPlan:
+    body: Dict[str, Any]  # candidate request sent to ES
+    factors: Tuple[_Factor, ...]
+    size: int
+    min_score: Optional[float]
+
+    def apply(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Score candidates locally, drop those under min_score, keep the top `size`."""
+        hits_block = (raw or {}).get("hits") or {}
+        hits = list(hits_block.get("hits") or [])
+        if not hits:
+            return raw
+        bm25 = [float(h.get("_score") or 0.0) for h in hits]
+        columns = {f: [_value(h.get("_source") or {}, f) for h in hits] for f in {x.field for x in self.factors}}
+        scores = _scores_numpy(bm25, columns, self.factors) if np is not None else _scores_python(bm25, columns, self.factors)
+
+        keep = [i for i, s in enumerate(scores) if self.min_score is None or s >= self.min_score]
+        keep.sort(key=lambda i: -scores[i])  # stable: ties keep ES order
+        ranked = []
+        for i in keep[: self.size]:
+            hit = dict(hits[i])
+            hit["_score"] = scores[i]
+            ranked.append(hit)
+        out = dict(raw)
+        out["hits"] = {**hits_block, "hits": ranked, "max_score": ranked[0]["_score"] if ranked else None}
+        return out
+
+
+def plan(body: Dict[str, Any], *, candidates: int = RERANK_CANDIDATES) -> Optional[RerankPlan]:
+    """Candidate request + local scoring plan, or None when the body can't be reranked here."""
+    fs = (body.get("query") or {}).get("function_score")
+    if not isinstance(fs, dict) or set(fs) != {"query", "functions", "score_mode", "boost_mode"}:
+        return None
+    if fs["score_mode"] != "multiply" or fs["boost_mode"] != "multiply":
+        return None
+    factors = [_parse_function(fn) for fn in fs["functions"] or ()]
+    if not factors or any(f is None for f in factors):
+        return None
+    if list(body.get("sort") or [{"_score": "desc"}]) != [{"_score": "desc"}]:
+        return None
+
+    size = int(body.get("size", 10))
+    candidate = {k: v for k, v in body.items() if k not in ("query", "min_score", "size", "_source")}
+    candidate["size"] = max(size, int(candidates))
+    candidate["query"] = fs["query"]
+    if "_source" in body:
+        candidate["_source"] = _with_fields(body["_source"], [f.field for f in factors])
+    min_score = body.get("min_score")
+    return RerankPlan(
+        body=candidate,
+        factors=tuple(factors),
+        size=size,
+        min_score=float(min_score) if min_score is not None else None,
+    )
+
+
+# ────────────────────────────────────────────────────────
+# Scoring
+# ────────────────────────────────────────────────────────
+
+def _value(src: Dict[str, Any], path: str) -> float:
+    """Numeric doc value at a dotted path (dotted keys allowed at any level); NaN when missing."""
+    node: Any = src
+    rest = path
+    while True:
+        if not isinstance(node, dict):
+            return math.nan
+        if rest in node:
+            node = node[rest]
+            break
+        head, sep, rest = rest.partition(".")
+        if not sep:
+            return math.nan
+        node = node.get(head)
+    if isinstance(node, (list, tuple)):
+        # doc values are sorted; `.value` is the smallest
+        nums = [v for v in (_number(x) for x in node) if not math.isnan(v)]
+        return min(nums) if nums else math.nan
+    return _number(node)
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool) or value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _in_range(v: float, bounds: Tuple[Tuple[str, float], ...]) -> bool:
+    if math.isnan(v):
+        return False
+    for op, t in bounds:
+        if (op == "gt" and not v > t) or (op == "gte" and not v >= t) or (op == "lt" and not v < t) or (op == "lte" and not v <= t):
+            return False
+    return True
+
+
+def _f32(x: float) -> float:
+    """Round to single precision (ES keeps the combined score as a Java float)."""
+    return struct.unpack("f", struct.pack("f", x))[0]
+
+
+def _scores_python(bm25: List[float], columns: Dict[str, List[float]], factors: Sequence[_Factor]) -> List[float]:
+    out: List[float] = []
+    for i, base in enumerate(bm25):
+        factor = 1.0
+        for f in factors:
+            v = columns[f.field][i]
+            if f.is_flean:
+                p = 50.0 if math.isnan(v) else v
+                factor *= 1.0 + max(0.0, min(100.0, p)) / 100.0
+            elif _in_range(v, f.bounds):
+                factor *= f.weight
+        out.append(_f32(base * factor))
+    return out
+
+
+def _scores_numpy(bm25: List[float], columns: Dict[str, List[float]], factors: Sequence[_Factor]) -> List[float]:
+    arrays = {name: np.asarray(col, dtype=np.float64) for name, col in columns.items()}
+    factor = np.ones(len(bm25), dtype=np.float64)
+    for f in factors:
+        v = arrays[f.field]
+        if f.is_flean:
+            factor *= 1.0 + np.clip(np.where(np.isnan(v), 50.0, v), 0.0, 100.0) / 100.0
+            continue
+        mask = ~np.isnan(v)
+        with np.errstate(invalid="ignore"):
+            for op, t in f.bounds:
+                mask &= {"gt": v > t, "gte": v >= t, "lt": v < t, "lte": v <= t}[op]
+        factor = np.where(mask, factor * f.weight, factor)
+    return (np.asarray(bm25, dtype=np.float64) * factor).astype(np.float32).astype(np.float64).tolist()
@@ -32,7 +32,7 @@ from .models import (
     FlowType,
 )
 from .redis_manager import RedisContextManager
-from .data_fetchers import get_fetcher
+from .data_fetchers import FetchOutcome, run_fetchers
 from .utils.smart_logger import get_smart_logger
 from .bot_helpers import (
     compute_still_missing,
@@ -441,53 +441,36 @@ class EnhancedShoppingBotCore:
         """
         FIX: Execute fetchers and properly persist results to session:*:fetched.
         This addresses issue #4 from the diagnostic.
+
+        Fetchers run as one concurrent, dependency-aware group (per-fetcher
+        timeouts, cancelled together); results are persisted in one batch.
         """
         if fetchers:
             log.info(f"FETCHERS_START | user={ctx.user_id} | session={ctx.session_id} | fetchers={[f.value for f in fetchers]}")
             self.smart_log.data_operations(ctx.user_id, [f.value for f in fetchers])
 
         fetched: Dict[str, Any] = {}
-        success_count = 0
+        to_persist: Dict[str, Any] = {}
 
-        for func in fetchers:
+        def _record(func: BackendFunction, outcome: FetchOutcome) -> None:
+            # Runs as each fetcher settles, before its dependents start
             func_name = func.value
-            log.info(f"FETCHER_EXECUTE | user={ctx.user_id} | fetcher={func_name}")
-            
-            try:
-                result = await get_fetcher(func)(ctx)
-                fetched[func_name] = result
-                
-                # FIX: Save to both fetched_data (in-memory) AND persist to Redis
+            if outcome.ok:
+                fetched[func_name] = outcome.result
                 ctx.fetched_data[func_name] = {
-                    "data": result,
-                    "timestamp": datetime.now().isoformat(),
-                    "status": "success"
-                }
-                
-                # FIX: Merge into session:*:fetched (don't overwrite)
-                fetched_key = f"session:{ctx.session_id}:fetched"
-                existing_fetched = self.ctx_mgr._get_json(fetched_key, default={})
-                existing_fetched[func_name] = {
-                    "data": result,
+                    "data": outcome.result,
                     "timestamp": datetime.now().isoformat(),
                     "status": "success"
                 }
-                self.ctx_mgr._set_json(fetched_key, existing_fetched, ttl=self.ctx_mgr.ttl)
-                
-                success_count += 1
-                data_size = len(str(result)) if result else 0
-                log.info(f"FETCHER_SUCCESS | user={ctx.user_id} | fetcher={func_name} | data_size={data_size}")
-                
+                data_size = len(str(outcome.result)) if outcome.result else 0
+                log.info(f"FETCHER_SUCCESS | user={ctx.user_id} | fetcher={func_name} | data_size={data_size} | elapsed_ms={outcome.elapsed_ms}")
                 self.smart_log.performance_metric(
-                    ctx.user_id, func_name, data_size=data_size
+                    ctx.user_id, func_name, duration_ms=outcome.elapsed_ms, data_size=data_size
                 )
-
-            except Exception as exc:
-                log.error(f"FETCHER_FAILED | user={ctx.user_id} | fetcher={func_name} | error={exc}", exc_info=True)
-                
-                error_info = {"error": str(exc), "error_type": type(exc).__name__}
-                fetched[func_name] = error_info
-                
+            else:
+                exc = outcome.error
+                log.error(f"FETCHER_FAILED | user={ctx.user_id} | fetcher={func_name} | error={exc}", exc_info=exc)
+                fetched[func_name] = {"error": str(exc), "error_type": type(exc).__name__}
                 # FIX: Persist error state as well
                 ctx.fetched_data[func_name] = {
                     "data": None,
@@ -495,21 +478,18 @@ class EnhancedShoppingBotCore:
                     "timestamp": datetime.now().isoformat(),
                     "status": "failed"
                 }
-                
-                # FIX: Merge error into Redis as well
-                fetched_key = f"session:{ctx.session_id}:fetched"
-                existing_fetched = self.ctx_mgr._get_json(fetched_key, default={})
-                existing_fetched[func_name] = {
-                    "data": None,
-                    "error": str(exc),
-                    "timestamp": datetime.now().isoformat(),
-                    "status": "failed"
-                }
-                self.ctx_mgr._set_json(fetched_key, existing_fetched, ttl=self.ctx_mgr.ttl)
-                
                 self.smart_log.warning(
                     ctx.user_id, "DATA_FETCH_FAILED", f"{func_name}: {exc}"
                 )
+            to_persist[func_name] = ctx.fetched_data[func_name]
+
+        outcomes = await run_fetchers(fetchers, ctx, on_done=_record)
+        fetched = {func.value: fetched[func.value] for func in outcomes}
+        success_count = sum(1 for o in outcomes.values() if o.ok)
+
+        # FIX: Merge all results into session:*:fetched in one write (one HSET, no read)
+        if to_persist:
+            self.ctx_mgr.merge_fetched_data(ctx.session_id, to_persist)
 
         if fetchers:
             log.info(f"FETCHERS_COMPLETE | user={ctx.user_id} | success={success_count}/{len(fetchers)}")
@@ -550,8 +530,7 @@ class EnhancedShoppingBotCore:
         
         # FIX: Also store in permanent user profile
         try:
-            user_key = f"user:{ctx.user_id}:permanent"
-            permanent_data = self.ctx_mgr._get_json(user_key, default={})
+            permanent_data = self.ctx_mgr.get_permanent(ctx.user_id)
             
             # Create user_answers section if it doesn't exist
             if "user_answers" not in permanent_data:
@@ -579,7 +558,7 @@ class EnhancedShoppingBotCore:
             permanent_data["last_updated"] = datetime.now().isoformat()
             
             # Persist to Redis (no TTL for permanent data)
-            self.ctx_mgr._set_json(user_key, permanent_data, ttl=None)
+            self.ctx_mgr.merge_permanent(ctx.user_id, permanent_data)
             
             log.info(f"USER_ANSWER_PERSISTED | user={ctx.user_id} | slot={currently_asking} | to_permanent=true")
             
@@ -592,8 +571,7 @@ class EnhancedShoppingBotCore:
             # Simple heuristic: if query contains preferences, budget, or address info, store it
             query_lower = query.lower()
             
-            user_key = f"user:{ctx.user_id}:permanent"
-            permanent_data = self.ctx_mgr._get_json(user_key, default={})
+            permanent_data = self.ctx_mgr.get_permanent(ctx.user_id)
             
             if "follow_up_data" not in permanent_data:
                 permanent_data["follow_up_data"] = []
@@ -612,7 +590,7 @@ class EnhancedShoppingBotCore:
             permanent_data["follow_up_data"] = permanent_data["follow_up_data"][-10:]
             permanent_data["last_updated"] = datetime.now().isoformat()
             
-            self.ctx_mgr._set_json(user_key, permanent_data, ttl=None)
+            self.ctx_mgr.merge_permanent(ctx.user_id, permanent_data)
             log.info(f"FOLLOW_UP_STORED | user={ctx.user_id} | query_len={len(query)}")
             
         except Exception as e:
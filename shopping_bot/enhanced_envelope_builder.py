@@ -13,6 +13,7 @@ from enum import Enum
 
 from .enums import EnhancedResponseType, UXIntentType, PSLType
 from .models import UserContext, EnhancedBotResponse
+from .utils.metrics import timed
 
 
 def _to_json_safe(obj: Any) -> Any:
@@ -107,6 +108,7 @@ def normalize_enhanced_content(
     return {"message": c.get("message", "")}
 
 
+@timed("envelope", builder="enhanced")
 def build_enhanced_envelope(
     *,
     wa_id: str | None,
@@ -168,6 +170,7 @@ def build_enhanced_envelope(
         }
 
 
+@timed("envelope", builder="legacy")
 def build_legacy_compatible_envelope(
     *,
     wa_id: str | None,
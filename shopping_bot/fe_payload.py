@@ -6,6 +6,7 @@ from typing import Any, Dict
 
 from .enums import ResponseType
 from .models import UserContext
+from .utils.metrics import timed
 
 
 def _to_json_safe(obj: Any) -> Any:
@@ -206,6 +207,7 @@ def normalize_content(bot_resp_type: ResponseType, content: Dict[str, Any] | Non
     return {"summary_message": text}
 
 
+@timed("envelope", builder="fe")
 def build_envelope(
     *,
     wa_id: str | None,
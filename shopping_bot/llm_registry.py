@@ -0,0 +1,565 @@
+# shopping_bot/llm_registry.py
+"""
+Process-wide LLM clients and static prompt data
+───────────────────────────────────────────────
+Owns the objects that used to be rebuilt on every call:
+
+• One pooled `AsyncAnthropic` client per running event loop (httpx pools
+  are loop-bound), plus one sync client for the streaming helpers.
+• Taxonomies loaded once per process and frozen (read-only dict/list
+  subclasses, still JSON-serializable). `reload_static_data()` rebuilds
+  them and runs the callbacks registered with `on_reload` so derived
+  caches (prompt prefixes, macro profiles) are dropped too.
+
+Usage:
+    client = get_anthropic_client()
+    taxonomy = get_static_data().personal_care
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import anthropic
+import httpx
+
+from .config import get_config
+from .utils import metrics
+
+log = logging.getLogger(__name__)
+
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+
+_TAXONOMY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "taxonomies")
+
+
+# ────────────────────────────────────────────────────────
+# Anthropic clients
+# ────────────────────────────────────────────────────────
+
+# loop id -> (loop, client); entries for closed loops are pruned lazily
+_clients: Dict[Optional[int], Tuple[Optional[asyncio.AbstractEventLoop], anthropic.AsyncAnthropic]] = {}
+_sync_client: Optional[anthropic.Anthropic] = None
+_client_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE)
+
+
+def _call_name(kwargs: Dict[str, Any]) -> str:
+    choice = kwargs.get("tool_choice") or {}
+    return str(choice.get("name") or "text") if isinstance(choice, dict) else "text"
+
+
+class _TimedStream:
+    """Wraps a (sync or async) stream manager so the whole stream is one span."""
+
+    def __init__(self, manager: Any, call: str):
+        self._manager = manager
+        self._span = metrics.span("llm", call=call)
+
+    def __enter__(self) -> Any:
+        self._span.__enter__()
+        return self._manager.__enter__()
+
+    def __exit__(self, *exc: Any) -> Any:
+        try:
+            return self._manager.__exit__(*exc)
+        finally:
+            self._span.__exit__(*exc)
+
+    async def __aenter__(self) -> Any:
+        self._span.__enter__()
+        return await self._manager.__aenter__()
+
+    async def __aexit__(self, *exc: Any) -> Any:
+        try:
+            return await self._manager.__aexit__(*exc)
+        finally:
+            self._span.__exit__(*exc)
+
+
+class _TimedMessages:
+    """`client.messages` stand-in recording an `llm` span per call, labelled by tool name."""
+
+    def __init__(self, messages: Any, is_async: bool):
+        self._messages = messages
+        self._is_async = is_async
+
+    def create(self, **kwargs: Any) -> Any:
+        call = _call_name(kwargs)
+        if self._is_async:
+            async def timed() -> Any:
+                with metrics.span("llm", call=call):
+                    return await self._messages.create(**kwargs)
+            return timed()
+        with metrics.span("llm", call=call):
+            return self._messages.create(**kwargs)
+
+    def stream(self, **kwargs: Any) -> _TimedStream:
+        return _TimedStream(self._messages.stream(**kwargs), _call_name(kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._messages, name)
+
+
+def _instrumented(client: Any, is_async: bool) -> Any:
+    # `messages` is a cached_property on the SDK client, so an instance attribute shadows it
+    if metrics.enabled():
+        client.messages = _TimedMessages(client.messages, is_async)
+    return client
+
+
+def get_anthropic_client() -> anthropic.AsyncAnthropic:
+    """Shared async client bound to the running event loop (created on first use)."""
+    try:
+        loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    key = id(loop) if loop is not None else None
+    with _client_lock:
+        entry = _clients.get(key)
+        if entry and entry[0] is loop:
+            return entry[1]
+        for k, (other_loop, _client) in list(_clients.items()):
+            if other_loop is not None and other_loop.is_closed():
+                _clients.pop(k, None)
+        client = _instrumented(
+            anthropic.AsyncAnthropic(
+                api_key=get_config().ANTHROPIC_API_KEY,
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=_limits()),
+            ),
+            is_async=True,
+        )
+        _clients[key] = (loop, client)
+        return client
+
+
+def get_sync_anthropic_client() -> anthropic.Anthropic:
+    """Shared sync client (httpx sync pools are thread-safe)."""
+    global _sync_client
+    with _client_lock:
+        if _sync_client is None:
+            _sync_client = _instrumented(
+                anthropic.Anthropic(
+                    api_key=get_config().ANTHROPIC_API_KEY,
+                    http_client=anthropic.DefaultHttpxClient(limits=_limits()),
+                ),
+                is_async=False,
+            )
+        return _sync_client
+
+
+async def aclose_anthropic_client() -> None:
+    """Close the client bound to the running loop (call from shutdown hooks)."""
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        entry = _clients.pop(id(loop), None)
+    if entry:
+        await entry[1].close()
+
+
+# ────────────────────────────────────────────────────────
+# Static data
+# ────────────────────────────────────────────────────────
+
+def _readonly(*_args: Any, **_kwargs: Any) -> None:
+    raise TypeError("static taxonomy data is read-only; use reload_static_data()")
+
+
+class FrozenDict(dict):
+    __slots__ = ()
+    __setitem__ = __delitem__ = _readonly  # type: ignore[assignment]
+    clear = pop = popitem = setdefault = update = _readonly  # type: ignore[assignment]
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class FrozenList(list):
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly  # type: ignore[assignment]
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly  # type: ignore[assignment]
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def freeze(obj: Any) -> Any:
+    """Recursively convert dicts/lists to their read-only subclasses."""
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return FrozenList(freeze(v) for v in obj)
+    return obj
+
+
+@dataclass(frozen=True)
+class StaticData:
+    fnb_hierarchy: Dict[str, Any]  # f_and_b → food|beverages → l2 → l3 → {}
+    fnb_prompt: Dict[str, Dict[str, List[str]]]  # {food|beverages: {l2: [l3]}} for prompts
+    fnb_l2: Dict[str, List[str]]  # {l2: [l3]} used by the recommendation engine
+    personal_care: Dict[str, Any]
+
+
+_static: Optional[StaticData] = None
+_static_lock = threading.Lock()
+_reload_callbacks: List[Callable[[], None]] = []
+
+
+def _read_json(name: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(_TAXONOMY_DIR, name), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except Exception:
+        return None
+
+
+def _flatten_fnb_hierarchy(hierarchical: Dict[str, Any]) -> Dict[str, Dict[str, List[str]]]:
+    """Convert nested taxonomy to 2-level structure for prompt."""
+    flattened: Dict[str, Dict[str, List[str]]] = {}
+    try:
+        fnb = hierarchical.get("f_and_b", {})
+        for domain in ["food", "beverages"]:
+            if domain in fnb:
+                flattened[domain] = {}
+                for l2_key, l3_dict in fnb[domain].items():
+                    if isinstance(l3_dict, dict):
+                        flattened[domain][l2_key] = list(l3_dict.keys())
+                    else:
+                        flattened[domain][l2_key] = []
+    except Exception as exc:
+        log.warning(f"FNB_TAXONOMY_FLATTEN_ERROR | {exc}")
+    return flattened
+
+
+def _load_fnb_l2_override() -> Optional[Dict[str, Any]]:
+    """Load F&B taxonomy override from env JSON or file path."""
+    path = os.getenv("FNB_TAXONOMY_PATH")
+    raw = os.getenv("FNB_TAXONOMY_JSON")
+    data: Optional[Dict[str, Any]] = None
+    if path and isinstance(path, str) and path.strip():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load taxonomy file '{path}': {e}")
+    elif raw and isinstance(raw, str) and raw.strip():
+        try:
+            data = json.loads(raw)
+        except Exception as e:
+            raise RuntimeError(f"Failed to parse FNB_TAXONOMY_JSON: {e}")
+
+    if data is None:
+        return None
+
+    # Basic validation
+    if not isinstance(data, dict):
+        raise ValueError("Taxonomy override must be a JSON object mapping category → list[subcategories]")
+    for k, v in data.items():
+        if not isinstance(k, str) or not isinstance(v, list):
+            raise ValueError("Invalid taxonomy format: keys must be strings and values must be lists")
+    return data
+
+
+def _load_static_data() -> StaticData:
+    hierarchy = _read_json("fnb_hierarchy.json") or _EMBEDDED_FNB_HIERARCHY
+    personal_care = _read_json("personal_care.json") or _EMBEDDED_PERSONAL_CARE_TAXONOMY
+
+    fnb_l2: Dict[str, Any] = _DEFAULT_FNB_L2_TAXONOMY
+    try:
+        override = _load_fnb_l2_override()
+        if override:
+            fnb_l2 = override
+            log.info("FNB_TAXONOMY | loaded override from environment")
+    except Exception as exc:
+        log.warning(f"FNB_TAXONOMY_OVERRIDE_FAILED | {exc}")
+
+    data = StaticData(
+        fnb_hierarchy=freeze(hierarchy),
+        fnb_prompt=freeze(_flatten_fnb_hierarchy(hierarchy)),
+        fnb_l2=freeze(fnb_l2),
+        personal_care=freeze(personal_care),
+    )
+    log.info(
+        "STATIC_DATA_LOADED | fnb_l2=%d | fnb_prompt_domains=%d | personal_care=%s",
+        len(data.fnb_l2),
+        len(data.fnb_prompt),
+        "file" if personal_care is not _EMBEDDED_PERSONAL_CARE_TAXONOMY else "embedded",
+    )
+    return data
+
+
+def get_static_data() -> StaticData:
+    """Preloaded, read-only taxonomies (loaded on first use)."""
+    global _static
+    if _static is None:
+        with _static_lock:
+            if _static is None:
+                _static = _load_static_data()
+    return _static
+
+
+def on_reload(callback: Callable[[], None]) -> None:
+    """Register a callback that drops data derived from the static data."""
+    _reload_callbacks.append(callback)
+
+
+def reload_static_data() -> StaticData:
+    """Re-read taxonomies from disk/env and invalidate derived caches."""
+    global _static
+    with _static_lock:
+        _static = _load_static_data()
+    for callback in list(_reload_callbacks):
+        try:
+            callback()
+        except Exception as exc:
+            log.warning(f"STATIC_DATA_RELOAD_CALLBACK_FAILED | {exc}")
+    return _static
+
+
+# ────────────────────────────────────────────────────────
+# Embedded fallbacks (used when the JSON files are absent)
+# ────────────────────────────────────────────────────────
+
+_EMBEDDED_FNB_HIERARCHY: Dict[str, Any] = {
+    "f_and_b": {
+        "food": {
+            "frozen_treats": {
+                "ice_cream_cakes_and_sandwiches": {},
+                "ice_cream_sticks": {},
+                "light_ice_cream": {},
+                "ice_cream_tubs": {},
+                "ice_cream_cups": {},
+                "ice_cream_cones": {},
+                "frozen_pop_cubes": {},
+                "kulfi": {}
+            },
+            "light_bites": {
+                "energy_bars": {},
+                "nachos": {},
+                "chips_and_crisps": {},
+                "savory_namkeen": {},
+                "dry_fruit_and_nut_snacks": {},
+                "popcorn": {}
+            },
+            "breakfast_essentials": {
+                "muesli_and_oats": {},
+                "dates_and_seeds": {},
+                "breakfast_cereals": {}
+            },
+            "packaged_meals": {
+                "papads_and_pickles_and_chutneys": {},
+                "baby_food": {},
+                "pasta_and_soups": {},
+                "baking_mixes_and_ingredients": {},
+                "ready_to_cook_meals": {},
+                "ready_to_eat_meals": {}
+            },
+            "dairy_and_bakery": {
+                "batter_and_mix": {},
+                "butter": {},
+                "paneer_and_cream": {},
+                "cheese": {},
+                "vegan_beverages": {},
+                "yogurt_and_shrikhand": {},
+                "curd_and_probiotic_drinks": {},
+                "bread_and_buns": {},
+                "eggs": {},
+                "gourmet_specialties": {}
+            },
+            "sweet_treats": {
+                "pastries_and_cakes": {},
+                "candies_gums_and_mints": {},
+                "chocolates": {},
+                "premium_chocolates": {},
+                "indian_mithai": {},
+                "dessert_mixes": {}
+            },
+            "noodles_and_vermicelli": {
+                "vermicelli_and_noodles": {}
+            },
+            "biscuits_and_crackers": {
+                "glucose_and_marie_biscuits": {},
+                "cream_filled_biscuits": {},
+                "rusks_and_khari": {},
+                "digestive_biscuits": {},
+                "wafer_biscuits": {},
+                "cookies": {},
+                "crackers": {}
+            },
+            "frozen_foods": {
+                "non_veg_frozen_snacks": {},
+                "frozen_raw_meats": {},
+                "frozen_vegetables_and_pulp": {},
+                "frozen_vegetarian_snacks": {},
+                "frozen_sausages_salami_and_ham": {},
+                "momos_and_similar": {},
+                "frozen_roti_and_paratha": {}
+            },
+            "spreads_and_condiments": {
+                "ketchup_and_sauces": {},
+                "honey_and_spreads": {},
+                "peanut_butter": {}
+            }
+        },
+        "beverages": {
+            "sodas_juices_and_more": {
+                "soda_and_mixers": {},
+                "flavored_milk_drinks": {},
+                "instant_beverage_mixes": {},
+                "fruit_juices": {},
+                "energy_and_non_alcoholic_drinks": {},
+                "soft_drinks": {},
+                "iced_coffee_and_tea": {},
+                "bottled_water": {},
+                "enhanced_hydration": {}
+            },
+            "tea_coffee_and_more": {
+                "iced_coffee_and_tea": {},
+                "green_and_herbal_tea": {},
+                "tea": {},
+                "beverage_mix": {},
+                "coffee": {}
+            },
+            "dairy_and_bakery": {
+                "milk": {}
+            }
+        }
+    }
+}
+
+_EMBEDDED_PERSONAL_CARE_TAXONOMY: Dict[str, Any] = {
+    "personal_care": {
+        "skin": {
+            "3_purifying_cleansers": {},
+            "1_skin_hydrators": {},
+            "11_uv_defense": {},
+            "5_skin_toners": {},
+            "2_active_serums": {}
+        },
+        "hair": {
+            "17_hair_nurture": {
+                "conditioner": {},
+                "shampoo": {}
+            }
+        }
+    }
+}
+
+_DEFAULT_FNB_L2_TAXONOMY: Dict[str, List[str]] = {
+    "frozen_treats": [
+        "ice_cream_cakes_and_sandwiches",
+        "ice_cream_sticks",
+        "light_ice_cream",
+        "ice_cream_tubs",
+        "ice_cream_cups",
+        "ice_cream_cones",
+        "frozen_pop_cubes",
+        "kulfi"
+    ],
+    "light_bites": [
+        "energy_bars",
+        "nachos",
+        "chips_and_crisps",
+        "savory_namkeen",
+        "dry_fruit_and_nut_snacks",
+        "popcorn"
+    ],
+    "refreshing_beverages": [
+        "soda_and_mixers",
+        "flavored_milk_drinks",
+        "instant_beverage_mixes",
+        "fruit_juices",
+        "energy_and_non_alcoholic_drinks",
+        "soft_drinks",
+        "iced_coffee_and_tea",
+        "bottled_water",
+        "enhanced_hydration"
+    ],
+    "breakfast_essentials": [
+        "muesli_and_oats",
+        "dates_and_seeds",
+        "breakfast_cereals"
+    ],
+    "spreads_and_condiments": [
+        "ketchup_and_sauces",
+        "honey_and_spreads",
+        "peanut_butter",
+        "jams_and_jellies"
+    ],
+    "packaged_meals": [
+        "papads_pickles_and_chutneys",
+        "baby_food",
+        "pasta_and_soups",
+        "baking_mixes_and_ingredients",
+        "ready_to_cook_meals",
+        "ready_to_eat_meals"
+    ],
+    "brew_and_brew_alternatives": [
+        "iced_coffee_and_tea",
+        "green_and_herbal_tea",
+        "tea",
+        "beverage_mix",
+        "coffee"
+    ],
+    "dairy_and_bakery": [
+        "batter_and_mix",
+        "butter",
+        "paneer_and_cream",
+        "cheese",
+        "vegan_beverages",
+        "yogurt_and_shrikhand",
+        "curd_and_probiotic_drinks",
+        "bread_and_buns",
+        "eggs",
+        "milk",
+        "gourmet_specialties"
+    ],
+    "sweet_treats": [
+        "pastries_and_cakes",
+        "candies_gums_and_mints",
+        "chocolates",
+        "premium_chocolates",
+        "indian_mithai",
+        "dessert_mixes"
+    ],
+    "noodles_and_vermicelli": [
+        "vermicelli_and_noodles"
+    ],
+    "biscuits_and_crackers": [
+        "glucose_and_marie_biscuits",
+        "cream_filled_biscuits",
+        "rusks_and_khari",
+        "digestive_biscuits",
+        "wafer_biscuits",
+        "cookies",
+        "crackers"
+    ],
+    "frozen_foods": [
+        "non_veg_frozen_snacks",
+        "frozen_raw_meats",
+        "frozen_vegetables_and_pulp",
+        "frozen_vegetarian_snacks",
+        "frozen_sausages_salami_and_ham",
+        "momos_and_similar",
+        "frozen_roti_and_paratha"
+    ],
+    "dry_fruits_nuts_and_seeds": [
+        "almonds",
+        "cashews",
+        "raisins",
+        "pistachios",
+        "walnuts",
+        "dates",
+        "seeds"
+    ]
+}
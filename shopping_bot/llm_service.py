@@ -12,26 +12,36 @@ UPDATED: 4-Intent Classification for Product Queries
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Union
 
-import anthropic
+from anthropic import AsyncAnthropic
 
 from .bot_helpers import pick_tool, string_to_function
+from .data_fetchers.product_record import llm_view
 from .config import get_config
 from .enums import BackendFunction, QueryIntent, UserSlot
 from .intent_config import (CATEGORY_QUESTION_HINTS, INTENT_MAPPING,
                             SLOT_QUESTIONS)
+from .llm_registry import get_anthropic_client, get_static_data, on_reload
 from .models import (FollowUpPatch, FollowUpResult, ProductData,
                      RequirementAssessment, UserContext)
 from .recommendation import get_recommendation_service
 # Avoid top-level import of es_products to prevent circular import at app startup
 from .utils.helpers import extract_json_block
+from .utils.llm_memo import llm_memo
+from .utils.prompt_cache import cached_system, cached_tools, log_cache_usage
+from .utils.single_flight import single_flight
 
 Cfg = get_config()
 log = logging.getLogger(__name__)
+
+# Static prompt prefixes built once per process (must stay byte-identical for prompt caching)
+_STATIC_PROMPTS: Dict[str, str] = {}
+on_reload(_STATIC_PROMPTS.clear)
 # ─────────────────────────────────────────────────────────────
 # NEW: Two-call ES pipeline tools (flag-gated)
 # ─────────────────────────────────────────────────────────────
@@ -1261,6 +1271,17 @@ CLASSIFICATION RULES (MANDATORY):
 Return ONLY a tool call to classify_product_intent.
 """
 
+# Session slots shown to the follow-up classifier (and hashed into its memo key).
+# Everything else in the session (debug, history, assessments, last products)
+# says nothing about whether the query continues the search.
+FOLLOW_UP_SESSION_SLOTS = (
+    "canonical_query", "last_query", "product_intent", "intent_override", "is_product_related",
+    "domain", "domain_subcategory", "category", "category_group", "category_path", "category_paths",
+    "brands", "price_min", "price_max", "dietary_requirements", "size_hint", "slots",
+    "user_skin_type", "user_skin_concerns", "user_hair_type", "user_hair_concerns",
+    "user_care_concerns", "user_allergies",
+)
+
 FOLLOW_UP_PROMPT_TEMPLATE = """You are a precise conversation analyzer for a shopping assistant specializing in food and personal care products.
 
 Your task: Determine if the user's new message continues their previous search (follow-up) or starts a completely new product search.
@@ -1564,9 +1585,17 @@ class LLMService:
         if not isinstance(api_key, str) or not api_key.startswith("sk-ant-"):
             raise RuntimeError("Invalid ANTHROPIC_API_KEY format. It should start with 'sk-ant-'.")
 
-        self.anthropic = anthropic.AsyncAnthropic(api_key=api_key)
         self._recommendation_service = get_recommendation_service()
 
+    @property
+    def anthropic(self) -> AsyncAnthropic:
+        """Shared client for the running event loop (see llm_registry)."""
+        return getattr(self, "_anthropic_override", None) or get_anthropic_client()
+
+    @anthropic.setter
+    def anthropic(self, client: AsyncAnthropic) -> None:
+        self._anthropic_override = client
+
     def _extract_noun(self, text: str) -> str:
         try:
             low = (text or "").lower()
@@ -1731,12 +1760,7 @@ class LLMService:
         user_answers = (ctx.permanent or {}).get("user_answers") or ctx.session.get("user_answers")
 
         # Optionally include F&B taxonomy for precise category mapping
-        try:
-            from .recommendation import ElasticsearchRecommendationEngine
-            _engine = ElasticsearchRecommendationEngine()
-            fnb_taxonomy = getattr(_engine, "_fnb_taxonomy", {})
-        except Exception:
-            fnb_taxonomy = {}
+        fnb_taxonomy = get_static_data().fnb_l2
 
         # Compute a simple carry-over hint for the planner (LLM decides reuse vs drop)
         try:
@@ -2188,22 +2212,35 @@ Now classify the user's current message. Return ONLY the tool call."""
             log.info(f"🤖 CLASSIFY_AND_ASSESS_LLM | model={Cfg.LLM_MODEL} | temp=0 | max_tokens=2000 | has_context={context_summary.get('has_history', False)}")
             log.info(f"🧠 CONTEXT_SUMMARY | recent_turns={len(context_summary.get('recent_turns', []))} | last_intent={context_summary.get('last_intent')}")
             
-            resp = await self.anthropic.messages.create(
+            async def _live() -> Optional[Dict[str, Any]]:
+                resp = await self.anthropic.messages.create(
+                    model=Cfg.LLM_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    tools=[COMBINED_CLASSIFY_ASSESS_TOOL],
+                    tool_choice={"type": "tool", "name": "classify_and_assess"},
+                    temperature=0,
+                    max_tokens=2000,
+                )
+
+                log.info(f"🤖 CLASSIFY_RESPONSE | stop_reason={resp.stop_reason} | input_tokens={resp.usage.input_tokens} | output_tokens={resp.usage.output_tokens}")
+
+                tool_use = pick_tool(resp, "classify_and_assess")
+                return dict(tool_use.input or {}) if tool_use else None
+
+            # Memo key: everything the prompt is rendered from (static text is covered by the source hash)
+            memo_args = dict(
                 model=Cfg.LLM_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                tools=[COMBINED_CLASSIFY_ASSESS_TOOL],
-                tool_choice={"type": "tool", "name": "classify_and_assess"},
-                temperature=0,
-                max_tokens=2000,
+                material={"text": query, "context": context_summary, "taxonomy": personal_care_taxonomy},
+                sources=(LLMService.classify_and_assess, COMBINED_CLASSIFY_ASSESS_TOOL),
             )
-            
-            log.info(f"🤖 CLASSIFY_RESPONSE | stop_reason={resp.stop_reason} | input_tokens={resp.usage.input_tokens} | output_tokens={resp.usage.output_tokens}")
-            
-            tool_use = pick_tool(resp, "classify_and_assess")
-            if not tool_use:
+            # Identical turns arriving together (e.g. replies to a broadcast) share one call
+            data = await single_flight("classify_and_assess").run(
+                llm_memo().key("classify_and_assess", **memo_args),
+                lambda: llm_memo().run("classify_and_assess", live=_live, **memo_args),
+            )
+            if data is None:
                 log.warning(f"⚠️ NO_TOOL_USE | falling back to default response")
                 return self._fallback_response()
-            data = tool_use.input or {}
             log.info(f"🔀 CLASSIFY_RESULT | route={data.get('route')} | data_strategy={data.get('data_strategy')} | domain={data.get('domain')} | category={data.get('category')}")
         except Exception as e:
             log.error(f"❌ LLM classification failed: {e}")
@@ -2866,7 +2903,8 @@ Generate your answer now:"""
 
         # Narrow LLM input: prefer small top-K for SPM to enable brand-aware selection later
         spm_mode = bool(product_intent and product_intent == "is_this_good")
-        products_for_llm = products_data[:5] if spm_mode else products_data[:10]
+        # Prompt view: no images, category paths or ranking internals; long text trimmed
+        products_for_llm = [llm_view(p) for p in (products_data[:5] if spm_mode else products_data[:10]) if isinstance(p, dict)]
 
         # Unified product + UX prompt and tool
         try:
@@ -3333,15 +3371,18 @@ Generate your answer now:"""
             except Exception:
                 formatted_history.append({"turn": i + 1, "weight": weight, "user_query": str(snap)[:120]})
 
+        current_slots = {k: ctx.session[k] for k in FOLLOW_UP_SESSION_SLOTS if ctx.session.get(k) not in (None, "", [], {})}
         prompt = FOLLOW_UP_PROMPT_TEMPLATE.format(
             last_snapshot=json.dumps(formatted_history, ensure_ascii=False, indent=2),
-            current_slots=json.dumps(ctx.session, ensure_ascii=False, indent=2),
+            current_slots=json.dumps(current_slots, ensure_ascii=False, indent=2, default=str),
             query=query,
         )
 
-        try:
+        model = getattr(Cfg, "LLM_CLASSIFIER_MODEL", Cfg.LLM_MODEL)
+
+        async def _live() -> Optional[Dict[str, Any]]:
             resp = await self.anthropic.messages.create(
-                model=getattr(Cfg, "LLM_CLASSIFIER_MODEL", Cfg.LLM_MODEL),
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 tools=[FOLLOW_UP_TOOL],
                 tool_choice={"type": "tool", "name": "classify_follow_up"},
@@ -3349,10 +3390,21 @@ Generate your answer now:"""
                 max_tokens=2000,
             )
             tool_use = pick_tool(resp, "classify_follow_up")
-            if not tool_use:
+            return dict(tool_use.input or {}) if tool_use else None
+
+        try:
+            # Key on exactly what the prompt renders: text, history window, search slots
+            raw = await llm_memo().run(
+                "classify_follow_up",
+                model=model,
+                material={"text": query, "history": formatted_history, "slots": current_slots},
+                sources=(LLMService.classify_follow_up, FOLLOW_UP_PROMPT_TEMPLATE, FOLLOW_UP_TOOL),
+                live=_live,
+            )
+            if raw is None:
                 return FollowUpResult(False, FollowUpPatch(slots={}))
 
-            ipt = _strip_keys(tool_use.input or {})
+            ipt = _strip_keys(raw)
             patch_dict = _safe_get(ipt, "patch", {}) or {}
             slots_dict = patch_dict.get("slots", {})
             
@@ -3384,9 +3436,7 @@ Generate your answer now:"""
         # Detected signals from current text if present
         detected_signals = {}
         try:
-            from .recommendation import ElasticsearchRecommendationEngine  # type: ignore
-            _tmp_engine = ElasticsearchRecommendationEngine()
-            detected_signals = await _tmp_engine._extract_constraints_from_text(current_text)
+            detected_signals = await self._recommendation_service.engine._extract_constraints_from_text(current_text)
         except Exception:
             detected_signals = {}
 
@@ -3473,11 +3523,12 @@ Generate your answer now:"""
         resp = await self.anthropic.messages.create(
             model=Cfg.LLM_MODEL,
             messages=[{"role": "user", "content": prompt}],
-            tools=[assessment_tool],
+            tools=cached_tools([assessment_tool]),
             tool_choice={"type": "tool", "name": "assess_requirements"},
             temperature=0,
             max_tokens=2000,
         )
+        log_cache_usage(resp, "assess_requirements")
 
         tool_use = pick_tool(resp, "assess_requirements")
         if not tool_use:
@@ -4426,42 +4477,50 @@ Validation: q has product noun, no prices/brands in q, category_group valid, cat
                 "bot_summary": turn.get("bot_reply", "")[:80]
             })
 
-        # Build optimized prompt WITH taxonomy injection and strict rules
-        fnb_taxonomy = self._get_fnb_taxonomy_hierarchical()
+        # Static rules + taxonomy go in a cached system prefix; only the context varies
         prompt = self._build_optimized_prompt(
             current_text=current_text,
             history=history_turns,
             is_follow_up=is_follow_up,
             product_intent=str(session.get("product_intent") or ""),
             slots=slot_answers,
-        ) + (
-            "\n<fnb_taxonomy>\n" +
-            json.dumps(fnb_taxonomy, ensure_ascii=False, indent=2) +
-            "\n</fnb_taxonomy>\n\n" +
-            TAXONOMY_CATEGORIZATION_EXAMPLES +
-            "\n" + MACRO_EXTRACTION_EXAMPLES +
-            "\n<taxonomy_rule priority=\"CRITICAL\">\n"
-            "Use ONLY the categories provided in <fnb_taxonomy> for f_and_b.\n"
-            "- Return 1-3 category_paths ordered by relevance.\n"
-            "- Format: 'f_and_b/{food|beverages}/{l2}/{l3}' (or L2-only when L3 unknown).\n"
-            "- NEVER output health_nutrition or any category not present in taxonomy.\n"
-            "</taxonomy_rule>\n"
         )
 
+        system_prompt = self._food_es_system_prompt()
+
         # Call LLM with forced tool use
-        resp = await self.anthropic.messages.create(
+        async def _live() -> Optional[Dict[str, Any]]:
+            resp = await self.anthropic.messages.create(
+                model=Cfg.LLM_MODEL,
+                system=cached_system(system_prompt),
+                messages=[{"role": "user", "content": prompt}],
+                tools=[UNIFIED_ES_PARAMS_TOOL],
+                tool_choice={"type": "tool", "name": "generate_unified_es_params"},
+                temperature=0,
+                max_tokens=2000,
+            )
+            log_cache_usage(resp, "es_params_food")
+            tool_use = pick_tool(resp, "generate_unified_es_params")
+            return dict(tool_use.input or {}) if tool_use else None
+
+        memo_input = await llm_memo().run(
+            "es_params",
             model=Cfg.LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            tools=[UNIFIED_ES_PARAMS_TOOL],
-            tool_choice={"type": "tool", "name": "generate_unified_es_params"},
-            temperature=0,
-            max_tokens=2000,
+            material={
+                "text": current_text,
+                "history": history_turns,
+                "follow_up": is_follow_up,
+                "product_intent": str(session.get("product_intent") or ""),
+                "slots": slot_answers,
+                "system": hashlib.sha1(system_prompt.encode("utf-8")).hexdigest(),
+            },
+            sources=(LLMService._build_optimized_prompt, UNIFIED_ES_PARAMS_TOOL),
+            live=_live,
         )
-        tool_use = pick_tool(resp, "generate_unified_es_params")
-        if not tool_use:
+        if memo_input is None:
             return {}
 
-        params: Dict[str, Any] = tool_use.input or {}
+        params: Dict[str, Any] = memo_input
 
         # Minimal post-processing (schema handles most validation)
         anchor = str(params.get("anchor_product_noun") or "").strip()
@@ -4613,22 +4672,51 @@ Validation: q has product noun, no prices/brands in q, category_group valid, cat
         product_intent: str,
         slots: dict[str, Any]
     ) -> str:
-        """Build optimized prompt using 2025 best practices."""
-        import json
+        """Per-request <context> block for the food ES-param prompt.
+
+        The static rules, examples and taxonomy are sent separately as a
+        cached system prefix (see `_food_es_system_prompt`).
+        """
         history_json = json.dumps(history, ensure_ascii=False, indent=2)
         slots_json = json.dumps({k: v for k, v in slots.items() if v}, ensure_ascii=False)
 
         return (
-            "<task>\n"
-            "Extract Elasticsearch parameters from user query while maintaining product continuity across conversation turns.\n"
-            "</task>\n\n"
             "<context>\n"
             f"<conversation_mode>{'FOLLOW_UP' if is_follow_up else 'NEW_QUERY'}</conversation_mode>\n"
             f"<current_query>{current_text}</current_query>\n"
             f"<history>{history_json if history else '[]'}</history>\n"
             f"<intent>{product_intent or 'show_me_options'}</intent>\n"
             f"<user_preferences>{slots_json}</user_preferences>\n"
-            "</context>\n\n"
+            "</context>\n"
+        )
+
+    def _food_es_system_prompt(self) -> str:
+        """Static food ES-param instructions + taxonomy (identical for every request)."""
+        cached = _STATIC_PROMPTS.get("food_es_params")
+        if cached is None:
+            fnb_taxonomy = self._get_fnb_taxonomy_hierarchical()
+            cached = _STATIC_PROMPTS["food_es_params"] = (
+                self._optimized_prompt_rules() +
+                "\n<fnb_taxonomy>\n" +
+                json.dumps(fnb_taxonomy, ensure_ascii=False, indent=2) +
+                "\n</fnb_taxonomy>\n\n" +
+                TAXONOMY_CATEGORIZATION_EXAMPLES +
+                "\n" + MACRO_EXTRACTION_EXAMPLES +
+                "\n<taxonomy_rule priority=\"CRITICAL\">\n"
+                "Use ONLY the categories provided in <fnb_taxonomy> for f_and_b.\n"
+                "- Return 1-3 category_paths ordered by relevance.\n"
+                "- Format: 'f_and_b/{food|beverages}/{l2}/{l3}' (or L2-only when L3 unknown).\n"
+                "- NEVER output health_nutrition or any category not present in taxonomy.\n"
+                "</taxonomy_rule>\n"
+            )
+        return cached
+
+    @staticmethod
+    def _optimized_prompt_rules() -> str:
+        return (
+            "<task>\n"
+            "Extract Elasticsearch parameters from the user query in the <context> block of the user message while maintaining product continuity across conversation turns.\n"
+            "</task>\n\n"
 
             "<reasoning_steps>\n"
             "1. IDENTIFY ANCHOR: Extract product noun from current OR most recent history\n"
@@ -5342,12 +5430,14 @@ Validation: q has product noun, no prices/brands in q, category_group valid, cat
         # Force tool call
         resp = await self.anthropic.messages.create(
             model=Cfg.LLM_MODEL,
+            system=cached_system(self._personal_care_prompt_rules()),
             messages=[{"role": "user", "content": prompt}],
             tools=[PERSONAL_CARE_ES_PARAMS_TOOL_2025],
             tool_choice={"type": "tool", "name": "generate_personal_care_es_params"},
             temperature=0,
             max_tokens=2000,
         )
+        log_cache_usage(resp, "es_params_personal_care")
         
         tool_use = pick_tool(resp, "generate_personal_care_es_params")
         params = _strip_keys(tool_use.input or {}) if tool_use else {}
@@ -5454,26 +5544,30 @@ Validation: q has product noun, no prices/brands in q, category_group valid, cat
         history_json: str,
         profile_hints: Dict[str, Any],
     ) -> str:
-        """Optimized 2025 prompt for Personal Care (parallels food path structure)."""
+        """Per-request context for the Personal Care prompt (rules: `_personal_care_prompt_rules`)."""
         
         profile_str = json.dumps(profile_hints, ensure_ascii=False)
         
+        return (
+            "<context>\n"
+            f"FOLLOW_UP: {is_follow_up}\n"
+            f"HISTORY: {history_json}\n"
+            f"PROFILE_HINTS: {profile_str}\n"
+            "</context>\n\n"
+            f"<current_query>{current_text}</current_query>\n"
+        )
+
+    @staticmethod
+    def _personal_care_prompt_rules() -> str:
+        """Optimized 2025 prompt for Personal Care (static; parallels food path structure)."""
         return (
             # Task definition
             "<task>\n"
             "Extract personal care product search parameters via the generate_personal_care_es_params tool.\n"
             "Goal: Convert natural language queries into structured Elasticsearch parameters for skin/hair products.\n"
+            "The per-request <context> and <current_query> are in the user message.\n"
             "</task>\n\n"
             
-            # Context
-            f"<context>\n"
-            f"FOLLOW_UP: {is_follow_up}\n"
-            f"HISTORY: {history_json}\n"
-            f"PROFILE_HINTS: {profile_str}\n"
-            f"</context>\n\n"
-            
-            f"<current_query>{current_text}</current_query>\n\n"
-            
             # Reasoning steps
             "<reasoning_steps>\n"
             "1. Identify the product type (shampoo, face wash, moisturizer, serum, etc.)\n"
@@ -5986,180 +6080,15 @@ Validation: q has product noun, no prices/brands in q, category_group valid, cat
 
     def _get_fnb_taxonomy(self) -> Dict[str, Any]:
         """Get F&B taxonomy for LLM context."""
-        try:
-            from .recommendation import ElasticsearchRecommendationEngine
-            engine = ElasticsearchRecommendationEngine()
-            return getattr(engine, "_fnb_taxonomy", {})
-        except Exception:
-            return {}
+        return get_static_data().fnb_l2
 
     def _get_fnb_taxonomy_hierarchical(self) -> Dict[str, Any]:
-        """Load hierarchical F&B taxonomy and flatten for LLM prompt efficiency."""
-        import os, json
-        
-        # Try to load user-provided hierarchical taxonomy
-        hierarchical = {}
-        try:
-            here = os.path.dirname(os.path.abspath(__file__))
-            path = os.path.join(here, "taxonomies", "fnb_hierarchy.json")
-            with open(path, "r", encoding="utf-8") as f:
-                hierarchical = json.load(f)
-        except Exception:
-            # Fallback: use embedded taxonomy from user requirements
-            hierarchical = {
-                "f_and_b": {
-                    "food": {
-                        "frozen_treats": {
-                            "ice_cream_cakes_and_sandwiches": {},
-                            "ice_cream_sticks": {},
-                            "light_ice_cream": {},
-                            "ice_cream_tubs": {},
-                            "ice_cream_cups": {},
-                            "ice_cream_cones": {},
-                            "frozen_pop_cubes": {},
-                            "kulfi": {}
-                        },
-                        "light_bites": {
-                            "energy_bars": {},
-                            "nachos": {},
-                            "chips_and_crisps": {},
-                            "savory_namkeen": {},
-                            "dry_fruit_and_nut_snacks": {},
-                            "popcorn": {}
-                        },
-                        "breakfast_essentials": {
-                            "muesli_and_oats": {},
-                            "dates_and_seeds": {},
-                            "breakfast_cereals": {}
-                        },
-                        "packaged_meals": {
-                            "papads_and_pickles_and_chutneys": {},
-                            "baby_food": {},
-                            "pasta_and_soups": {},
-                            "baking_mixes_and_ingredients": {},
-                            "ready_to_cook_meals": {},
-                            "ready_to_eat_meals": {}
-                        },
-                        "dairy_and_bakery": {
-                            "batter_and_mix": {},
-                            "butter": {},
-                            "paneer_and_cream": {},
-                            "cheese": {},
-                            "vegan_beverages": {},
-                            "yogurt_and_shrikhand": {},
-                            "curd_and_probiotic_drinks": {},
-                            "bread_and_buns": {},
-                            "eggs": {},
-                            "gourmet_specialties": {}
-                        },
-                        "sweet_treats": {
-                            "pastries_and_cakes": {},
-                            "candies_gums_and_mints": {},
-                            "chocolates": {},
-                            "premium_chocolates": {},
-                            "indian_mithai": {},
-                            "dessert_mixes": {}
-                        },
-                        "noodles_and_vermicelli": {
-                            "vermicelli_and_noodles": {}
-                        },
-                        "biscuits_and_crackers": {
-                            "glucose_and_marie_biscuits": {},
-                            "cream_filled_biscuits": {},
-                            "rusks_and_khari": {},
-                            "digestive_biscuits": {},
-                            "wafer_biscuits": {},
-                            "cookies": {},
-                            "crackers": {}
-                        },
-                        "frozen_foods": {
-                            "non_veg_frozen_snacks": {},
-                            "frozen_raw_meats": {},
-                            "frozen_vegetables_and_pulp": {},
-                            "frozen_vegetarian_snacks": {},
-                            "frozen_sausages_salami_and_ham": {},
-                            "momos_and_similar": {},
-                            "frozen_roti_and_paratha": {}
-                        },
-                        "spreads_and_condiments": {
-                            "ketchup_and_sauces": {},
-                            "honey_and_spreads": {},
-                            "peanut_butter": {}
-                        }
-                    },
-                    "beverages": {
-                        "sodas_juices_and_more": {
-                            "soda_and_mixers": {},
-                            "flavored_milk_drinks": {},
-                            "instant_beverage_mixes": {},
-                            "fruit_juices": {},
-                            "energy_and_non_alcoholic_drinks": {},
-                            "soft_drinks": {},
-                            "iced_coffee_and_tea": {},
-                            "bottled_water": {},
-                            "enhanced_hydration": {}
-                        },
-                        "tea_coffee_and_more": {
-                            "iced_coffee_and_tea": {},
-                            "green_and_herbal_tea": {},
-                            "tea": {},
-                            "beverage_mix": {},
-                            "coffee": {}
-                        },
-                        "dairy_and_bakery": {
-                            "milk": {}
-                        }
-                    }
-                }
-            }
-        
-        # Flatten to {food: {l2: [l3s]}, beverages: {l2: [l3s]}} for token efficiency
-        return self._flatten_fnb_taxonomy(hierarchical)
-    
-    def _flatten_fnb_taxonomy(self, hierarchical: Dict[str, Any]) -> Dict[str, Dict[str, List[str]]]:
-        """Convert nested taxonomy to 2-level structure for prompt."""
-        flattened = {}
-        try:
-            fnb = hierarchical.get("f_and_b", {})
-            for domain in ["food", "beverages"]:
-                if domain in fnb:
-                    flattened[domain] = {}
-                    for l2_key, l3_dict in fnb[domain].items():
-                        if isinstance(l3_dict, dict):
-                            flattened[domain][l2_key] = list(l3_dict.keys())
-                        else:
-                            flattened[domain][l2_key] = []
-        except Exception as exc:
-            log.warning(f"FNB_TAXONOMY_FLATTEN_ERROR | {exc}")
-        return flattened
+        """F&B taxonomy flattened to {food|beverages: {l2: [l3s]}} for prompt efficiency."""
+        return get_static_data().fnb_prompt
 
     def _get_personal_care_taxonomy(self) -> Dict[str, Any]:
-        """Load Personal Care taxonomy JSON if present."""
-        import os, json
-        try:
-            here = os.path.dirname(os.path.abspath(__file__))
-            path = os.path.join(here, "taxonomies", "personal_care.json")
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            # Embedded minimal fallback so taxonomy-dependent prompts still work
-            return {
-                "personal_care": {
-                    "skin": {
-                        "3_purifying_cleansers": {},
-                        "1_skin_hydrators": {},
-                        "11_uv_defense": {},
-                        "5_skin_toners": {},
-                        "2_active_serums": {}
-                    },
-                    "hair": {
-                        "17_hair_nurture": {
-                            "conditioner": {},
-                            "shampoo": {}
-                        }
-                    }
-                }
-            }
+        """Personal Care taxonomy (preloaded; embedded fallback when the JSON is absent)."""
+        return get_static_data().personal_care
 
     def _resolve_pc_paths(self, subcategory: Optional[str], taxonomy: Dict[str, Any]) -> List[str]:
         """Resolve up to 2 full personal_care category_paths from a subcategory token."""
@@ -6357,6 +6286,17 @@ Validation: q has product noun, no prices/brands in q, category_group valid, cat
             return {}
 
 
+_llm_service: Optional[LLMService] = None
+
+
+def get_llm_service() -> LLMService:
+    """Return a process-wide LLMService (its client is resolved per event loop)."""
+    global _llm_service
+    if _llm_service is None:
+        _llm_service = LLMService()
+    return _llm_service
+
+
 # ─────────────────────────────────────────────────────────────
 # Helper function
 # ─────────────────────────────────────────────────────────────
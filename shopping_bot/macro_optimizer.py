@@ -24,6 +24,8 @@ from typing import Dict, List, Any, Optional
 from pathlib import Path
 import logging
 
+from .llm_registry import on_reload
+
 log = logging.getLogger(__name__)
 
 
@@ -428,3 +430,11 @@ def get_macro_optimizer() -> MacroOptimizer:
         _optimizer = MacroOptimizer()
     return _optimizer
 
+
+def _reset_macro_optimizer() -> None:
+    """Drop the singleton so profiles are re-read on next use."""
+    global _optimizer
+    _optimizer = None
+
+
+on_reload(_reset_macro_optimizer)
@@ -11,6 +11,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Union, Optional
 from enum import Enum
 
+from .utils.tracked import TrackedDict
 from .enums import (
     QueryIntent, ResponseType, BackendFunction, UserSlot,
     UXIntentType, PSLType, EnhancedResponseType
@@ -25,10 +26,22 @@ class UserContext:
     session: Dict[str, Any] = field(default_factory=dict)
     fetched_data: Dict[str, Any] = field(default_factory=dict)
 
+    # Buckets are TrackedDicts so persistence can write only what changed
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _TRACKED_BUCKETS and not isinstance(value, TrackedDict):
+            value = TrackedDict(value or {})
+        object.__setattr__(self, name, value)
+
+    def is_dirty(self) -> bool:
+        return any(getattr(self, name).is_dirty() for name in _TRACKED_BUCKETS)
+
     def to_json(self) -> str:
         return json.dumps(asdict(self), default=str)
 
 
+_TRACKED_BUCKETS = ("permanent", "session", "fetched_data")
+
+
 @dataclass
 class RequirementAssessment:
     intent: QueryIntent
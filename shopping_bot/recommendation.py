@@ -32,10 +32,10 @@ from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 from enum import Enum
 
-import anthropic
+from anthropic import AsyncAnthropic
 
 from .config import get_config
-import os
+from .llm_registry import get_anthropic_client, get_static_data
 from .models import UserContext
 
 Cfg = get_config()
@@ -150,133 +150,23 @@ class ElasticsearchRecommendationEngine(BaseRecommendationEngine):
     """Primary recommendation engine using Elasticsearch parameter extraction"""
     
     def __init__(self):
-        # IMPORTANT: async client for awaitable calls
-        self._anthropic = anthropic.AsyncAnthropic(api_key=Cfg.ANTHROPIC_API_KEY)
         # Caching disabled for correctness-first behavior
         self._extraction_cache = None
         self._valid_categories = [
             "f_and_b", "health_nutrition", "personal_care", 
             "home_kitchen", "electronics"
         ]
-        # F&B taxonomy (provided)
-        self._fnb_taxonomy = {
-            "frozen_treats": [
-                "ice_cream_cakes_and_sandwiches",
-                "ice_cream_sticks",
-                "light_ice_cream",
-                "ice_cream_tubs",
-                "ice_cream_cups",
-                "ice_cream_cones",
-                "frozen_pop_cubes",
-                "kulfi"
-            ],
-            "light_bites": [
-                "energy_bars",
-                "nachos",
-                "chips_and_crisps",
-                "savory_namkeen",
-                "dry_fruit_and_nut_snacks",
-                "popcorn"
-            ],
-            "refreshing_beverages": [
-                "soda_and_mixers",
-                "flavored_milk_drinks",
-                "instant_beverage_mixes",
-                "fruit_juices",
-                "energy_and_non_alcoholic_drinks",
-                "soft_drinks",
-                "iced_coffee_and_tea",
-                "bottled_water",
-                "enhanced_hydration"
-            ],
-            "breakfast_essentials": [
-                "muesli_and_oats",
-                "dates_and_seeds",
-                "breakfast_cereals"
-            ],
-            "spreads_and_condiments": [
-                "ketchup_and_sauces",
-                "honey_and_spreads",
-                "peanut_butter",
-                "jams_and_jellies"
-            ],
-            "packaged_meals": [
-                "papads_pickles_and_chutneys",
-                "baby_food",
-                "pasta_and_soups",
-                "baking_mixes_and_ingredients",
-                "ready_to_cook_meals",
-                "ready_to_eat_meals"
-            ],
-            "brew_and_brew_alternatives": [
-                "iced_coffee_and_tea",
-                "green_and_herbal_tea",
-                "tea",
-                "beverage_mix",
-                "coffee"
-            ],
-            "dairy_and_bakery": [
-                "batter_and_mix",
-                "butter",
-                "paneer_and_cream",
-                "cheese",
-                "vegan_beverages",
-                "yogurt_and_shrikhand",
-                "curd_and_probiotic_drinks",
-                "bread_and_buns",
-                "eggs",
-                "milk",
-                "gourmet_specialties"
-            ],
-            "sweet_treats": [
-                "pastries_and_cakes",
-                "candies_gums_and_mints",
-                "chocolates",
-                "premium_chocolates",
-                "indian_mithai",
-                "dessert_mixes"
-            ],
-            "noodles_and_vermicelli": [
-                "vermicelli_and_noodles"
-            ],
-            "biscuits_and_crackers": [
-                "glucose_and_marie_biscuits",
-                "cream_filled_biscuits",
-                "rusks_and_khari",
-                "digestive_biscuits",
-                "wafer_biscuits",
-                "cookies",
-                "crackers"
-            ],
-            "frozen_foods": [
-                "non_veg_frozen_snacks",
-                "frozen_raw_meats",
-                "frozen_vegetables_and_pulp",
-                "frozen_vegetarian_snacks",
-                "frozen_sausages_salami_and_ham",
-                "momos_and_similar",
-                "frozen_roti_and_paratha"
-            ],
-            "dry_fruits_nuts_and_seeds": [
-                "almonds",
-                "cashews",
-                "raisins",
-                "pistachios",
-                "walnuts",
-                "dates",
-                "seeds"
-            ]
-        }
 
-        # Allow runtime override via env
-        try:
-            override = self._load_taxonomy_override()
-            if override:
-                self._fnb_taxonomy = override
-                log.info("FNB_TAXONOMY | loaded override from environment")
-        except Exception as exc:
-            log.warning(f"FNB_TAXONOMY_OVERRIDE_FAILED | {exc}")
-    
+    @property
+    def _anthropic(self) -> AsyncAnthropic:
+        # Shared async client bound to the running loop
+        return get_anthropic_client()
+
+    @property
+    def _fnb_taxonomy(self) -> Dict[str, List[str]]:
+        # F&B taxonomy (preloaded once per process; FNB_TAXONOMY_PATH/JSON overrides apply)
+        return get_static_data().fnb_l2
+
     def _normalize_dietary_term(self, term: str) -> List[str]:
         """Normalize a single dietary term to multiple possible variations"""
         term_lower = term.lower().strip()
@@ -1336,34 +1226,6 @@ Note: Brand dropped per rule
         except Exception:
             return {"q": (context.get("original_query") or "").strip(), "size": 20}
 
-    def _load_taxonomy_override(self) -> Optional[Dict[str, Any]]:
-        """Load F&B taxonomy override from env JSON or file path."""
-        path = os.getenv("FNB_TAXONOMY_PATH")
-        raw = os.getenv("FNB_TAXONOMY_JSON")
-        data: Optional[Dict[str, Any]] = None
-        if path and isinstance(path, str) and path.strip():
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception as e:
-                raise RuntimeError(f"Failed to load taxonomy file '{path}': {e}")
-        elif raw and isinstance(raw, str) and raw.strip():
-            try:
-                data = json.loads(raw)
-            except Exception as e:
-                raise RuntimeError(f"Failed to parse FNB_TAXONOMY_JSON: {e}")
-
-        if data is None:
-            return None
-
-        # Basic validation
-        if not isinstance(data, dict):
-            raise ValueError("Taxonomy override must be a JSON object mapping category → list[subcategories]")
-        for k, v in data.items():
-            if not isinstance(k, str) or not isinstance(v, list):
-                raise ValueError("Invalid taxonomy format: keys must be strings and values must be lists")
-        return data
-
     def _get_current_user_text(self, ctx: UserContext) -> str:
         """Best-effort extraction of the current turn's user text for delta-aware caching and prompts."""
         for attr in [
@@ -1623,8 +1485,8 @@ class RecommendationService:
         if getattr(cfg, "USE_TWO_CALL_ES_PIPELINE", False):
             # Two-call pipeline: delegate ES planning to LLMService once
             try:
-                from .llm_service import LLMService  # lazy import
-                llm = LLMService()
+                from .llm_service import get_llm_service  # lazy import
+                llm = get_llm_service()
                 # Read current text and product_intent from session
                 product_intent = str(ctx.session.get("product_intent") or "show_me_options")
                 plan = await llm.plan_es_search(ctx.session.get("current_user_text") or ctx.session.get("last_user_message") or "", ctx, product_intent=product_intent)
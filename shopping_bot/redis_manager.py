@@ -17,19 +17,147 @@ import json
 import logging
 import time
 import hashlib
+from collections import OrderedDict
 from datetime import timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import redis
-from redis.exceptions import RedisError, ConnectionError, TimeoutError
+from redis.exceptions import RedisError, ConnectionError, ResponseError, TimeoutError, WatchError
 
 from .config import get_config
 from .models import UserContext
+from .utils import codec
+from .utils.metrics import timed
+from .utils.tracing import TRACE, get_tracer
+from .utils.tracked import HistoryList, TrackedDict
 
 log = logging.getLogger(__name__)
+_trace = get_tracer(__name__)
 Cfg = get_config()
 
 
+# ────────────────────────────────────────────────────────
+# Key layout
+# ────────────────────────────────────────────────────────
+# Every bucket is a hash with one codec-encoded field (utils/codec.py) per
+# top-level key, so a save only
+# writes the fields that changed (see utils/tracked.py). Session keys share a
+# {session_id} hash tag so they land in one cluster slot and can be
+# written/read together:
+#
+#   user:<uid>:permanent              hash   permanent bucket (no TTL)
+#   session:{sid}                     hash   session bucket
+#   session:{sid}:fetched             hash   fetcher results, one field per fetcher
+#   session:{sid}:list:<name>         list   append-only histories (RPUSH + LTRIM)
+#   session:{sid}:blobs               hash   large values stored once, by content id
+
+# Session fields kept as capped Redis lists instead of hash fields
+LIST_FIELDS = ("conversation_history", "history")
+
+# session field -> sub-key stored as a blob and referenced as {"$blob": id}
+BLOB_FIELDS = {"last_recommendation": "products"}
+BLOB_REF = "$blob"
+
+def permanent_key(user_id: str) -> str:
+    return f"user:{user_id}:permanent"
+
+
+def session_key(session_id: str) -> str:
+    return f"session:{{{session_id}}}"
+
+
+def fetched_key(session_id: str) -> str:
+    return f"session:{{{session_id}}}:fetched"
+
+
+def list_key(session_id: str, name: str) -> str:
+    return f"session:{{{session_id}}}:list:{name}"
+
+
+def blobs_key(session_id: str) -> str:
+    return f"session:{{{session_id}}}:blobs"
+
+
+def _session_keys(session_id: str) -> List[str]:
+    return [
+        session_key(session_id),
+        fetched_key(session_id),
+        blobs_key(session_id),
+        *(list_key(session_id, name) for name in LIST_FIELDS),
+    ]
+
+
+def _legacy_session_keys(session_id: str) -> tuple[str, str]:
+    # Pre-hash-tag layout; read as a fallback until those keys have expired
+    return f"session:{session_id}", f"session:{session_id}:fetched"
+
+
+def _decode_json(raw: Any, default: Any) -> Any:
+    if raw is None:
+        return default
+    try:
+        return codec.decode(raw)
+    except (TypeError, ValueError):
+        return default
+
+
+def _binary_client(client: redis.Redis) -> redis.Redis:
+    """Same server/pool settings as `client` but returning bytes (codec payloads are binary)."""
+    pool = client.connection_pool
+    kwargs = dict(pool.connection_kwargs)
+    if not kwargs.get("decode_responses"):
+        return client
+    kwargs["decode_responses"] = False
+    return redis.Redis(connection_pool=pool.__class__(
+        connection_class=pool.connection_class,
+        max_connections=pool.max_connections,
+        **kwargs,
+    ))
+
+
+def _decode_hash(raw: Optional[Dict[Any, Any]]) -> Dict[str, Any]:
+    return _decode_bucket(raw)[0]
+
+
+def _decode_bucket(raw: Optional[Dict[Any, Any]]) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """HGETALL reply -> (decoded fields, stored payload per field for change detection)."""
+    data: Dict[str, Any] = {}
+    baseline: Dict[str, bytes] = {}
+    for field, value in (raw or {}).items():
+        name = field.decode() if isinstance(field, bytes) else str(field)
+        data[name] = _decode_json(value, None)
+        baseline[name] = value
+    return data, baseline
+
+
+def _encode_field(name: str, value: Any, blobs: Dict[str, bytes], encode: Callable[[Any], bytes] = codec.encode) -> bytes:
+    """Payload for one session field; BLOB_FIELDS values go to `blobs` and are referenced by id."""
+    sub = BLOB_FIELDS.get(name)
+    if sub and isinstance(value, dict) and value.get(sub):
+        payload = encode(value[sub])
+        blob_id = hashlib.sha1(payload).hexdigest()[:20]
+        blobs[blob_id] = payload
+        value = {**value, sub: {BLOB_REF: blob_id}}
+    return encode(value)
+
+
+def _blob_ref(name: str, raw: Optional[bytes]) -> Optional[str]:
+    sub = BLOB_FIELDS.get(name)
+    if not sub or not raw:
+        return None
+    value = _decode_json(raw, None)
+    ref = value.get(sub) if isinstance(value, dict) else None
+    return ref.get(BLOB_REF) if isinstance(ref, dict) else None
+
+
+def _resolve_blobs(session: Dict[str, Any], blobs: Dict[str, Any]) -> None:
+    for name, sub in BLOB_FIELDS.items():
+        value = session.get(name)
+        ref = value.get(sub) if isinstance(value, dict) else None
+        if isinstance(ref, dict) and BLOB_REF in ref:
+            value[sub] = blobs.get(ref[BLOB_REF]) or []
+
+
 class RedisContextManager:
     """
     Enhanced Redis context manager with atomic operations and race condition prevention.
@@ -46,18 +174,21 @@ class RedisContextManager:
             retry_on_timeout=True,
             health_check_interval=30
         )
+        # Codec payloads are binary; `redis` keeps the configured decode_responses for other callers
+        self.raw: redis.Redis = _binary_client(self.redis)
         self.ttl = timedelta(seconds=Cfg.REDIS_TTL_SECONDS)
-        
-        # FIX: Debouncing to prevent duplicate writes
-        self._last_save_hash = {}  # user_session -> (hash, timestamp)
-        self._debounce_window = 1.0  # seconds
-        
+        # session_id -> last save's encode cost (bounded; reported by get_diagnostics)
+        self._save_stats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.history_cap = max(0, int(Cfg.HISTORY_MAX_SNAPSHOTS))
+
         # Connection health tracking
         self._connection_healthy = True
         self._last_health_check = 0
 
     def _check_connection_health(self) -> bool:
-        """Check Redis connection health with caching."""
+        """Cheap gate for the hot path: only pings after a failure (at most every 30s)."""
+        if self._connection_healthy:
+            return True
         now = time.time()
         if now - self._last_health_check < 30:  # Cache for 30 seconds
             return self._connection_healthy
@@ -73,63 +204,18 @@ class RedisContextManager:
             self._last_health_check = now
             return False
 
-    def _generate_context_hash(self, ctx: UserContext) -> str:
-        """Generate hash of context to detect changes."""
-        try:
-            content = {
-                "permanent": ctx.permanent,
-                "session": ctx.session,
-                "fetched_data": ctx.fetched_data
-            }
-            content_str = json.dumps(content, sort_keys=True, default=str)
-            return hashlib.md5(content_str.encode()).hexdigest()
-        except Exception as e:
-            log.warning(f"HASH_GENERATION_ERROR | user={ctx.user_id} | error={e}")
-            return str(time.time())  # Fallback to timestamp
-
-    def _should_skip_save(self, ctx: UserContext) -> bool:
-        """
-        FIX: Check if we should skip this save operation to prevent duplicate writes.
-        Addresses issue #7 from diagnostic.
-        """
-        try:
-            user_session_key = f"{ctx.user_id}:{ctx.session_id}"
-            current_hash = self._generate_context_hash(ctx)
-            now = time.time()
-            
-            if user_session_key in self._last_save_hash:
-                last_hash, last_timestamp = self._last_save_hash[user_session_key]
-                
-                # Skip if same hash within debounce window
-                if (last_hash == current_hash and 
-                    now - last_timestamp < self._debounce_window):
-                    log.debug(f"SAVE_DEBOUNCED | user={ctx.user_id} | session={ctx.session_id}")
-                    return True
-                    
-            # Update tracking
-            self._last_save_hash[user_session_key] = (current_hash, now)
-            
-            # Cleanup old entries (keep last 100)
-            if len(self._last_save_hash) > 100:
-                sorted_items = sorted(
-                    self._last_save_hash.items(), 
-                    key=lambda x: x[1][1]  # Sort by timestamp
-                )
-                self._last_save_hash = dict(sorted_items[-50:])  # Keep newest 50
-                
-            return False
-            
-        except Exception as e:
-            log.warning(f"DEBOUNCE_CHECK_ERROR | user={ctx.user_id} | error={e}")
-            return False
+    def _mark_unhealthy(self) -> None:
+        self._connection_healthy = False
+        self._last_health_check = time.time()
 
     # ────────────────────────────────────────────────────────
     # Enhanced public API with atomic operations
     # ────────────────────────────────────────────────────────
 
+    @timed("redis.load")
     def get_context(self, user_id: str, session_id: str) -> UserContext:
         """
-        Enhanced context loading with retry logic and error handling.
+        Load permanent, session and fetched buckets in a single pipelined round trip.
         """
         if not self._check_connection_health():
             log.error(f"CONTEXT_LOAD_UNHEALTHY | user={user_id} | session={session_id}")
@@ -145,10 +231,7 @@ class RedisContextManager:
         try:
             log.debug(f"CONTEXT_LOAD_START | user={user_id} | session={session_id}")
             
-            # Load all three buckets with error handling
-            permanent = self._get_json_with_retry(f"user:{user_id}:permanent", default={})
-            session = self._get_json_with_retry(f"session:{session_id}", default={})
-            fetched = self._get_json_with_retry(f"session:{session_id}:fetched", default={})
+            permanent, session, fetched = self._load_buckets(user_id, session_id)
 
             ctx = UserContext(
                 user_id=user_id,
@@ -158,34 +241,12 @@ class RedisContextManager:
                 fetched_data=fetched,
             )
             
-            log.info(f"💾 REDIS_LOAD | user={user_id} | session={session_id} | permanent_keys={list(permanent.keys())} | session_keys={list(session.keys())} | fetched_keys={list(fetched.keys())}")
-            log.info(f"💾 REDIS_LOAD_SIZES | p={len(permanent)} | s={len(session)} | f={len(fetched)} | conv_turns={len((session or {}).get('conversation_history', []))} | last_rec_exists={bool((session or {}).get('last_recommendation'))}")
-            
-            try:
-                # Log last_recommendation detail
-                last_rec = (session or {}).get("last_recommendation", {})
-                if last_rec:
-                    log.info(f"🧠 REDIS_LAST_REC | query='{last_rec.get('query', '')[:60]}' | products={len(last_rec.get('products', []))} | as_of={last_rec.get('as_of', 'N/A')}")
-                else:
-                    log.info(f"🧠 REDIS_LAST_REC | EMPTY (no last_recommendation in session)")
-                
-                # Log conversation history detail
-                print(f"CORE:REDIS_LOAD | session={session_id} | p={len(permanent)} | s={len(session)} | f={len(fetched)} | ch={len((session or {}).get('conversation_history', []))}")
-                ch_list = (session or {}).get('conversation_history') or []
-                log.info(f"🧠 REDIS_CONV_HIST | turns={len(ch_list)}")
-                if isinstance(ch_list, list) and 0 < len(ch_list) <= 5:
-                    preview = [
-                        {
-                            "i": idx + 1,
-                            "user": str((h or {}).get("user_query", ""))[:80],
-                            "bot": str((((h or {}).get("final_answer", {}) or {}).get("message_preview") or (h or {}).get("bot_reply") or ""))[:100],
-                        }
-                        for idx, h in enumerate(ch_list)
-                    ]
-                    print(f"CORE:REDIS_CONVO_DUMP | session={session_id} | {json.dumps(preview, ensure_ascii=False)}")
-                    log.info(f"🧠 REDIS_CONV_PREVIEW | last_3={preview[-3:]}")
-            except Exception:
-                pass
+            _trace.debug(
+                "REDIS_LOAD | user=%s | session=%s | p=%d | s=%d | f=%d",
+                user_id, session_id, len(permanent), len(session), len(fetched),
+            )
+            if _trace.enabled(TRACE):
+                self._trace_context_detail("REDIS_LOAD", session_id, session)
             return ctx
             
         except Exception as e:
@@ -199,165 +260,343 @@ class RedisContextManager:
                 fetched_data={}
             )
 
+    def _load_buckets(self, user_id: str, session_id: str, *, max_retries: int = 3) -> tuple[TrackedDict, TrackedDict, TrackedDict]:
+        p_key, s_key = permanent_key(user_id), session_key(session_id)
+        legacy_session, legacy_fetched = _legacy_session_keys(session_id)
+        for attempt in range(max_retries):
+            try:
+                pipe = self.raw.pipeline(transaction=False)
+                pipe.hgetall(p_key)
+                pipe.hgetall(s_key)
+                pipe.hgetall(fetched_key(session_id))
+                for name in LIST_FIELDS:
+                    pipe.lrange(list_key(session_id, name), 0, -1)
+                pipe.hgetall(blobs_key(session_id))
+                pipe.get(legacy_session)
+                pipe.get(legacy_fetched)
+                reads = len(pipe)
+                # Sliding TTL: a read-only turn keeps the session alive without a save
+                if self.ttl:
+                    for key in _session_keys(session_id):
+                        pipe.expire(key, int(self.ttl.total_seconds()))
+                # WRONGTYPE replies mark buckets still stored as one JSON string
+                results = pipe.execute(raise_on_error=False)[:reads]
+                break
+            except (ConnectionError, TimeoutError) as ce:
+                log.warning(f"REDIS_LOAD_CONNECTION_ERROR | session={session_id} | attempt={attempt + 1} | error={ce}")
+                if attempt == max_retries - 1:
+                    self._mark_unhealthy()
+                    raise
+                time.sleep(0.1 * (attempt + 1))  # Exponential backoff
+
+        raw_perm, raw_session, raw_fetched = results[:3]
+        raw_lists = results[3:3 + len(LIST_FIELDS)]
+        raw_blobs, raw_legacy_session, raw_legacy_fetched = results[3 + len(LIST_FIELDS):]
+        string_keys = [key for key, raw in ((p_key, raw_perm), (s_key, raw_session)) if isinstance(raw, ResponseError)]
+        for raw in results:
+            if isinstance(raw, ResponseError) and "WRONGTYPE" not in str(raw):
+                raise raw
+        strings: Dict[str, Any] = {}
+        if string_keys:
+            pipe = self.raw.pipeline(transaction=False)
+            for key in string_keys:
+                pipe.get(key)
+            strings = dict(zip(string_keys, pipe.execute()))
+
+        if p_key in strings:
+            permanent = TrackedDict(_decode_json(strings[p_key], {}) or {})
+        else:
+            permanent = TrackedDict.loaded(*_decode_bucket(raw_perm))
+
+        if s_key in strings or (not raw_session and not any(raw_lists) and raw_legacy_session is not None):
+            # Whole-document layout: load it and rewrite it as fields on the next save
+            raw_doc = strings[s_key] if s_key in strings else raw_legacy_session
+            session = TrackedDict(_decode_json(raw_doc, {}) or {})
+            if raw_legacy_session is not None and s_key not in strings and not raw_fetched:
+                fetched = TrackedDict(_decode_json(raw_legacy_fetched, {}) or {})
+            else:
+                fetched = TrackedDict.loaded(*_decode_bucket(raw_fetched))
+            return permanent, session, fetched
+
+        data, baseline = _decode_bucket(raw_session)
+        for name, items in zip(LIST_FIELDS, raw_lists):
+            if items:
+                data[name] = HistoryList(_decode_json(item, None) for item in items)
+        _resolve_blobs(data, _decode_hash(raw_blobs))
+        session = TrackedDict.loaded(data, baseline)
+        fetched = TrackedDict.loaded(*_decode_bucket(raw_fetched))
+        return permanent, session, fetched
+
+    @staticmethod
+    def _trace_context_detail(event: str, session_id: str, session: Dict[str, Any]) -> None:
+        """Last-recommendation and conversation previews (TRACE level only)."""
+        try:
+            session = session or {}
+            last_rec = session.get("last_recommendation") or {}
+            _trace.trace(
+                "%s_LAST_REC | session=%s | query=%r | products=%d | as_of=%s",
+                event,
+                session_id,
+                str(last_rec.get("query", ""))[:60],
+                len(last_rec.get("products", []) or []),
+                last_rec.get("as_of", "N/A"),
+            )
+            ch_list = session.get("conversation_history") or []
+            if isinstance(ch_list, list) and ch_list:
+                preview = [
+                    {
+                        "i": idx + 1,
+                        "user": str((h or {}).get("user_query", ""))[:80],
+                        "bot": str((((h or {}).get("final_answer", {}) or {}).get("message_preview") or (h or {}).get("bot_reply") or ""))[:100],
+                    }
+                    for idx, h in enumerate(ch_list[-3:], start=max(0, len(ch_list) - 3))
+                ]
+                _trace.trace(
+                    lambda: f"{event}_CONV_PREVIEW | session={session_id} | turns={len(ch_list)} | last_3={json.dumps(preview, ensure_ascii=False)}"
+                )
+        except Exception:
+            pass
+
+    @timed("redis.save")
     def save_context(self, ctx: UserContext) -> bool:
-        """Enhanced context saving with Redis Cluster compatibility."""
+        """Write the fields that changed since load (or the last save) in one pipeline."""
         try:
-            # FIX: Check if we should skip this save
-            if self._should_skip_save(ctx):
+            if not ctx.is_dirty():
+                log.debug(f"SAVE_SKIPPED_CLEAN | user={ctx.user_id} | session={ctx.session_id}")
                 return True
 
             if not self._check_connection_health():
                 log.error(f"CONTEXT_SAVE_UNHEALTHY | user={ctx.user_id} | session={ctx.session_id}")
                 return False
 
-            log.info(f"💾 REDIS_SAVE_START | user={ctx.user_id} | session={ctx.session_id}")
-            log.info(f"💾 REDIS_SAVE_SIZES | p={len(ctx.permanent)} | s={len(ctx.session)} | f={len(ctx.fetched_data)} | conv_turns={len((ctx.session or {}).get('conversation_history', []))} | last_rec_exists={bool((ctx.session or {}).get('last_recommendation'))}")
-            
-            try:
-                # Log last_recommendation being saved
-                last_rec = (ctx.session or {}).get("last_recommendation", {})
-                if last_rec:
-                    log.info(f"🧠 REDIS_SAVE_LAST_REC | query='{last_rec.get('query', '')[:60]}' | products={len(last_rec.get('products', []))} | as_of={last_rec.get('as_of', 'N/A')}")
-                else:
-                    log.info(f"🧠 REDIS_SAVE_LAST_REC | EMPTY (no last_recommendation to save)")
-                
-                print(f"CORE:REDIS_SAVE | session={ctx.session_id} | p={len(ctx.permanent)} | s={len(ctx.session)} | f={len(ctx.fetched_data)} | ch={len((ctx.session or {}).get('conversation_history', []))}")
-                ch_list = (ctx.session or {}).get('conversation_history') or []
-                if isinstance(ch_list, list) and 0 < len(ch_list) <= 5:
-                    preview = [
-                        {
-                            "i": idx + 1,
-                            "user": str((h or {}).get("user_query", ""))[:80],
-                            "bot": str((((h or {}).get("final_answer", {}) or {}).get("message_preview") or (h or {}).get("bot_reply") or ""))[:100],
-                        }
-                        for idx, h in enumerate(ch_list)
-                    ]
-                    print(f"CORE:REDIS_CONVO_DUMP_SAVE | session={ctx.session_id} | {json.dumps(preview, ensure_ascii=False)}")
-                    log.info(f"🧠 REDIS_SAVE_CONV_PREVIEW | last_3={preview[-3:]}")
-            except Exception:
-                pass
-
-            # FIX: For Redis Cluster, save keys individually instead of pipeline
+            _trace.debug(
+                "REDIS_SAVE | user=%s | session=%s | p=%d | s=%d | f=%d",
+                ctx.user_id, ctx.session_id, len(ctx.permanent), len(ctx.session), len(ctx.fetched_data),
+            )
+            if _trace.enabled(TRACE):
+                self._trace_context_detail("REDIS_SAVE", ctx.session_id, ctx.session)
+
             try:
-                # Check if this is a Redis Cluster
-                if hasattr(self.redis, 'cluster_nodes') or 'cluster' in str(type(self.redis)).lower():
-                    return self._save_context_cluster_safe(ctx)
-                else:
-                    return self._save_context_pipeline(ctx)
-            except Exception as e:
-                # Fallback to individual operations if pipeline fails
-                log.warning(f"PIPELINE_FAILED | user={ctx.user_id} | error={e} | falling_back")
-                return self._save_context_cluster_safe(ctx)
+                return self._save_context_pipeline(ctx)
+            except (ConnectionError, TimeoutError) as e:
+                log.error(f"CONTEXT_SAVE_CONNECTION_ERROR | user={ctx.user_id} | session={ctx.session_id} | error={e}")
+                self._mark_unhealthy()
+                return False
 
         except Exception as e:
             log.error(f"CONTEXT_SAVE_ERROR | user={ctx.user_id} | session={ctx.session_id} | error={e}", exc_info=True)
             return False
 
     def _save_context_pipeline(self, ctx: UserContext) -> bool:
-        """Pipeline version for single Redis instance"""
-        with self.redis.pipeline() as pipe:
-            # Your existing pipeline code here
-            permanent_key = f"user:{ctx.user_id}:permanent"
-            session_key = f"session:{ctx.session_id}"
-            fetched_key = f"session:{ctx.session_id}:fetched"
-            
-            pipe.set(permanent_key, json.dumps(ctx.permanent))
-            
-            if self.ttl:
-                pipe.setex(session_key, int(self.ttl.total_seconds()), json.dumps(ctx.session))
-                pipe.setex(fetched_key, int(self.ttl.total_seconds()), json.dumps(ctx.fetched_data))
-            else:
-                pipe.set(session_key, json.dumps(ctx.session))
-                pipe.set(fetched_key, json.dumps(ctx.fetched_data))
-            
-            results = pipe.execute()
-            return all(results)
+        """Queue per-bucket deltas on one non-transactional pipeline (cluster-safe) and execute once."""
+        sid = ctx.session_id
+        pipe = self.raw.pipeline(transaction=False)
+        blobs: Dict[str, bytes] = {}
+        sizes: List[int] = []
+
+        def encode(value: Any) -> bytes:
+            payload = codec.encode(value)
+            sizes.append(len(payload))
+            return payload
+
+        t0 = time.perf_counter()
+        written = {
+            "permanent": self._queue_bucket(pipe, permanent_key(ctx.user_id), ctx.permanent, encode=lambda _n, v: encode(v)),
+            "session": self._queue_bucket(pipe, session_key(sid), ctx.session, skip=LIST_FIELDS,
+                                          encode=lambda name, value: _encode_field(name, value, blobs, encode)),
+            "fetched_data": self._queue_bucket(pipe, fetched_key(sid), ctx.fetched_data, encode=lambda _n, v: encode(v)),
+        }
+        self._queue_blobs(pipe, sid, ctx.session, written["session"], blobs)
+        if ctx.session.replaced:
+            for key in _legacy_session_keys(sid):
+                pipe.delete(key)
+        for name in LIST_FIELDS:
+            self._queue_list(pipe, sid, name, ctx.session, encode)
+        self._record_save(sid, (time.perf_counter() - t0) * 1000, sizes, written)
+
+        if len(pipe) == 0:
+            for name in written:
+                getattr(ctx, name).mark_clean()
+            return True
+        if self.ttl:
+            ttl = int(self.ttl.total_seconds())
+            for key in _session_keys(sid):
+                pipe.expire(key, ttl)
+        pipe.execute()
+
+        for name, fields in written.items():
+            bucket = getattr(ctx, name)
+            baseline = {} if bucket.replaced else dict(bucket.baseline)
+            for field in bucket.deleted:
+                baseline.pop(field, None)
+            baseline.update(fields)
+            bucket.mark_clean(baseline)
+        _trace.debug(
+            lambda: f"REDIS_SAVE_DELTA | session={sid} | commands={len(pipe)} | "
+            + " | ".join(f"{name}={sorted(fields)}" for name, fields in written.items())
+        )
+        return True
+
+    @staticmethod
+    def _queue_bucket(
+        pipe: Any,
+        key: str,
+        bucket: TrackedDict,
+        *,
+        skip: Tuple[str, ...] = (),
+        encode: Optional[Callable[[str, Any], bytes]] = None,
+    ) -> Dict[str, bytes]:
+        """Queue HSET/HDEL for changed fields of `bucket`; returns the payload written per field."""
+        encode = encode or (lambda _name, value: codec.encode(value))
+        if bucket.replaced:
+            pipe.delete(key)
+            candidates = set(dict.keys(bucket))
+        else:
+            candidates = bucket.dirty | bucket.touched
+            deleted = [f for f in bucket.deleted if f not in skip]
+            if deleted:
+                pipe.hdel(key, *deleted)
+        mapping: Dict[str, bytes] = {}
+        for field in candidates:
+            if field in skip or field not in bucket:
+                continue
+            raw = encode(field, dict.__getitem__(bucket, field))
+            if bucket.replaced or field in bucket.dirty or raw != bucket.baseline.get(field):
+                mapping[field] = raw
+        if mapping:
+            pipe.hset(key, mapping=mapping)
+        return mapping
+
+    @staticmethod
+    def _queue_blobs(pipe: Any, session_id: str, session: TrackedDict, written: Dict[str, bytes], blobs: Dict[str, bytes]) -> None:
+        """Store new blob payloads once and drop the ones no longer referenced."""
+        b_key = blobs_key(session_id)
+        if session.replaced:
+            pipe.delete(b_key)
+        for name in BLOB_FIELDS:
+            old = None if session.replaced else _blob_ref(name, session.baseline.get(name))
+            if name not in written and name not in session.deleted:
+                continue
+            new = _blob_ref(name, written.get(name))
+            if new and new != old:
+                pipe.hsetnx(b_key, new, blobs[new])
+            if old and old != new:
+                pipe.hdel(b_key, old)
+
+    def _queue_list(self, pipe: Any, session_id: str, name: str, session: TrackedDict, encode: Callable[[Any], bytes] = codec.encode) -> None:
+        """Append-only histories: RPUSH the new entries and LTRIM to the cap, else rewrite."""
+        key = list_key(session_id, name)
+        value = dict.get(session, name)
+        if value is None:
+            if session.replaced or name in session.deleted:
+                pipe.delete(key)
+            return
+        items = value if isinstance(value, list) else []
+        keep = min(len(items), self.history_cap) if self.history_cap else len(items)
+        incremental = isinstance(value, HistoryList) and not (
+            session.replaced or value.rewritten or name in session.dirty
+        )
+        if incremental:
+            if not value.is_dirty():
+                return
+            new = value.new_items()
+            if new:
+                pipe.rpush(key, *(encode(item) for item in new))
+        else:
+            if not isinstance(value, HistoryList):
+                # Track appends from here on
+                dict.__setitem__(session, name, HistoryList(items))
+            pipe.delete(key)
+            if items:
+                pipe.rpush(key, *(encode(item) for item in items[-keep:]))
+        if keep:
+            pipe.ltrim(key, -keep, -1)
+        else:
+            pipe.delete(key)
+
+    def _record_save(self, session_id: str, encode_ms: float, sizes: List[int], written: Dict[str, Dict[str, bytes]]) -> None:
+        self._save_stats[session_id] = {
+            "at": time.time(),
+            "encode_ms": round(encode_ms, 3),
+            "values_encoded": len(sizes),
+            "bytes_encoded": sum(sizes),
+            "fields_written": sum(len(fields) for fields in written.values()),
+        }
+        self._save_stats.move_to_end(session_id)
+        while len(self._save_stats) > 256:
+            self._save_stats.popitem(last=False)
+
+    def merge_fetched_data(self, session_id: str, new_data: Dict[str, Any]) -> bool:
+        """
+        Merge fetcher results into session:{id}:fetched without a read.
 
-    def _save_context_cluster_safe(self, ctx: UserContext) -> bool:
-        """Cluster-safe version using individual operations"""
+        Each top-level key is its own hash field, so concurrent fetchers never
+        overwrite each other and the write is one atomic HSET (+ EXPIRE).
+        """
+        if not new_data:
+            return True
         try:
-            # Save each key individually for Redis Cluster compatibility
-            permanent_key = f"user:{ctx.user_id}:permanent"
-            session_key = f"session:{ctx.session_id}"
-            fetched_key = f"session:{ctx.session_id}:fetched"
-            
-            # Permanent data (no TTL)
-            result1 = self.redis.set(permanent_key, json.dumps(ctx.permanent))
-            
-            # Session data (with TTL)
+            f_key = fetched_key(session_id)
+            pipe = self.raw.pipeline(transaction=False)
+            pipe.hset(f_key, mapping={k: codec.encode(v) for k, v in new_data.items()})
             if self.ttl:
-                result2 = self.redis.setex(session_key, int(self.ttl.total_seconds()), json.dumps(ctx.session))
-                result3 = self.redis.setex(fetched_key, int(self.ttl.total_seconds()), json.dumps(ctx.fetched_data))
-            else:
-                result2 = self.redis.set(session_key, json.dumps(ctx.session))
-                result3 = self.redis.set(fetched_key, json.dumps(ctx.fetched_data))
-            
-            success = all([result1, result2, result3])
-            if success:
-                log.info(f"CONTEXT_SAVED_CLUSTER | user={ctx.user_id} | session={ctx.session_id}")
-            
-            return success
-            
+                pipe.expire(f_key, int(self.ttl.total_seconds()))
+            pipe.execute()
+            log.debug(f"MERGE_FETCHED_SUCCESS | session={session_id} | keys={list(new_data.keys())}")
+            return True
         except Exception as e:
-            log.error(f"CLUSTER_SAVE_ERROR | user={ctx.user_id} | error={e}")
+            log.error(f"MERGE_FETCHED_ERROR | session={session_id} | error={e}", exc_info=True)
             return False
 
-    def merge_fetched_data(self, session_id: str, new_data: Dict[str, Any]) -> bool:
-        """
-        FIX: Merge new fetched data without overwriting existing data.
-        Addresses issue #4 from diagnostic - fetchers not saving to session:*:fetched.
-        """
+    def get_permanent(self, user_id: str) -> Dict[str, Any]:
+        """Read the permanent profile outside a full context load."""
+        key = permanent_key(user_id)
         try:
-            fetched_key = f"session:{session_id}:fetched"
-            log.info(f"MERGE_FETCHED_START | session={session_id} | new_keys={list(new_data.keys())}")
-            
-            # FIX: Use atomic merge operation
-            with self.redis.pipeline() as pipe:
-                while True:
-                    try:
-                        # Watch the key for changes
-                        pipe.watch(fetched_key)
-                        
-                        # Get current data
-                        current_data = self._get_json(fetched_key, default={})
-                        
-                        # Merge new data
-                        merged_data = dict(current_data)
-                        for key, value in new_data.items():
-                            if isinstance(value, dict) and key in merged_data and isinstance(merged_data[key], dict):
-                                # Deep merge for dict values
-                                merged_data[key] = {**merged_data[key], **value}
-                            else:
-                                # Simple overwrite for other types
-                                merged_data[key] = value
-                        
-                        # Start pipeline
-                        pipe.multi()
-                        
-                        # Set merged data with TTL
-                        if self.ttl:
-                            pipe.setex(fetched_key, int(self.ttl.total_seconds()), json.dumps(merged_data))
-                        else:
-                            pipe.set(fetched_key, json.dumps(merged_data))
-                        
-                        # Execute atomically
-                        pipe.execute()
-                        
-                        log.info(f"MERGE_FETCHED_SUCCESS | session={session_id} | merged_keys={list(merged_data.keys())}")
-                        return True
-                        
-                    except redis.WatchError:
-                        # Retry if key was modified during our operation
-                        log.debug(f"MERGE_FETCHED_RETRY | session={session_id}")
-                        continue
-                    except Exception as e:
-                        log.error(f"MERGE_FETCHED_ERROR | session={session_id} | error={e}")
-                        return False
-                        
+            return _decode_hash(self.raw.hgetall(key))
+        except ResponseError:
+            # Still stored as one JSON document (rewritten as a hash on next context save)
+            return self._get_json(key, default={}) or {}
+        except RedisError as e:
+            log.error(f"PERMANENT_GET_ERROR | user={user_id} | error={e}")
+            return {}
+
+    def merge_permanent(self, user_id: str, fields: Dict[str, Any]) -> bool:
+        """HSET top-level profile fields without touching the rest of the profile."""
+        if not fields:
+            return True
+        key = permanent_key(user_id)
+        try:
+            try:
+                # Field-level HSET is atomic; only the legacy string layout needs a read
+                self.raw.hset(key, mapping={k: codec.encode(v) for k, v in fields.items()})
+                return True
+            except ResponseError as e:
+                if "WRONGTYPE" not in str(e):
+                    raise
+            self._migrate_permanent(key, fields)
+            return True
         except Exception as e:
-            log.error(f"MERGE_FETCHED_OUTER_ERROR | session={session_id} | error={e}", exc_info=True)
+            log.error(f"PERMANENT_MERGE_ERROR | user={user_id} | error={e}", exc_info=True)
             return False
 
+    def _migrate_permanent(self, key: str, fields: Dict[str, Any], *, max_retries: int = 10) -> None:
+        """Rewrite a whole-document profile as a hash plus `fields`, under WATCH (single key, cluster-safe)."""
+        with self.raw.pipeline() as pipe:
+            for _ in range(max_retries):
+                try:
+                    pipe.watch(key)
+                    legacy = pipe.type(key) == b"string"
+                    merged = {**(_decode_json(pipe.get(key), {}) or {}), **fields} if legacy else fields
+                    pipe.multi()
+                    if legacy:  # someone else may have migrated it already; then only HSET
+                        pipe.delete(key)
+                    pipe.hset(key, mapping={k: codec.encode(v) for k, v in merged.items()})
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+        raise WatchError(f"permanent profile {key} kept changing during migration")
+
     def delete_session(self, session_id: str) -> bool:
         """
         Enhanced session deletion with atomic operations and logging.
@@ -366,12 +605,12 @@ class RedisContextManager:
             log.info(f"SESSION_DELETE_START | session={session_id}")
             
             keys_to_delete = [
-                f"session:{session_id}",
-                f"session:{session_id}:fetched"
+                *_session_keys(session_id),
+                *_legacy_session_keys(session_id),
             ]
             
-            # FIX: Use pipeline for atomic deletion
-            with self.redis.pipeline() as pipe:
+            # Legacy keys have no {session_id} hash tag, so no MULTI (CROSSSLOT on cluster)
+            with self.raw.pipeline(transaction=False) as pipe:
                 for key in keys_to_delete:
                     pipe.delete(key)
                 results = pipe.execute()
@@ -394,19 +633,23 @@ class RedisContextManager:
         """
         for attempt in range(max_retries):
             try:
-                raw = self.redis.get(key)
+                raw = self.raw.get(key)
                 if raw is None:
                     log.debug(f"REDIS_GET_NONE | key={key} | attempt={attempt + 1}")
                     return default
                     
                 try:
-                    result = json.loads(raw)
+                    result = codec.decode(raw)
                     log.debug(f"REDIS_GET_SUCCESS | key={key} | size={len(raw)} | attempt={attempt + 1}")
                     return result
-                except json.JSONDecodeError as je:
-                    log.warning(f"REDIS_GET_JSON_ERROR | key={key} | attempt={attempt + 1} | error={je}")
+                except codec.UnsupportedPayload as ue:
+                    # Written by a newer/differently-built worker; leave it for them
+                    log.warning(f"REDIS_GET_UNSUPPORTED_PAYLOAD | key={key} | error={ue}")
+                    return default
+                except ValueError as je:
+                    log.warning(f"REDIS_GET_DECODE_ERROR | key={key} | attempt={attempt + 1} | error={je}")
                     # Reset corrupted key
-                    self.redis.delete(key)
+                    self.raw.delete(key)
                     return default
                     
             except (ConnectionError, TimeoutError) as ce:
@@ -432,12 +675,12 @@ class RedisContextManager:
         """
         for attempt in range(max_retries):
             try:
-                json_data = json.dumps(value)
+                json_data = codec.encode(value)
                 
                 if ttl is None:
-                    result = self.redis.set(key, json_data)
+                    result = self.raw.set(key, json_data)
                 else:
-                    result = self.redis.setex(key, int(ttl.total_seconds()), json_data)
+                    result = self.raw.setex(key, int(ttl.total_seconds()), json_data)
                 
                 if result:
                     log.debug(f"REDIS_SET_SUCCESS | key={key} | size={len(json_data)} | ttl={ttl} | attempt={attempt + 1}")
@@ -452,7 +695,7 @@ class RedisContextManager:
                     return False
                 time.sleep(0.1 * (attempt + 1))  # Exponential backoff
                 
-            except (RedisError, json.JSONEncodeError) as e:
+            except (RedisError, TypeError, ValueError) as e:
                 log.error(f"REDIS_SET_ERROR | key={key} | attempt={attempt + 1} | error={e}")
                 return False
                 
@@ -531,12 +774,11 @@ class RedisContextManager:
             success = self._set_json_with_retry(result_key, result_data, ttl=self.ttl)
             
             if success:
-                result_size = len(json.dumps(result_data))
                 products_count = 0
                 if "flow_data" in result_data and "products" in result_data["flow_data"]:
                     products_count = len(result_data["flow_data"]["products"])
                     
-                log.info(f"RESULT_SET | processing_id={processing_id} | size={result_size} | products={products_count}")
+                log.info(f"RESULT_SET | processing_id={processing_id} | products={products_count}")
             else:
                 log.error(f"RESULT_SET_FAILED | processing_id={processing_id}")
                 
@@ -616,30 +858,54 @@ class RedisContextManager:
             
         except Exception as e:
             health_data["error"] = str(e)
-            
+
+        health_data["codec"] = codec.codec_stats()
         return health_data
 
+    def _stored_bytes(self, user_id: str, session_id: str) -> Dict[str, Any]:
+        """Encoded payload bytes per bucket (values only, excluding Redis overhead)."""
+        buckets = [
+            ("permanent", permanent_key(user_id), "hash"),
+            ("session", session_key(session_id), "hash"),
+            ("fetched", fetched_key(session_id), "hash"),
+            ("blobs", blobs_key(session_id), "hash"),
+            *((f"list:{name}", list_key(session_id, name), "list") for name in LIST_FIELDS),
+        ]
+        pipe = self.raw.pipeline(transaction=False)
+        for _name, key, kind in buckets:
+            if kind == "hash":
+                pipe.hvals(key)
+            else:
+                pipe.lrange(key, 0, -1)
+        out: Dict[str, Any] = {}
+        for (name, _key, _kind), values in zip(buckets, pipe.execute(raise_on_error=False)):
+            out[name] = "unknown" if isinstance(values, Exception) else sum(len(v) for v in values)
+        out["total"] = sum(v for v in out.values() if isinstance(v, int))
+        return out
+
     def get_diagnostics(self, user_id: str, session_id: str) -> Dict[str, Any]:
         """Get diagnostic information for a specific user session."""
         try:
-            permanent_key = f"user:{user_id}:permanent"
-            session_key = f"session:{session_id}"
-            fetched_key = f"session:{session_id}:fetched"
+            p_key = permanent_key(user_id)
+            s_key = session_key(session_id)
+            f_key = fetched_key(session_id)
             
             diagnostics = {
                 "user_id": user_id,
                 "session_id": session_id,
                 "keys_exist": {
-                    "permanent": bool(self.redis.exists(permanent_key)),
-                    "session": bool(self.redis.exists(session_key)),
-                    "fetched": bool(self.redis.exists(fetched_key))
+                    "permanent": bool(self.redis.exists(p_key)),
+                    "session": bool(self.redis.exists(s_key)),
+                    "fetched": bool(self.redis.exists(f_key)),
+                    "blobs": bool(self.redis.exists(blobs_key(session_id))),
                 },
+                "list_lengths": {name: self.redis.llen(list_key(session_id, name)) for name in LIST_FIELDS},
                 "key_sizes": {},
                 "ttl_info": {}
             }
             
             # Get sizes and TTLs
-            for key_name, key in [("permanent", permanent_key), ("session", session_key), ("fetched", fetched_key)]:
+            for key_name, key in [("permanent", p_key), ("session", s_key), ("fetched", f_key)]:
                 try:
                     size = self.redis.memory_usage(key) or 0
                     ttl = self.redis.ttl(key)
@@ -648,7 +914,10 @@ class RedisContextManager:
                 except Exception:
                     diagnostics["key_sizes"][key_name] = "unknown"
                     diagnostics["ttl_info"][key_name] = "unknown"
-                    
+
+            diagnostics["stored_bytes"] = self._stored_bytes(user_id, session_id)
+            diagnostics["last_save"] = self._save_stats.get(session_id)
+            diagnostics["codec"] = codec.codec_stats()
             return diagnostics
             
         except Exception as e:
@@ -28,7 +28,7 @@ from ..fe_payload import build_envelope
 from ..models import UserContext
 from ..utils.smart_logger import get_smart_logger
 from ..data_fetchers.es_products import get_es_fetcher  # type: ignore
-from ..llm_service import LLMService  # type: ignore
+from ..llm_service import get_llm_service  # type: ignore
 from ..ux_response_generator import generate_ux_response_for_intent  # type: ignore
 
 log = logging.getLogger(__name__)
@@ -346,10 +346,9 @@ async def chat() -> Response:
             selected_product_id = str(data.get("selected_product_id") or "").strip()
             if selected_product_id:
                 log.info(f"IMAGE_SELECTION_START | user={user_id} | selected_id={selected_product_id}")
-                # Fetch full product doc via ES mget (sync API run in executor)
+                # Fetch full product doc via ES mget (async pooled transport)
                 fetcher = get_es_fetcher()
-                loop = asyncio.get_running_loop()
-                docs = await loop.run_in_executor(None, lambda: fetcher.mget_products([selected_product_id]))
+                docs = await fetcher.amget_products([selected_product_id])
                 if not docs:
                     log.info("IMAGE_SELECTION_FALLBACK | mget returned 0 docs")
                     # Gracefully degrade: minimal response
@@ -406,7 +405,7 @@ async def chat() -> Response:
                 }
 
                 # Call LLM response generator directly with SPM intent
-                llm = LLMService()
+                llm = get_llm_service()
                 answer = await llm.generate_response(
                     synthetic_query,
                     ctx,
@@ -6,29 +6,30 @@ import logging
 import time
 import uuid
 from datetime import datetime
-from typing import AsyncGenerator, Dict, Any
-import threading
-import queue
+from typing import Any, AsyncGenerator, Dict
 
-from flask import Blueprint, Response, current_app, request, stream_with_context
+from flask import Blueprint, Response, current_app, request
 
 from ..config import get_config
 from ..fe_payload import build_envelope
-from ..utils.helpers import safe_get
-from ..llm_service import LLMService  # type: ignore
+from ..llm_service import get_llm_service  # type: ignore
 from ..enums import ResponseType
+from ..utils.sse import EventStreamBody, StreamLimiter, relay
 
 log = logging.getLogger(__name__)
 
 bp = Blueprint("chat_stream", __name__)
 
+# Open streams in this worker (STREAM_MAX_CONCURRENT; 0 = unlimited)
+_streams = StreamLimiter(getattr(get_config(), "STREAM_MAX_CONCURRENT", 0))
+
 
 def _sse_event(event: str, data: Dict[str, Any]) -> bytes:
     payload = json.dumps(data, ensure_ascii=False)
     return (f"event: {event}\ndata: {payload}\n\n").encode("utf-8")
 
 
-def _heartbeat_event() -> str:
+def _heartbeat_event() -> bytes:
     return _sse_event("heartbeat", {"ts": datetime.utcnow().isoformat() + "Z"})
 
 
@@ -42,12 +43,27 @@ def chat_stream() -> Response:
             mimetype="application/json",
         )
 
-    def generate():
+    # Everything the stream needs from the request/app is read here: the body
+    # outlives the request context (it runs on the worker loop under ASGI)
+    data = request.get_json(silent=True) or {}
+    ctx_mgr = current_app.extensions.get("ctx_mgr")
+    bot_core = current_app.extensions.get("bot_core")
+    heartbeat_s = float(getattr(cfg, "STREAM_HEARTBEAT_SECONDS", 15))
+
+    if not _streams.try_acquire():
+        log.warning(f"SSE_REJECTED | active={_streams.active} | limit={_streams.limit}")
+        return Response(
+            json.dumps({"error": "Too many concurrent streams", "hint": "Retry shortly"}),
+            status=503,
+            mimetype="application/json",
+            headers={"Retry-After": "1"},
+        )
+
+    async def generate() -> AsyncGenerator[bytes, None]:
         request_id = str(uuid.uuid4())
         start_ts = time.time()
 
         try:
-            data = request.get_json(silent=True) or {}
             user_id = str(data.get("user_id") or "").strip() or "anonymous"
             session_id = str(data.get("session_id") or user_id)
             message = str(data.get("message") or "").strip()
@@ -58,16 +74,13 @@ def chat_stream() -> Response:
             log.info(f"SSE_EMIT | event=ack | session={session_id}")
             yield evt
 
-            # Access shared components from app.extensions
-            ctx_mgr = current_app.extensions.get("ctx_mgr")
-            bot_core = current_app.extensions.get("bot_core")
             if not ctx_mgr or not bot_core:
                 yield _sse_event("error", {"message": "Server not initialized"})
                 yield _sse_event("end", {"ok": False})
                 return
 
-            # Initialize LLM service for streaming
-            llm_service = LLMService()
+            # Shared LLM service for streaming
+            llm_service = get_llm_service()
 
             ctx = ctx_mgr.get_context(user_id, session_id)
 
@@ -151,85 +164,57 @@ def chat_stream() -> Response:
                     # STREAMING FINAL ANSWER: Run ES fetch + stream LLM3 response
                     # ============================================================
                     
-                    # Set up streaming callback for final answer
-                    final_answer_queue: "queue.Queue[tuple[str, Any]]" = queue.Queue()
-                    
-                    def start_product_search() -> None:
-                        async def search_and_stream():
-                            try:
-                                # Define streaming callback for LLM3
-                                async def final_answer_callback(event_dict):
-                                    event_name = event_dict.get("event", "delta")
-                                    event_data = event_dict.get("data", {})
-                                    log.info(f"FINAL_ANSWER_SSE | event={event_name} | session={session_id}")
-                                    final_answer_queue.put_nowait(("stream", {"event": event_name, "data": event_data}))
-                                
-                                # Run ES fetchers using registered handler
-                                from ..data_fetchers import get_fetcher
-                                from ..enums import BackendFunction
-
-                                fetched = {}
-                                try:
-                                    log.info(f"ES_FETCH_START | user={user_id}")
-                                    search_handler = get_fetcher(BackendFunction.SEARCH_PRODUCTS)
-                                    search_result = await search_handler(ctx)
-                                    fetched[BackendFunction.SEARCH_PRODUCTS.value] = search_result
-                                    try:
-                                        prod_count = len((search_result or {}).get('products', []) or [])
-                                    except Exception:
-                                        prod_count = 0
-                                    log.info(f"ES_FETCH_COMPLETE | products={prod_count}")
-                                except Exception as fetch_exc:
-                                    log.error(f"ES_FETCH_FAILED | error={fetch_exc}")
-                                    fetched[BackendFunction.SEARCH_PRODUCTS.value] = {"error": str(fetch_exc)}
-                                
-                                # Generate streaming response via LLM3
-                                intent_l3 = ctx.session.get("intent_l3", "")
-                                product_intent = ctx.session.get("product_intent", "show_me_options")
-                                from ..enums import QueryIntent
-                                query_intent = QueryIntent.RECOMMENDATION  # Default
-                                
-                                log.info(f"LLM3_STREAM_START | intent={product_intent} | session={session_id}")
-                                answer_dict = await llm_service.generate_response(
-                                    original_query,
-                                    ctx,
-                                    fetched,
-                                    intent_l3=intent_l3,
-                                    query_intent=query_intent,
-                                    product_intent=product_intent,
-                                    emit_callback=final_answer_callback
-                                )
-                                
-                                # Pass both answer and fetched data back to main thread
-                                final_answer_queue.put_nowait(("answer", {"answer_dict": answer_dict, "fetched": fetched}))
-                                
-                            except Exception as exc:
-                                log.error(f"PRODUCT_SEARCH_STREAM_ERROR | error={exc}")
-                                final_answer_queue.put_nowait(("error", exc))
-                            finally:
-                                final_answer_queue.put_nowait(("done", None))
-                        
+                    async def search_and_stream(emit):
+                        # Run ES fetchers using registered handler
+                        from ..data_fetchers import get_fetcher
+                        from ..enums import BackendFunction
+
+                        fetched = {}
                         try:
-                            asyncio.run(search_and_stream())
-                        except Exception as exc:
-                            final_answer_queue.put_nowait(("error", exc))
-                            final_answer_queue.put_nowait(("done", None))
-                    
-                    threading.Thread(target=start_product_search, daemon=True).start()
-                    
-                    # Stream events to frontend
+                            log.info(f"ES_FETCH_START | user={user_id}")
+                            search_handler = get_fetcher(BackendFunction.SEARCH_PRODUCTS)
+                            search_result = await search_handler(ctx)
+                            fetched[BackendFunction.SEARCH_PRODUCTS.value] = search_result
+                            try:
+                                prod_count = len((search_result or {}).get('products', []) or [])
+                            except Exception:
+                                prod_count = 0
+                            log.info(f"ES_FETCH_COMPLETE | products={prod_count}")
+                        except Exception as fetch_exc:
+                            log.error(f"ES_FETCH_FAILED | error={fetch_exc}")
+                            fetched[BackendFunction.SEARCH_PRODUCTS.value] = {"error": str(fetch_exc)}
+
+                        # Generate streaming response via LLM3
+                        intent_l3 = ctx.session.get("intent_l3", "")
+                        product_intent = ctx.session.get("product_intent", "show_me_options")
+                        from ..enums import QueryIntent
+                        query_intent = QueryIntent.RECOMMENDATION  # Default
+
+                        log.info(f"LLM3_STREAM_START | intent={product_intent} | session={session_id}")
+                        answer_dict = await llm_service.generate_response(
+                            original_query,
+                            ctx,
+                            fetched,
+                            intent_l3=intent_l3,
+                            query_intent=query_intent,
+                            product_intent=product_intent,
+                            emit_callback=emit
+                        )
+                        return {"answer_dict": answer_dict, "fetched": fetched}
+
+                    # Stream events to frontend as the search/LLM3 task emits them
                     answer_dict = None
                     fetched = {}
                     search_failed = False
-                    
-                    while True:
-                        kind, payload = final_answer_queue.get()
+
+                    async for kind, payload in relay(search_and_stream, heartbeat_s=heartbeat_s):
                         if kind == "stream":
-                            event_name = payload.get("event")
-                            event_data = payload.get("data", {})
-                            yield _sse_event(event_name, event_data)
-                        elif kind == "answer":
-                            # Payload now contains both answer_dict and fetched
+                            log.info(f"FINAL_ANSWER_SSE | event={payload.get('event')} | session={session_id}")
+                            yield _sse_event(payload.get("event"), payload.get("data", {}))
+                        elif kind == "heartbeat":
+                            yield _heartbeat_event()
+                        elif kind == "result":
+                            # Payload contains both answer_dict and fetched
                             answer_dict = payload.get("answer_dict")
                             fetched = payload.get("fetched", {})
                         elif kind == "error":
@@ -237,9 +222,7 @@ def chat_stream() -> Response:
                             err_msg = str(payload)
                             log.error(f"PRODUCT_SEARCH_ERROR | {err_msg}")
                             yield _sse_event("error", {"message": err_msg})
-                        elif kind == "done":
-                            break
-                    
+
                     if search_failed or not answer_dict:
                         yield _sse_event("end", {"ok": False})
                         return
@@ -252,11 +235,6 @@ def chat_stream() -> Response:
                         from ..bot_helpers import snapshot_and_trim
                         from ..enums import BackendFunction
                         
-                        # Reconstruct fetched dict for _store_last_recommendation
-                        # (it was built inside the async thread, need to pass it)
-                        # We need to get it from the thread - let's add it to the queue
-                        # For now, we'll extract product IDs from answer_dict and build minimal snapshot
-                        
                         # Store last_recommendation (product memory for follow-ups)
                         bot_core._store_last_recommendation(original_query, ctx, fetched)
                         
@@ -284,7 +262,6 @@ def chat_stream() -> Response:
                     
                     # Build final envelope
                     elapsed = time.time() - start_ts
-                    from ..enums import ResponseType
                     resp_type = ResponseType(answer_dict.get("response_type", "final_answer"))
                     
                     envelope = build_envelope(
@@ -316,52 +293,33 @@ def chat_stream() -> Response:
 
             # Quick classification FIRST to detect simple vs product queries
             # Using STREAMING version to emit incremental ASK messages and simple responses
-            llm_service = LLMService()
-
-            event_queue: "queue.Queue[tuple[str, Any]]" = queue.Queue()
-
-            def start_streaming() -> None:
-                async def stream_wrapper():
-                    async def collect_callback(event_dict):
-                        event_name = event_dict.get("event", "delta")
-                        event_data = event_dict.get("data", {})
-                        log.info(f"SSE_EMIT | event={event_name} | session={session_id} | data_keys={list(event_data.keys())}")
-                        event_queue.put_nowait(("stream", {"event": event_name, "data": event_data}))
-
-                    result = await llm_service.classify_and_assess_stream(message, ctx, emit_callback=collect_callback)
-                    event_queue.put_nowait(("classification", result))
-
-                try:
-                    asyncio.run(stream_wrapper())
-                except Exception as exc:  # pragma: no cover - defensive
-                    event_queue.put_nowait(("error", exc))
-                finally:
-                    event_queue.put_nowait(("done", None))
-
-            threading.Thread(target=start_streaming, daemon=True).start()
+            llm_service = get_llm_service()
 
             accumulated_text = ""
             classification: Dict[str, Any] = {}
             streaming_failed = False
 
-            while True:
-                kind, payload = event_queue.get()
+            async for kind, payload in relay(
+                lambda emit: llm_service.classify_and_assess_stream(message, ctx, emit_callback=emit),
+                heartbeat_s=heartbeat_s,
+            ):
                 if kind == "stream":
                     event_name = payload.get("event")
                     event_data = payload.get("data", {})
+                    log.info(f"SSE_EMIT | event={event_name} | session={session_id} | data_keys={list(event_data.keys())}")
                     if event_name == "final_answer.delta":
                         delta_text = event_data.get("delta") or ""
                         accumulated_text += delta_text
                     yield _sse_event(event_name, event_data)
-                elif kind == "classification":
+                elif kind == "heartbeat":
+                    yield _heartbeat_event()
+                elif kind == "result":
                     classification = payload or {}
                 elif kind == "error":
                     streaming_failed = True
                     err_msg = str(payload)
                     log.error(f"SSE_STREAM_ERROR | {err_msg}")
                     yield _sse_event("error", {"message": err_msg})
-                elif kind == "done":
-                    break
 
             if streaming_failed:
                 yield _sse_event("end", {"ok": False})
@@ -457,7 +415,14 @@ def chat_stream() -> Response:
             # For product queries, run full pipeline (no streaming yet for product path)
             log.info(f"SSE_STANDARD_PATH | product_query | session={session_id}")
             yield _sse_event("status", {"stage": "product_search"})
-            bot_resp = asyncio.run(bot_core.process_query(message, ctx))
+            bot_resp = None
+            async for kind, payload in relay(lambda _emit: bot_core.process_query(message, ctx), heartbeat_s=heartbeat_s):
+                if kind == "heartbeat":
+                    yield _heartbeat_event()
+                elif kind == "result":
+                    bot_resp = payload
+                elif kind == "error":
+                    raise payload
 
             # If response is an MPM/UX surface with product IDs, send an early bootstrap
             try:
@@ -490,6 +455,9 @@ def chat_stream() -> Response:
             log.info(f"SSE_EMIT | event=end | ok=True | session={session_id}")
             yield _sse_event("end", {"ok": True})
 
+        except (asyncio.CancelledError, GeneratorExit):
+            log.info(f"SSE_CANCELLED | request_id={request_id} | elapsed_ms={int((time.time() - start_ts) * 1000)}")
+            raise
         except Exception as e:
             log.exception("STREAM_ERROR")
             log.error(f"SSE_EMIT | event=error | err={e} | session={session_id if 'session_id' in locals() else 'unknown'}")
@@ -504,4 +472,5 @@ def chat_stream() -> Response:
         "Access-Control-Allow-Origin": request.headers.get("Origin", "*"),
     }
 
-    return Response(stream_with_context(generate()), headers=headers, mimetype="text/event-stream", direct_passthrough=True)
+    body = EventStreamBody(generate(), on_close=_streams.release)
+    return Response(body, headers=headers, mimetype="text/event-stream", direct_passthrough=True)
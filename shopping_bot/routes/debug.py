@@ -0,0 +1,65 @@
+# shopping_bot/routes/debug.py
+"""
+Operator endpoints for the tracing layer (per worker).
+
+• GET  /rs/debug/es/queries?limit=N   → most recent captured ES query bodies
+• GET  /rs/debug/trace/levels         → current tracer levels
+• POST /rs/debug/trace/levels         → {"es_products": "DEBUG", ...}
+• POST /rs/debug/static/reload        → re-read taxonomies and drop derived caches
+
+Fails closed: without DEBUG_TOKEN the routes answer 404, and with it every
+request must send the same value in the X-Debug-Token header.
+"""
+
+from __future__ import annotations
+
+import hmac
+import os
+from typing import Any, Dict
+
+from flask import Blueprint, jsonify, request
+
+from ..llm_registry import reload_static_data
+from ..utils.tracing import capture_kinds, levels_snapshot, recent_payloads, set_levels
+
+bp = Blueprint("debug", __name__)
+
+
+@bp.before_request
+def _require_token():
+    token = os.getenv("DEBUG_TOKEN", "")
+    if not token:
+        return jsonify({"error": "not found"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Debug-Token", "").encode(), token.encode()):
+        return jsonify({"error": "forbidden"}), 403
+    return None
+
+
+@bp.get("/debug/es/queries")
+def es_queries() -> tuple[Dict[str, Any], int]:
+    try:
+        limit = int(request.args.get("limit", 20))
+    except (TypeError, ValueError):
+        limit = 20
+    return jsonify({"queries": recent_payloads("es_query", limit), "captured": capture_kinds()}), 200
+
+
+@bp.route("/debug/trace/levels", methods=["GET", "POST"])
+def trace_levels() -> tuple[Dict[str, Any], int]:
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return jsonify({"error": "expected a JSON object of {module: level}"}), 400
+        return jsonify({"levels": set_levels({str(k): str(v) for k, v in body.items()})}), 200
+    return jsonify({"levels": levels_snapshot()}), 200
+
+
+@bp.post("/debug/static/reload")
+def static_reload() -> tuple[Dict[str, Any], int]:
+    data = reload_static_data()
+    return jsonify({
+        "reloaded": True,
+        "fnb_l2": len(data.fnb_l2),
+        "fnb_prompt": {domain: len(l2s) for domain, l2s in data.fnb_prompt.items()},
+        "personal_care": list(data.personal_care.keys()),
+    }), 200
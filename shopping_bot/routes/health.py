@@ -11,10 +11,11 @@ Otherwise 500 (so Cloud Run / Kubernetes can restart the pod).
 
 from __future__ import annotations
 
+import importlib
 import logging
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Tuple
 
-from flask import Blueprint, current_app, jsonify
+from flask import Blueprint, Response, current_app, jsonify
 
 log = logging.getLogger(__name__)
 bp = Blueprint("health", __name__)
@@ -31,4 +32,61 @@ def health_check() -> tuple[Dict[str, Any], int]:
         log.warning("Redis ping failed: %s", exc)
         return jsonify({"status": "unhealthy", "redis": "disconnected", "service": "shopbot"}), 500
 
-    
\ No newline at end of file
+
+def _es_fetcher() -> Any:
+    from ..data_fetchers.es_products import get_es_fetcher
+
+    return get_es_fetcher()
+
+
+def _lazy(module: str, name: str) -> Callable[[], Any]:
+    """Stats function imported on first call, so one broken module can't take the route down."""
+    return lambda: getattr(importlib.import_module(module, __package__), name)()
+
+
+# name → per-worker stats callable, listed in /health/caches
+_CACHE_STATS: Tuple[Tuple[str, Callable[[], Any]], ...] = (
+    ("es_search", lambda: _es_fetcher().cache.stats()),
+    ("es_docs", lambda: _es_fetcher().docs.stats()),
+    ("brand_index", lambda: _es_fetcher().brands.stats()),
+    ("llm_prompt", _lazy("..utils.prompt_cache", "cache_usage_stats")),
+    ("redis_codec", _lazy("..utils.codec", "codec_stats")),
+    ("llm_memo", _lazy("..utils.llm_memo", "llm_memo_stats")),
+    ("speculation", _lazy("..speculation", "speculation_stats")),
+    ("single_flight", _lazy("..utils.single_flight", "single_flight_stats")),
+)
+
+
+@bp.get("/health/caches")
+def cache_stats() -> tuple[Dict[str, Any], int]:
+    """Hit/miss counters for in-process caches (per worker)."""
+    caches: Dict[str, Any] = {}
+    for name, stats in _CACHE_STATS:
+        try:
+            caches[name] = stats()
+        except Exception as exc:  # noqa: BLE001
+            caches[name] = {"error": str(exc)}
+    return jsonify({"caches": caches}), 200
+
+
+@bp.get("/health/queue")
+def queue_stats() -> tuple[Dict[str, Any], int]:
+    """Background job queue: depth/age per lane (shared) and this worker's consumer counters."""
+    try:
+        from ..utils.job_queue import JobQueue
+
+        processor = current_app.extensions.get("background_processor")
+        queue = processor.queue if processor is not None else JobQueue(current_app.extensions["ctx_mgr"].redis, "bg")
+        return jsonify(queue.stats()), 200
+    except Exception as exc:  # noqa: BLE001
+        return jsonify({"error": str(exc)}), 500
+
+
+@bp.get("/metrics")
+def metrics_scrape() -> Any:
+    """Prometheus scrape: stage latency histograms and counters merged across this host's workers."""
+    from ..utils import metrics
+
+    if not metrics.enabled():
+        return jsonify({"error": "metrics disabled", "hint": "set METRICS_ENABLED=true"}), 404
+    return Response(metrics.render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -11,6 +11,9 @@ This endpoint provides a comprehensive product search API with support for:
 - Brand filtering
 - Quality threshold (healthy only)
 - Pagination/size control
+- Cursor pagination: `search_after` over a point-in-time snapshot, so
+  infinite scroll costs one small query per page and never repeats or
+  skips a product while the index changes underneath
 
 Designed for external app consumption (Flutter, React Native, etc.)
 """
@@ -18,11 +21,13 @@ Designed for external app consumption (Flutter, React Native, etc.)
 from __future__ import annotations
 
 import logging
+import re
 from typing import Any, Dict, List, Optional
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
 
-from ..data_fetchers.es_products import get_es_fetcher
+from ..data_fetchers.es_products import PIT_KEEP_ALIVE, get_es_fetcher
 
 log = logging.getLogger(__name__)
 bp = Blueprint("product_search", __name__)
@@ -50,6 +55,10 @@ MAX_SIZE = 50
 MIN_SIZE = 1
 DEFAULT_MIN_FLEAN_PERCENTILE = 0  # No quality filter by default
 
+# Cursor tokens are signed so clients can't forge PIT ids or search_after values
+CURSOR_SALT = "product-search-cursor"
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
 
 # ============================================================================
 # Request Validation
@@ -215,6 +224,52 @@ def _validate_request(data: Dict[str, Any]) -> tuple[Dict[str, Any], Optional[st
     return params, None
 
 
+# ============================================================================
+# Cursor Tokens
+# ============================================================================
+
+def _keep_alive_seconds(value: str) -> float:
+    """ES duration ("90s", "2m", "1h") in seconds; unparseable values count as 2 minutes."""
+    match = re.fullmatch(r"\s*(\d+)\s*(ms|s|m|h|d)\s*", value or "")
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)] if match else 120.0
+
+
+def _cursor_serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=CURSOR_SALT)
+
+
+def _encode_cursor(params: Dict[str, Any], cursor: Dict[str, Any], total_hits: int, page: int) -> str:
+    """Opaque token for the next page: params, PIT id, sort values, first-page total."""
+    return _cursor_serializer().dumps({
+        "p": params,
+        "pit": cursor["pit_id"],
+        "after": cursor["search_after"],
+        "total": total_hits,
+        "page": page,
+    })
+
+
+def _decode_cursor(token: Any) -> tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Returns:
+        tuple: (state, error_code)
+        - If valid: (state_dict, None)
+        - If expired (older than the PIT keep-alive): (None, "CURSOR_EXPIRED")
+        - If malformed or tampered with: (None, "INVALID_CURSOR")
+    """
+    if not isinstance(token, str) or not token.strip():
+        return None, "INVALID_CURSOR"
+    try:
+        state = _cursor_serializer().loads(token.strip(), max_age=_keep_alive_seconds(PIT_KEEP_ALIVE))
+    except SignatureExpired:
+        return None, "CURSOR_EXPIRED"
+    except BadSignature:
+        return None, "INVALID_CURSOR"
+    if not isinstance(state, dict) or not isinstance(state.get("p"), dict) or not state.get("pit") or not isinstance(state.get("after"), list):
+        return None, "INVALID_CURSOR"
+    return state, None
+
+
 # ============================================================================
 # Response Formatting
 # ============================================================================
@@ -303,10 +358,14 @@ def _build_response(
     products: List[Dict[str, Any]],
     meta: Dict[str, Any],
     filters_applied: Dict[str, Any],
-    fallback_used: Optional[str] = None
+    fallback_used: Optional[str] = None,
+    paging: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Build the final API response.
+
+    `paging` (cursor requests only) is merged into `data.pagination`:
+    page, has_more and next_cursor.
     """
     formatted_products = []
     for product in products:
@@ -332,6 +391,8 @@ def _build_response(
             "filters_applied": {k: v for k, v in filters_applied.items() if v is not None and k != "size"},
         }
     }
+    if paging:
+        response["data"]["pagination"].update(paging)
     
     if fallback_used:
         response["meta"]["fallback_used"] = fallback_used
@@ -344,6 +405,56 @@ def _build_response(
 # API Endpoint
 # ============================================================================
 
+def _paged_search(params: Dict[str, Any], state: Optional[Dict[str, Any]] = None, cursor_in: Optional[str] = None) -> tuple[Any, int]:
+    """One cursor page: opens the PIT snapshot on the first page, resumes it after that.
+
+    `cursor_in` is the cursor the client sent; a failed page echoes it back
+    so the same page can be retried.
+    """
+    fetcher = get_es_fetcher()
+    result, cursor = fetcher.search_page(
+        params,
+        pit_id=(state or {}).get("pit"),
+        search_after=(state or {}).get("after"),
+    )
+    meta = dict(result.get("meta", {}))
+    if meta.get("error") == "pit_expired":
+        return jsonify({
+            "success": False,
+            "error": {
+                "code": "CURSOR_EXPIRED",
+                "message": "The result snapshot for this cursor has expired; repeat the search without a cursor"
+            }
+        }), 410
+    if not meta.get("query_successful"):
+        # Not a last page: a 200 with has_more=false would silently truncate the walk
+        log.warning(f"PRODUCT_SEARCH_PAGE_FAILED | query='{params.get('q')}' | error={meta.get('error')}")
+        return jsonify({
+            "success": False,
+            "error": {
+                "code": "SEARCH_UNAVAILABLE",
+                "message": "The search backend failed for this page; retry with the same cursor",
+                "cursor": cursor_in,
+            }
+        }), 504 if meta.get("error") == "timeout" else 503
+
+    page = int((state or {}).get("page", 0)) + 1
+    # Follow-up pages don't count hits; the first page's total travels in the cursor
+    if state:
+        meta["total_hits"] = state.get("total", 0)
+    products = result.get("products", [])
+    log.info(
+        f"PRODUCT_SEARCH_PAGE | query='{params.get('q')}' | page={page} | "
+        f"returned={len(products)} | has_more={cursor is not None}"
+    )
+    paging = {
+        "page": page,
+        "has_more": cursor is not None,
+        "next_cursor": _encode_cursor(params, cursor, meta.get("total_hits", 0), page) if cursor else None,
+    }
+    return jsonify(_build_response(products=products, meta=meta, filters_applied=params, paging=paging)), 200
+
+
 @bp.post("/api/v1/products/search")
 def product_search() -> tuple[Dict[str, Any], int]:
     """
@@ -364,7 +475,13 @@ def product_search() -> tuple[Dict[str, Any], int]:
         "brands": ["Lays", "Pringles"],                // Optional: Brand filter
         "healthy_only": true,                          // Optional: Only show healthy products (flean >= 70)
         "min_flean_percentile": 60,                    // Optional: Custom quality threshold (0-100)
-        "size": 20                                     // Optional: Number of results (1-50, default: 20)
+        "size": 20,                                    // Optional: Number of results (1-50, default: 20)
+        "paginate": true                               // Optional: Return a cursor for the next page
+    }
+
+    Next page (every other field is taken from the cursor):
+    {
+        "cursor": "eyJwIjp7InEiOiJjaGlwcyJ9..."        // data.pagination.next_cursor of the previous page
     }
     
     ---
@@ -404,7 +521,10 @@ def product_search() -> tuple[Dict[str, Any], int]:
             "pagination": {
                 "total_hits": 1250,
                 "returned": 20,
-                "size": 20
+                "size": 20,
+                "page": 1,                              // Cursor requests only (page, has_more, next_cursor)
+                "has_more": true,
+                "next_cursor": "eyJwIjp7InEiOiJjaGlwcyJ9..."
             }
         },
         "meta": {
@@ -427,6 +547,10 @@ def product_search() -> tuple[Dict[str, Any], int]:
             "message": "'query' is required and must be a non-empty string"
         }
     }
+    Cursor errors: INVALID_CURSOR (400), CURSOR_EXPIRED (410) once the
+    snapshot has outlived ES_PIT_KEEP_ALIVE; clients restart from page one.
+    SEARCH_UNAVAILABLE (503, 504 on timeout) when ES fails a page; the
+    error carries the request's `cursor` (null on page one) to retry with.
     """
     try:
         # Parse request body
@@ -441,9 +565,23 @@ def product_search() -> tuple[Dict[str, Any], int]:
                 "query": request.args.get("query") or request.args.get("q"),
                 "category_group": request.args.get("category_group"),
                 "size": request.args.get("size"),
+                "cursor": request.args.get("cursor"),
             }
         
         log.info(f"PRODUCT_SEARCH_REQUEST | raw_data={data}")
+
+        # Follow-up page: the cursor carries the validated params
+        if data.get("cursor"):
+            state, cursor_error = _decode_cursor(data["cursor"])
+            if cursor_error:
+                return jsonify({
+                    "success": False,
+                    "error": {
+                        "code": cursor_error,
+                        "message": "Cursor has expired; repeat the search without a cursor" if cursor_error == "CURSOR_EXPIRED" else "Cursor is malformed or was not issued by this API"
+                    }
+                }), 410 if cursor_error == "CURSOR_EXPIRED" else 400
+            return _paged_search(state["p"], state, data["cursor"])
         
         # Validate request
         params, error = _validate_request(data)
@@ -457,6 +595,9 @@ def product_search() -> tuple[Dict[str, Any], int]:
             }), 400
         
         log.info(f"PRODUCT_SEARCH_VALIDATED | params={params}")
+
+        if str(data.get("paginate")).strip().lower() in {"1", "true", "yes", "on"}:
+            return _paged_search(params)
         
         # Get ES fetcher
         fetcher = get_es_fetcher()
@@ -201,6 +201,16 @@ CATEGORY_SCORING_RULES: Dict[str, Dict[str, Any]] = {
     }
 }
 
+# Base quality multiplier: 1.0 + clamp(adjusted percentile, 0, 100) / 100 (missing → 50).
+# The client-side reranker (data_fetchers.rerank) recognises this exact source.
+FLEAN_PERCENTILE_FIELD = "stats.adjusted_score_percentiles.subcategory_percentile"
+FLEAN_SCRIPT_SOURCE = (
+    "double p = (doc.containsKey('stats.adjusted_score_percentiles.subcategory_percentile') \n"
+    "            && doc['stats.adjusted_score_percentiles.subcategory_percentile'].size() > 0) \n"
+    "    ? doc['stats.adjusted_score_percentiles.subcategory_percentile'].value : 50; \n"
+    "return 1.0 + (Math.max(0.0, Math.min(100.0, p)) / 100.0);"
+)
+
 def get_scoring_rules(subcategory: str) -> Dict[str, List[Dict[str, Any]]]:
     """
     Get scoring rules for a specific subcategory.
@@ -238,12 +248,7 @@ def build_function_score_functions(subcategory: str, include_flean: bool = True)
         functions.append({
             "script_score": {
                 "script": {
-                    "source": (
-                        "double p = (doc.containsKey('stats.adjusted_score_percentiles.subcategory_percentile') \n"
-                        "            && doc['stats.adjusted_score_percentiles.subcategory_percentile'].size() > 0) \n"
-                        "    ? doc['stats.adjusted_score_percentiles.subcategory_percentile'].value : 50; \n"
-                        "return 1.0 + (Math.max(0.0, Math.min(100.0, p)) / 100.0);"
-                    )
+                    "source": FLEAN_SCRIPT_SOURCE
                 }
             }
         })
@@ -280,4 +285,10 @@ def build_function_score_functions(subcategory: str, include_flean: bool = True)
     return functions
 
 # Export for use in other modules
-__all__ = ["CATEGORY_SCORING_RULES", "get_scoring_rules", "build_function_score_functions"]
\ No newline at end of file
+__all__ = [
+    "CATEGORY_SCORING_RULES",
+    "FLEAN_PERCENTILE_FIELD",
+    "FLEAN_SCRIPT_SOURCE",
+    "get_scoring_rules",
+    "build_function_score_functions",
+]
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+Speculative ES-param extraction that overlaps turn classification.
+
+A product turn normally runs classification (LLM) → ES-param extraction
+(LLM) → ES search → answer. With SPECULATIVE_ES_PARAMS enabled, a turn that
+is about to be classified and *looks* product-like starts
+`build_search_params` (and, with SPECULATIVE_ES_PREFETCH, the first ES query)
+at once, on a private copy of the context:
+
+    spec = maybe_start(query, ctx)        # before classify_* in process_query
+    ...classification...
+    hit = await claim(ctx)                # in search_products_handler
+    discard(ctx, "unused")                # end of turn, if never claimed
+
+Correctness: the copy is made with the routing outcome we are betting on (an
+active assessment, product_intent defaulting to show_me_options) and we
+fingerprint exactly the session inputs param extraction reads. `claim`
+only uses the speculative result when the real context, after
+classification, has the same fingerprint; it then replays the session writes
+the extraction made on the copy. Anything else – a different route, changed
+slots or domain, an error – cancels the work and counts it as wasted.
+Counters are served at /rs/health/caches ("speculation").
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .config import get_config
+from .models import UserContext
+from .utils.tracked import HistoryList
+
+log = logging.getLogger(__name__)
+
+_ATTR = "_speculative_search"
+
+# Session keys read by build_search_params / generate_unified_es_params
+_FINGERPRINT_KEYS = (
+    "product_intent", "budget", "dietary_requirements", "preferences",
+    "size_hint", "domain",
+)
+_HISTORY_WINDOW = 10
+
+_PRODUCT_HINT = re.compile(
+    r"\b(?:buy|show|find|suggest|recommend|need|want|looking|options?|cheaper|healthier|under|below|"
+    r"chips|snacks?|namkeen|biscuits?|cookies?|chocolates?|juices?|milk|bread|butter|cheese|ketchup|sauce|"
+    r"noodles?|oats|cereals?|protein|bars?|shampoo|soap|serum|cream|moisturi[sz]er|sunscreen|face ?wash|"
+    r"lotion|conditioner|oil|gluten|vegan|sugar)\b",
+    re.I,
+)
+
+_stats: Dict[str, int] = {"started": 0, "hit": 0, "wasted": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] = _stats.get(name, 0) + 1
+
+
+def speculation_stats() -> Dict[str, Any]:
+    """Started / hit / wasted counters for this worker, plus the wasted-call rate."""
+    with _stats_lock:
+        out: Dict[str, Any] = dict(_stats)
+    settled = out["hit"] + out["wasted"]
+    out["wasted_rate"] = round(out["wasted"] / settled, 4) if settled else 0.0
+    return out
+
+
+@dataclass
+class SpeculativeResult:
+    params: Dict[str, Any]
+    results: Optional[Dict[str, Any]] = None  # set when the ES query was prefetched
+
+
+class _Speculation:
+    def __init__(self, shadow: UserContext, fingerprint: str, task: "asyncio.Task[SpeculativeResult]", before: Dict[str, Any]):
+        self.shadow = shadow
+        self.fingerprint = fingerprint
+        self.task = task
+        self.before = before
+
+
+def looks_product_like(query: str) -> bool:
+    """Cheap lexical gate so chit-chat and support turns never pay for speculation."""
+    return bool(query and _PRODUCT_HINT.search(query))
+
+
+def _current_text(session: Dict[str, Any]) -> str:
+    return str(session.get("current_user_text") or session.get("last_user_message") or "").strip()
+
+
+def _fingerprint(session: Dict[str, Any]) -> str:
+    history = (session.get("conversation_history") or [])[-_HISTORY_WINDOW:]
+    material = {
+        "text": _current_text(session),
+        "follow_up": bool(session.get("assessment")),
+        "slots": {k: session.get(k) for k in _FINGERPRINT_KEYS},
+        "history": list(history),
+    }
+    blob = json.dumps(material, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _snapshot(session: Dict[str, Any]) -> Dict[str, Any]:
+    # dict.items bypasses TrackedDict read tracking; history entries are immutable records
+    return {
+        k: (list(v) if isinstance(v, HistoryList) else copy.deepcopy(v))
+        for k, v in dict.items(session)
+    }
+
+
+def maybe_start(query: str, ctx: UserContext) -> bool:
+    """Start speculative extraction for this turn if enabled and the query looks product-like."""
+    cfg = get_config()
+    if not getattr(cfg, "SPECULATIVE_ES_PARAMS", False) or getattr(ctx, _ATTR, None) is not None:
+        return False
+    if not looks_product_like(query) or not _current_text(ctx.session):
+        return False
+
+    session = _snapshot(ctx.session)
+    # Bet on the es_fetch route: fetching always happens inside an assessment
+    session.setdefault("assessment", {"original_query": query})
+    session["product_intent"] = str(session.get("product_intent") or "show_me_options")
+    before = copy.deepcopy(session)
+    shadow = UserContext(
+        user_id=ctx.user_id,
+        session_id=ctx.session_id,
+        permanent=_snapshot(ctx.permanent),
+        session=session,
+    )
+    prefetch = bool(getattr(cfg, "SPECULATIVE_ES_PREFETCH", False))
+    task = asyncio.ensure_future(_run(shadow, prefetch))
+    object.__setattr__(ctx, _ATTR, _Speculation(shadow, _fingerprint(session), task, before))
+    _count("started")
+    log.info(f"SPECULATION_START | user={ctx.user_id} | prefetch={prefetch}")
+    return True
+
+
+async def _run(shadow: UserContext, prefetch: bool) -> SpeculativeResult:
+    from .data_fetchers.es_products import build_search_params, get_es_fetcher
+
+    params = await build_search_params(shadow)
+    results = await get_es_fetcher().asearch(copy.deepcopy(params)) if prefetch else None
+    return SpeculativeResult(params=params, results=results)
+
+
+async def claim(ctx: UserContext) -> Optional[SpeculativeResult]:
+    """
+    Take this turn's speculative result if it was computed from the same
+    inputs the real extraction would see now; otherwise discard it.
+    """
+    spec: Optional[_Speculation] = getattr(ctx, _ATTR, None)
+    if spec is None:
+        return None
+    object.__setattr__(ctx, _ATTR, None)
+    if _fingerprint(ctx.session) != spec.fingerprint:
+        _cancel(spec, ctx, "inputs_changed")
+        return None
+    try:
+        result = await spec.task
+    except Exception as exc:
+        _count("errors")
+        _cancel(spec, ctx, f"error:{type(exc).__name__}")
+        return None
+
+    # Replay what the extraction wrote to the copy (debug params, domain resets, size_hint, ...)
+    after = spec.shadow.session
+    for key in set(spec.before) | set(dict.keys(after)):
+        if key not in after:
+            ctx.session.pop(key, None)
+        elif key not in spec.before or dict.__getitem__(after, key) != spec.before[key]:
+            ctx.session[key] = dict.__getitem__(after, key)
+    _count("hit")
+    log.info(f"SPECULATION_HIT | user={ctx.user_id} | prefetched={result.results is not None}")
+    return result
+
+
+def discard(ctx: UserContext, reason: str = "unused") -> None:
+    """Cancel speculation the turn never claimed (e.g. classification routed elsewhere)."""
+    spec: Optional[_Speculation] = getattr(ctx, _ATTR, None)
+    if spec is None:
+        return
+    object.__setattr__(ctx, _ATTR, None)
+    _cancel(spec, ctx, reason)
+
+
+def _cancel(spec: _Speculation, ctx: UserContext, reason: str) -> None:
+    if not spec.task.done():
+        spec.task.cancel()
+    elif not spec.task.cancelled():
+        # Retrieve the outcome so a failed speculation never logs "exception was never retrieved"
+        spec.task.exception()
+    _count("wasted")
+    log.info(f"SPECULATION_WASTED | user={ctx.user_id} | reason={reason}")
@@ -3,9 +3,9 @@ from __future__ import annotations
 import logging
 from typing import Dict, Generator, Optional
 
-import anthropic  # type: ignore
 
 from ..config import get_config
+from ..llm_registry import get_sync_anthropic_client
 
 log = logging.getLogger(__name__)
 
@@ -20,7 +20,7 @@ class AnthropicStreamer:
 
     def __init__(self) -> None:
         cfg = get_config()
-        self._client = anthropic.Anthropic(api_key=cfg.ANTHROPIC_API_KEY)
+        self._client = get_sync_anthropic_client()
         self._model = cfg.LLM_MODEL
         self._max_tokens = cfg.LLM_MAX_TOKENS
 
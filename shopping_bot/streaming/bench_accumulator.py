@@ -0,0 +1,129 @@
+"""
+Micro-benchmark: replay tool_use delta streams through ToolStreamAccumulator.
+
+    python -m shopping_bot.streaming.bench_accumulator
+    python -m shopping_bot.streaming.bench_accumulator --replay deltas.jsonl
+
+A replay file holds one recorded stream per line, as a JSON list of the
+`partial_json` strings in arrival order. Without one, representative LLM1 /
+final-answer payloads are split into Anthropic-sized deltas (1-24 chars) with
+a fixed seed, at 1x/4x/16x their natural size. For each stream we report the
+accumulator's time per delta next to a "rescan" baseline that runs the regex
+set of the previous extractor over the whole buffer on every delta. The
+accumulator's column should stay flat as streams grow; the baseline's grows
+with the buffer.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import List
+
+from .tool_stream_accumulator import ToolStreamAccumulator
+
+_RESCAN = [re.compile(p, re.S) for p in (
+    r'"slot_name"\s*:\s*"([^"]+)"',
+    r'"message"\s*:\s*"([^"]{10,})"',
+    r'"simple_response"[^}]*?"message"\s*:\s*"([^"]*)',
+    r'"summary_message_part_1"\s*:\s*"([^"]*)',
+    r'"summary_message_part_2"\s*:\s*"([^"]*)',
+    r'"summary_message_part_3"\s*:\s*"([^"]*)',
+    r'"product_ids"\s*:\s*\[([^\]]*)',
+    r'"hero_product_id"\s*:\s*"([^"]*)"',
+    r'"quick_replies"\s*:\s*\[([^\]]*)',
+)]
+
+
+def _sample_streams(seed: int = 7, scales=(1, 4, 16)) -> List[List[str]]:
+    rng = random.Random(seed)
+    streams = []
+    for scale in scales:
+        for payload in _sample_payloads(scale):
+            text = json.dumps(payload, ensure_ascii=False)
+            deltas, i = [], 0
+            while i < len(text):
+                size = rng.randint(1, 24)
+                deltas.append(text[i:i + size])
+                i += size
+            streams.append(deltas)
+    return streams
+
+
+def _sample_payloads(scale: int) -> List[dict]:
+    ask = {
+        "reasoning": "User wants chips; budget and flavour narrow the search.",
+        "route": "product",
+        "ask_slots": [
+            {"slot_name": f"ASK_SLOT_{i}", "message": f"Question {i}: which option suits you best?",
+             "options": [f"Option {i}.{j}" for j in range(3)]}
+            for i in range(4 * scale)
+        ],
+    }
+    simple = {"simple_response": {"message": "Sure! " * 200 * scale, "response_type": "friendly_chat"}}
+    final = {
+        "response_type": "final_answer",
+        "summary_message_part_1": "These picks are \"clean\" and high in protein. " * 20 * scale,
+        "summary_message_part_2": "Sodium stays under 200mg per serving. " * 20 * scale,
+        "summary_message_part_3": "Tap a product to compare. " * 10 * scale,
+        "product_ids": [f"prod_{n:05d}" for n in range(40 * scale)],
+        "hero_product_id": "prod_00000",
+        "quick_replies": ["Cheaper", "Why?", "Show more"],
+    }
+    return [ask, simple, final]
+
+
+def _replay(deltas: List[str]) -> float:
+    acc = ToolStreamAccumulator()
+    acc.process_event(SimpleNamespace(type="content_block_start",
+                                      content_block=SimpleNamespace(type="tool_use", name="bench", id="tu_bench")))
+    start = time.perf_counter()
+    for chunk in deltas:
+        acc.process_event(SimpleNamespace(type="content_block_delta",
+                                          delta=SimpleNamespace(type="input_json_delta", partial_json=chunk)))
+    acc.process_event(SimpleNamespace(type="content_block_stop"))
+    return time.perf_counter() - start
+
+
+def _rescan(deltas: List[str]) -> float:
+    buffer = ""
+    start = time.perf_counter()
+    for chunk in deltas:
+        buffer += chunk
+        for pattern in _RESCAN:
+            for _ in pattern.finditer(buffer):
+                pass
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", help="JSONL file, one list of partial_json strings per line")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay, encoding="utf-8") as fh:
+            streams = [json.loads(line) for line in fh if line.strip()]
+    else:
+        streams = _sample_streams()
+
+    # Silence per-delta INFO logging so we time parsing, not log formatting
+    logging.getLogger("shopping_bot.streaming.tool_stream_accumulator").setLevel(logging.WARNING)
+
+    print(f"{'stream':>6} {'bytes':>7} {'deltas':>6} {'accumulator us/delta':>21} {'rescan us/delta':>16}")
+    for n, deltas in enumerate(streams):
+        size = sum(len(d) for d in deltas)
+        acc = min(_replay(deltas) for _ in range(args.repeat))
+        base = min(_rescan(deltas) for _ in range(args.repeat))
+        per = 1e6 / max(len(deltas), 1)
+        print(f"{n:>6} {size:>7} {len(deltas):>6} {acc * per:>21.2f} {base * per:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Incremental JSON tokenizer for streamed tool input.
+
+Anthropic streams tool arguments as `input_json_delta.partial_json` chunks
+split at arbitrary points. `JSONStreamParser.feed(chunk)` consumes each chunk
+exactly once and returns the events it completed, so the work per chunk is
+O(len(chunk)) however large the document grows.
+
+Events are `(kind, path, value)`; a path is a tuple of object keys and array
+indices, e.g. ("ask", "budget", "message") or ("product_ids", 2):
+
+    ("string",     path, fragment)  decoded text added to an open string value in this chunk
+    ("string_end", path, text)      the string value closed (full decoded text)
+    ("scalar",     path, value)     a number, true, false or null completed
+    ("end",        path, "{" | "[") an object / array closed
+
+Chunks may split anywhere, including inside escapes, \\uXXXX sequences and
+surrogate pairs. Object keys produce no events. Malformed input stops the
+parser (`error` is set) instead of raising.
+
+`match(path, pattern)` checks a path against a pattern such as
+"ask.*.message", "product_ids[]" or "**.summary_message_part_2": `*` is any
+key, `[]` any index, `[2]` a specific index, and a leading `**.` allows any
+prefix.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import re
+from typing import Any, List, Optional, Tuple, Union
+
+PathElement = Union[str, int]
+Path = Tuple[PathElement, ...]
+Event = Tuple[str, Path, Any]
+
+_WS = re.compile(r"[ \t\n\r]+")
+_STRING_RUN = re.compile(r'[^"\\]+')
+_TOKEN_RUN = re.compile(r"[^,\]}\s]+")
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_TOKEN_START = frozenset("-0123456789tfn")
+
+# lexer modes
+_NORMAL, _STRING, _ESCAPE, _UNICODE, _TOKEN = range(5)
+# container states: object expects key | ':' | value | ',' or close; arrays use _VALUE / _NEXT
+_KEY, _COLON, _VALUE, _NEXT = range(4)
+
+
+class JSONStreamParser:
+    """Resumable JSON tokenizer emitting path-addressed events."""
+
+    def __init__(self) -> None:
+        # frames: [is_object, key | index, state, expecting_first_member]
+        self._stack: List[list] = []
+        self._mode = _NORMAL
+        self._done = False
+        self._is_key = False
+        self._parts: List[str] = []
+        self._reported = 0  # parts of the open string already sent as "string" events
+        self._value_path: Path = ()
+        self._hex = ""
+        self._high: Optional[int] = None  # pending high surrogate
+        self._token = ""
+        self.consumed = 0
+        self.error: Optional[str] = None
+
+    @property
+    def path(self) -> Path:
+        return tuple(frame[1] for frame in self._stack)
+
+    @property
+    def complete(self) -> bool:
+        return self._done and self._mode == _NORMAL
+
+    def feed(self, chunk: str) -> List[Event]:
+        events: List[Event] = []
+        if self.error is not None or not chunk:
+            return events
+        try:
+            self._consume(chunk, events)
+        except (ValueError, IndexError) as exc:
+            self.error = f"{exc} (near offset {self.consumed})"
+        self.consumed += len(chunk)
+        if self._mode in (_STRING, _ESCAPE, _UNICODE) and not self._is_key and len(self._parts) > self._reported:
+            events.append(("string", self._value_path, "".join(self._parts[self._reported:])))
+            self._reported = len(self._parts)
+        return events
+
+    def close(self) -> List[Event]:
+        """Finish a top-level number/literal that no delimiter followed."""
+        events: List[Event] = []
+        if self._mode == _TOKEN and self.error is None:
+            try:
+                self._end_token(events)
+            except ValueError as exc:
+                self.error = str(exc)
+        return events
+
+    # ── lexer ──
+
+    def _consume(self, chunk: str, events: List[Event]) -> None:
+        i, n = 0, len(chunk)
+        while i < n:
+            mode = self._mode
+            if mode == _STRING:
+                run = _STRING_RUN.match(chunk, i)
+                if run is not None:
+                    if self._high is not None:
+                        self._flush_high()
+                    self._parts.append(run.group())
+                    i = run.end()
+                    continue
+                if chunk[i] == '"':
+                    self._end_string(events)
+                else:
+                    self._mode = _ESCAPE
+                i += 1
+            elif mode == _ESCAPE:
+                c = chunk[i]
+                i += 1
+                if c == "u":
+                    self._hex = ""
+                    self._mode = _UNICODE
+                    continue
+                if c not in _ESCAPES:
+                    raise ValueError(f"invalid escape \\{c}")
+                if self._high is not None:
+                    self._flush_high()
+                self._parts.append(_ESCAPES[c])
+                self._mode = _STRING
+            elif mode == _UNICODE:
+                take = 4 - len(self._hex)
+                self._hex += chunk[i:i + take]
+                i += take
+                if len(self._hex) == 4:
+                    self._append_code_point(int(self._hex, 16))
+                    self._mode = _STRING
+            elif mode == _TOKEN:
+                run = _TOKEN_RUN.match(chunk, i)
+                if run is not None:
+                    self._token += run.group()
+                    i = run.end()
+                if i < n:
+                    self._end_token(events)
+            else:
+                ws = _WS.match(chunk, i)
+                if ws is not None:
+                    i = ws.end()
+                    continue
+                i = self._structural(chunk, i, events)
+
+    def _structural(self, chunk: str, i: int, events: List[Event]) -> int:
+        c = chunk[i]
+        if not self._stack:
+            if self._done:
+                raise ValueError(f"unexpected {c!r} after the document")
+            return self._begin_value(c, i)
+        top = self._stack[-1]
+        state = top[2]
+        if top[0]:
+            if state == _KEY:
+                if c == '"':
+                    self._is_key = True
+                    self._parts = []
+                    self._mode = _STRING
+                    return i + 1
+                if c == "}" and top[3]:
+                    return self._close(events, "{", i)
+            elif state == _COLON:
+                if c == ":":
+                    top[2] = _VALUE
+                    return i + 1
+            elif state == _VALUE:
+                return self._begin_value(c, i)
+            elif c == ",":
+                top[2], top[3] = _KEY, False
+                return i + 1
+            elif c == "}":
+                return self._close(events, "{", i)
+        else:
+            if state == _VALUE:
+                if c == "]" and top[3]:
+                    return self._close(events, "[", i)
+                return self._begin_value(c, i)
+            if c == ",":
+                top[2], top[3] = _VALUE, False
+                return i + 1
+            if c == "]":
+                return self._close(events, "[", i)
+        raise ValueError(f"unexpected {c!r}")
+
+    def _begin_value(self, c: str, i: int) -> int:
+        if self._stack:
+            top = self._stack[-1]
+            if not top[0]:
+                top[1] += 1
+            top[2] = _NEXT
+        if c == '"':
+            self._is_key = False
+            self._parts = []
+            self._reported = 0
+            self._value_path = self.path
+            self._mode = _STRING
+            return i + 1
+        if c == "{":
+            self._stack.append([True, None, _KEY, True])
+            return i + 1
+        if c == "[":
+            self._stack.append([False, -1, _VALUE, True])
+            return i + 1
+        if c in _TOKEN_START:
+            self._token = ""
+            self._value_path = self.path
+            self._mode = _TOKEN
+            return i
+        raise ValueError(f"unexpected {c!r}")
+
+    def _close(self, events: List[Event], kind: str, i: int) -> int:
+        self._stack.pop()
+        events.append(("end", self.path, kind))
+        if not self._stack:
+            self._done = True
+        return i + 1
+
+    def _end_string(self, events: List[Event]) -> None:
+        if self._high is not None:
+            self._flush_high()
+        text = "".join(self._parts)
+        self._mode = _NORMAL
+        if self._is_key:
+            top = self._stack[-1]
+            top[1], top[2] = text, _COLON
+        else:
+            if len(self._parts) > self._reported:
+                events.append(("string", self._value_path, "".join(self._parts[self._reported:])))
+            events.append(("string_end", self._value_path, text))
+            if not self._stack:
+                self._done = True
+        self._parts = []
+        self._reported = 0
+
+    def _end_token(self, events: List[Event]) -> None:
+        token = self._token
+        try:
+            value = json.loads(token)
+        except ValueError:
+            raise ValueError(f"invalid literal {token!r}") from None
+        if isinstance(value, (list, dict, str)):
+            raise ValueError(f"invalid literal {token!r}")
+        self._mode = _NORMAL
+        self._token = ""
+        events.append(("scalar", self._value_path, value))
+        if not self._stack:
+            self._done = True
+
+    # ── \uXXXX handling (surrogate pairs may span chunks) ──
+
+    def _append_code_point(self, cp: int) -> None:
+        if 0xD800 <= cp < 0xDC00:
+            if self._high is not None:
+                self._flush_high()
+            self._high = cp
+        elif 0xDC00 <= cp < 0xE000 and self._high is not None:
+            self._parts.append(chr(0x10000 + ((self._high - 0xD800) << 10) + (cp - 0xDC00)))
+            self._high = None
+        else:
+            if self._high is not None:
+                self._flush_high()
+            self._parts.append(chr(cp) if not 0xDC00 <= cp < 0xE000 else "\ufffd")
+
+    def _flush_high(self) -> None:
+        # A high surrogate not followed by a low one: keep the text encodable
+        self._parts.append("\ufffd")
+        self._high = None
+
+
+# ── path patterns ──
+
+_ANY_INDEX = object()
+_SEGMENT = re.compile(r"\[(\d*)\]|([^.\[\]]+)")
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(pattern: str) -> Tuple[bool, Tuple[Any, ...]]:
+    any_prefix = pattern.startswith("**.")
+    body = pattern[3:] if any_prefix else pattern
+    parts: List[Any] = []
+    for m in _SEGMENT.finditer(body):
+        key = m.group(2)
+        if key is not None:
+            parts.append(key)
+        else:
+            parts.append(int(m.group(1)) if m.group(1) else _ANY_INDEX)
+    return any_prefix, tuple(parts)
+
+
+def match(path: Path, pattern: str) -> bool:
+    """Whether `path` matches `pattern` (see module docstring)."""
+    any_prefix, parts = _compile(pattern)
+    if any_prefix:
+        if len(path) < len(parts):
+            return False
+        path = path[len(path) - len(parts):]
+    elif len(path) != len(parts):
+        return False
+    for element, part in zip(path, parts):
+        if part is _ANY_INDEX:
+            if not isinstance(element, int):
+                return False
+        elif part == "*":
+            if not isinstance(element, str):
+                return False
+        elif element != part:
+            return False
+    return True
+
+
+def path_str(path: Path) -> str:
+    """("ask", "budget", "options", 2) -> "ask.budget.options[2]"."""
+    out = ""
+    for element in path:
+        out += f"[{element}]" if isinstance(element, int) else (f".{element}" if out else element)
+    return out
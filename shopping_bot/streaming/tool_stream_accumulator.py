@@ -13,11 +13,16 @@ from __future__ import annotations
 
 import json
 import logging
-import re
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
+
+from .json_stream import JSONStreamParser, Path, match
 
 log = logging.getLogger(__name__)
 
+SlotKey = Union[str, int]  # ask.<slot_name> key or ask_slots[<index>]
+
+_SUMMARY_PARTS = {f"summary_message_part_{n}": n for n in (1, 2, 3)}
+
 
 class ToolStreamAccumulator:
     """
@@ -27,10 +32,14 @@ class ToolStreamAccumulator:
     1. content_block_start (type=tool_use) → capture tool name
     2. content_block_delta (type=input_json_delta) → accumulate partial_json
     3. content_block_stop → parse complete JSON
+
+    `process_event` returns every output the event completed, in order (one
+    delta can close several strings at once).
     
     Features:
     - Accumulates raw JSON strings from input_json_delta events
-    - Extracts user-visible strings incrementally (ASK messages, simple_response)
+    - Tokenizes each delta once with an incremental JSON parser and extracts
+      user-visible strings from path-addressed events (ASK messages, simple_response)
     - Parses complete payload at content_block_stop
     - Tracks emitted strings to prevent duplicates
     """
@@ -41,22 +50,33 @@ class ToolStreamAccumulator:
         self.input_buffer: str = ""  # Accumulated partial_json strings
         self.complete_input: Optional[Dict[str, Any]] = None
         self._emitted_texts: set[str] = set()  # Prevent duplicate emissions
-        self._last_buffer_scan_pos: int = 0  # Track last scanned position
         self._current_block_type: Optional[str] = None
         self._in_tool_block: bool = False
-        # Track per-slot emission state for robust streaming of messages and options
-        self._slot_emit_state: Dict[str, Dict[str, bool]] = {}
+        self._reset_stream_state()
+
+    def _reset_stream_state(self) -> None:
+        """Per-tool-block parser and extraction state."""
+        self._parser = JSONStreamParser()
+        self._parser_error_logged = False
+        # ask_slots[i].slot_name, plus messages/options that arrived before it
+        self._slot_names: Dict[int, str] = {}
+        self._deferred_messages: Dict[SlotKey, str] = {}
+        self._deferred_options: Dict[SlotKey, List[str]] = {}
+        self._has_slot_structure = False
         # Track options already emitted per slot (to support incremental emissions)
         self._slot_seen_options: Dict[str, List[str]] = {}
         # Track simple_response streaming position
+        self._simple_response_text: str = ""
         self._simple_response_emitted_len: int = 0
         # Track summary_message_part streaming positions (for final answer streaming)
+        self._summary_part_text: Dict[int, str] = {}
         self._summary_part_emitted_len: Dict[int, int] = {1: 0, 2: 0, 3: 0}
-        # Track product ids and hero product streaming state
+        # Track product ids, hero product and quick replies streaming state
         self._product_ids_emitted: List[str] = []
         self._hero_product_emitted: Optional[str] = None
+        self._quick_replies: List[str] = []
         
-    def process_event(self, event) -> Optional[Dict[str, Any]]:
+    def process_event(self, event) -> List[Dict[str, Any]]:
         """
         Process a single streaming event from Anthropic.
         
@@ -64,22 +84,24 @@ class ToolStreamAccumulator:
             event: Anthropic stream event object
             
         Returns:
-            Dict with extracted user-facing content, or None
-            Format: {"type": "ask_message" | "simple_response", "text": "..."}
+            Outputs the event completed, in order (empty if none)
+            Format: {"type": "ask_message" | "simple_response_delta" | ..., ...}
         """
         event_type = getattr(event, 'type', None)
         log.info(f"STREAM_EVENT | type={event_type}")
         
         if event_type == 'content_block_start':
-            return self._handle_block_start(event)
+            output = self._handle_block_start(event)
             
         elif event_type == 'content_block_delta':
             return self._handle_block_delta(event)
             
         elif event_type == 'content_block_stop':
-            return self._handle_block_stop(event)
+            output = self._handle_block_stop(event)
             
-        return None
+        else:
+            return []
+        return [output] if output else []
     
     def _handle_block_start(self, event) -> Optional[Dict[str, Any]]:
         """Handle content_block_start event"""
@@ -102,6 +124,8 @@ class ToolStreamAccumulator:
                         tool_id = content_block.get('id')
                     self.tool_name = tool_name
                     self.tool_id = tool_id
+                    self.input_buffer = ""
+                    self._reset_stream_state()
                     log.info(f"TOOL_STREAM_START | tool={self.tool_name} | id={self.tool_id}")
                     return {
                         "type": "tool_start",
@@ -115,21 +139,21 @@ class ToolStreamAccumulator:
             log.debug(f"Block start parsing error: {e}")
         return None
     
-    def _handle_block_delta(self, event) -> Optional[Dict[str, Any]]:
+    def _handle_block_delta(self, event) -> List[Dict[str, Any]]:
         """Handle content_block_delta event with input_json_delta"""
         try:
             delta = getattr(event, 'delta', None)
             if delta is None and isinstance(event, dict):
                 delta = event.get('delta')
             if not delta:
-                return None
+                return []
                 
             delta_type = getattr(delta, 'type', None)
             if delta_type is None and isinstance(delta, dict):
                 delta_type = delta.get('type')
             # Ignore deltas outside tool_use blocks
             if not self._in_tool_block:
-                return None
+                return []
 
             # Some SDK/event variants may omit delta.type; prefer presence of partial_json
             partial_json = getattr(delta, 'partial_json', None)
@@ -144,11 +168,11 @@ class ToolStreamAccumulator:
                         preview = "<unprintable>"
                     log.info(f"JSON_DELTA | size={len(partial_json)} | total={len(self.input_buffer)} | preview='{preview}'")
                     # Extract user-facing strings incrementally
-                    return self._extract_user_strings()
+                    return self._extract_user_strings(partial_json)
                     
         except Exception as e:
             log.debug(f"Block delta parsing error: {e}")
-        return None
+        return []
     
     def _handle_block_stop(self, event) -> Optional[Dict[str, Any]]:
         """Handle content_block_stop - only parse if current block is tool_use"""
@@ -197,182 +221,158 @@ class ToolStreamAccumulator:
             self.input_buffer = self.input_buffer if self.complete_input is None else self.input_buffer
         return None
 
-    def _extract_user_strings(self) -> Optional[Dict[str, Any]]:
+    def _extract_user_strings(self, partial_json: str) -> List[Dict[str, Any]]:
         """
-        Extract user-visible strings from accumulated JSON buffer.
-        
-        Uses regex patterns to find message strings before full JSON parsing.
-        Scans only the newly added portion to avoid duplicate emissions.
-        
+        Feed one partial_json chunk to the incremental parser and translate
+        the events it completes into user-facing outputs.
+
+        Each chunk is tokenized exactly once, so the cost per delta is
+        proportional to the delta, not to the accumulated buffer.
+
         Returns:
-            Dict with extracted string, or None if nothing new found
+            Every output the chunk completed, in order (empty if none)
         """
+        outputs: List[Dict[str, Any]] = []
         try:
-            # Scan only the newly added portion
-            scan_start = max(0, self._last_buffer_scan_pos - 100)  # Small overlap for split patterns
-            scan_region = self.input_buffer[scan_start:]
-            
-            # Structured-first: slot_name + message + options (incremental)
-            full_region = self.input_buffer
-            for slot_match in re.finditer(r'"slot_name"\s*:\s*"([^"]+)"', full_region):
-                slot_name = slot_match.group(1)
-                state = self._slot_emit_state.get(slot_name, {"message": False, "options": False})
-                forward_slice = full_region[slot_match.end(): slot_match.end() + 1200]
+            for kind, path, value in self._parser.feed(partial_json):
+                self._on_parser_event(kind, path, value, outputs)
+            if self._parser.error is not None and not self._parser_error_logged:
+                self._parser_error_logged = True
+                log.debug(f"String extraction stopped: {self._parser.error}")
+        except Exception as e:
+            log.debug(f"String extraction error: {e}")
 
-                # Message per slot
-                if not state["message"]:
-                    msg_match = re.search(r'"message"\s*:\s*"([^"]{5,})"', forward_slice)
-                    if msg_match:
-                        msg_text = msg_match.group(1)
-                        if msg_text in self._emitted_texts:
-                            self._slot_emit_state[slot_name] = {**state, "message": True}
-                        else:
-                            self._slot_emit_state[slot_name] = {**state, "message": True}
-                            self._last_buffer_scan_pos = len(self.input_buffer)
-                            log.info(f"EXTRACTED_ASK | slot={slot_name} | text='{msg_text[:60]}...'")
-                            return {
-                                "type": "ask_message",
-                                "slot_name": slot_name,
-                                "text": msg_text
-                            }
+        return outputs
 
-                # Options per slot (incremental streaming)
-                if not state["options"]:
-                    partial_opt_match = re.search(r'"options"\s*:\s*\[([^\]]*)', forward_slice, re.S)
-                    if partial_opt_match:
-                        raw_partial = partial_opt_match.group(1)
-                        options_partial = re.findall(r'"([^"]+)"', raw_partial)
-                        if options_partial:
-                            seen = self._slot_seen_options.get(slot_name, [])
-                            if len(options_partial) > len(seen):
-                                self._slot_seen_options[slot_name] = options_partial[:]
-                                closed = bool(re.search(r'"options"\s*:\s*\[[^\]]*\]', forward_slice, re.S))
-                                if closed:
-                                    self._slot_emit_state[slot_name] = {**state, "options": True}
-                                self._last_buffer_scan_pos = len(self.input_buffer)
-                                log.info(f"EXTRACTED_OPTIONS | slot={slot_name} | count={len(options_partial)} | preview={options_partial[:3]}")
-                                return {
-                                    "type": "ask_options",
-                                    "slot_name": slot_name,
-                                    "options": options_partial
-                                }
+    def _on_parser_event(self, kind: str, path: Path, value: Any, outputs: List[Dict[str, Any]]) -> None:
+        """Map one path-addressed parser event to accumulator outputs (appended to `outputs`)."""
+        if not path:
+            return
 
-            # Generic fallback: only emit message if no slot structure is present
-            ask_pattern = r'"message"\s*:\s*"([^"]{10,})"'
-            ask_matches = re.findall(ask_pattern, scan_region)
-            for match_text in ask_matches:
-                if match_text and match_text not in self._emitted_texts:
-                    if re.search(r'"slot_name"\s*:\s*"', full_region):
-                        continue
-                    self._emitted_texts.add(match_text)
-                    self._last_buffer_scan_pos = len(self.input_buffer)
-                    log.info(f"EXTRACTED_ASK | text='{match_text[:60]}...'")
-                    return {
-                        "type": "ask_message",
-                        "text": match_text
-                    }
+        # ASK slots: ask_slots[i].{slot_name,message,options[]} or ask.<slot>.{message,options[]}
+        if match(path, "ask_slots[].slot_name"):
+            if kind == "string_end":
+                self._bind_slot_name(path[1], value, outputs)
+            return
+        if match(path, "ask_slots[].message") or match(path, "ask.*.message"):
+            if kind == "string_end":
+                self._has_slot_structure = True
+                self._on_slot_message(path[1], value, outputs)
+            return
+        if match(path, "ask_slots[].options[]") or match(path, "ask.*.options[]"):
+            if kind == "string_end" and value:
+                self._has_slot_structure = True
+                self._on_slot_option(path[1], value, outputs)
+            return
 
-            # Pattern 2: Simple response messages - STREAMING DELTAS
-            # Extract incrementally as the message grows character-by-character
-            # This provides true real-time streaming as Anthropic generates text
-            # Match even WITHOUT closing quote to catch text as it arrives
-            simple_pattern = r'"simple_response"[^}]*?"message"\s*:\s*"([^"]*)'
-            simple_match = re.search(simple_pattern, self.input_buffer)
-            
-            if simple_match:
-                current_simple = simple_match.group(1)  # Text so far (may be incomplete)
-                current_len = len(current_simple)
-                
-                # Check if the message has grown since last emission
+        # Simple response text streams as deltas while the string is open
+        if match(path, "simple_response.message"):
+            if kind == "string":
+                self._simple_response_text += value
+                current_len = len(self._simple_response_text)
                 if current_len > self._simple_response_emitted_len and current_len >= 3:
-                    # Emit only the NEW characters (delta)
-                    delta_text = current_simple[self._simple_response_emitted_len:]
+                    delta_text = self._simple_response_text[self._simple_response_emitted_len:]
                     self._simple_response_emitted_len = current_len
-                    self._last_buffer_scan_pos = len(self.input_buffer)
                     log.info(f"EXTRACTED_SIMPLE_DELTA | delta_len={len(delta_text)} | total_len={current_len} | preview='{delta_text[:40]}...'")
-                    return {
+                    outputs.append({
                         "type": "simple_response_delta",
                         "text": delta_text,
                         "total_length": current_len
-                    }
-            
-            # Pattern 3: Summary message parts (for final answer streaming)
-            # Extract summary_message_part_1, part_2, part_3 as they stream
-            for part_num in [1, 2, 3]:
-                part_pattern = rf'"summary_message_part_{part_num}"\s*:\s*"([^"]*)'
-                part_match = re.search(part_pattern, self.input_buffer)
-                
-                if part_match:
-                    current_part = part_match.group(1)  # Text so far (may be incomplete)
-                    current_len = len(current_part)
-                    emitted_len = self._summary_part_emitted_len.get(part_num, 0)
-                    
-                    # Check if the part has grown since last emission
-                    if current_len > emitted_len and current_len >= 3:
-                        # Emit only the NEW characters (delta)
-                        delta_text = current_part[emitted_len:]
-                        self._summary_part_emitted_len[part_num] = current_len
-                        self._last_buffer_scan_pos = len(self.input_buffer)
-                        log.info(f"EXTRACTED_SUMMARY_PART_{part_num} | delta_len={len(delta_text)} | total_len={current_len} | preview='{delta_text[:60]}...'")
-                        return {
-                            "type": "summary_part_delta",
-                            "part_number": part_num,
-                            "text": delta_text,
-                            "total_length": current_len
-                        }
+                    })
+            return
 
-            # Pattern 4: Product IDs array streaming
-            product_pattern = r'"product_ids"\s*:\s*\[([^\]]*)'
-            product_match = re.search(product_pattern, self.input_buffer)
-            if product_match:
-                raw_ids = product_match.group(1)
-                ids = re.findall(r'"([^\"]+)"', raw_ids)
-                if ids and ids != self._product_ids_emitted:
-                    self._product_ids_emitted = ids[:]
-                    self._last_buffer_scan_pos = len(self.input_buffer)
-                    log.info(f"EXTRACTED_PRODUCT_IDS | count={len(ids)} | preview={ids[:4]}")
-                    return {
-                        "type": "product_ids",
-                        "product_ids": ids
-                    }
+        # Summary message parts (final answer streaming)
+        last = path[-1]
+        if isinstance(last, str) and last in _SUMMARY_PARTS:
+            if kind == "string":
+                part_num = _SUMMARY_PARTS[last]
+                text = self._summary_part_text.get(part_num, "") + value
+                self._summary_part_text[part_num] = text
+                current_len = len(text)
+                emitted_len = self._summary_part_emitted_len.get(part_num, 0)
+                if current_len > emitted_len and current_len >= 3:
+                    delta_text = text[emitted_len:]
+                    self._summary_part_emitted_len[part_num] = current_len
+                    log.info(f"EXTRACTED_SUMMARY_PART_{part_num} | delta_len={len(delta_text)} | total_len={current_len} | preview='{delta_text[:60]}...'")
+                    outputs.append({
+                        "type": "summary_part_delta",
+                        "part_number": part_num,
+                        "text": delta_text,
+                        "total_length": current_len
+                    })
+            return
 
-            # Pattern 5: Hero product id
-            hero_pattern = r'"hero_product_id"\s*:\s*"([^"]*)"'
-            hero_match = re.search(hero_pattern, self.input_buffer)
-            if hero_match:
-                hero_id = hero_match.group(1)
-                if hero_id and hero_id != self._hero_product_emitted:
-                    self._hero_product_emitted = hero_id
-                    self._last_buffer_scan_pos = len(self.input_buffer)
-                    log.info(f"EXTRACTED_HERO_PRODUCT | id={hero_id}")
-                    return {
-                        "type": "hero_product",
-                        "hero_product_id": hero_id
-                    }
+        if kind != "string_end":
+            return
+
+        if match(path, "**.product_ids[]"):
+            if value:
+                self._product_ids_emitted.append(value)
+                ids = self._product_ids_emitted[:]
+                log.info(f"EXTRACTED_PRODUCT_IDS | count={len(ids)} | preview={ids[:4]}")
+                outputs.append({"type": "product_ids", "product_ids": ids})
+        elif match(path, "**.hero_product_id"):
+            if value and value != self._hero_product_emitted:
+                self._hero_product_emitted = value
+                log.info(f"EXTRACTED_HERO_PRODUCT | id={value}")
+                outputs.append({"type": "hero_product", "hero_product_id": value})
+        elif match(path, "**.quick_replies[]"):
+            if value:
+                self._quick_replies.append(value)
+                quick_replies = self._quick_replies[:]
+                log.info(f"EXTRACTED_QUICK_REPLIES | count={len(quick_replies)} | preview={quick_replies[:4]}")
+                outputs.append({"type": "quick_replies", "quick_replies": quick_replies})
+        elif last == "message" and path[0] != "simple_response":
+            # Generic fallback: only emit a message if no slot structure is present
+            if self._has_slot_structure or len(value) < 10 or value in self._emitted_texts:
+                return
+            self._emitted_texts.add(value)
+            log.info(f"EXTRACTED_ASK | text='{value[:60]}...'")
+            outputs.append({"type": "ask_message", "text": value})
+
+    def _bind_slot_name(self, key: SlotKey, slot_name: str, outputs: List[Dict[str, Any]]) -> None:
+        """Record the slot_name for an ask_slots entry and flush anything seen before it."""
+        self._has_slot_structure = True
+        self._slot_names[key] = slot_name
+        message = self._deferred_messages.pop(key, None)
+        if message is not None:
+            self._on_slot_message(key, message, outputs)
+        for option in self._deferred_options.pop(key, []):
+            self._on_slot_option(key, option, outputs)
+
+    def _slot_name_for(self, key: SlotKey) -> Optional[str]:
+        # ask.<slot_name>.* carries the name in the path; ask_slots[i] needs its slot_name member
+        return key if isinstance(key, str) else self._slot_names.get(key)
+
+    def _on_slot_message(self, key: SlotKey, text: str, outputs: List[Dict[str, Any]]) -> None:
+        slot_name = self._slot_name_for(key)
+        if slot_name is None:
+            self._deferred_messages[key] = text
+            return
+        if len(text) < 5 or text in self._emitted_texts:
+            return
+        self._emitted_texts.add(text)
+        log.info(f"EXTRACTED_ASK | slot={slot_name} | text='{text[:60]}...'")
+        outputs.append({
+            "type": "ask_message",
+            "slot_name": slot_name,
+            "text": text
+        })
+
+    def _on_slot_option(self, key: SlotKey, option: str, outputs: List[Dict[str, Any]]) -> None:
+        slot_name = self._slot_name_for(key)
+        if slot_name is None:
+            self._deferred_options.setdefault(key, []).append(option)
+            return
+        options = self._slot_seen_options.setdefault(slot_name, [])
+        options.append(option)
+        log.info(f"EXTRACTED_OPTIONS | slot={slot_name} | count={len(options)} | preview={options[:3]}")
+        outputs.append({
+            "type": "ask_options",
+            "slot_name": slot_name,
+            "options": options[:]
+        })
 
-            # Pattern 6: Quick replies array
-            qr_pattern = r'"quick_replies"\s*:\s*\[([^\]]*)'
-            qr_match = re.search(qr_pattern, self.input_buffer)
-            if qr_match:
-                raw_qr = qr_match.group(1)
-                quick_replies = re.findall(r'"([^\"]+)"', raw_qr)
-                if quick_replies:
-                    # We emit every time the array grows; frontend will handle dedupe
-                    self._last_buffer_scan_pos = len(self.input_buffer)
-                    log.info(f"EXTRACTED_QUICK_REPLIES | count={len(quick_replies)} | preview={quick_replies[:4]}")
-                    return {
-                        "type": "quick_replies",
-                        "quick_replies": quick_replies
-                    }
-            
-            # Update scan position even if nothing found
-            self._last_buffer_scan_pos = len(self.input_buffer)
-            
-        except Exception as e:
-            log.debug(f"String extraction error: {e}")
-        
-        return None
-    
     def get_complete_input(self) -> Dict[str, Any]:
         """Return the fully accumulated and parsed tool input"""
         return self.complete_input or {}
@@ -395,11 +395,5 @@ class ToolStreamAccumulator:
         self.input_buffer = ""
         self.complete_input = None
         self._emitted_texts.clear()
-        self._last_buffer_scan_pos = 0
-        self._slot_emit_state.clear()
-        self._slot_seen_options.clear()
-        self._simple_response_emitted_len = 0
-        self._summary_part_emitted_len = {1: 0, 2: 0, 3: 0}
-        self._product_ids_emitted = []
-        self._hero_product_emitted = None
+        self._reset_stream_state()
 
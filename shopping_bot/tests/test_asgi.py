@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+
+from flask import Flask, Response, jsonify, request
+
+from shopping_bot import asgi
+
+
+def _app(started: threading.Event, cancelled: threading.Event) -> Flask:
+    app = Flask(__name__)
+
+    @app.post("/echo")
+    async def echo():
+        await asyncio.sleep(0.05)
+        return jsonify({"loop": id(asyncio.get_running_loop()), "body": request.get_json()})
+
+    @app.get("/stream")
+    def stream():
+        def gen():
+            yield "a"
+            yield "b"
+
+        return Response(gen(), mimetype="text/event-stream")
+
+    @app.get("/slow")
+    async def slow():
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "late"
+
+    return app
+
+
+async def _call(server, method, path, body=b"", disconnect=None):
+    sent = []
+    incoming = asyncio.Queue()
+    await incoming.put({"type": "http.request", "body": body, "more_body": False})
+
+    async def receive():
+        if incoming.empty() and disconnect is not None:
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+        return await incoming.get()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": b"", "http_version": "1.1",
+        "headers": [(b"content-type", b"application/json")], "server": ("test", 80), "client": ("127.0.0.1", 1),
+    }
+    await server(scope, receive, send)
+    return sent
+
+
+def test_async_views_share_the_worker_loop_and_hooks_run():
+    started, cancelled = threading.Event(), threading.Event()
+    events = []
+
+    async def on_start():
+        events.append("start")
+
+    async def on_stop():
+        events.append("stop")
+
+    asgi._startup_hooks.append(on_start)
+    asgi._shutdown_hooks.append(on_stop)
+    try:
+        async def run():
+            server = asgi.create_asgi_app(_app(started, cancelled), threads=8)
+            await server.startup()
+            a, b = await asyncio.gather(
+                _call(server, "POST", "/echo", b'{"n": 1}'),
+                _call(server, "POST", "/echo", b'{"n": 2}'),
+            )
+            stream = await _call(server, "GET", "/stream")
+            stats = server.stats()
+            await server.shutdown()
+            return id(asyncio.get_running_loop()), a, b, stream, stats
+
+        loop_id, a, b, stream, stats = asyncio.run(run())
+    finally:
+        asgi._startup_hooks.remove(on_start)
+        asgi._shutdown_hooks.remove(on_stop)
+
+    for sent, n in ((a, 1), (b, 2)):
+        assert sent[0]["status"] == 200
+        payload = json.loads(b"".join(m.get("body", b"") for m in sent[1:]))
+        assert payload == {"loop": loop_id, "body": {"n": n}}
+    # streamed chunks are forwarded one by one
+    assert [m.get("body") for m in stream[1:]] == [b"a", b"b", b""]
+    assert stats["requests"] == 3 and stats["max_inflight"] == 2 and stats["inflight"] == 0
+    assert events == ["start", "stop"]
+
+
+def test_disconnect_cancels_the_pending_view():
+    started, cancelled = threading.Event(), threading.Event()
+
+    async def run():
+        server = asgi.create_asgi_app(_app(started, cancelled), threads=4)
+        await server.startup()
+        gone = asyncio.Event()
+        call = asyncio.ensure_future(_call(server, "GET", "/slow", disconnect=gone))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        gone.set()
+        sent = await asyncio.wait_for(call, timeout=5)
+        stats = server.stats()
+        await server.shutdown()
+        return sent, stats
+
+    sent, stats = asyncio.run(run())
+    assert cancelled.is_set()
+    assert sent == [] and stats["disconnects"] == 1
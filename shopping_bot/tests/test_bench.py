@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import anthropic
+import httpx
+import pytest
+
+from shopping_bot.bench.loadgen import percentile
+from shopping_bot.bench.stubs import StubAnthropic, StubElasticsearch, synthesize
+
+TOOL = {
+    "name": "pick",
+    "input_schema": {
+        "type": "object",
+        "properties": {"route": {"type": "string", "enum": ["product", "general"]}, "ids": {"type": "array", "items": {"type": "string"}, "minItems": 2}},
+    },
+}
+
+
+@pytest.fixture
+def llm():
+    stub = StubAnthropic(first_token_ms=0, delta_ms=0, recordings={"recorded": [{"n": 1}, {"n": 2}]}).start()
+    yield stub
+    stub.stop()
+
+
+def _client(stub: StubAnthropic) -> anthropic.Anthropic:
+    return anthropic.Anthropic(api_key="sk-ant-bench", base_url=stub.url, max_retries=0)
+
+
+def test_stub_anthropic_replays_recordings_and_synthesizes_the_rest(llm):
+    client = _client(llm)
+    recorded = {"name": "recorded", "input_schema": {"type": "object"}}
+    inputs = [
+        client.messages.create(
+            model="m", max_tokens=10, messages=[{"role": "user", "content": "x"}],
+            tools=[recorded], tool_choice={"type": "tool", "name": "recorded"},
+        ).content[0].input
+        for _ in range(3)
+    ]
+    assert inputs == [{"n": 1}, {"n": 2}, {"n": 1}]
+
+    msg = client.messages.create(
+        model="m", max_tokens=10, messages=[{"role": "user", "content": "x"}],
+        tools=[TOOL], tool_choice={"type": "tool", "name": "pick"},
+    )
+    assert msg.content[0].input == synthesize(TOOL["input_schema"]) == {"route": "product", "ids": ["bench ids", "bench ids"]}
+    assert llm.stats()["llm.pick"]["calls"] == 1
+
+
+def test_stub_anthropic_streams_tool_input_deltas(llm):
+    with _client(llm).messages.stream(
+        model="m", max_tokens=10, messages=[{"role": "user", "content": "x"}],
+        tools=[TOOL], tool_choice={"type": "tool", "name": "pick"},
+    ) as stream:
+        deltas = [e for e in stream if e.type == "content_block_delta"]
+        final = stream.get_final_message()
+    assert len(deltas) > 1
+    assert final.content[0].input["route"] == "product"
+
+
+def test_stub_elasticsearch_search_and_mget():
+    es = StubElasticsearch(latency_ms=0).start()
+    try:
+        hits = httpx.post(f"{es.url}/idx/_search", json={"size": 5, "query": {"match": {"name": "chips"}}}).json()["hits"]["hits"]
+        assert len(hits) == 5 and all(h["_source"]["id"] == h["_id"] for h in hits)
+        docs = httpx.post(f"{es.url}/idx/_mget", json={"ids": [hits[0]["_id"], "missing"]}).json()["docs"]
+        assert [d["found"] for d in docs] == [True, False]
+        assert es.stats()["es._search"]["calls"] == 1
+    finally:
+        es.stop()
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import random
+
+import pytest
+
+from shopping_bot.bench.stubs import StubElasticsearch
+from shopping_bot.data_fetchers.brand_index import BrandDictionary, BrandIndex, normalize
+from shopping_bot.data_fetchers.es_products import ElasticsearchProductsFetcher
+
+COUNTS = [
+    ("Dabur Real", 500), ("Real Good", 20), ("Amul", 900), ("Britannia", 700), ("Lay's", 650),
+    ("Haldiram's", 400), ("Too Yumm", 80), ("Yoga Bar", 120), ("Mamaearth", 300), ("Dabur", 250),
+]
+
+
+def _dump(groups, truncated=False, groups_truncated=False):
+    def agg(counts):
+        return {"sum_other_doc_count": 7 if truncated else 0, "buckets": [{"key": b, "doc_count": n} for b, n in counts]}
+
+    union = sorted({b: n for counts in groups.values() for b, n in counts}.items(), key=lambda x: -x[1])
+    return {"aggregations": {"brands": agg(union), "groups": {"sum_other_doc_count": 40 if groups_truncated else 0, "buckets": [{"key": g, "brands": agg(c)} for g, c in groups.items()]}}}
+
+
+@pytest.mark.parametrize("hint, expected", [
+    ("dabur", "Dabur"),            # exact beats the more frequent "Dabur Real"
+    ("LAYS", "Lay's"),             # case / apostrophes don't matter
+    ("real", "Dabur Real"),        # word prefix, most frequent wins (like the terms agg)
+    ("dab", "Dabur Real"),
+    ("earth", "Mamaearth"),        # infix
+    ("britania", "Britannia"),     # typo: one edit
+    ("haldirams namkeen", None),   # too far from anything
+    ("xq", None),
+    ("", None),
+])
+def test_match_tiers(hint, expected):
+    assert BrandIndex(COUNTS).match(hint) == expected
+
+
+def test_substring_matches_agree_with_the_wildcard_aggregation():
+    rng = random.Random(3)
+    alphabet = "abcdefgh "
+    counts = [("".join(rng.choice(alphabet) for _ in range(rng.randint(3, 14))).strip() or "a", rng.randint(1, 1000)) for _ in range(400)]
+    index = BrandIndex(counts)
+    ranked = sorted(counts, key=lambda x: (-x[1], x[0]))
+    for _ in range(500):
+        brand = rng.choice(counts)[0]
+        start = rng.randrange(len(brand))
+        hint = brand[start:start + rng.randint(1, 5)].strip()
+        key = normalize(hint)
+        if not key or key in {normalize(b) for b, _ in counts}:
+            continue
+        # `*hint*` over every brand, top bucket by doc_count
+        expected = next(b for b, _ in ranked if key in normalize(b))
+        assert index.match(hint) == expected, hint
+
+
+def test_dictionary_routes_by_group_and_falls_back_only_when_needed():
+    brands = BrandDictionary()
+    assert brands.suggest("amul") == (False, None)  # not loaded yet → ES
+
+    brands.load(_dump({"f_and_b": COUNTS[:6], "personal_care": [("Mamaearth", 300), ("Dove", 90)]}))
+    assert brands.suggest("dove", "personal_care") == (True, "Dove")
+    assert brands.suggest("dove", "f_and_b") == (True, None)  # complete dump: a miss is final
+    assert brands.suggest("mama") == (True, "Mamaearth")  # no group → every brand
+
+    brands.load(_dump({"f_and_b": COUNTS[:6]}, truncated=True))
+    assert brands.suggest("amul", "f_and_b") == (True, "Amul")
+    assert brands.suggest("zzzz", "f_and_b") == (False, None)  # long tail not dumped → ES
+    stats = brands.stats()
+    assert (stats["refreshes"], stats["local_hits"], stats["local_misses"], stats["es_fallbacks"]) == (2, 3, 1, 2)
+
+
+def test_unknown_group_goes_to_es_when_the_group_list_was_cut_off():
+    brands = BrandDictionary()
+    brands.load(_dump({"f_and_b": COUNTS[:6]}))
+    assert brands.suggest("dove", "pet_care") == (True, None)  # every group listed: no such products
+    assert brands.stats()["groups_complete"] is True
+
+    brands.load(_dump({"f_and_b": COUNTS[:6]}, groups_truncated=True))
+    assert brands.suggest("dove", "pet_care") == (False, None)  # may be past the top 50 groups
+    assert brands.suggest("amul", "f_and_b") == (True, "Amul")  # listed groups still answer locally
+    assert brands.stats()["groups_complete"] is False
+
+
+def test_fetcher_answers_from_the_dictionary_after_a_refresh():
+    stub = StubElasticsearch(latency_ms=0).start()
+    try:
+        fetcher = ElasticsearchProductsFetcher(base_url=stub.url, index="idx", api_key="k")
+        fetcher.brands = BrandDictionary(refresh_seconds=3600)
+        assert fetcher.suggest_brand("bingo") == "Bingo"  # ES wildcard fallback
+        assert stub.stats()["es._search"]["calls"] == 1
+
+        thread = fetcher.brands.start(fetcher.refresh_brand_index)
+        for _ in range(200):
+            if fetcher.brands.loaded:
+                break
+            thread.join(0.01)
+        fetcher.brands.stop()
+        assert fetcher.brands.stats()["groups"]["personal_care"]["brands"] > 0
+        calls = stub.stats()["es._search"]["calls"]
+
+        assert fetcher.suggest_brand("haldirams", "f_and_b") == "Haldiram's"
+        assert asyncio.run(fetcher.asuggest_brand("minimalst", "personal_care")) == "Minimalist"
+        assert stub.stats()["es._search"]["calls"] == calls
+    finally:
+        stub.stop()
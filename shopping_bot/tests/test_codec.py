@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+
+import fakeredis
+import pytest
+
+from shopping_bot.redis_manager import RedisContextManager
+from shopping_bot.utils import codec
+
+
+@pytest.fixture(autouse=True)
+def _default_codec():
+    yield
+    codec.configure()
+
+
+@pytest.mark.parametrize("name", ["orjson", "json"])
+def test_round_trip_with_header(name):
+    codec.configure(codec=name, compression="none")
+    value = {"products": [{"id": 1, "price": 9.5}], "query": "chips", 3: "int key"}
+    payload = codec.encode(value)
+    assert payload[:1] == codec.MAGIC and payload[1] == codec.VERSION
+    assert codec.decode(payload) == {"products": [{"id": 1, "price": 9.5}], "query": "chips", "3": "int key"}
+    # Non-JSON types fall back to str like json.dumps(default=str)
+    assert codec.decode(codec.encode({"at": datetime(2025, 1, 2)}))["at"].startswith("2025-01-02")
+
+
+def test_headerless_json_still_decodes():
+    before = codec.codec_stats()["legacy_decoded"]
+    assert codec.decode(json.dumps({"status": "completed"})) == {"status": "completed"}
+    assert codec.decode(b'["a"]') == ["a"]
+    assert codec.codec_stats()["legacy_decoded"] == before + 2
+
+
+def test_zstd_above_threshold():
+    pytest.importorskip("zstandard")
+    codec.configure(codec="orjson", compression="zstd", compress_min_bytes=64)
+    small, large = codec.encode({"a": 1}), codec.encode({"text": "x" * 5000})
+    assert small[3:4] == b"-" and large[3:4] == b"z"
+    assert len(large) < 200
+    assert codec.decode(large) == {"text": "x" * 5000}
+
+
+def test_unknown_codec_is_left_in_place():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    manager = RedisContextManager(client=client)
+    foreign = codec.MAGIC + bytes((codec.VERSION,)) + b"?" + b"-" + b"\x93\x01"
+    manager.raw.set("processing:p1:result", foreign)
+
+    with pytest.raises(codec.UnsupportedPayload):
+        codec.decode(foreign)
+    assert manager.get_processing_result("p1") is None
+    assert manager.raw.get("processing:p1:result") == foreign
+
+
+def test_processing_result_uses_codec_and_reads_old_json():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    manager = RedisContextManager(client=client)
+    assert manager.set_processing_result("p1", {"flow_data": {"products": [{"id": 1}]}})
+    assert manager.raw.get("processing:p1:result")[:1] == codec.MAGIC
+    assert manager.get_processing_result("p1")["flow_data"]["products"] == [{"id": 1}]
+
+    client.set("processing:p2:result", json.dumps({"text_content": "old"}))
+    assert manager.get_processing_result("p2") == {"text_content": "old"}
+
+    health = manager.health_check()
+    assert health["codec"]["encoded"] >= 1 and health["codec"]["stored_bytes"] > 0
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import pytest
+from flask import Flask
+
+from shopping_bot.routes import debug
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(debug.bp, url_prefix="/rs")
+    return app.test_client()
+
+
+def test_routes_are_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.delenv("DEBUG_TOKEN", raising=False)
+    assert client.get("/rs/debug/es/queries").status_code == 404
+    assert client.post("/rs/debug/trace/levels", json={"es_products": "DEBUG"}).status_code == 404
+    assert client.post("/rs/debug/static/reload").status_code == 404
+
+
+def test_token_must_match(client, monkeypatch):
+    monkeypatch.setenv("DEBUG_TOKEN", "s3cret")
+    assert client.get("/rs/debug/trace/levels").status_code == 403
+    assert client.get("/rs/debug/trace/levels", headers={"X-Debug-Token": "nope"}).status_code == 403
+    assert client.get("/rs/debug/trace/levels", headers={"X-Debug-Token": "s3cret"}).status_code == 200
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import fakeredis
+import pytest
+
+from shopping_bot.bench.stubs import StubElasticsearch
+from shopping_bot.data_fetchers.doc_cache import ProductDocCache
+from shopping_bot.data_fetchers.es_products import ElasticsearchProductsFetcher
+
+
+def _doc(pid: str, size: int = 10):
+    return {"id": pid, "name": "x" * size}
+
+
+def test_lru_is_bounded_by_bytes_and_hits_are_copies():
+    cache = ProductDocCache(use_redis=False, max_bytes=400)
+    cache.put_many("idx", {"a": _doc("a", 100), "b": _doc("b", 100)})
+    docs, missing = cache.get_many("idx", ["a", "b", "c"])
+    assert set(docs) == {"a", "b"} and missing == ["c"]
+    docs["a"]["name"] = "mutated"
+    assert cache.get_many("idx", ["a"])[0]["a"]["name"] == "x" * 100
+
+    cache.put_many("idx", {"c": _doc("c", 250)})  # pushes out the least recently used
+    stats = cache.stats()
+    assert stats["l1_bytes"] <= 400 and stats["evictions"] >= 1
+    assert cache.get_many("idx", ["c"])[1] == []
+
+
+def test_redis_tier_backfills_and_version_stamp_invalidates_every_worker():
+    redis = fakeredis.FakeRedis()
+    a = ProductDocCache(redis_client=redis, version_check_seconds=0)
+    b = ProductDocCache(redis_client=redis, version_check_seconds=0)
+    a.put_many("idx", {"p1": _doc("p1"), "p2": _doc("p2")})
+    docs, missing = b.get_many("idx", ["p2", "p1", "p3"])
+    assert list(docs) == ["p2", "p1"] and missing == ["p3"]
+    assert b.stats()["l2_hits"] == 2
+
+    assert a.invalidate("idx") == "1"
+    assert b.get_many("idx", ["p1"]) == ({}, ["p1"])
+    assert a.get_many("idx", ["p1"]) == ({}, ["p1"])
+    assert b.stats()["invalidations"] == 1 and b.stats()["l1_size"] == 0
+    assert a.get_many("other", ["p1"])[1] == ["p1"]
+
+
+def test_popular_ids_are_shared_through_redis():
+    redis = fakeredis.FakeRedis()
+    a = ProductDocCache(redis_client=redis, popular_flush_seconds=3600)
+    for ids in (["p1", "p2"], ["p2"], ["p2", "p3"], ["p3"]):
+        a.get_many("idx", ids)
+    a.get_many("idx", ["p9"], track=False)
+    assert not redis.exists("es:doc:popular:idx")  # lookups never flush; the background thread does
+    a.flush_popularity()
+    other_worker = ProductDocCache(redis_client=redis)
+    assert other_worker.popular("idx", 2) == ["p2", "p3"]
+    assert "p9" not in other_worker.popular("idx", 10)
+
+
+def test_async_lookups_touch_redis_off_the_event_loop():
+    threads = []
+
+    class Recording(fakeredis.FakeRedis):
+        def mget(self, *args, **kwargs):
+            threads.append(threading.get_ident())
+            return super().mget(*args, **kwargs)
+
+        def pipeline(self, *args, **kwargs):
+            threads.append(threading.get_ident())
+            return super().pipeline(*args, **kwargs)
+
+    redis = Recording()
+    writer = ProductDocCache(redis_client=redis)
+    reader = ProductDocCache(redis_client=redis)
+
+    async def main():
+        await writer.aput_many("idx", {"p1": _doc("p1")})
+        return threading.get_ident(), await reader.aget_many("idx", ["p1", "p2"], track=False)
+
+    loop_thread, (docs, missing) = asyncio.run(main())
+    assert list(docs) == ["p1"] and missing == ["p2"]
+    assert len(threads) == 2 and loop_thread not in threads
+
+
+@pytest.fixture
+def fetcher():
+    stub = StubElasticsearch(latency_ms=0).start()
+    f = ElasticsearchProductsFetcher(base_url=stub.url, index="idx", api_key="k")
+    f.docs = ProductDocCache(use_redis=False)
+    yield f, stub
+    stub.stop()
+
+
+def test_mget_fetches_only_missing_ids_in_one_request(fetcher):
+    f, stub = fetcher
+    assert [d["id"] for d in f.mget_products(["bench_00002", "bench_00001"])] == ["bench_00002", "bench_00001"]
+    docs = asyncio.run(f.amget_products(["bench_00001", "nope", "bench_00003", "bench_00002"]))
+    assert [d["id"] for d in docs] == ["bench_00001", "bench_00003", "bench_00002"]
+    assert f.search_by_ids(["bench_00003"])[0]["id"] == "bench_00003"
+    assert stub.stats()["es._mget"]["calls"] == 2
+    assert "es._search" not in stub.stats()
+    assert f.docs.stats()["l1_hits"] == 3
+
+    assert f.warm_up_docs(2) == 2  # already cached: nothing fetched
+    assert stub.stats()["es._mget"]["calls"] == 2
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Dict
+
+from shopping_bot.data_fetchers.es_cache import SearchResultCache, canonical_query_key
+
+
+class _DictRedis:
+    def __init__(self):
+        self.data: Dict[str, str] = {}
+
+    def get(self, key: str):
+        return self.data.get(key)
+
+    def setex(self, key: str, ttl: int, value: str):
+        self.data[key] = value
+        return True
+
+
+def _ok(n: int) -> Dict[str, Any]:
+    return {"meta": {"total_hits": n, "query_successful": True}, "products": [{"id": str(i)} for i in range(n)]}
+
+
+def test_key_ignores_dict_order():
+    a = {"query": {"bool": {"filter": [1], "should": [2]}}, "size": 10}
+    b = {"size": 10, "query": {"bool": {"should": [2], "filter": [1]}}}
+    assert canonical_query_key("idx", a) == canonical_query_key("idx", b)
+    assert canonical_query_key("idx", a) != canonical_query_key("other", a)
+
+
+def test_hits_are_independent_copies():
+    cache = SearchResultCache(use_redis=False)
+    cache.set("k", _ok(2))
+    first = cache.get("k")
+    first["meta"]["fallback_applied"] = "price_any"
+    assert "fallback_applied" not in cache.get("k")["meta"]
+    assert cache.stats()["l1_hits"] == 2
+
+
+def test_lru_bound_and_failed_results_not_cached():
+    cache = SearchResultCache(use_redis=False, max_entries=2)
+    cache.set("a", _ok(1))
+    cache.set("b", _ok(1))
+    cache.get("a")  # refresh a
+    cache.set("c", _ok(1))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    cache.set("err", {"meta": {"query_successful": False}, "products": []})
+    assert cache.get("err") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_redis_tier_backfills_local():
+    shared = _DictRedis()
+    writer = SearchResultCache(redis_client=shared)
+    reader = SearchResultCache(redis_client=shared)
+    writer.set("k", _ok(3))
+    assert reader.get("k")["meta"]["total_hits"] == 3
+    assert reader.get("k") is not None
+    stats = reader.stats()
+    assert (stats["l2_hits"], stats["l1_hits"]) == (1, 1)
+
+
+def test_disabled_cache_is_a_noop():
+    cache = SearchResultCache(enabled=False, use_redis=False)
+    cache.set("k", _ok(1))
+    assert cache.get("k") is None
+
+
+def test_async_variants_use_redis_off_the_event_loop():
+    shared = _DictRedis()
+    threads = []
+    get, setex = shared.get, shared.setex
+    shared.get = lambda key: threads.append(threading.get_ident()) or get(key)
+    shared.setex = lambda key, ttl, value: threads.append(threading.get_ident()) or setex(key, ttl, value)
+
+    async def main():
+        await SearchResultCache(redis_client=shared).aset("k", _ok(2))
+        return threading.get_ident(), await SearchResultCache(redis_client=shared).aget("k")
+
+    loop_thread, hit = asyncio.run(main())
+    assert hit["meta"]["total_hits"] == 2
+    assert len(threads) == 2 and loop_thread not in threads
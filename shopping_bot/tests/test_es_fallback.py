@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from shopping_bot.data_fetchers.es_products import _run_fallback_ladder
+
+
+def _result(hits: int) -> Dict[str, Any]:
+    return {"meta": {"total_hits": hits, "returned": hits}, "products": [{}] * hits}
+
+
+class _FakeFetcher:
+    """Answers from a label → hit-count table; records how it was called."""
+
+    def __init__(self, table: Dict[str, int]):
+        self.table = table
+        self.search_calls: List[str] = []
+        self.msearch_calls = 0
+
+    async def asearch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.search_calls.append(params["label"])
+        await asyncio.sleep(0)
+        return _result(self.table[params["label"]])
+
+    async def amsearch(self, params_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self.msearch_calls += 1
+        return [_result(self.table[p["label"]]) for p in params_list]
+
+
+STEPS = [(label, {"label": label}) for label in ("price_any", "drop_hard_soft", "sibling_l2", "drop_category")]
+
+
+@pytest.mark.parametrize("mode", ["sequential", "concurrent", "msearch"])
+def test_ladder_keeps_highest_priority_hit(mode: str):
+    fetcher = _FakeFetcher({"price_any": 0, "drop_hard_soft": 0, "sibling_l2": 3, "drop_category": 9})
+    res = asyncio.run(_run_fallback_ladder(fetcher, STEPS, mode=mode))
+    assert res["meta"]["fallback_applied"] == "sibling_l2"
+    assert res["meta"]["total_hits"] == 3
+
+
+@pytest.mark.parametrize("mode", ["sequential", "concurrent", "msearch"])
+def test_ladder_all_empty_returns_none(mode: str):
+    fetcher = _FakeFetcher({label: 0 for label, _ in STEPS})
+    assert asyncio.run(_run_fallback_ladder(fetcher, STEPS, mode=mode)) is None
+
+
+def test_msearch_mode_is_one_round_trip():
+    fetcher = _FakeFetcher({"price_any": 0, "drop_hard_soft": 2, "sibling_l2": 0, "drop_category": 0})
+    asyncio.run(_run_fallback_ladder(fetcher, STEPS, mode="msearch"))
+    assert fetcher.msearch_calls == 1
+    assert fetcher.search_calls == []
+
+
+def test_sequential_mode_stops_at_first_hit():
+    fetcher = _FakeFetcher({"price_any": 0, "drop_hard_soft": 2, "sibling_l2": 5, "drop_category": 0})
+    asyncio.run(_run_fallback_ladder(fetcher, STEPS, mode="sequential"))
+    assert fetcher.search_calls == ["price_any", "drop_hard_soft"]
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from shopping_bot.bench.stubs import StubElasticsearch
+from shopping_bot.data_fetchers import es_templates
+from shopping_bot.data_fetchers.es_cache import SearchResultCache
+from shopping_bot.data_fetchers.es_products import ElasticsearchProductsFetcher, _build_enhanced_es_query, _build_skin_es_query
+from shopping_bot.scoring_config import build_function_score_functions
+
+FNB = {"q": "chips", "category_group": "f_and_b", "category_path": "f_and_b/food/light_bites/chips_and_crisps", "price_max": 100}
+SKIN = {"q": "face wash", "category_group": "personal_care", "skin_types": ["oily"], "brands": ["Cetaphil"]}
+
+
+def test_builders_share_frozen_fragments_without_touching_params():
+    params = dict(FNB)
+    a = _build_enhanced_es_query(params)
+    b = _build_enhanced_es_query(dict(FNB, q="crisps"))
+    assert params == FNB
+    functions = a["query"]["function_score"]["functions"]
+    assert functions is b["query"]["function_score"]["functions"] is es_templates.scoring_functions("chips_and_crisps")
+    assert json.loads(json.dumps(functions)) == build_function_score_functions("chips_and_crisps")
+    assert a["_source"] is es_templates.FNB_SOURCE
+    with pytest.raises(TypeError):
+        functions.append({})
+    assert _build_skin_es_query(dict(SKIN))["highlight"] is es_templates.SKIN_HIGHLIGHT
+
+
+def test_template_request_covers_shared_shapes_only():
+    tpl, params = es_templates.template_request(_build_enhanced_es_query(dict(FNB)))
+    assert tpl.id.startswith("shopbot-fnb-chips-and-crisps-hl-")
+    assert set(params) == {"size", "track_total_hits", "min_score", "query"}
+    assert "{{#toJson}}query{{/toJson}}" in tpl.source and "script_score" in tpl.source
+    assert es_templates.template_request(_build_skin_es_query(dict(SKIN)))[0].id.startswith("shopbot-pc-hl-")
+
+    macro = _build_enhanced_es_query(dict(FNB, macro_filters=[{"nutrient_name": "protein g", "operator": "gt", "value": 5, "priority": "soft"}]))
+    assert len(macro["query"]["function_score"]["functions"]) > len(es_templates.scoring_functions("chips_and_crisps"))
+    assert es_templates.template_request(macro) is None  # request-specific soft boosts go inline
+    assert es_templates.template_request(_build_enhanced_es_query({})) is None  # plain bool, no function_score
+
+
+@pytest.fixture
+def es(monkeypatch):
+    monkeypatch.setattr(es_templates, "STORED_TEMPLATES", True)
+    stub = StubElasticsearch(latency_ms=0).start()
+    yield stub
+    stub.stop()
+
+
+def test_fetcher_registers_once_and_sends_template_requests(es):
+    fetcher = ElasticsearchProductsFetcher(base_url=es.url, index="idx", api_key="k")
+    fetcher.cache = SearchResultCache(enabled=False)
+    assert fetcher.search(dict(FNB))["meta"]["returned"] == 10
+    assert asyncio.run(fetcher.asearch(dict(FNB, q="crisps")))["meta"]["returned"] == 10
+    results = fetcher.msearch([dict(FNB, q="nachos"), dict(SKIN)])
+    assert [r["meta"]["returned"] for r in results] == [10, 10]
+
+    stats = es.stats()
+    assert stats["es._scripts"]["calls"] == 2  # F&B chips + personal care, each registered once
+    assert stats["es._search/template"]["calls"] == 2
+    assert stats["es._msearch/template"]["calls"] == 1
+    assert "es._search" not in stats
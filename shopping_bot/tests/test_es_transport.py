@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import asyncio
+
+from shopping_bot.bench.stubs import StubElasticsearch
+from shopping_bot.data_fetchers.es_transport import ESTransport
+
+
+def test_per_request_loops_close_their_sessions():
+    stub = StubElasticsearch(latency_ms=0).start()
+    transport = ESTransport({}, timeout=5)
+    sessions = []
+
+    async def request():
+        await transport.apost(f"{stub.url}/idx/_search", {"query": {"match_all": {}}})
+        await transport.apost(f"{stub.url}/idx/_search", {"query": {"match_all": {}}})
+        sessions.append(await transport._get_aio_session())
+
+    try:
+        asyncio.run(request())  # what flask[async] does for every async view under WSGI
+        asyncio.run(request())
+        assert sessions[0] is not sessions[1]
+        assert all(s.closed for s in sessions)
+        assert len(transport._aio_sessions) == 1  # the first loop's entry was pruned
+    finally:
+        transport.close()
+        stub.stop()
+
+
+def test_one_loop_reuses_its_session_until_aclose():
+    transport = ESTransport({}, timeout=5)
+
+    async def main():
+        first = await transport._get_aio_session()
+        again = await transport._get_aio_session()
+        await transport.aclose()
+        return first, again
+
+    first, again = asyncio.run(main())
+    assert first is again and first.closed
+    assert transport._aio_sessions == {}
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from shopping_bot import data_fetchers
+from shopping_bot.data_fetchers import FetcherDependencyError, register_fetcher, run_fetchers
+from shopping_bot.enums import BackendFunction
+
+SEARCH = BackendFunction.SEARCH_PRODUCTS
+PROFILE = BackendFunction.FETCH_USER_PROFILE
+HISTORY = BackendFunction.FETCH_PURCHASE_HISTORY
+
+
+@pytest.fixture(autouse=True)
+def _restore_registry():
+    saved = (dict(data_fetchers._REGISTRY), dict(data_fetchers._DEPENDENCIES), dict(data_fetchers._TIMEOUTS))
+    yield
+    for table, old in zip((data_fetchers._REGISTRY, data_fetchers._DEPENDENCIES, data_fetchers._TIMEOUTS), saved):
+        table.clear()
+        table.update(old)
+
+
+def _sleeper(name, delay, log):
+    async def handler(ctx):
+        log.append(("start", name))
+        await asyncio.sleep(delay)
+        log.append(("end", name))
+        ctx.fetched_data[name] = {"data": name}
+        return name
+    return handler
+
+
+def test_independent_fetchers_overlap():
+    log = []
+    register_fetcher(SEARCH, _sleeper("search", 0.1, log))
+    register_fetcher(PROFILE, _sleeper("profile", 0.1, log))
+    register_fetcher(HISTORY, _sleeper("history", 0.1, log))
+    ctx = SimpleNamespace(fetched_data={})
+
+    start = time.perf_counter()
+    outcomes = asyncio.run(run_fetchers([SEARCH, PROFILE, HISTORY], ctx))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.25
+    assert list(outcomes) == [SEARCH, PROFILE, HISTORY]
+    assert [o.result for o in outcomes.values()] == ["search", "profile", "history"]
+
+
+def test_dependents_wait_and_see_results_recorded_by_on_done():
+    log = []
+    seen = {}
+    register_fetcher(PROFILE, _sleeper("profile", 0.05, log))
+
+    async def search(ctx):
+        seen["profile"] = ctx.fetched_data.get("recorded")
+        return "search"
+
+    register_fetcher(SEARCH, search, depends_on=[PROFILE])
+    ctx = SimpleNamespace(fetched_data={})
+
+    def on_done(func, outcome):
+        if func is PROFILE:
+            ctx.fetched_data["recorded"] = outcome.result
+
+    outcomes = asyncio.run(run_fetchers([SEARCH, PROFILE], ctx, on_done=on_done))
+    assert outcomes[SEARCH].ok and seen["profile"] == "profile"
+
+
+def test_timeout_and_failed_dependency_are_reported_not_raised():
+    log = []
+    register_fetcher(PROFILE, _sleeper("profile", 1.0, log), timeout_s=0.05)
+    register_fetcher(SEARCH, _sleeper("search", 0, log), depends_on=[PROFILE])
+    register_fetcher(HISTORY, _sleeper("history", 0, log))
+
+    outcomes = asyncio.run(run_fetchers([SEARCH, PROFILE, HISTORY], SimpleNamespace(fetched_data={})))
+    assert isinstance(outcomes[PROFILE].error, asyncio.TimeoutError)
+    assert isinstance(outcomes[SEARCH].error, FetcherDependencyError)
+    assert outcomes[HISTORY].ok
+    assert ("start", "search") not in log
+
+
+def test_cancelling_the_caller_cancels_running_fetchers():
+    cancelled = []
+
+    async def slow(ctx):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    register_fetcher(SEARCH, slow)
+
+    async def main():
+        task = asyncio.ensure_future(run_fetchers([SEARCH], SimpleNamespace(fetched_data={})))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert cancelled == [True]
+
+
+def test_dependency_cycle_is_rejected():
+    log = []
+    register_fetcher(SEARCH, _sleeper("search", 0, log), depends_on=[PROFILE])
+    register_fetcher(PROFILE, _sleeper("profile", 0, log), depends_on=[SEARCH])
+    with pytest.raises(ValueError):
+        asyncio.run(run_fetchers([SEARCH, PROFILE], SimpleNamespace(fetched_data={})))
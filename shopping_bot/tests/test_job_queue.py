@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import fakeredis
+
+from shopping_bot.utils.job_queue import JobQueue
+
+
+def _queue(redis, **kwargs) -> JobQueue:
+    kwargs.setdefault("block_ms", 50)
+    return JobQueue(redis, "test", **kwargs)
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_interactive_lane_is_claimed_before_prefetch():
+    q = _queue(fakeredis.FakeRedis())
+    q.enqueue("job", {"n": 1}, lane="prefetch")
+    q.enqueue("job", {"n": 2}, lane="interactive")
+    first = q.claim(1)
+    assert [lane for lane, *_ in first] == ["interactive"]
+    stats = q.stats()["lanes"]
+    assert stats["interactive"] == {**stats["interactive"], "depth": 0, "pending": 1}
+    assert stats["prefetch"]["depth"] == 1 and stats["prefetch"]["oldest_waiting_s"] >= 0
+
+
+def test_consumer_runs_jobs_with_bounded_concurrency():
+    q = _queue(fakeredis.FakeRedis(), concurrency=2)
+    running, peak, done = [0], [0], []
+
+    async def handler(payload):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+        done.append(payload["n"])
+
+    q.register("job", handler)
+    for n in range(6):
+        q.enqueue("job", {"n": n})
+    q.start()
+    try:
+        _wait_for(lambda: len(done) == 6)
+    finally:
+        q.stop()
+    assert sorted(done) == list(range(6))
+    assert peak[0] == 2
+    stats = q.stats()
+    assert stats["completed"] == 6 and stats["lanes"]["interactive"] == {**stats["lanes"]["interactive"], "depth": 0, "pending": 0}
+
+
+def test_abandoned_job_is_reclaimed_by_another_consumer():
+    redis = fakeredis.FakeRedis()
+    dead_worker = _queue(redis, consumer="a:1", visibility_s=0.05)
+    dead_worker.enqueue("job", {"n": 1})
+    assert len(dead_worker.claim(1)) == 1  # claimed, then the worker "dies" without acking
+
+    survivor = _queue(redis, consumer="b:2", visibility_s=0.05)
+    assert survivor.claim(1) == []  # still inside the visibility window
+    time.sleep(0.1)
+    [(lane, _id, fields, deliveries)] = survivor.claim(1)
+    assert lane == "interactive" and deliveries == 2 and survivor.stats()["reclaimed"] == 1
+
+
+def test_failing_job_is_retried_then_dead_lettered():
+    q = _queue(fakeredis.FakeRedis(), max_attempts=2)
+    attempts = []
+
+    async def handler(payload):
+        attempts.append(payload["n"])
+        raise RuntimeError("boom")
+
+    q.register("job", handler)
+    q.enqueue("job", {"n": 7})
+    for _ in range(2):
+        [(lane, entry_id, fields, deliveries)] = q.claim(1)
+        asyncio.run(q._run(lane, entry_id, fields, deliveries))
+    stats = q.stats()
+    assert attempts == [7, 7]
+    assert (stats["retried"], stats["dead"]) == (1, 1)
+    assert stats["lanes"]["interactive"]["depth"] == 0
+    [(_id, dead)] = q._redis.xrange(q.dead_stream)
+    assert dead[b"last_error"] == b"RuntimeError: boom" and dead[b"attempt"] == b"2"
+
+
+def test_stats_are_read_only():
+    redis = fakeredis.FakeRedis()
+    stats = _queue(redis).stats()
+    assert redis.keys("*") == []  # a health check must not create streams or groups
+    assert all(lane == {"depth": 0, "pending": 0, "oldest_waiting_s": 0.0, "oldest_pending_s": 0.0} for lane in stats["lanes"].values())
+    assert stats["dead"] == 0 and stats["running"] is False
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+import random
+from types import SimpleNamespace as NS
+
+from shopping_bot.streaming import ToolStreamAccumulator
+from shopping_bot.streaming.json_stream import JSONStreamParser, match, path_str
+
+DOC = {
+    "ask_slots": [{"slot_name": "ASK_USER_BUDGET", "message": 'Your "budget"?\n', "options": ["Under ₹50", "₹50+"]}],
+    "n": [1, -2.5e3, True, None, {}, []],
+    "emoji": "\U0001F600 \\ done",
+}
+
+
+def _replay(parser: JSONStreamParser, chunks):
+    closed = {}
+    for chunk in chunks:
+        for kind, path, value in parser.feed(chunk):
+            if kind in ("string_end", "scalar"):
+                closed[path] = value
+    for kind, path, value in parser.close():
+        closed[path] = value
+    return closed
+
+
+def test_parser_survives_a_split_at_every_offset():
+    for ensure_ascii in (True, False):
+        text = json.dumps(DOC, ensure_ascii=ensure_ascii)
+        for i in range(len(text) + 1):
+            parser = JSONStreamParser()
+            closed = _replay(parser, [text[:i], text[i:]])
+            assert parser.complete and parser.error is None
+            assert closed[("ask_slots", 0, "message")] == 'Your "budget"?\n'
+            assert closed[("emoji",)] == DOC["emoji"]
+            assert closed[("n", 1)] == -2500.0
+
+
+def test_string_fragments_reassemble_to_the_value():
+    text = json.dumps({"simple_response": {"message": 'a "quoted" reply é'}})
+    parser = JSONStreamParser()
+    fragments = []
+    for i in range(0, len(text), 3):
+        fragments += [v for k, p, v in parser.feed(text[i:i + 3]) if k == "string" and p == ("simple_response", "message")]
+    assert "".join(fragments) == 'a "quoted" reply é'
+
+
+def test_malformed_input_sets_error_instead_of_raising():
+    parser = JSONStreamParser()
+    parser.feed('{"a": [1, }')
+    assert parser.error is not None
+    assert parser.feed('"more"') == []
+
+
+def test_path_patterns():
+    assert match(("ask", "ASK_USER_BUDGET", "message"), "ask.*.message")
+    assert match(("product_ids", 3), "product_ids[]")
+    assert not match(("product_ids", "x"), "product_ids[]")
+    assert match(("ux", "summary_message_part_2"), "**.summary_message_part_2")
+    assert path_str(("ask", "budget", "options", 2)) == "ask.budget.options[2]"
+
+
+def _stream(payload, seed=0):
+    text = json.dumps(payload)
+    rng = random.Random(seed)
+    acc = ToolStreamAccumulator()
+    outputs = acc.process_event(NS(type="content_block_start", content_block=NS(type="tool_use", name="t", id="tu_1")))
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 9)
+        delta = NS(type="input_json_delta", partial_json=text[i:i + size])
+        outputs += acc.process_event(NS(type="content_block_delta", delta=delta))
+        i += size
+    outputs += acc.process_event(NS(type="content_block_stop"))
+    return outputs
+
+
+def test_accumulator_emits_slot_messages_and_options_once():
+    payload = {"route": "product", "ask_slots": [
+        {"slot_name": "ASK_USER_BUDGET", "message": 'What\'s your "budget"?', "options": ["Under ₹50", "₹50-100"]},
+        {"message": "Any dietary needs?", "slot_name": "ASK_DIETARY_REQUIREMENTS", "options": ["Vegan"]},
+    ]}
+    outputs = _stream(payload)
+    asks = [(o["slot_name"], o["text"]) for o in outputs if o["type"] == "ask_message"]
+    assert asks == [("ASK_USER_BUDGET", 'What\'s your "budget"?'), ("ASK_DIETARY_REQUIREMENTS", "Any dietary needs?")]
+    options = [o["options"] for o in outputs if o["type"] == "ask_options" and o["slot_name"] == "ASK_USER_BUDGET"]
+    assert options == [["Under ₹50"], ["Under ₹50", "₹50-100"]]
+    assert outputs[-1]["type"] == "tool_complete" and outputs[-1]["input"] == payload
+
+
+def test_accumulator_streams_text_deltas_and_arrays():
+    payload = {
+        "summary_message_part_1": "Line one\nwith \"quotes\"",
+        "product_ids": ["p1", "p2"],
+        "hero_product_id": "p1",
+        "quick_replies": ["Cheaper", "Why?"],
+    }
+    outputs = _stream(payload, seed=3)
+    text = "".join(o["text"] for o in outputs if o["type"] == "summary_part_delta")
+    assert text == payload["summary_message_part_1"]
+    assert [o["product_ids"] for o in outputs if o["type"] == "product_ids"][-1] == ["p1", "p2"]
+    assert [o["hero_product_id"] for o in outputs if o["type"] == "hero_product"] == ["p1"]
+    assert [o["quick_replies"] for o in outputs if o["type"] == "quick_replies"][-1] == ["Cheaper", "Why?"]
+
+    simple = _stream({"simple_response": {"message": "Hello! How can I help?", "response_type": "friendly_chat"}}, seed=5)
+    assert "".join(o["text"] for o in simple if o["type"] == "simple_response_delta") == "Hello! How can I help?"
+    assert not [o for o in simple if o["type"] == "ask_message"]
+
+
+def test_one_delta_returns_every_output_it_completes():
+    payload = {"product_ids": ["p1", "p2", "p3"], "quick_replies": ["Cheaper", "Why?"], "hero_product_id": "p2"}
+    acc = ToolStreamAccumulator()
+    acc.process_event(NS(type="content_block_start", content_block=NS(type="tool_use", name="t", id="tu_1")))
+    delta = NS(type="input_json_delta", partial_json=json.dumps(payload))  # one delta completes six outputs
+    outputs = acc.process_event(NS(type="content_block_delta", delta=delta))
+    assert [o["type"] for o in outputs] == ["product_ids"] * 3 + ["quick_replies"] * 2 + ["hero_product"]
+    assert outputs[2]["product_ids"] == ["p1", "p2", "p3"]
+    [complete] = acc.process_event(NS(type="content_block_stop"))
+    assert complete["type"] == "tool_complete" and complete["input"] == payload
+    assert acc.process_event(NS(type="message_stop")) == []
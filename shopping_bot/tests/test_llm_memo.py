@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import fakeredis
+
+from shopping_bot import llm_service
+from shopping_bot.models import UserContext
+from shopping_bot.utils.llm_memo import KEY_PREFIX, LLMMemo
+
+TOOL = {"name": "classify_and_assess", "input_schema": {"type": "object"}}
+
+
+def _memo(**kwargs) -> LLMMemo:
+    return LLMMemo(redis_client=fakeredis.FakeRedis(), **kwargs)
+
+
+def _run(memo: LLMMemo, text: str, answer, calls: list, call: str = "classify_and_assess", sources=(TOOL,)):
+    async def live():
+        calls.append(text)
+        return answer
+
+    return asyncio.run(memo.run(call, model="m", material={"text": text, "slots": {"budget": None}}, live=live, sources=sources))
+
+
+def test_on_mode_serves_normalized_repeats_from_redis():
+    memo = _memo(default_mode="on", ttls={"classify_and_assess": 120})
+    calls: list = []
+    first = _run(memo, "Show me  healthy chips", {"route": "product"}, calls)
+    first["mutated"] = True
+    second = _run(memo, "show me healthy chips ", {"route": "other"}, calls)
+
+    assert calls == ["Show me  healthy chips"]
+    assert second == {"route": "product"}
+    key = memo.key("classify_and_assess", model="m", material={"text": "show me healthy chips", "slots": {"budget": None}}, sources=(TOOL,))
+    assert 0 < memo._redis.ttl(KEY_PREFIX + key) <= 120
+    assert memo.stats()["classify_and_assess"]["hits"] == 1
+
+
+def test_shadow_mode_always_calls_live_and_counts_agreement():
+    memo = _memo(default_mode="shadow")
+    calls: list = []
+    _run(memo, "chips", {"route": "product"}, calls)
+    served = _run(memo, "chips", {"route": "product"}, calls)
+    _run(memo, "chips", {"route": "support"}, calls)
+
+    assert len(calls) == 3 and served == {"route": "product"}
+    stats = memo.stats()["classify_and_assess"]
+    assert stats["shadow_agree"] == 1 and stats["shadow_disagree"] == 1
+    assert stats["shadow_agreement"] == 0.5
+
+
+def test_inputs_template_and_mode_are_respected():
+    memo = _memo(default_mode="on", modes={"classify_follow_up": "off"})
+    calls: list = []
+    _run(memo, "chips", None, calls)  # fallbacks are never stored
+    _run(memo, "chips", {"a": 1}, calls)
+    _run(memo, "chips", {"a": 1}, calls, sources=({"name": "classify_and_assess", "v": 2},))  # schema changed
+    _run(memo, "chips", {"a": 1}, calls, call="classify_follow_up")
+    _run(memo, "chips", {"a": 1}, calls, call="classify_follow_up")
+
+    assert len(calls) == 5
+    assert _run(memo, "chips", {"a": 2}, calls) == {"a": 1}
+
+
+def test_redis_failures_fall_back_to_live():
+    class Broken:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def set(self, *args, **kwargs):
+            raise ConnectionError("down")
+
+    memo = LLMMemo(default_mode="on", redis_client=Broken())
+    calls: list = []
+    assert _run(memo, "chips", {"a": 1}, calls) == {"a": 1}
+    assert memo.stats()["classify_and_assess"]["redis_errors"] == 2
+
+
+def test_redis_calls_run_off_the_event_loop_thread():
+    threads = []
+
+    class Recording(fakeredis.FakeRedis):
+        def get(self, *args, **kwargs):
+            threads.append(threading.get_ident())
+            return super().get(*args, **kwargs)
+
+    memo = LLMMemo(default_mode="on", redis_client=Recording())
+    loop_thread = []
+
+    async def live():
+        loop_thread.append(threading.get_ident())
+        return {"a": 1}
+
+    asyncio.run(memo.run("classify_and_assess", model="m", material={"text": "chips"}, live=live))
+    assert threads and loop_thread and threads[0] != loop_thread[0]
+
+
+def test_follow_up_key_ignores_session_fields_the_prompt_does_not_show(monkeypatch):
+    memo = _memo(default_mode="on")
+    monkeypatch.setattr(llm_service, "llm_memo", lambda: memo)
+    calls = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            calls.append(kwargs["messages"][0]["content"])
+            block = SimpleNamespace(type="tool_use", name="classify_follow_up", input={"is_follow_up": True, "reason": "r", "patch": {"slots": {}}})
+            return SimpleNamespace(content=[block])
+
+    service = llm_service.LLMService.__new__(llm_service.LLMService)
+    service.anthropic = SimpleNamespace(messages=Messages())
+    ctx = UserContext(user_id="u", session_id="s", session={"canonical_query": "chips", "debug": {"turn": 1}})
+
+    asyncio.run(service.classify_follow_up("baked ones", ctx))
+    ctx.session["debug"] = {"turn": 2}
+    ctx.session["last_recommendation"] = {"products": ["p1"]}
+    asyncio.run(service.classify_follow_up("baked ones", ctx))
+    ctx.session["price_max"] = 100
+    asyncio.run(service.classify_follow_up("baked ones", ctx))
+
+    assert len(calls) == 2
+    assert '"debug"' not in calls[0] and '"price_max": 100' in calls[1]
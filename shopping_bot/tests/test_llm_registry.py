@@ -0,0 +1,42 @@
+import asyncio
+import copy
+import json
+
+import pytest
+
+from shopping_bot import llm_registry
+
+
+def test_static_data_is_read_only_and_serializable():
+    data = llm_registry.get_static_data()
+    assert data.fnb_l2 and data.fnb_prompt and data.personal_care
+    with pytest.raises(TypeError):
+        data.fnb_l2["new_l2"] = []
+    some_l2 = next(iter(data.fnb_l2))
+    with pytest.raises(TypeError):
+        data.fnb_l2[some_l2].append("x")
+    # Still usable as plain JSON / copyable into mutable structures
+    assert json.loads(json.dumps(data.fnb_prompt)) == data.fnb_prompt
+    clone = copy.deepcopy(data.personal_care)
+    clone["extra"] = {}
+    assert "extra" not in data.personal_care
+
+
+def test_reload_runs_callbacks_and_replaces_data():
+    calls = []
+    llm_registry.on_reload(lambda: calls.append(1))
+    before = llm_registry.get_static_data()
+    after = llm_registry.reload_static_data()
+    assert calls == [1]
+    assert after is llm_registry.get_static_data() and after is not before
+    assert after.fnb_l2 == before.fnb_l2
+
+
+def test_one_client_per_event_loop():
+    async def two_lookups():
+        return llm_registry.get_anthropic_client(), llm_registry.get_anthropic_client()
+
+    a1, a2 = asyncio.run(two_lookups())
+    b1, _ = asyncio.run(two_lookups())
+    assert a1 is a2
+    assert b1 is not a1
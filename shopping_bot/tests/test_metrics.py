@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+import fakeredis
+import pytest
+
+from shopping_bot.utils import codec, metrics
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", True)
+    monkeypatch.setattr(metrics, "_registry", metrics.Registry(buckets=(0.01, 0.1, 1.0)))
+    publisher = metrics._Publisher()
+    publisher._pid = os.getpid()  # no flusher thread in tests
+    publisher._redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(metrics, "_publisher", publisher)
+    return publisher
+
+
+def test_disabled_span_and_timed_are_free(monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", False)
+
+    def fn():
+        return 1
+
+    assert metrics.timed("x")(fn) is fn
+    assert metrics.span("x", a=1) is metrics._NOOP
+
+
+def test_span_histogram_and_error_counter_render(enabled):
+    with metrics.span("es.search"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("llm", call='say "hi"'):
+            raise ValueError("boom")
+    metrics.observe("redis.load", 0.5)
+
+    @metrics.timed("webhook.post")
+    async def post():
+        return True
+
+    assert asyncio.run(post()) is True
+    metrics.inc("shopbot_es_fallback_applied_total", step="price_any")
+
+    text = metrics.render(metrics.merge([metrics._registry.snapshot()]))
+    assert "# TYPE shopbot_stage_seconds histogram" in text
+    assert 'shopbot_stage_seconds_bucket{stage="redis.load",le="0.1"} 0' in text
+    assert 'shopbot_stage_seconds_bucket{stage="redis.load",le="1"} 1' in text
+    assert 'shopbot_stage_seconds_bucket{stage="redis.load",le="+Inf"} 1' in text
+    assert 'shopbot_stage_seconds_sum{stage="redis.load"} 0.5' in text
+    assert 'shopbot_stage_seconds_count{stage="webhook.post"} 1' in text
+    assert 'shopbot_stage_errors_total{stage="llm",call="say \\"hi\\""} 1' in text
+    assert 'shopbot_es_fallback_applied_total{step="price_any"} 1' in text
+    assert "es.search" in text and 'shopbot_stage_errors_total{stage="es.search"}' not in text
+
+
+def test_scrape_merges_fresh_workers_and_retires_stale_ones(enabled):
+    other = metrics.Registry(buckets=(0.01, 0.1, 1.0))
+    other.observe(metrics.STAGE_HISTOGRAM, (("stage", "redis.save"),), 0.05)
+    redis = enabled._redis
+    redis.hset(enabled.key(), "1", codec.encode({"ts": time.time(), **other.snapshot()}))
+    redis.hset(enabled.key(), "2", codec.encode({"ts": time.time() - 10 * metrics.METRICS_STALE_SECONDS, **other.snapshot()}))
+
+    metrics.observe("redis.save", 0.005)
+    text = metrics.render_metrics()
+
+    assert 'shopbot_stage_seconds_count{stage="redis.save"} 3' in text  # the dead worker's samples are kept
+    assert 'shopbot_stage_seconds_bucket{stage="redis.save",le="0.01"} 1' in text
+    assert "shopbot_metrics_workers 2" in text
+    assert set(redis.hkeys(enabled.key())) == {b"1", b"retired", str(os.getpid()).encode()}
+    assert 'shopbot_stage_seconds_count{stage="redis.save"} 3' in metrics.render_metrics()  # folded once
+
+
+def test_recycled_workers_never_make_totals_go_backwards(enabled):
+    redis = enabled._redis
+    seen = []
+    for generation in range(3):
+        worker = metrics.Registry(buckets=(0.01, 0.1, 1.0))
+        for _ in range(generation + 1):
+            worker.inc("shopbot_requests_total", ())
+        redis.hset(enabled.key(), f"w{generation}", codec.encode({"ts": time.time(), **worker.snapshot()}))
+        seen.append(metrics.render_metrics())
+        # the worker is recycled: its last snapshot goes stale
+        redis.hset(enabled.key(), f"w{generation}", codec.encode({"ts": 0, **worker.snapshot()}))
+
+    totals = [next(line for line in text.splitlines() if line.startswith("shopbot_requests_total")) for text in seen]
+    assert totals == ["shopbot_requests_total 1", "shopbot_requests_total 3", "shopbot_requests_total 6"]
+
+
+def test_scrape_without_redis_serves_local_numbers(enabled):
+    enabled._redis = None
+    enabled._redis_failed_at = time.monotonic()
+    metrics.observe("envelope", 0.002, builder="fe")
+    text = metrics.render_metrics()
+    assert 'shopbot_stage_seconds_count{stage="envelope",builder="fe"} 1' in text
+    assert "shopbot_metrics_workers 1" in text
@@ -0,0 +1,88 @@
+from shopping_bot.data_fetchers.product_record import (
+    DICT_FIELDS,
+    LLM_TEXT_LIMIT,
+    Product,
+    fe_view,
+    llm_view,
+)
+
+
+def _hit(**source):
+    src = {
+        "id": "p1",
+        "name": "  Baked <b>Ragi</b>\n Chips ",
+        "brand": "Crunchy",
+        "price": 99,
+        "category_group": "f_and_b",
+        "category_paths": ["f_and_b/food/light_bites/chips"],
+        "description": "word " * 200,
+        "category_data": {"nutritional": {"nutri_breakdown": {"protein_g": 7, "energy_kcal": 480}}},
+        "package_claims": {"health_claims": "not a list", "dietary_labels": ["VEGAN"]},
+        "stats": {
+            "adjusted_score_percentiles": {"subcategory_percentile": 82.5},
+            "protein_percentiles": {"subcategory_percentile": 70},
+            "sugar_penalty_percentiles": {"subcategory_percentile": 12},
+        },
+        "hero_image": {"256": "small.jpg", "640": "large.jpg"},
+        "review_stats": {"avg_rating": 4.2, "total_reviews": 31},
+    }
+    src.update(source)
+    return {"_score": 3.14159, "_source": src, "highlight": {"name": ["<em>Ragi</em> Chips"]}}
+
+
+def test_to_dict_keeps_legacy_shape():
+    out = Product.from_hit(_hit(), rank=1).to_dict()
+    assert list(out) == list(DICT_FIELDS) + ["highlight"]
+    assert out["score"] == 3.142
+    assert out["name"] == "Baked Ragi Chips"
+    assert out["category"] == "f_and_b"
+    assert out["protein_g"] == 7 and out["carbs_g"] is None and out["calories"] == 480
+    assert out["health_claims"] == [] and out["dietary_labels"] == ["VEGAN"]
+    assert out["flean_percentile"] == 82.5
+    assert out["bonus_percentiles"] == {"protein": 70}
+    assert out["penalty_percentiles"] == {"sugar": 12}
+    assert out["image"] == "large.jpg"
+    assert out["highlight"] == "Ragi Chips"
+
+
+def test_missing_parents_fall_back_to_defaults():
+    product = Product({"stats": None, "package_claims": None}, rank=4)
+    out = product.to_dict()
+    assert out["id"] == "prod_4" and out["brand"] == "" and out["category_paths"] == []
+    assert out["flean_percentile"] is None and out["bonus_percentiles"] == {}
+    assert product.sort_key() == -1.0
+    # default lists are never shared between records
+    out["category_paths"].append("x")
+    assert Product({}, rank=5).category_paths == []
+
+
+def test_derived_fields_are_lazy_and_memoized():
+    product = Product.from_hit(_hit(), rank=1)
+    assert product._lazy == {}
+    assert product.name == "Baked Ragi Chips"
+    assert set(product._lazy) == {"name"}
+    product._src["name"] = "changed"
+    assert product.to_dict()["name"] == "Baked Ragi Chips"
+
+
+def test_llm_and_fe_views():
+    product = Product.from_hit(_hit(), rank=1)
+    llm = product.to_llm_dict()
+    assert "image" not in llm and "category_paths" not in llm and "rank" not in llm
+    assert "carbs_g" not in llm and "health_claims" not in llm
+    assert len(llm["description"]) <= LLM_TEXT_LIMIT + 1 and llm["description"].endswith("…")
+    assert llm["highlight"] == "Ragi Chips"
+    assert product.to_fe_dict() == {
+        "id": "p1", "name": "Baked Ragi Chips", "brand": "Crunchy", "price": 99, "mrp": None,
+        "image": "large.jpg", "flean_score": None, "flean_percentile": 82.5, "avg_rating": 4.2, "total_reviews": 31,
+    }
+
+
+def test_dict_views_match_record_views_and_pass_foreign_keys():
+    product = Product.from_hit(_hit(), rank=1)
+    as_dict = product.to_dict()
+    assert llm_view(as_dict) == product.to_llm_dict()
+    assert fe_view(as_dict) == product.to_fe_dict()
+    # personal-care results carry keys this module does not produce
+    view = llm_view({"id": "s1", "name": "Serum", "review_stats": {"avg_rating": 4.5}, "image": "x.jpg", "efficacy": {}})
+    assert view == {"id": "s1", "name": "Serum", "review_stats": {"avg_rating": 4.5}}
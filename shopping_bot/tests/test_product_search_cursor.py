@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import pytest
+import requests
+from flask import Flask
+
+from shopping_bot.bench.stubs import StubElasticsearch
+from shopping_bot.data_fetchers.es_cache import SearchResultCache
+from shopping_bot.data_fetchers.es_products import ElasticsearchProductsFetcher
+from shopping_bot.routes import product_search
+
+
+@pytest.fixture
+def client(monkeypatch):
+    stub = StubElasticsearch(latency_ms=0).start()
+    fetcher = ElasticsearchProductsFetcher(base_url=stub.url, index="idx", api_key="k")
+    fetcher.cache = SearchResultCache(enabled=False)
+    monkeypatch.setattr(product_search, "get_es_fetcher", lambda: fetcher)
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test-secret"
+    app.register_blueprint(product_search.bp, url_prefix="/rs")
+    yield app.test_client(), stub
+    stub.stop()
+
+
+def _page(client, body):
+    resp = client.post("/rs/api/v1/products/search", json=body)
+    return resp.status_code, resp.get_json()
+
+
+def test_cursor_walks_one_snapshot_without_repeats(client):
+    http, stub = client
+    status, first = _page(http, {"query": "chips", "size": 50, "paginate": True})
+    assert status == 200
+    pagination = first["data"]["pagination"]
+    assert (pagination["page"], pagination["has_more"], pagination["total_hits"]) == (1, True, 500)
+
+    seen = [p["id"] for p in first["data"]["products"]]
+    cursor = pagination["next_cursor"]
+    pages = 1
+    while cursor:
+        status, page = _page(http, {"cursor": cursor})
+        assert status == 200
+        pagination = page["data"]["pagination"]
+        assert pagination["total_hits"] == 500 and pagination["page"] == pages + 1
+        seen += [p["id"] for p in page["data"]["products"]]
+        cursor = pagination["next_cursor"]
+        pages += 1
+
+    assert pages == 11 and pagination["has_more"] is False  # 10 full pages + one empty
+    assert len(seen) == len(set(seen)) == 500
+    assert stub.stats()["es._pit"]["calls"] == 2  # opened once, closed at the end
+    assert stub.pits == {}
+
+
+def test_follow_up_pages_skip_total_hits_and_renew_the_snapshot(client, monkeypatch):
+    http, _stub = client
+    bodies = []
+    fetcher = product_search.get_es_fetcher()
+    post = fetcher.transport.post
+    monkeypatch.setattr(fetcher.transport, "post", lambda url, body, **kw: bodies.append(body) or post(url, body, **kw))
+
+    _status, first = _page(http, {"query": "chips", "size": 5, "paginate": True})
+    _page(http, {"cursor": first["data"]["pagination"]["next_cursor"]})
+    assert [b.get("track_total_hits") for b in bodies] == [True, False]
+    assert "search_after" not in bodies[0] and bodies[1]["search_after"]
+    assert all(b["pit"]["keep_alive"] and b["sort"][-1] == {"_shard_doc": "asc"} for b in bodies)
+
+
+def test_expired_and_tampered_cursors(client):
+    http, stub = client
+    _status, first = _page(http, {"query": "chips", "size": 5, "paginate": True})
+    cursor = first["data"]["pagination"]["next_cursor"]
+
+    status, body = _page(http, {"cursor": cursor[:-2] + "xx"})
+    assert status == 400 and body["error"]["code"] == "INVALID_CURSOR"
+
+    stub.pits.clear()  # ES dropped the snapshot after its keep-alive
+    status, body = _page(http, {"cursor": cursor})
+    assert status == 410 and body["error"]["code"] == "CURSOR_EXPIRED"
+
+
+def test_plain_search_is_unchanged(client):
+    http, stub = client
+    status, body = _page(http, {"query": "chips", "size": 5})
+    assert status == 200
+    assert set(body["data"]["pagination"]) == {"total_hits", "returned", "size"}
+    assert "es._pit" not in stub.stats()
+
+
+def test_backend_failures_are_retryable_and_release_new_snapshots(client, monkeypatch):
+    http, stub = client
+    transport = product_search.get_es_fetcher().transport
+    post = transport.post
+    failing = {"on": True}
+
+    def flaky(url, body, **kw):
+        if failing["on"] and "pit" in body:
+            raise requests.exceptions.ConnectionError("es down")
+        return post(url, body, **kw)
+
+    monkeypatch.setattr(transport, "post", flaky)
+    status, body = _page(http, {"query": "chips", "size": 5, "paginate": True})
+    assert status == 503 and body["error"] == {**body["error"], "code": "SEARCH_UNAVAILABLE", "cursor": None}
+    assert stub.pits == {}  # the snapshot opened for the failed first page was closed
+
+    failing["on"] = False
+    _status, first = _page(http, {"query": "chips", "size": 5, "paginate": True})
+    cursor = first["data"]["pagination"]["next_cursor"]
+    failing["on"] = True
+    status, body = _page(http, {"cursor": cursor})
+    assert status == 503 and body["error"]["cursor"] == cursor
+
+    failing["on"] = False
+    status, page = _page(http, {"cursor": body["error"]["cursor"]})
+    assert status == 200 and page["data"]["pagination"]["page"] == 2
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List
+
+import anthropic
+from aiohttp import web
+
+from shopping_bot.llm_service import LLMService
+from shopping_bot.models import UserContext
+from shopping_bot.utils.prompt_cache import cache_usage_stats
+
+
+async def _with_stub_anthropic(run):
+    """Run `run(service, requests)` against a local stub of POST /v1/messages."""
+    requests: List[Dict[str, Any]] = []
+
+    async def messages(request: web.Request) -> web.Response:
+        body = await request.json()
+        requests.append(body)
+        tool = body["tool_choice"]["name"]
+        warm = len(requests) > 1
+        return web.json_response({
+            "id": f"msg_{len(requests)}",
+            "type": "message",
+            "role": "assistant",
+            "model": body["model"],
+            "content": [{"type": "tool_use", "id": "tu_1", "name": tool, "input": {"anchor_product_noun": "chips"}}],
+            "stop_reason": "tool_use",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": 120,
+                "output_tokens": 30,
+                "cache_creation_input_tokens": 0 if warm else 4000,
+                "cache_read_input_tokens": 4000 if warm else 0,
+            },
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/messages", messages)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        service = LLMService.__new__(LLMService)
+        service.anthropic = anthropic.AsyncAnthropic(api_key="sk-ant-test", base_url=f"http://127.0.0.1:{port}")
+        await run(service, requests)
+    finally:
+        await runner.cleanup()
+
+
+def _ctx(text: str) -> UserContext:
+    ctx = UserContext(user_id="u1", session_id="s1", permanent={}, session={}, fetched_data={})
+    ctx.session["current_user_text"] = text
+    return ctx
+
+
+def test_food_es_params_static_prefix_is_cached():
+    async def run(service: LLMService, requests: List[Dict[str, Any]]) -> None:
+        await service._generate_unified_es_params_2025(_ctx("banana chips"), "banana chips")
+        await service._generate_unified_es_params_2025(_ctx("sugar free cookies under 100"), "sugar free cookies under 100")
+
+        assert len(requests) == 2
+        first, second = requests
+        # Identical, cache-marked system prefix on every request
+        assert first["system"] == second["system"]
+        assert first["system"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert "<fnb_taxonomy>" in first["system"][-1]["text"]
+        # Per-request context lives only in the user message
+        assert "<current_query>banana chips" not in first["system"][-1]["text"]
+        assert "<current_query>banana chips</current_query>" in first["messages"][0]["content"]
+        assert "<current_query>sugar free cookies under 100</current_query>" in second["messages"][0]["content"]
+
+    asyncio.run(_with_stub_anthropic(run))
+    stats = cache_usage_stats()["es_params_food"]
+    assert stats["calls"] >= 2 and stats["hits"] >= 1
+    assert stats["cache_read_input_tokens"] >= 4000
+
+
+def test_personal_care_prompt_uses_cached_system():
+    async def run(service: LLMService, requests: List[Dict[str, Any]]) -> None:
+        await service._generate_personal_care_es_params_2025(_ctx("shampoo for dry scalp"), "shampoo for dry scalp")
+        body = requests[0]
+        assert body["system"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert "<current_query>shampoo" not in body["system"][-1]["text"]
+        assert "<current_query>shampoo for dry scalp</current_query>" in body["messages"][0]["content"]
+
+    asyncio.run(_with_stub_anthropic(run))
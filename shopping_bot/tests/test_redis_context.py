@@ -0,0 +1,285 @@
+import json
+
+import fakeredis
+import pytest
+
+from shopping_bot.models import UserContext
+from shopping_bot.utils import codec
+from shopping_bot.redis_manager import (
+    RedisContextManager,
+    blobs_key,
+    fetched_key,
+    list_key,
+    permanent_key,
+    session_key,
+)
+
+
+@pytest.fixture()
+def mgr():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    manager = RedisContextManager(client=client)
+    return manager, client
+
+
+def _ctx(**session):
+    return UserContext(
+        user_id="u1",
+        session_id="s1",
+        permanent={"name": "A"},
+        session=dict(session),
+        fetched_data={"search_products": {"data": {"products": [1, 2]}, "status": "success"}},
+    )
+
+
+def test_save_and_load_round_trip(mgr):
+    manager, client = mgr
+    assert manager.save_context(_ctx(intent_l3="Recommendation", conversation_history=[]))
+
+    # Session keys share one hash tag (single cluster slot); fetched is a hash
+    assert client.type(session_key("s1")) == "hash"
+    assert client.type(fetched_key("s1")) == "hash"
+    assert 0 < client.ttl(fetched_key("s1")) <= manager.ttl.total_seconds()
+
+    ctx = manager.get_context("u1", "s1")
+    assert ctx.permanent == {"name": "A"}
+    assert ctx.session["intent_l3"] == "Recommendation"
+    assert ctx.fetched_data["search_products"]["data"]["products"] == [1, 2]
+
+
+def test_load_is_one_round_trip(mgr, monkeypatch):
+    manager, _ = mgr
+    client = manager.raw
+    manager.save_context(_ctx())
+    executes = []
+    original = client.pipeline
+
+    def counting_pipeline(*args, **kwargs):
+        pipe = original(*args, **kwargs)
+        real = pipe.execute
+
+        def execute(*a, **kw):
+            executes.append(1)
+            return real(*a, **kw)
+
+        pipe.execute = execute
+        return pipe
+
+    monkeypatch.setattr(client, "pipeline", counting_pipeline)
+    monkeypatch.setattr(client, "get", lambda *a, **k: pytest.fail("unexpected standalone GET"))
+    manager.get_context("u1", "s1")
+    assert len(executes) == 1
+
+
+def test_merge_fetched_is_field_level(mgr):
+    manager, client = mgr
+    manager.save_context(_ctx())
+    assert manager.merge_fetched_data("s1", {"fetch_reviews": {"data": [], "status": "success"}})
+    ctx = manager.get_context("u1", "s1")
+    assert set(ctx.fetched_data) == {"search_products", "fetch_reviews"}
+    assert ctx.fetched_data["fetch_reviews"]["data"] == []
+
+
+def test_legacy_keys_are_read_until_rewritten(mgr):
+    manager, client = mgr
+    client.set("session:s1", json.dumps({"intent_l3": "Legacy"}))
+    client.set("session:s1:fetched", json.dumps({"search_products": {"data": None}}))
+    ctx = manager.get_context("u1", "s1")
+    assert ctx.session == {"intent_l3": "Legacy"}
+    assert "search_products" in ctx.fetched_data
+
+    assert manager.delete_session("s1")
+    assert not client.exists("session:s1")
+
+
+def _record_commands(monkeypatch, client):
+    """Capture (command, *args) for every pipeline executed on `client`."""
+    commands = []
+    original = client.pipeline
+
+    def recording_pipeline(*args, **kwargs):
+        pipe = original(*args, **kwargs)
+        real = pipe.execute
+
+        def execute(*a, **kw):
+            commands.extend(cmd[0] for cmd in pipe.command_stack)
+            return real(*a, **kw)
+
+        pipe.execute = execute
+        return pipe
+
+    monkeypatch.setattr(client, "pipeline", recording_pipeline)
+    return commands
+
+
+def _names(commands):
+    return [cmd[0] for cmd in commands]
+
+
+def test_save_writes_only_changed_fields(mgr, monkeypatch):
+    manager, client = mgr
+    manager.save_context(_ctx(intent_l3="Recommendation", slots={"budget": 100}, note="x"))
+    ctx = manager.get_context("u1", "s1")
+    assert not ctx.is_dirty()
+
+    ctx.session["intent_l3"] = "Support"
+    assert ctx.session["slots"] == {"budget": 100}  # read but not changed
+    del ctx.session["note"]
+    commands = _record_commands(monkeypatch, manager.raw)
+    assert manager.save_context(ctx)
+
+    writes = [cmd for cmd in commands if cmd[0] in ("HSET", "HDEL", "DEL", "SET")]
+    assert writes == [("HDEL", session_key("s1"), "note"), ("HSET", session_key("s1"), "intent_l3", codec.encode("Support"))]
+    assert set(client.hkeys(session_key("s1"))) == {"intent_l3", "slots"}
+    assert not ctx.session.dirty and not ctx.session.deleted
+
+    # In-place mutation of a read value is detected by comparison
+    commands.clear()
+    ctx.session["slots"]["budget"] = 200
+    manager.save_context(ctx)
+    assert ("HSET", session_key("s1"), "slots", codec.encode({"budget": 200})) in commands
+    assert "DEL" not in _names(commands)
+
+    # Nothing changed: the save is skipped entirely
+    loaded = manager.get_context("u1", "s1")
+    assert loaded.session["slots"] == {"budget": 200}
+    commands.clear()
+    manager.save_context(loaded)
+    assert commands == []
+
+
+def test_history_is_appended_and_capped(mgr, monkeypatch):
+    manager, client = mgr
+    manager.history_cap = 3
+    manager.save_context(_ctx(conversation_history=[{"user_query": "q0"}]))
+    assert client.type(list_key("s1", "conversation_history")) == "list"
+
+    for i in range(1, 5):
+        ctx = manager.get_context("u1", "s1")
+        commands = _record_commands(monkeypatch, manager.raw)
+        ctx.session["conversation_history"].append({"user_query": f"q{i}"})
+        assert manager.save_context(ctx)
+        monkeypatch.undo()
+        assert ("RPUSH", list_key("s1", "conversation_history"), codec.encode({"user_query": f"q{i}"})) in commands
+        assert "LTRIM" in _names(commands) and "DEL" not in _names(commands)
+
+    ctx = manager.get_context("u1", "s1")
+    assert [h["user_query"] for h in ctx.session["conversation_history"]] == ["q2", "q3", "q4"]
+    assert "conversation_history" not in client.hkeys(session_key("s1"))
+
+
+def test_recommendation_products_are_stored_once(mgr):
+    manager, client = mgr
+    products = [{"id": i, "name": f"p{i}"} for i in range(20)]
+    manager.save_context(_ctx(last_recommendation={"query": "chips", "products": products}))
+
+    raw = codec.decode(manager.raw.hget(session_key("s1"), "last_recommendation"))
+    blob_id = raw["products"]["$blob"]
+    assert client.hkeys(blobs_key("s1")) == [blob_id]
+
+    ctx = manager.get_context("u1", "s1")
+    assert ctx.session["last_recommendation"]["products"] == products
+
+    # Same products under a new query reuse the stored blob
+    ctx.session["last_recommendation"] = {"query": "crisps", "products": products}
+    manager.save_context(ctx)
+    assert client.hkeys(blobs_key("s1")) == [blob_id]
+
+    ctx.session["last_recommendation"] = {"query": "nuts", "products": products[:2]}
+    manager.save_context(ctx)
+    assert len(client.hkeys(blobs_key("s1"))) == 1 and client.hkeys(blobs_key("s1")) != [blob_id]
+    assert manager.get_context("u1", "s1").session["last_recommendation"]["products"] == products[:2]
+
+
+def test_whole_document_layout_is_migrated(mgr):
+    manager, client = mgr
+    client.set(permanent_key("u1"), json.dumps({"name": "A"}))
+    client.set(session_key("s1"), json.dumps({"intent_l3": "Old", "conversation_history": [{"user_query": "q"}]}))
+
+    ctx = manager.get_context("u1", "s1")
+    assert ctx.permanent == {"name": "A"}
+    assert ctx.session["conversation_history"] == [{"user_query": "q"}]
+
+    assert manager.save_context(ctx)
+    assert client.type(permanent_key("u1")) == "hash"
+    assert client.type(session_key("s1")) == "hash"
+    assert manager.get_context("u1", "s1").session["intent_l3"] == "Old"
+
+
+def test_permanent_profile_merge_keeps_other_fields(mgr):
+    manager, client = mgr
+    manager.save_context(_ctx())
+    profile = manager.get_permanent("u1")
+    profile["budget"] = "under 500"
+    assert manager.merge_permanent("u1", profile)
+    assert manager.get_context("u1", "s1").permanent == {"name": "A", "budget": "under 500"}
+
+    client.delete(permanent_key("u1"))
+    client.set(permanent_key("u1"), json.dumps({"name": "B"}))
+    assert manager.get_permanent("u1") == {"name": "B"}
+    assert manager.merge_permanent("u1", {"address": "x"})
+    assert client.type(permanent_key("u1")) == "hash"
+    assert manager.get_permanent("u1") == {"name": "B", "address": "x"}
+
+
+def test_nested_reference_held_across_a_save_is_still_saved(mgr):
+    manager, _ = mgr
+    manager.save_context(_ctx(slots={"budget": 100}))
+    ctx = manager.get_context("u1", "s1")
+    slots = ctx.session["slots"]
+    fresh = {"a": 1}
+    ctx.session["prefs"] = fresh
+    assert manager.save_context(ctx)
+
+    slots["budget"] = 300
+    fresh["a"] = 2
+    assert ctx.is_dirty()
+    assert manager.save_context(ctx)
+    reloaded = manager.get_context("u1", "s1")
+    assert reloaded.session["slots"] == {"budget": 300} and reloaded.session["prefs"] == {"a": 2}
+
+
+def test_load_refreshes_the_session_ttl(mgr):
+    manager, client = mgr
+    manager.save_context(_ctx(intent_l3="x", conversation_history=[{"user_query": "q"}]))
+    for key in (session_key("s1"), fetched_key("s1"), list_key("s1", "conversation_history")):
+        client.expire(key, 5)
+    manager.get_context("u1", "s1")  # read-only turn: no save
+    for key in (session_key("s1"), fetched_key("s1"), list_key("s1", "conversation_history")):
+        assert client.ttl(key) > 5
+
+
+def test_permanent_migration_does_not_lose_a_concurrent_write(mgr, monkeypatch):
+    manager, client = mgr
+    client.set(permanent_key("u1"), json.dumps({"name": "B"}))
+    original = manager.raw.pipeline
+    raced = []
+
+    def racing_pipeline(*args, **kwargs):
+        pipe = original(*args, **kwargs)
+        real_multi = pipe.multi
+
+        def multi():
+            if not raced:  # another worker migrates between our read and our write
+                raced.append(1)
+                client.delete(permanent_key("u1"))
+                client.hset(permanent_key("u1"), mapping={"name": codec.encode("B"), "budget": codec.encode("low")})
+            return real_multi()
+
+        pipe.multi = multi
+        return pipe
+
+    monkeypatch.setattr(manager.raw, "pipeline", racing_pipeline)
+    assert manager.merge_permanent("u1", {"address": "x"})
+    assert manager.get_permanent("u1") == {"name": "B", "budget": "low", "address": "x"}
+
+
+def test_delete_session_does_not_use_multi(mgr, monkeypatch):
+    manager, client = mgr
+    manager.save_context(_ctx(intent_l3="x"))
+    calls = []
+    original = manager.raw.pipeline
+    monkeypatch.setattr(manager.raw, "pipeline", lambda *a, **kw: calls.append(kw) or original(*a, **kw))
+    assert manager.delete_session("s1")
+    assert calls == [{"transaction": False}]
+    assert not client.exists(session_key("s1"))
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import random
+import struct
+
+import pytest
+
+from shopping_bot.bench.stubs import StubElasticsearch
+from shopping_bot.data_fetchers import rerank
+from shopping_bot.data_fetchers.es_cache import SearchResultCache
+from shopping_bot.data_fetchers.es_products import (
+    ElasticsearchProductsFetcher,
+    _build_enhanced_es_query,
+    _build_skin_es_query,
+    _transform_results,
+)
+from shopping_bot.scoring_config import CATEGORY_SCORING_RULES, FLEAN_SCRIPT_SOURCE
+
+MACRO = [{"nutrient_name": "protein g", "operator": "gt", "value": 5, "priority": "soft"}]
+NUTRI = "category_data.nutritional.nutri_breakdown_updated."
+SUBCATEGORIES = ["chips_and_crisps", "chocolates", "breakfast_cereals", "unmapped_thing"]
+
+
+def _fnb(subcategory: str, **extra):
+    return _build_enhanced_es_query({"q": "snack", "category_group": "f_and_b", "category_path": f"f_and_b/food/x/{subcategory}", **extra})
+
+
+def _candidates(n: int, seed: int):
+    """BM25-ordered hits with every field the scoring rules read (some missing)."""
+    rng = random.Random(seed)
+    fields = {r["field"].split(".")[1] for rules in CATEGORY_SCORING_RULES.values() for r in rules["bonuses"] + rules["penalties"]}
+    fields.add("adjusted_score_percentiles")
+    hits = []
+    for i in range(n):
+        stats = {f: {"subcategory_percentile": round(rng.uniform(0, 100), 1)} for f in fields if rng.random() > 0.15}
+        nutri = {"protein g": round(rng.uniform(0, 20), 1)} if rng.random() > 0.2 else {}
+        src = {"id": f"p{i}", "name": f"Snack {i}", "stats": stats, "category_data": {"nutritional": {"nutri_breakdown_updated": nutri}}}
+        hits.append({"_id": f"p{i}", "_score": round(rng.uniform(0.05, 12.0), 4), "_source": src})
+    hits.sort(key=lambda h: -h["_score"])
+    return {"took": 3, "hits": {"total": {"value": n, "relation": "eq"}, "hits": hits}}
+
+
+def _lookup(src, path):
+    if path.startswith(NUTRI):
+        return src["category_data"]["nutritional"]["nutri_breakdown_updated"].get(path[len(NUTRI):])
+    _stats, block, leaf = path.split(".")
+    return (src["stats"].get(block) or {}).get(leaf)
+
+
+def _script_version(body, raw):
+    """Reference: what ES computes for the function_score body (scalar, one doc at a time)."""
+    fs = body["query"]["function_score"]
+    scored = []
+    for hit in raw["hits"]["hits"]:
+        factor = 1.0
+        for fn in fs["functions"]:
+            if "script_score" in fn:
+                assert fn["script_score"]["script"]["source"] == FLEAN_SCRIPT_SOURCE
+                p = _lookup(hit["_source"], "stats.adjusted_score_percentiles.subcategory_percentile")
+                p = 50 if p is None else p
+                factor *= 1.0 + max(0.0, min(100.0, p)) / 100.0
+                continue
+            (field, spec), = fn["filter"]["range"].items()
+            v = _lookup(hit["_source"], field)
+            if v is not None and all({"gt": v > t, "gte": v >= t, "lt": v < t, "lte": v <= t}[op] for op, t in spec.items()):
+                factor *= fn["weight"]
+        score = struct.unpack("f", struct.pack("f", hit["_score"] * factor))[0]
+        if score >= body["min_score"]:
+            scored.append({**hit, "_score": score})
+    scored.sort(key=lambda h: -h["_score"])
+    return {**raw, "hits": {**raw["hits"], "hits": scored[: body["size"]]}}
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(rerank, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("subcategory", SUBCATEGORIES)
+@pytest.mark.parametrize("macro", [False, True])
+def test_client_rerank_matches_script_ordering(backend, subcategory, macro):
+    body = _fnb(subcategory, **({"macro_filters": MACRO} if macro else {}))
+    plan = rerank.plan(body)
+    assert plan is not None
+    for seed in range(5):
+        raw = _candidates(200, seed)
+        expected = _script_version(body, raw)
+        got = plan.apply(raw)
+        assert [h["_id"] for h in got["hits"]["hits"]] == [h["_id"] for h in expected["hits"]["hits"]]
+        assert [h["_score"] for h in got["hits"]["hits"]] == pytest.approx([h["_score"] for h in expected["hits"]["hits"]])
+        assert _transform_results(got)["products"] == _transform_results(expected)["products"]
+        # the functions really reorder: BM25 alone would pick a different top 10
+        assert [h["_id"] for h in got["hits"]["hits"]] != [h["_id"] for h in raw["hits"]["hits"][:10]]
+
+
+def test_plan_sends_plain_bm25_candidates_and_skips_unsupported_bodies():
+    body = _fnb("chocolates")
+    plan = rerank.plan(body, candidates=200)
+    cand = plan.body
+    assert "function_score" not in cand["query"] and "min_score" not in cand
+    assert cand["query"] is body["query"]["function_score"]["query"]
+    assert (cand["size"], plan.size, plan.min_score) == (200, 10, 0.5)
+    # chocolates read additives percentiles, which the F&B _source list doesn't include
+    assert "stats.additives_penalty_percentiles.subcategory_percentile" in cand["_source"]["includes"]
+    assert cand["highlight"] is body["highlight"]
+
+    assert rerank.plan(_build_skin_es_query({"q": "face wash", "category_group": "personal_care"})) is None
+    assert rerank.plan(_build_enhanced_es_query({})) is None  # no function_score at all
+
+
+def test_fetcher_reranks_candidates_in_client_mode(monkeypatch):
+    monkeypatch.setattr(rerank, "RERANK_MODE", "client")
+    stub = StubElasticsearch(latency_ms=0).start()
+    try:
+        fetcher = ElasticsearchProductsFetcher(base_url=stub.url, index="idx", api_key="k")
+        fetcher.cache = SearchResultCache(enabled=False)
+        params = {"q": "chips", "category_group": "f_and_b", "category_path": "f_and_b/food/light_bites/chips_and_crisps"}
+        result = fetcher.search(dict(params))
+        batch = fetcher.msearch([dict(params), dict(params, q="nachos")])
+    finally:
+        stub.stop()
+    assert result["meta"]["returned"] == 10
+    assert [r["meta"]["returned"] for r in batch] == [10, 10]
+    assert batch[0]["products"] == result["products"]
+    scores = [p["score"] for p in result["products"]]
+    assert all(s >= 0.5 for s in scores)
+
+
+def test_script_top_k_outside_the_candidates_degrades_to_the_best_candidates(backend):
+    body = _fnb("chips_and_crisps")
+    plan = rerank.plan(body, candidates=20)
+    raw = _candidates(200, 0)
+    returned = {**raw, "hits": {**raw["hits"], "hits": raw["hits"]["hits"][:20]}}  # what ES sends back for plan.body
+    got = plan.apply(returned)
+    script = _script_version(body, raw)
+
+    bm25_rank = {h["_id"]: i for i, h in enumerate(raw["hits"]["hits"])}
+    missed = {h["_id"] for h in script["hits"]["hits"] if bm25_rank[h["_id"]] >= 20}
+    ids = [h["_id"] for h in got["hits"]["hits"]]
+    assert missed and not missed & set(ids)  # script top-10 hits past BM25 rank 20 are lost...
+    assert ids == [h["_id"] for h in _script_version(body, returned)["hits"]["hits"]]  # ...the best candidates fill in
+    assert _transform_results(got)["meta"]["total_hits"] == 200  # BM25 matches, not candidates
+
+
+def test_total_hits_counts_bm25_matches_before_min_score(backend):
+    raw = _candidates(30, 1)
+    for hit in raw["hits"]["hits"][5:]:
+        hit["_score"] = 0.01  # under min_score 0.5 whatever the factors
+    got = rerank.plan(_fnb("chocolates")).apply(raw)
+    assert len(got["hits"]["hits"]) <= 5
+    assert _transform_results(got)["meta"]["total_hits"] == 30
+
+
+def test_cached_results_are_kept_apart_per_rerank_mode(monkeypatch):
+    stub = StubElasticsearch(latency_ms=0).start()
+    try:
+        fetcher = ElasticsearchProductsFetcher(base_url=stub.url, index="idx", api_key="k")
+        fetcher.cache = SearchResultCache(use_redis=False)
+        params = {"q": "chips", "category_group": "f_and_b", "category_path": "f_and_b/food/light_bites/chips_and_crisps"}
+        fetcher.search(dict(params))
+        monkeypatch.setattr(rerank, "RERANK_MODE", "client")
+        fetcher.search(dict(params))  # a script-mode entry must not answer this
+        fetcher.search(dict(params))
+        calls = stub.stats()["es._search"]["calls"]
+    finally:
+        stub.stop()
+    assert calls == 2
+    assert fetcher.cache.stats()["l1_hits"] == 1
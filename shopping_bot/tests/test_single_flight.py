@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from shopping_bot.bench.stubs import StubElasticsearch
+from shopping_bot.data_fetchers.es_cache import SearchResultCache
+from shopping_bot.data_fetchers.es_products import ElasticsearchProductsFetcher
+from shopping_bot.utils.single_flight import SingleFlight
+
+
+def test_concurrent_async_calls_share_one_flight():
+    flight = SingleFlight("t", use_redis=False)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"products": [1, 2]}
+
+    async def main():
+        return await asyncio.gather(*(flight.run("k", fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r == {"products": [1, 2]} for r in results)
+    assert len({id(r) for r in results}) == 5  # followers get their own copy
+    stats = flight.stats()
+    assert (stats["leaders"], stats["collapsed"], stats["in_flight"]) == (1, 4, 0)
+
+
+def test_leader_mutations_after_the_flight_stay_private():
+    flight = SingleFlight("t", use_redis=False)
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return {"meta": {}, "products": [1]}
+
+    async def leader():
+        result = await flight.run("k", fetch)
+        result["meta"]["quality_warning"] = "leader only"  # what search_products_handler does
+        return result
+
+    async def main():
+        first = asyncio.ensure_future(leader())
+        await asyncio.sleep(0)
+        return await asyncio.gather(first, *(flight.run("k", fetch) for _ in range(3)))
+
+    lead, *followers = asyncio.run(main())
+    assert lead["meta"] == {"quality_warning": "leader only"}
+    assert all(f == {"meta": {}, "products": [1]} for f in followers)
+
+
+def test_followers_share_errors_and_survive_a_cancelled_leader():
+    flight = SingleFlight("t", use_redis=False)
+
+    async def boom():
+        await asyncio.sleep(0.02)
+        raise ValueError("nope")
+
+    async def failing():
+        return await asyncio.gather(*(flight.run("e", boom) for _ in range(3)), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(failing())] == [ValueError] * 3
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def cancelled():
+        leader = asyncio.ensure_future(flight.run("c", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run("c", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(cancelled()) == "done"
+    assert flight.stats()["abandoned"] == 1
+
+
+def test_sync_and_async_callers_across_threads_share_one_flight():
+    flight = SingleFlight("t", use_redis=False)
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"n": 1}
+
+    def sync_caller():
+        results.append(flight.run_sync("k", fetch))
+
+    async def afetch():
+        return fetch()
+
+    def async_caller():
+        results.append(asyncio.run(flight.run("k", afetch)))
+
+    threads = [threading.Thread(target=sync_caller) for _ in range(3)] + [threading.Thread(target=async_caller)]
+    threads[0].start()
+    time.sleep(0.01)
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [{"n": 1}] * 4
+
+
+def test_second_worker_waits_for_the_lock_holders_result():
+    redis = fakeredis.FakeRedis()
+    worker_a = SingleFlight("t", use_redis=True, redis_client=redis)
+    worker_b = SingleFlight("t", use_redis=True, redis_client=redis)
+    calls = []
+
+    def fetch(tag):
+        calls.append(tag)
+        time.sleep(0.1)
+        return {"from": tag}
+
+    holder = threading.Thread(target=lambda: worker_a.run_sync("k", lambda: fetch("a")))
+    holder.start()
+    time.sleep(0.02)
+    assert worker_b.run_sync("k", lambda: fetch("b")) == {"from": "a"}
+    holder.join()
+    assert calls == ["a"]
+    assert worker_b.stats()["remote_collapsed"] == 1
+    assert redis.keys("sf:t:lock:*") == []
+
+    # Unpublishable results (store_if False) make the waiter run the call itself
+    holder = threading.Thread(target=lambda: worker_a.run_sync("n", lambda: fetch("a"), store_if=lambda r: False))
+    holder.start()
+    time.sleep(0.02)
+    assert worker_b.run_sync("n", lambda: fetch("b")) == {"from": "b"}
+    holder.join()
+
+
+@pytest.fixture
+def es():
+    stub = StubElasticsearch(latency_ms=50).start()
+    yield stub
+    stub.stop()
+
+
+def test_fetcher_collapses_identical_concurrent_searches(es):
+    fetcher = ElasticsearchProductsFetcher(base_url=es.url, index="idx", api_key="k")
+    fetcher.cache = SearchResultCache(enabled=False)
+    fetcher.flight = SingleFlight("es.search", use_redis=False)
+    params = {"q": "chips", "category_group": "f_and_b"}
+
+    async def main():
+        return await asyncio.gather(*(fetcher.asearch(dict(params)) for _ in range(4)), fetcher.asearch(dict(params, q="nachos")))
+
+    results = asyncio.run(main())
+    assert [r["meta"]["returned"] for r in results] == [10] * 5
+    assert es.stats()["es._search"]["calls"] == 2
+    assert fetcher.flight.stats()["collapsed"] == 3
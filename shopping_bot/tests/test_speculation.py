@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from shopping_bot import speculation
+from shopping_bot.data_fetchers import es_products
+from shopping_bot.models import UserContext
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def build_search_params(ctx):
+        calls.append(dict(ctx.session))
+        await asyncio.sleep(0.01)
+        ctx.session.setdefault("debug", {})["last_search_params"] = {"q": "chips"}
+        return {"q": "chips", "size": 20}
+
+    monkeypatch.setattr(es_products, "build_search_params", build_search_params)
+    monkeypatch.setattr(speculation, "get_config", lambda: SimpleNamespace(SPECULATIVE_ES_PARAMS=True))
+    return calls
+
+
+def _ctx(text: str) -> UserContext:
+    return UserContext(user_id="u1", session_id="s1", session={"current_user_text": text, "domain": "f_and_b"})
+
+
+def _classify_as_product_follow_up(ctx: UserContext) -> None:
+    ctx.session["assessment"] = {"original_query": ctx.session["current_user_text"]}
+    ctx.session["product_intent"] = "show_me_options"
+
+
+def test_matching_inputs_reuse_speculative_params_and_replay_session_writes(calls):
+    async def turn():
+        ctx = _ctx("show me cheaper chips")
+        assert speculation.maybe_start("show me cheaper chips", ctx)
+        _classify_as_product_follow_up(ctx)
+        hit = await speculation.claim(ctx)
+        return ctx, hit
+
+    before = speculation.speculation_stats()
+    ctx, hit = asyncio.run(turn())
+    assert hit is not None and hit.params == {"q": "chips", "size": 20}
+    assert len(calls) == 1
+    assert ctx.session["debug"]["last_search_params"] == {"q": "chips"}
+    assert speculation.speculation_stats()["hit"] == before["hit"] + 1
+
+
+def test_changed_inputs_discard_the_speculation(calls):
+    async def turn():
+        ctx = _ctx("show me chips")
+        speculation.maybe_start("show me chips", ctx)
+        _classify_as_product_follow_up(ctx)
+        ctx.session["domain"] = "personal_care"  # classification moved the turn elsewhere
+        return ctx, await speculation.claim(ctx)
+
+    before = speculation.speculation_stats()
+    ctx, hit = asyncio.run(turn())
+    assert hit is None
+    assert "debug" not in ctx.session
+    assert speculation.speculation_stats()["wasted"] == before["wasted"] + 1
+
+
+def test_non_product_text_does_not_speculate_and_discard_cancels(calls):
+    async def turn():
+        assert not speculation.maybe_start("hi there", _ctx("hi there"))
+        ctx = _ctx("chips please")
+        assert speculation.maybe_start("chips please", ctx)
+        speculation.discard(ctx)
+        await asyncio.sleep(0.02)
+        return ctx
+
+    ctx = asyncio.run(turn())
+    assert "debug" not in ctx.session
+    assert 0 < speculation.speculation_stats()["wasted_rate"] <= 1
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import fakeredis
+import pytest
+from flask import Flask
+
+from shopping_bot import asgi
+from shopping_bot.config import BaseConfig
+from shopping_bot.data_fetchers.es_transport import ESTransport
+from shopping_bot.redis_manager import RedisContextManager
+from shopping_bot.routes import chat_stream
+from shopping_bot.utils.sse import EventStreamBody, StreamLimiter, relay
+
+
+def test_relay_yields_events_heartbeats_then_result():
+    async def run(emit):
+        await emit({"event": "delta", "data": {"n": 1}})
+        await asyncio.sleep(0.08)
+        await emit({"event": "delta", "data": {"n": 2}})
+        return "done"
+
+    async def collect():
+        return [item async for item in relay(run, heartbeat_s=0.03)]
+
+    items = asyncio.run(collect())
+    kinds = [k for k, _ in items]
+    assert kinds[0] == "stream" and kinds[-2:] == ["stream", "result"]
+    assert "heartbeat" in kinds
+    assert items[-1] == ("result", "done")
+
+
+def test_closing_the_relay_cancels_the_producer():
+    cancelled = []
+
+    async def run(emit):
+        await emit({"event": "delta", "data": {}})
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def consume_one():
+        stream = relay(run, heartbeat_s=10)
+        assert (await stream.__anext__())[0] == "stream"
+        await stream.aclose()
+
+    asyncio.run(consume_one())
+    assert cancelled == [True]
+
+
+def test_event_stream_body_sync_iteration_releases_slot():
+    limiter = StreamLimiter(1)
+    assert limiter.try_acquire() and not limiter.try_acquire()
+
+    async def frames():
+        yield b"a"
+        yield b"b"
+
+    body = EventStreamBody(frames(), on_close=limiter.release)
+    assert list(body) == [b"a", b"b"]
+    body.close()
+    assert limiter.stats() == {"active": 0, "limit": 1, "rejected": 1}
+
+
+def test_event_stream_body_sync_iteration_closes_loop_bound_sessions():
+    transport = ESTransport({}, timeout=5)
+    sessions = []
+
+    async def frames():
+        sessions.append(await transport._get_aio_session())
+        yield b"a"
+
+    for _ in range(2):  # one private loop per WSGI stream
+        body = EventStreamBody(frames())
+        assert list(body) == [b"a"]
+        body.close()
+    assert sessions[0] is not sessions[1]
+    assert all(s.closed for s in sessions)
+    assert len(transport._aio_sessions) == 1  # the first stream's closed loop was pruned
+
+
+class _StubLLM:
+    async def classify_and_assess_stream(self, message, ctx, emit_callback):
+        for word in ("Hi", " there"):
+            await emit_callback({"event": "final_answer.delta", "data": {"delta": word}})
+        return {"route": "general", "data_strategy": "none"}
+
+
+@pytest.fixture
+def stream_app(monkeypatch):
+    monkeypatch.setattr(BaseConfig, "ENABLE_STREAMING", True)
+    monkeypatch.setattr(chat_stream, "get_llm_service", lambda: _StubLLM())
+    monkeypatch.setattr(chat_stream, "_streams", StreamLimiter(4))
+    app = Flask(__name__)
+    app.extensions["ctx_mgr"] = RedisContextManager(client=fakeredis.FakeRedis(decode_responses=True))
+    app.extensions["bot_core"] = object()
+    app.register_blueprint(chat_stream.bp, url_prefix="/rs")
+    return app
+
+
+def _events(raw: bytes):
+    return [frame.split("\n")[0][len("event: "):] for frame in raw.decode().strip().split("\n\n")]
+
+
+def test_stream_route_over_wsgi(stream_app):
+    resp = stream_app.test_client().post("/rs/chat/stream", json={"user_id": "u1", "message": "hello"})
+    assert resp.headers["Content-Type"].startswith("text/event-stream")
+    events = _events(resp.get_data())
+    assert events == ["ack", "status", "final_answer.delta", "final_answer.delta", "final_answer.complete", "end"]
+    assert chat_stream._streams.active == 0
+
+
+def test_stream_route_over_asgi_and_concurrency_cap(stream_app, monkeypatch):
+    async def call(server):
+        sent = []
+        body = json.dumps({"user_id": "u2", "message": "hello"}).encode()
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.sleep(30)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/rs/chat/stream", "query_string": b"",
+                 "headers": [(b"content-type", b"application/json")]}
+        await server(scope, receive, send)
+        return sent
+
+    async def run():
+        server = asgi.create_asgi_app(stream_app, threads=4)
+        await server.startup()
+        ok = await call(server)
+        monkeypatch.setattr(chat_stream, "_streams", StreamLimiter(1))
+        chat_stream._streams.try_acquire()
+        rejected = await call(server)
+        await server.shutdown()
+        return ok, rejected
+
+    ok, rejected = asyncio.run(run())
+    assert ok[0]["status"] == 200
+    chunks = [m["body"] for m in ok[1:] if m.get("body")]
+    # one frame per send: the body is streamed, not buffered
+    assert _events(b"".join(chunks)) == ["ack", "status", "final_answer.delta", "final_answer.delta", "final_answer.complete", "end"]
+    assert len(chunks) == 6
+    assert rejected[0]["status"] == 503
@@ -0,0 +1,39 @@
+import logging
+
+from shopping_bot.utils import tracing
+
+
+def test_lazy_message_not_evaluated_when_disabled():
+    tracer = tracing.get_tracer("shopping_bot.tests.trace_lazy")
+    tracer.set_level(logging.INFO)
+    calls = []
+
+    def _expensive():
+        calls.append(1)
+        return "expensive"
+
+    tracer.debug(_expensive)
+    assert calls == []
+
+    tracer.set_level(logging.DEBUG)
+    tracer.debug(_expensive)
+    assert calls == [1]
+
+
+def test_set_levels_matches_module_suffix():
+    tracer = tracing.get_tracer("shopping_bot.tests.trace_suffix")
+    tracer.set_level(logging.INFO)
+    levels = tracing.set_levels({"trace_suffix": "TRACE"})
+    assert levels["shopping_bot.tests.trace_suffix"] == "TRACE"
+    assert tracer.enabled(tracing.TRACE)
+    tracing.set_levels({"trace_suffix": "INFO"})
+    assert not tracer.enabled(logging.DEBUG)
+
+
+def test_capture_ring_newest_first():
+    tracer = tracing.get_tracer("shopping_bot.tests.trace_capture")
+    for i in range(3):
+        tracer.capture("test_kind", {"i": i}, q=f"q{i}")
+    recent = tracing.recent_payloads("test_kind", limit=2)
+    assert [r["payload"]["i"] for r in recent] == [2, 1]
+    assert recent[0]["meta"] == {"q": "q2"}
@@ -0,0 +1,221 @@
+# shopping_bot/utils/codec.py
+"""
+Pluggable value codec for Redis payloads.
+
+Every value written by the context manager goes through `encode()` and comes
+back through `decode()`:
+
+    \\x00 | version | codec id | compression | body
+
+• codec: orjson (default when installed), msgpack (optional), stdlib json
+• compression: zstd above REDIS_COMPRESS_MIN_BYTES when `zstandard` is installed
+• Anything without the \\x00 header is a plain JSON document written before
+  the header existed, so old keys keep decoding during a rollout.
+
+The header names the codec, so readers decode whatever any writer chose;
+REDIS_CODEC only picks what this process writes. Encodings are
+deterministic for equal values, which the delta save relies on.
+
+Configuration (env): REDIS_CODEC (orjson|msgpack|json), REDIS_COMPRESSION
+(zstd|none), REDIS_COMPRESS_MIN_BYTES.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from ..config import get_config
+
+log = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+MAGIC = b"\x00"
+VERSION = 1
+_NO_COMPRESSION = b"-"
+_ZSTD = b"z"
+
+
+class UnsupportedPayload(ValueError):
+    """Well-formed payload this process cannot read (newer header, codec not installed)."""
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, default=str, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(body: bytes) -> Any:
+    return json.loads(body)
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_dumps(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=str, use_bin_type=True)
+
+
+def _msgpack_loads(body: bytes) -> Any:
+    return msgpack.unpackb(body, raw=False, strict_map_key=False)
+
+
+# codec name -> (header id, dumps, loads); only importable codecs are listed
+_CODECS: Dict[str, Tuple[bytes, Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (b"j", _json_dumps, _json_loads),
+}
+if orjson is not None:
+    _CODECS["orjson"] = (b"o", _orjson_dumps, orjson.loads)
+if msgpack is not None:
+    _CODECS["msgpack"] = (b"m", _msgpack_dumps, _msgpack_loads)
+_BY_ID = {cid: (name, loads) for name, (cid, _dumps, loads) in _CODECS.items()}
+
+_zstd_local = threading.local()
+
+_stats: Dict[str, Union[int, float]] = {
+    "encoded": 0,
+    "decoded": 0,
+    "legacy_decoded": 0,
+    "compressed": 0,
+    "encode_ms": 0.0,
+    "decode_ms": 0.0,
+    "raw_bytes": 0,
+    "stored_bytes": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def _zstd() -> Tuple[Any, Any]:
+    # zstd contexts are not thread-safe; keep one pair per thread
+    pair = getattr(_zstd_local, "pair", None)
+    if pair is None:
+        pair = _zstd_local.pair = (zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor())
+    return pair
+
+
+_settings_cache: Optional[Tuple[str, Optional[int]]] = None
+
+
+def _settings() -> Tuple[str, Optional[int]]:
+    """(codec name, zstd threshold or None), read from config once per process."""
+    if _settings_cache is None:
+        cfg = get_config()
+        configure(
+            codec=getattr(cfg, "REDIS_CODEC", "orjson"),
+            compression=getattr(cfg, "REDIS_COMPRESSION", "zstd"),
+            compress_min_bytes=getattr(cfg, "REDIS_COMPRESS_MIN_BYTES", 4096),
+        )
+    return _settings_cache
+
+
+def configure(*, codec: str = "orjson", compression: str = "zstd", compress_min_bytes: int = 4096) -> Tuple[str, Optional[int]]:
+    """Pick the codec/compression this process writes (unavailable choices fall back)."""
+    global _settings_cache
+    name = str(codec or "orjson").lower()
+    if name not in _CODECS:
+        fallback = "orjson" if "orjson" in _CODECS else "json"
+        log.warning(f"REDIS_CODEC_UNAVAILABLE | requested={name} | using={fallback}")
+        name = fallback
+    threshold: Optional[int] = None
+    if str(compression or "").lower() == "zstd":
+        if zstandard is None:
+            log.info("REDIS_COMPRESSION_UNAVAILABLE | zstandard not installed | storing uncompressed")
+        else:
+            threshold = max(0, int(compress_min_bytes))
+    _settings_cache = (name, threshold)
+    return _settings_cache
+
+
+def _record(**deltas: Union[int, float]) -> None:
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def encode(obj: Any, *, codec: Optional[str] = None) -> bytes:
+    """Serialize `obj` with the configured codec (compressing large bodies) behind a header."""
+    t0 = time.perf_counter()
+    name, threshold = _settings()
+    cid, dumps, _loads = _CODECS.get(codec or name) or _CODECS[name]
+    body = dumps(obj)
+    raw_len = len(body)
+    compression = _NO_COMPRESSION
+    if threshold is not None and raw_len >= threshold:
+        body = _zstd()[0].compress(body)
+        compression = _ZSTD
+    payload = MAGIC + bytes((VERSION,)) + cid + compression + body
+    _record(
+        encoded=1,
+        compressed=int(compression == _ZSTD),
+        encode_ms=(time.perf_counter() - t0) * 1000,
+        raw_bytes=raw_len,
+        stored_bytes=len(payload),
+    )
+    return payload
+
+
+def decode(raw: Union[bytes, str, None], default: Any = None) -> Any:
+    """Inverse of `encode`; headerless payloads are read as legacy JSON.
+
+    Raises UnsupportedPayload for payloads this process cannot read and
+    ValueError for corrupt ones.
+    """
+    if raw is None:
+        return default
+    t0 = time.perf_counter()
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    if not raw.startswith(MAGIC):
+        try:
+            value = json.loads(raw)
+        except ValueError as exc:
+            raise ValueError(f"invalid legacy JSON payload: {exc}") from exc
+        _record(decoded=1, legacy_decoded=1, decode_ms=(time.perf_counter() - t0) * 1000)
+        return value
+    if len(raw) < 4 or raw[1] != VERSION:
+        raise UnsupportedPayload(f"unsupported payload header {raw[:4]!r}")
+    entry = _BY_ID.get(raw[2:3])
+    if entry is None:
+        raise UnsupportedPayload(f"payload codec {raw[2:3]!r} is not available in this process")
+    body = raw[4:]
+    if raw[3:4] == _ZSTD:
+        if zstandard is None:
+            raise UnsupportedPayload("payload is zstd-compressed but zstandard is not installed")
+        body = _zstd()[1].decompress(body)
+    try:
+        value = entry[1](body)
+    except Exception as exc:
+        raise ValueError(f"corrupt {entry[0]} payload: {exc}") from exc
+    _record(decoded=1, decode_ms=(time.perf_counter() - t0) * 1000)
+    return value
+
+
+def codec_stats() -> Dict[str, Any]:
+    """Process-wide encode/decode timings and byte counts."""
+    name, threshold = _settings()
+    with _stats_lock:
+        out: Dict[str, Any] = dict(_stats)
+    out["encode_ms"] = round(out["encode_ms"], 3)
+    out["decode_ms"] = round(out["decode_ms"], 3)
+    out["compression_ratio"] = round(out["stored_bytes"] / out["raw_bytes"], 4) if out["raw_bytes"] else 1.0
+    out["codec"] = name
+    out["available"] = sorted(_CODECS)
+    out["compress_min_bytes"] = threshold
+    return out
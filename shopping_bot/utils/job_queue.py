@@ -0,0 +1,330 @@
+# shopping_bot/utils/job_queue.py
+"""
+Durable job queue on Redis Streams.
+
+    queue = JobQueue(redis_client, "bg")
+    queue.register("process_query", handler)        # async def handler(payload) -> None
+    queue.start()                                   # consumer thread for this process
+    queue.enqueue("process_query", {...}, lane="interactive")
+
+Layout: one stream per priority lane (`jobs:{name}:{lane}`), all read through
+the same consumer group. Lanes are served in the order given (interactive
+before prefetch); a lower lane only gets slots when the lanes above it are
+empty. Every process is one consumer (`{hostname}:{pid}`).
+
+Durability: a job is XACKed only after its handler returns. If a worker dies
+mid-job (gunicorn --max-requests recycling, OOM, deploy) the entry stays in
+the group's pending list and another consumer takes it over with XAUTOCLAIM
+once it has been idle for JOB_QUEUE_VISIBILITY_SECONDS. Running jobs refresh
+their claim every third of that window, so long jobs are not stolen.
+
+Retries: a handler exception re-enqueues the job with attempt+1 until
+JOB_QUEUE_MAX_ATTEMPTS; a job delivered more than that many times (poison
+message that keeps killing workers) or out of attempts moves to
+`jobs:{name}:dead` with its last error.
+
+Concurrency: each process runs at most JOB_QUEUE_CONCURRENCY handlers at once
+on a dedicated event loop thread, independent of request threads/loops.
+
+`stats()` reports per-lane depth (undelivered entries), pending (claimed, not
+acked), oldest waiting/pending age, dead-letter depth and this process'
+counters; job wait/run latency also lands in utils.metrics (`job.wait`,
+`job.run`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import codec, metrics
+
+log = logging.getLogger(__name__)
+
+JOB_QUEUE_CONCURRENCY = int(os.getenv("JOB_QUEUE_CONCURRENCY", "4"))
+JOB_QUEUE_VISIBILITY_SECONDS = float(os.getenv("JOB_QUEUE_VISIBILITY_SECONDS", "300"))
+JOB_QUEUE_MAX_ATTEMPTS = int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+JOB_QUEUE_MAXLEN = int(os.getenv("JOB_QUEUE_MAXLEN", "10000"))
+
+LANES: Tuple[str, ...] = ("interactive", "prefetch")
+GROUP = "workers"
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def _s(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+def _entry_ms(entry_id: Any) -> int:
+    return int(_s(entry_id).split("-", 1)[0])
+
+
+class JobQueue:
+    """Redis Streams job queue with priority lanes, visibility timeout and retries."""
+
+    def __init__(
+        self,
+        redis_client: Any,
+        name: str = "bg",
+        *,
+        lanes: Sequence[str] = LANES,
+        concurrency: int = JOB_QUEUE_CONCURRENCY,
+        visibility_s: float = JOB_QUEUE_VISIBILITY_SECONDS,
+        max_attempts: int = JOB_QUEUE_MAX_ATTEMPTS,
+        maxlen: int = JOB_QUEUE_MAXLEN,
+        block_ms: int = 1000,
+        consumer: Optional[str] = None,
+    ):
+        self._redis = redis_client
+        self.name = name
+        self.lanes = tuple(lanes)
+        self.concurrency = max(1, concurrency)
+        self.visibility_ms = int(visibility_s * 1000)
+        self.max_attempts = max(1, max_attempts)
+        self.maxlen = maxlen
+        self.block_ms = block_ms
+        self._consumer = consumer
+        self._handlers: Dict[str, Handler] = {}
+        self._groups_ready = False
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {"enqueued": 0, "completed": 0, "retried": 0, "reclaimed": 0, "dead": 0}
+
+    # ────────────────────────────────────────────────────────
+    # Producer side
+    # ────────────────────────────────────────────────────────
+
+    def stream(self, lane: str) -> str:
+        return f"jobs:{self.name}:{lane}"
+
+    @property
+    def dead_stream(self) -> str:
+        return f"jobs:{self.name}:dead"
+
+    @property
+    def consumer(self) -> str:
+        return self._consumer or f"{socket.gethostname()}:{os.getpid()}"
+
+    def ensure_groups(self) -> None:
+        if self._groups_ready:
+            return
+        for lane in self.lanes:
+            try:
+                self._redis.xgroup_create(self.stream(lane), GROUP, id="0", mkstream=True)
+            except Exception as exc:  # BUSYGROUP: already created by another worker
+                if "BUSYGROUP" not in str(exc):
+                    raise
+        self._groups_ready = True
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], *, lane: Optional[str] = None, attempt: int = 1) -> str:
+        """Append a job; returns its stream entry id."""
+        lane = lane or self.lanes[0]
+        if lane not in self.lanes:
+            raise ValueError(f"unknown lane {lane!r} (lanes: {self.lanes})")
+        self.ensure_groups()
+        entry_id = self._redis.xadd(
+            self.stream(lane),
+            {"kind": kind, "payload": codec.encode(payload), "attempt": str(attempt), "enqueued_at": f"{time.time():.3f}"},
+            maxlen=self.maxlen,
+            approximate=True,
+        )
+        with self._lock:
+            self._counters["enqueued"] += 1
+        metrics.inc("shopbot_jobs_total", queue=self.name, lane=lane, event="enqueued")
+        return _s(entry_id)
+
+    # ────────────────────────────────────────────────────────
+    # Consumer side
+    # ────────────────────────────────────────────────────────
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        """Start this process' consumer thread (idempotent; re-armed after fork)."""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._thread_main, name=f"jobs-{self.name}", daemon=True)
+            self._thread.start()
+        log.info(f"JOB_QUEUE_STARTED | queue={self.name} | consumer={self.consumer} | concurrency={self.concurrency}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _thread_main(self) -> None:
+        try:
+            asyncio.run(self.run_forever())
+        except Exception as exc:  # noqa: BLE001
+            log.error(f"JOB_QUEUE_CRASHED | queue={self.name} | error={exc}", exc_info=True)
+
+    async def run_forever(self) -> None:
+        """Claim and run jobs until `stop()`; at most `concurrency` handlers at a time."""
+        self.ensure_groups()
+        tasks: set = set()
+        while not self._stop.is_set():
+            free = self.concurrency - len(tasks)
+            if free <= 0:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                tasks.difference_update(done)
+                continue
+            try:
+                batch = self.claim(free) or await asyncio.to_thread(self._read_blocking, free)
+            except Exception as exc:  # noqa: BLE001
+                log.warning(f"JOB_QUEUE_READ_FAILED | queue={self.name} | error={exc}")
+                await asyncio.sleep(1.0)
+                continue
+            for lane, entry_id, fields, deliveries in batch:
+                task = asyncio.ensure_future(self._run(lane, entry_id, fields, deliveries))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks, timeout=self.visibility_ms / 1000.0)
+
+    def claim(self, count: int) -> List[Tuple[str, str, Dict[str, Any], int]]:
+        """Non-blocking: abandoned entries first, then new ones, lanes in priority order."""
+        out: List[Tuple[str, str, Dict[str, Any], int]] = []
+        for lane in self.lanes:
+            if len(out) >= count:
+                break
+            stream = self.stream(lane)
+            reclaimed = self._redis.xautoclaim(stream, GROUP, self.consumer, self.visibility_ms, "0-0", count=count - len(out))
+            for entry_id, fields in (reclaimed[1] if reclaimed else []):
+                if fields is None:  # entry trimmed away while pending
+                    self._redis.xack(stream, GROUP, entry_id)
+                    continue
+                out.append((lane, _s(entry_id), fields, self._deliveries(stream, entry_id)))
+                with self._lock:
+                    self._counters["reclaimed"] += 1
+                log.warning(f"JOB_RECLAIMED | queue={self.name} | lane={lane} | id={_s(entry_id)}")
+        for lane in self.lanes:
+            if len(out) >= count:
+                break
+            resp = self._redis.xreadgroup(GROUP, self.consumer, {self.stream(lane): ">"}, count=count - len(out))
+            for _stream, entries in resp or []:
+                out.extend((lane, _s(entry_id), fields, 1) for entry_id, fields in entries)
+        return out
+
+    def _read_blocking(self, count: int) -> List[Tuple[str, str, Dict[str, Any], int]]:
+        """Wait up to block_ms for new entries on any lane (used only when every lane is empty)."""
+        resp = self._redis.xreadgroup(
+            GROUP, self.consumer, {self.stream(lane): ">" for lane in self.lanes}, count=count, block=self.block_ms
+        )
+        lane_of = {self.stream(lane): lane for lane in self.lanes}
+        return [(lane_of[_s(stream)], _s(entry_id), fields, 1) for stream, entries in resp or [] for entry_id, fields in entries]
+
+    def _deliveries(self, stream: str, entry_id: Any) -> int:
+        try:
+            info = self._redis.xpending_range(stream, GROUP, min=entry_id, max=entry_id, count=1)
+            return int(info[0]["times_delivered"]) if info else 1
+        except Exception:
+            return 1
+
+    async def _keep_claimed(self, stream: str, entry_id: str) -> None:
+        # Reset the idle time so other consumers don't reclaim a job that is still running
+        while True:
+            await asyncio.sleep(max(1.0, self.visibility_ms / 3000.0))
+            try:
+                self._redis.xclaim(stream, GROUP, self.consumer, 0, [entry_id], justid=True)
+            except Exception as exc:  # noqa: BLE001
+                log.debug(f"JOB_HEARTBEAT_FAILED | id={entry_id} | error={exc}")
+
+    async def _run(self, lane: str, entry_id: str, fields: Dict[Any, Any], deliveries: int) -> None:
+        stream = self.stream(lane)
+        data = {_s(k): v for k, v in fields.items()}
+        kind = _s(data.get("kind", ""))
+        attempt = int(_s(data.get("attempt", "1")))
+        enqueued_at = float(_s(data.get("enqueued_at", "0")) or 0)
+        if enqueued_at:
+            metrics.observe("job.wait", max(0.0, time.time() - enqueued_at), queue=self.name, lane=lane)
+
+        error: Optional[str] = None
+        if deliveries > self.max_attempts:
+            error = f"abandoned after {deliveries} deliveries"
+        elif kind not in self._handlers:
+            error = f"no handler for {kind!r}"
+        else:
+            heartbeat = asyncio.ensure_future(self._keep_claimed(stream, entry_id))
+            try:
+                with metrics.span("job.run", queue=self.name, kind=kind):
+                    await self._handlers[kind](codec.decode(data["payload"]))
+            except Exception as exc:  # noqa: BLE001
+                error = f"{type(exc).__name__}: {exc}"
+                log.error(f"JOB_FAILED | queue={self.name} | id={entry_id} | kind={kind} | attempt={attempt} | error={error}", exc_info=True)
+            finally:
+                heartbeat.cancel()
+
+        try:
+            if error is None:
+                event = "completed"
+            elif attempt < self.max_attempts and deliveries <= self.max_attempts and kind in self._handlers:
+                event = "retried"
+                self._redis.xadd(stream, {**data, "attempt": str(attempt + 1), "last_error": error[:500]}, maxlen=self.maxlen, approximate=True)
+            else:
+                event = "dead"
+                self._redis.xadd(self.dead_stream, {**data, "lane": lane, "last_error": error[:500], "failed_at": f"{time.time():.3f}"}, maxlen=self.maxlen, approximate=True)
+                log.error(f"JOB_DEAD | queue={self.name} | id={entry_id} | kind={kind} | error={error}")
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.xack(stream, GROUP, entry_id)
+            pipe.xdel(stream, entry_id)
+            pipe.execute()
+        except Exception as exc:  # noqa: BLE001
+            # Left pending: another consumer reclaims it after the visibility timeout
+            log.error(f"JOB_ACK_FAILED | queue={self.name} | id={entry_id} | error={exc}")
+            return
+        with self._lock:
+            self._counters[event] += 1
+        metrics.inc("shopbot_jobs_total", queue=self.name, lane=lane, event=event)
+
+    # ────────────────────────────────────────────────────────
+    # Stats
+    # ────────────────────────────────────────────────────────
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth/age per lane (shared, from Redis) plus this process' counters.
+
+        Read-only: health checks must not create streams or groups, so a lane
+        nobody has used yet simply reports zeros.
+        """
+        now_ms = int(time.time() * 1000)
+        lanes: Dict[str, Any] = {}
+        for lane in self.lanes:
+            stream = self.stream(lane)
+            group: Dict[Any, Any] = {}
+            if self._redis.exists(stream):
+                group = next((g for g in self._redis.xinfo_groups(stream) if _s(g.get("name")) == GROUP), {})
+            # Finished entries are deleted, so the stream holds exactly the waiting + pending jobs
+            pending = (self._redis.xpending(stream, GROUP) if group else None) or {}
+            n_pending = int(pending.get("pending") or 0)
+            oldest_pending = pending.get("min")
+            last = _s(group.get("last-delivered-id") or "0-0")
+            waiting = self._redis.xrange(stream, min=f"({last}", max="+", count=1)
+            lanes[lane] = {
+                "depth": max(0, self._redis.xlen(stream) - n_pending),
+                "pending": n_pending,
+                "oldest_waiting_s": round((now_ms - _entry_ms(waiting[0][0])) / 1000.0, 3) if waiting else 0.0,
+                "oldest_pending_s": round((now_ms - _entry_ms(oldest_pending)) / 1000.0, 3) if oldest_pending else 0.0,
+            }
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "queue": self.name,
+            "consumer": self.consumer,
+            "running": bool(self._thread and self._thread.is_alive() and self._pid == os.getpid()),
+            "concurrency": self.concurrency,
+            "lanes": lanes,
+            "dead": self._redis.xlen(self.dead_stream),
+            **counters,
+        }
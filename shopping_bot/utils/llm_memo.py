@@ -0,0 +1,243 @@
+# shopping_bot/utils/llm_memo.py
+"""
+Redis-backed memo for deterministic (temperature=0) LLM tool calls.
+
+Only the raw tool input is memoized; every caller still runs its own
+post-processing and session writes on the returned copy:
+
+    data = await llm_memo().run(
+        "classify_and_assess",
+        model=Cfg.LLM_MODEL,
+        material={"text": query, "context": context_summary},
+        sources=(LLMService.classify_and_assess, COMBINED_CLASSIFY_ASSESS_TOOL),
+        live=_call,                       # async () -> Optional[dict]
+    )
+
+Key = sha1 of: call type, model, normalized text (casefolded, whitespace
+collapsed), the call-specific `material` (slots, history window, taxonomy
+...), and a template version. The version hashes the source of the functions
+that render the prompt plus the tool schema, so editing a prompt or schema
+invalidates its entries without a manual bump; LLM_MEMO_VERSION is the
+global escape hatch. `None` results (fallbacks, errors) are never stored.
+
+Modes per call type (LLM_MEMO_MODE default, LLM_MEMO_MODES overrides):
+
+  off     always live
+  shadow  always live; when an entry exists, compare it with the live result
+          and count agree/disagree (this is how a call type earns trust)
+  on      serve entries; live only on a miss
+
+TTLs: LLM_MEMO_TTL_SECONDS default, LLM_MEMO_TTLS per call type, e.g.
+"classify_and_assess=3600,classify_follow_up=600". Redis failures count as
+misses and never fail the call; Redis I/O runs off the event loop
+(`redis_client.to_thread`).
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from . import codec
+from .redis_client import aux_client, to_thread
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "llm:memo:"
+MODES = ("off", "shadow", "on")
+
+
+def _parse_map(raw: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            if name.strip() and value.strip():
+                out[name.strip()] = value.strip()
+    return out
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", str(text or "")).strip().casefold()
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+_source_versions: Dict[int, str] = {}
+
+
+def _source_version(obj: Any) -> str:
+    """Hash of a prompt-rendering function's source or a tool schema (cached per object)."""
+    cached = _source_versions.get(id(obj))
+    if cached is not None:
+        return cached
+    if isinstance(obj, (dict, list, str)):
+        raw = _canonical(obj)
+    else:
+        try:
+            raw = inspect.getsource(obj)
+        except (OSError, TypeError):
+            raw = getattr(obj, "__qualname__", repr(obj))
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+    # Schemas are module constants and functions live for the process: safe to key by id
+    _source_versions[id(obj)] = digest
+    return digest
+
+
+class LLMMemo:
+    def __init__(
+        self,
+        *,
+        default_mode: str = "off",
+        modes: Optional[Dict[str, str]] = None,
+        default_ttl_seconds: int = 3600,
+        ttls: Optional[Dict[str, int]] = None,
+        version: str = "1",
+        redis_client: Any = None,
+    ):
+        self.default_mode = default_mode if default_mode in MODES else "off"
+        self.modes = {k: v for k, v in (modes or {}).items() if v in MODES}
+        self.default_ttl_seconds = max(1, int(default_ttl_seconds))
+        self.ttls = {k: max(1, int(v)) for k, v in (ttls or {}).items()}
+        self.version = str(version)
+        self._redis = redis_client
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "LLMMemo":
+        ttls: Dict[str, int] = {}
+        for name, value in _parse_map(os.getenv("LLM_MEMO_TTLS", "")).items():
+            try:
+                ttls[name] = int(value)
+            except ValueError:
+                log.warning(f"LLM_MEMO_BAD_TTL | call={name} | value={value}")
+        return cls(
+            default_mode=os.getenv("LLM_MEMO_MODE", "off").strip().lower(),
+            modes={k: v.lower() for k, v in _parse_map(os.getenv("LLM_MEMO_MODES", "")).items()},
+            default_ttl_seconds=int(os.getenv("LLM_MEMO_TTL_SECONDS", "3600")),
+            ttls=ttls,
+            version=os.getenv("LLM_MEMO_VERSION", "1"),
+        )
+
+    def mode(self, call: str) -> str:
+        return self.modes.get(call, self.default_mode)
+
+    def ttl(self, call: str) -> int:
+        return self.ttls.get(call, self.default_ttl_seconds)
+
+    # ────────────────────────────────────────────────────────
+    # Redis
+    # ────────────────────────────────────────────────────────
+
+    def _get_redis(self):
+        return self._redis if self._redis is not None else aux_client()
+
+    async def _load(self, call: str, key: str) -> Optional[Dict[str, Any]]:
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            return codec.decode(await to_thread(client.get, KEY_PREFIX + key))
+        except Exception as exc:
+            self._count(call, "redis_errors")
+            log.debug(f"LLM_MEMO_GET_ERROR | call={call} | error={exc}")
+            return None
+
+    async def _store(self, call: str, key: str, value: Dict[str, Any]) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await to_thread(client.set, KEY_PREFIX + key, codec.encode(value), ex=self.ttl(call))
+            self._count(call, "sets")
+        except Exception as exc:
+            self._count(call, "redis_errors")
+            log.debug(f"LLM_MEMO_SET_ERROR | call={call} | error={exc}")
+
+    # ────────────────────────────────────────────────────────
+    # Public API
+    # ────────────────────────────────────────────────────────
+
+    def key(self, call: str, *, model: str, material: Dict[str, Any], sources: Iterable[Any] = ()) -> str:
+        material = dict(material)
+        if "text" in material:
+            material["text"] = normalize_text(material["text"])
+        version = ":".join([self.version, *(_source_version(s) for s in sources)])
+        raw = _canonical({"call": call, "model": model, "version": version, "material": material})
+        return f"{call}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    async def run(
+        self,
+        call: str,
+        *,
+        model: str,
+        material: Dict[str, Any],
+        live: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        sources: Iterable[Any] = (),
+    ) -> Optional[Dict[str, Any]]:
+        mode = self.mode(call)
+        if mode == "off":
+            return await live()
+
+        key = self.key(call, model=model, material=material, sources=sources)
+        cached = await self._load(call, key)
+        if mode == "on" and cached is not None:
+            self._count(call, "hits")
+            log.info(f"LLM_MEMO_HIT | call={call}")
+            return copy.deepcopy(cached)
+
+        result = await live()
+        if cached is None:
+            self._count(call, "misses")
+            if isinstance(result, dict):
+                await self._store(call, key, result)
+        elif mode == "shadow":
+            if result is not None and _canonical(result) == _canonical(cached):
+                self._count(call, "shadow_agree")
+            else:
+                self._count(call, "shadow_disagree")
+                log.info(f"LLM_MEMO_SHADOW_MISMATCH | call={call} | key={key}")
+        return result
+
+    def _count(self, call: str, name: str) -> None:
+        with self._lock:
+            bucket = self._stats.setdefault(call, {})
+            bucket[name] = bucket.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {call: dict(c) for call, c in self._stats.items()}
+        for call, c in out.items():
+            c["mode"] = self.mode(call)
+            compared = c.get("shadow_agree", 0) + c.get("shadow_disagree", 0)
+            if compared:
+                c["shadow_agreement"] = round(c.get("shadow_agree", 0) / compared, 4)
+        return out
+
+
+_memo: Optional[LLMMemo] = None
+_memo_lock = threading.Lock()
+
+
+def llm_memo() -> LLMMemo:
+    """Process-wide memo configured from the environment."""
+    global _memo
+    if _memo is None:
+        with _memo_lock:
+            if _memo is None:
+                _memo = LLMMemo.from_env()
+    return _memo
+
+
+def llm_memo_stats() -> Dict[str, Any]:
+    return llm_memo().stats()
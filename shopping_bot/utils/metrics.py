@@ -0,0 +1,439 @@
+# shopping_bot/utils/metrics.py
+"""
+Per-stage latency spans and Prometheus-style metrics.
+
+    from ..utils.metrics import inc, span, timed
+
+    with span("es.fallback", step=label):      # histogram sample on exit
+        res = await fetcher.asearch(p)
+
+    @timed("redis.load")                        # sync or async functions
+    def get_context(...): ...
+
+    inc("shopbot_es_fallback_applied_total", step=label)
+
+Every span lands in one histogram, `shopbot_stage_seconds{stage=...,<labels>}`;
+spans that raise also bump `shopbot_stage_errors_total`. Keep labels to small
+fixed sets (tool names, ladder steps) – never ids or user text.
+
+Off switch (METRICS_ENABLED, default false): `span` returns a shared no-op
+after one flag check, `inc`/`observe` return immediately, and `timed`
+returns the function itself when metrics are off at import, so disabled
+builds pay nothing on decorated paths.
+
+Across gunicorn workers: each worker keeps its own registry and publishes a
+snapshot to the Redis hash `metrics:workers:{hostname}` (one field per pid)
+every METRICS_FLUSH_SECONDS and whenever it serves a scrape. GET /rs/metrics
+merges every snapshot of this host that is fresher than METRICS_STALE_SECONDS
+and renders the Prometheus text format. Older snapshots belong to recycled
+workers (gunicorn --max-requests): they are folded into the `retired` field
+of the same hash before being dropped, under WATCH so each is counted once,
+and `retired` is merged into every scrape. Totals therefore never go
+backwards when a worker exits (the prometheus_client multiprocess approach).
+Without Redis a scrape shows the serving worker only.
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import inspect
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from redis.exceptions import WatchError
+
+from . import codec
+from .redis_client import aux_client
+
+log = logging.getLogger(__name__)
+
+_ON = {"1", "true", "yes", "on"}
+
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "10"))
+METRICS_STALE_SECONDS = float(os.getenv("METRICS_STALE_SECONDS", "120"))
+KEY_PREFIX = "metrics:workers:"
+RETIRED_FIELD = "retired"
+
+# Upper bounds (seconds) of the stage histogram buckets; +Inf is implicit
+BUCKETS: Tuple[float, ...] = tuple(
+    float(b) for b in os.getenv("METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30").split(",") if b.strip()
+)
+
+STAGE_HISTOGRAM = "shopbot_stage_seconds"
+STAGE_ERRORS = "shopbot_stage_errors_total"
+
+Labels = Tuple[Tuple[str, str], ...]
+F = TypeVar("F", bound=Callable[..., Any])
+
+_enabled = os.getenv("METRICS_ENABLED", "false").lower() in _ON
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(flag: bool) -> None:
+    """Toggle spans/counters at runtime (functions decorated while off stay undecorated)."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+def _labels(stage: Optional[str], extra: Dict[str, Any]) -> Labels:
+    pairs = [(k, str(v)) for k, v in extra.items()]
+    pairs.sort()
+    if stage is not None:
+        pairs.insert(0, ("stage", stage))
+    return tuple(pairs)
+
+
+# ────────────────────────────────────────────────────────
+# Registry
+# ────────────────────────────────────────────────────────
+
+class Registry:
+    """Histograms (per-bucket counts + sum) and counters of one process."""
+
+    def __init__(self, buckets: Iterable[float] = BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # (name, labels) -> [count per bucket..., count above last bucket, sum]
+        self._hist: Dict[Tuple[str, Labels], List[float]] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+
+    def observe(self, name: str, labels: Labels, seconds: float) -> None:
+        slot = bisect.bisect_left(self.buckets, seconds)
+        key = (name, labels)
+        with self._lock:
+            row = self._hist.get(key)
+            if row is None:
+                row = self._hist[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[slot] += 1
+            row[-1] += seconds
+
+    def inc(self, name: str, labels: Labels, value: float = 1.0) -> None:
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            hist = [[name, [list(p) for p in labels], list(row)] for (name, labels), row in self._hist.items()]
+            counters = [[name, [list(p) for p in labels], value] for (name, labels), value in self._counters.items()]
+        return {"buckets": list(self.buckets), "hist": hist, "counters": counters}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+            self._counters.clear()
+
+
+def merge(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum snapshots from several workers (snapshots with other bucket bounds are skipped)."""
+    buckets: Optional[List[float]] = None
+    hist: Dict[Tuple[str, Labels], List[float]] = {}
+    counters: Dict[Tuple[str, Labels], float] = {}
+    for snap in snapshots:
+        if buckets is None:
+            buckets = list(snap.get("buckets") or [])
+        elif list(snap.get("buckets") or []) != buckets:
+            log.warning("METRICS_BUCKETS_MISMATCH | snapshot skipped")
+            continue
+        for name, labels, row in snap.get("hist") or []:
+            key = (name, tuple(tuple(p) for p in labels))
+            acc = hist.get(key)
+            if acc is None:
+                hist[key] = list(row)
+            else:
+                for i, v in enumerate(row):
+                    acc[i] += v
+        for name, labels, value in snap.get("counters") or []:
+            key = (name, tuple(tuple(p) for p in labels))
+            counters[key] = counters.get(key, 0.0) + value
+    return {"buckets": buckets or [], "hist": hist, "counters": counters}
+
+
+def _as_snapshot(merged: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of `merge` for one result: back to the published snapshot layout."""
+    return {
+        "buckets": list(merged["buckets"]),
+        "hist": [[name, [list(p) for p in labels], list(row)] for (name, labels), row in merged["hist"].items()],
+        "counters": [[name, [list(p) for p in labels], value] for (name, labels), value in merged["counters"].items()],
+    }
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+_HELP = {
+    STAGE_HISTOGRAM: "Latency of pipeline stages in seconds.",
+    STAGE_ERRORS: "Stage spans that exited with an exception.",
+}
+
+
+def render(merged: Dict[str, Any], workers: int = 1) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    buckets = merged["buckets"]
+    lines: List[str] = []
+    by_name: Dict[str, List[Tuple[Labels, List[float]]]] = {}
+    for (name, labels), row in sorted(merged["hist"].items()):
+        by_name.setdefault(name, []).append((labels, row))
+    for name, series in by_name.items():
+        lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, row in series:
+            cumulative = 0.0
+            for bound, count in zip(buckets, row):
+                cumulative += count
+                lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', _fmt_num(bound)))} {_fmt_num(cumulative)}")
+            cumulative += row[len(buckets)]
+            lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {_fmt_num(cumulative)}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_num(row[-1])}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {_fmt_num(cumulative)}")
+    counter_names: Dict[str, List[Tuple[Labels, float]]] = {}
+    for (name, labels), value in sorted(merged["counters"].items()):
+        counter_names.setdefault(name, []).append((labels, value))
+    for name, series in counter_names.items():
+        lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in series:
+            lines.append(f"{name}{_fmt_labels(labels)} {_fmt_num(value)}")
+    lines.append("# HELP shopbot_metrics_workers Worker snapshots merged into this scrape.")
+    lines.append("# TYPE shopbot_metrics_workers gauge")
+    lines.append(f"shopbot_metrics_workers {workers}")
+    return "\n".join(lines) + "\n"
+
+
+_registry = Registry()
+
+
+def registry() -> Registry:
+    return _registry
+
+
+# ────────────────────────────────────────────────────────
+# Recording API
+# ────────────────────────────────────────────────────────
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("labels", "start")
+
+    def __init__(self, labels: Labels):
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        _registry.observe(STAGE_HISTOGRAM, self.labels, time.perf_counter() - self.start)
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            _registry.inc(STAGE_ERRORS, self.labels)
+        _publisher.ensure_running()
+        return False
+
+
+def span(stage: str, **labels: Any) -> Any:
+    """Context manager timing one stage (no-op while metrics are disabled)."""
+    if not _enabled:
+        return _NOOP
+    return _Span(_labels(stage, labels))
+
+
+def observe(stage: str, seconds: float, **labels: Any) -> None:
+    """Record an already-measured stage duration."""
+    if not _enabled:
+        return
+    _registry.observe(STAGE_HISTOGRAM, _labels(stage, labels), seconds)
+    _publisher.ensure_running()
+
+
+def inc(name: str, value: float = 1.0, **labels: Any) -> None:
+    """Bump a counter (`name` should end in `_total`)."""
+    if not _enabled:
+        return
+    _registry.inc(name, _labels(None, labels), value)
+    _publisher.ensure_running()
+
+
+def timed(stage: str, **labels: Any) -> Callable[[F], F]:
+    """Decorator form of `span` for sync and async functions."""
+
+    def decorate(fn: F) -> F:
+        if not _enabled:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(stage, **labels):
+                    return await fn(*args, **kwargs)
+            return awrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage, **labels):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+# ────────────────────────────────────────────────────────
+# Cross-worker publishing
+# ────────────────────────────────────────────────────────
+
+class _Publisher:
+    """Pushes this worker's snapshot to Redis on a timer; merges all of them on scrape."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._redis: Any = None
+        self._redis_failed_at = 0.0
+
+    @staticmethod
+    def key() -> str:
+        return f"{KEY_PREFIX}{socket.gethostname()}"
+
+    def ensure_running(self) -> None:
+        # One flusher thread per process; re-armed after a fork (gunicorn preload)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._redis = None
+            threading.Thread(target=self._loop, name="metrics-flush", daemon=True).start()
+
+    def _loop(self) -> None:
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            self.publish()
+
+    def _client(self) -> Any:
+        if self._redis is not None:
+            return self._redis
+        # Back off for a while after a failed flush instead of retrying on every one
+        if time.monotonic() - self._redis_failed_at < 30:
+            return None
+        self._redis = aux_client(timeout=0.5)
+        return self._redis
+
+    def publish(self) -> bool:
+        client = self._client()
+        if client is None:
+            return False
+        snapshot = {"ts": time.time(), **_registry.snapshot()}
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hset(self.key(), str(os.getpid()), codec.encode(snapshot))
+            pipe.expire(self.key(), int(METRICS_STALE_SECONDS * 2))
+            pipe.execute()
+            return True
+        except Exception as exc:
+            log.debug(f"METRICS_PUBLISH_FAILED | error={exc}")
+            self._redis = None
+            self._redis_failed_at = time.monotonic()
+            return False
+
+    def collect(self) -> Optional[Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+        """(fresh snapshots of every worker on this host, retired totals); None when Redis is unavailable."""
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            raw = client.hgetall(self.key())
+        except Exception as exc:
+            log.debug(f"METRICS_COLLECT_FAILED | error={exc}")
+            return None
+        now = time.time()
+        fresh, stale, retired = [], [], None
+        for field, payload in (raw or {}).items():
+            try:
+                snap = codec.decode(payload)
+            except (TypeError, ValueError):
+                snap = None
+            if field in (RETIRED_FIELD, RETIRED_FIELD.encode()):
+                retired = snap if isinstance(snap, dict) else None
+            elif not isinstance(snap, dict) or now - float(snap.get("ts", 0)) > METRICS_STALE_SECONDS:
+                stale.append(field)
+            else:
+                fresh.append(snap)
+        if stale:
+            retired = self._retire(client, stale) or retired
+        return fresh, retired
+
+    def _retire(self, client: Any, stale: List[Any], *, max_retries: int = 5) -> Optional[Dict[str, Any]]:
+        """Fold dead workers' last snapshots into the retired totals and drop them, under WATCH."""
+        key = self.key()
+        try:
+            with client.pipeline() as pipe:
+                for _ in range(max_retries):
+                    try:
+                        pipe.watch(key)
+                        payloads = pipe.hmget(key, [RETIRED_FIELD, *stale])
+                        snaps: List[Optional[Dict[str, Any]]] = []
+                        for payload in payloads:
+                            try:
+                                snap = codec.decode(payload) if payload is not None else None
+                            except (TypeError, ValueError):
+                                snap = None
+                            snaps.append(snap if isinstance(snap, dict) else None)
+                        prior, dead = snaps[0], [snap for snap in snaps[1:] if snap is not None]
+                        # Dead workers first: after a bucket change their layout wins
+                        retired = _as_snapshot(merge(dead + ([prior] if prior else []))) if dead else prior
+                        pipe.multi()
+                        if dead:
+                            pipe.hset(key, RETIRED_FIELD, codec.encode(retired))
+                        pipe.hdel(key, *stale)
+                        pipe.execute()
+                        return retired
+                    except WatchError:
+                        continue  # a worker published meanwhile (or another scrape retired them)
+        except Exception as exc:
+            log.debug(f"METRICS_RETIRE_FAILED | error={exc}")
+        return None
+
+
+_publisher = _Publisher()
+
+
+def render_metrics() -> str:
+    """Scrape body: all workers of this host when Redis is reachable, else this worker."""
+    collected = _publisher.collect() if _publisher.publish() else None
+    fresh, retired = collected if collected is not None else ([], None)
+    if not fresh:
+        fresh = [_registry.snapshot()]
+    return render(merge(fresh + ([retired] if retired else [])), workers=len(fresh))
@@ -0,0 +1,85 @@
+# shopping_bot/utils/prompt_cache.py
+"""
+Anthropic prompt-prefix caching helpers.
+
+The API caches the request prefix (tools → system → messages) up to each
+`cache_control` breakpoint. To get hits, the static part of a prompt must be
+byte-identical across requests and come *before* anything per-request:
+
+    resp = await client.messages.create(
+        system=cached_system(STATIC_RULES),                 # breakpoint here
+        messages=[{"role": "user", "content": dynamic}],   # per-request context
+        tools=[TOOL],
+        ...
+    )
+    log_cache_usage(resp, "es_params_food")
+
+Prefixes below the model's minimum cacheable length are simply not cached;
+the breakpoint is harmless. Set ENABLE_PROMPT_CACHE=false to send plain
+prompts (same text, no breakpoints).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Dict, List
+
+from ..config import get_config
+
+log = logging.getLogger(__name__)
+
+_EPHEMERAL = {"type": "ephemeral"}
+
+_usage: Dict[str, Dict[str, int]] = {}
+_usage_lock = threading.Lock()
+
+
+def _enabled() -> bool:
+    return bool(getattr(get_config(), "ENABLE_PROMPT_CACHE", True))
+
+
+def cached_system(*blocks: str) -> List[Dict[str, Any]]:
+    """System text blocks with a cache breakpoint after the last one."""
+    out: List[Dict[str, Any]] = [{"type": "text", "text": b} for b in blocks if b]
+    if out and _enabled():
+        out[-1]["cache_control"] = dict(_EPHEMERAL)
+    return out
+
+
+def cached_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy of `tools` with a cache breakpoint on the last tool (schemas must be static)."""
+    out = [dict(t) for t in tools]
+    if out and _enabled():
+        out[-1]["cache_control"] = dict(_EPHEMERAL)
+    return out
+
+
+def log_cache_usage(resp: Any, call: str) -> Dict[str, int]:
+    """Log cache read/write token counts for one response and add them to the per-call totals."""
+    usage = getattr(resp, "usage", None)
+    counts = {
+        "input_tokens": int(getattr(usage, "input_tokens", 0) or 0),
+        "cache_read_input_tokens": int(getattr(usage, "cache_read_input_tokens", 0) or 0),
+        "cache_creation_input_tokens": int(getattr(usage, "cache_creation_input_tokens", 0) or 0),
+    }
+    log.info(
+        "LLM_PROMPT_CACHE | call=%s | cache_read=%d | cache_write=%d | uncached_input=%d",
+        call,
+        counts["cache_read_input_tokens"],
+        counts["cache_creation_input_tokens"],
+        counts["input_tokens"],
+    )
+    with _usage_lock:
+        totals = _usage.setdefault(call, {"calls": 0, "hits": 0, **{k: 0 for k in counts}})
+        totals["calls"] += 1
+        totals["hits"] += 1 if counts["cache_read_input_tokens"] else 0
+        for key, value in counts.items():
+            totals[key] += value
+    return counts
+
+
+def cache_usage_stats() -> Dict[str, Dict[str, int]]:
+    """Per-call prompt-cache token totals for this worker."""
+    with _usage_lock:
+        return {call: dict(totals) for call, totals in _usage.items()}
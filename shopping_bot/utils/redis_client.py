@@ -0,0 +1,95 @@
+# shopping_bot/utils/redis_client.py
+"""
+Shared Redis client for the auxiliary tiers (ES result cache, doc cache,
+single-flight, LLM memo, metrics).
+
+These tiers sit in front of something slower (ES, the LLM), so their client
+uses short socket timeouts and a failed init is retried only after a
+back-off. One client per (decode_responses, timeout) profile is shared by the
+whole process; redis-py's pool reconnects by itself after a fork.
+
+Async callers go through `to_thread(fn, *args)`, which runs the blocking call
+on a small dedicated pool instead of the event loop. redis.asyncio is not an
+option here: flask[async] runs every async view on its own short-lived loop,
+and an asyncio client's connections belong to the loop that opened them.
+
+    client = aux_client()
+    if client is not None:
+        raw = await to_thread(client.get, key)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+log = logging.getLogger(__name__)
+
+REDIS_AUX_TIMEOUT_SECONDS = float(os.getenv("REDIS_AUX_TIMEOUT_SECONDS", "0.25"))
+REDIS_AUX_THREADS = int(os.getenv("REDIS_AUX_THREADS", "8"))
+_RETRY_AFTER_SECONDS = 30.0
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[bool, float], Any] = {}
+_failed_at: Dict[Tuple[bool, float], float] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+
+
+def aux_client(*, decode_responses: bool = False, timeout: Optional[float] = None) -> Any:
+    """Process-wide client for one profile, or None while a failed init backs off."""
+    profile = (bool(decode_responses), float(timeout if timeout is not None else REDIS_AUX_TIMEOUT_SECONDS))
+    client = _clients.get(profile)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(profile)
+        if client is not None:
+            return client
+        if time.monotonic() - _failed_at.get(profile, -_RETRY_AFTER_SECONDS) < _RETRY_AFTER_SECONDS:
+            return None
+        try:
+            import redis
+
+            from ..config import get_config
+
+            cfg = get_config()
+            client = redis.Redis(
+                host=cfg.REDIS_HOST,
+                port=cfg.REDIS_PORT,
+                db=cfg.REDIS_DB,
+                decode_responses=profile[0],
+                socket_timeout=profile[1],
+                socket_connect_timeout=profile[1],
+            )
+        except Exception as exc:
+            log.warning(f"REDIS_AUX_INIT_FAILED | error={exc}")
+            _failed_at[profile] = time.monotonic()
+            return None
+        _clients[profile] = client
+        return client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    # Threads don't survive a fork (gunicorn preload): build a fresh pool per process
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=max(1, REDIS_AUX_THREADS), thread_name_prefix="redis-aux")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+async def to_thread(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking Redis call off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,338 @@
+# shopping_bot/utils/single_flight.py
+"""
+Single-flight: collapse concurrent identical calls into one.
+
+    result = await single_flight("es.search").run(key, lambda: fetch(...))
+    result = single_flight("es.search").run_sync(key, lambda: fetch(...))
+
+The first caller for a key becomes the leader and does the work; callers
+that arrive while it is in flight attach to the leader's future and get a
+deep copy of its result (or its exception). The future holds its own
+snapshot, so whatever the leader does to its result afterwards stays local. Nothing is kept once the
+leader finishes; remembering results is the job of the caches in front.
+
+In-flight entries are `concurrent.futures.Future`s behind a thread lock,
+so sync callers, async callers and callers on different event loops (one
+loop per request thread under WSGI) all share one table. If an async
+leader is cancelled (e.g. a discarded speculative fetch), its followers
+are released and retry instead of inheriting the cancellation.
+
+Cross-worker (SINGLE_FLIGHT_REDIS=true): the leader also takes a short
+Redis lock (SET NX PX). A worker that finds the lock held polls for the
+result key the holder writes on completion, for up to
+SINGLE_FLIGHT_WAIT_MS, then runs the call itself. Only results accepted by
+`store_if` are published, with a short TTL. Redis failures degrade to
+in-process coalescing and never fail the call. On the async path the Redis
+calls (lock, polls, publish) run off the event loop.
+
+Counters per name (leaders, collapsed, remote_collapsed, remote_timeouts,
+abandoned, redis_errors) are served under /rs/health/caches and as
+`shopbot_single_flight_total{call,event}`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from . import codec
+from .metrics import inc
+from .redis_client import aux_client, to_thread
+
+log = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+SINGLE_FLIGHT_REDIS = os.getenv("SINGLE_FLIGHT_REDIS", "false").lower() in {"1", "true", "yes", "on"}
+SINGLE_FLIGHT_LOCK_MS = int(os.getenv("SINGLE_FLIGHT_LOCK_MS", "15000"))
+SINGLE_FLIGHT_WAIT_MS = int(os.getenv("SINGLE_FLIGHT_WAIT_MS", "8000"))
+SINGLE_FLIGHT_RESULT_TTL_SECONDS = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL_SECONDS", "10"))
+KEY_PREFIX = "sf:"
+_POLL_SECONDS = 0.025
+
+
+class _Abandoned(Exception):
+    """The leader went away without a result; followers retry."""
+
+
+def _default_store_if(result: Any) -> bool:
+    return result is not None
+
+
+class SingleFlight:
+    def __init__(
+        self,
+        name: str,
+        *,
+        enabled: bool = SINGLE_FLIGHT_ENABLED,
+        use_redis: bool = SINGLE_FLIGHT_REDIS,
+        redis_client: Any = None,
+        lock_ms: int = SINGLE_FLIGHT_LOCK_MS,
+        wait_ms: int = SINGLE_FLIGHT_WAIT_MS,
+        result_ttl_seconds: int = SINGLE_FLIGHT_RESULT_TTL_SECONDS,
+    ):
+        self.name = name
+        self.enabled = bool(enabled)
+        self.use_redis = bool(use_redis)
+        self.lock_ms = max(1, int(lock_ms))
+        self.wait_ms = max(0, int(wait_ms))
+        self.result_ttl_seconds = max(1, int(result_ttl_seconds))
+        self._redis = redis_client
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {}
+
+    # ────────────────────────────────────────────────────────
+    # In-process table
+    # ────────────────────────────────────────────────────────
+
+    def _join(self, key: str) -> Tuple[concurrent.futures.Future, bool]:
+        """(future, is_leader) for `key`."""
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                fut.followers += 1
+                return fut, False
+            fut = concurrent.futures.Future()
+            fut.followers = 0
+            self._inflight[key] = fut
+            return fut, True
+
+    def _finish(self, key: str, fut: concurrent.futures.Future, *, result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            followers = fut.followers
+        if error is not None:
+            fut.set_exception(error)
+        elif followers:
+            # The leader keeps (and may mutate) `result`; followers copy from a private snapshot
+            fut.set_result(copy.deepcopy(result))
+        else:
+            fut.set_result(result)
+
+    # ────────────────────────────────────────────────────────
+    # Redis tier
+    # ────────────────────────────────────────────────────────
+
+    def _get_redis(self):
+        if not self.use_redis:
+            return None
+        return self._redis if self._redis is not None else aux_client()
+
+    def _redis_key(self, kind: str, key: str) -> str:
+        return f"{KEY_PREFIX}{self.name}:{kind}:{key}"
+
+    def _try_lock(self, key: str) -> Optional[str]:
+        """Lock token when this worker should run the call, None when another worker holds it."""
+        client = self._get_redis()
+        token = uuid.uuid4().hex
+        if client is None:
+            return token
+        try:
+            if client.set(self._redis_key("lock", key), token, nx=True, px=self.lock_ms):
+                return token
+            return None
+        except Exception as exc:
+            self._count("redis_errors")
+            log.debug(f"SINGLE_FLIGHT_LOCK_ERROR | name={self.name} | error={exc}")
+            return token
+
+    def _remote_result(self, key: str) -> Tuple[bool, Any]:
+        """(found, result) from the lock holder's result key."""
+        client = self._get_redis()
+        if client is None:
+            return False, None
+        try:
+            raw = client.get(self._redis_key("result", key))
+            return (raw is not None), (codec.decode(raw) if raw is not None else None)
+        except Exception as exc:
+            self._count("redis_errors")
+            log.debug(f"SINGLE_FLIGHT_GET_ERROR | name={self.name} | error={exc}")
+            return False, None
+
+    def _lock_held(self, key: str) -> bool:
+        client = self._get_redis()
+        if client is None:
+            return False
+        try:
+            return bool(client.exists(self._redis_key("lock", key)))
+        except Exception:
+            self._count("redis_errors")
+            return False
+
+    def _publish(self, key: str, token: str, result: Any, store_if: Callable[[Any], bool]) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            if store_if(result):
+                client.set(self._redis_key("result", key), codec.encode(result), ex=self.result_ttl_seconds)
+            lock_key = self._redis_key("lock", key)
+            raw = client.get(lock_key)
+            if raw is not None and (raw.decode() if isinstance(raw, bytes) else raw) == token:
+                client.delete(lock_key)
+        except Exception as exc:
+            self._count("redis_errors")
+            log.debug(f"SINGLE_FLIGHT_PUBLISH_ERROR | name={self.name} | error={exc}")
+
+    async def _off_loop(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Redis steps of the async path run off the event loop (inline without a Redis tier)."""
+        if self._get_redis() is None:
+            return fn(*args)
+        return await to_thread(fn, *args)
+
+    def _poll_remote(self, key: str) -> Tuple[bool, Any]:
+        """One poll step: (done, result); done=True with a result, or when the holder is gone."""
+        found, result = self._remote_result(key)
+        if found:
+            return True, result
+        return (not self._lock_held(key)), None
+
+    # ────────────────────────────────────────────────────────
+    # Public API
+    # ────────────────────────────────────────────────────────
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        *,
+        store_if: Callable[[Any], bool] = _default_store_if,
+    ) -> Any:
+        """Await `fn()` once per in-flight `key`; concurrent callers share its outcome."""
+        if not self.enabled:
+            return await fn()
+        while True:
+            fut, leader = self._join(key)
+            if not leader:
+                try:
+                    result = await asyncio.wrap_future(fut)
+                except _Abandoned:
+                    continue
+                self._count("collapsed")
+                return copy.deepcopy(result)
+
+            try:
+                token = await self._off_loop(self._try_lock, key)
+                if token is None:
+                    found, result = await self._await_remote(key)
+                    if found:
+                        self._finish(key, fut, result=result)
+                        return result
+                    token = uuid.uuid4().hex
+                self._count("leaders")
+                result = await fn()
+            except asyncio.CancelledError:
+                self._count("abandoned")
+                self._finish(key, fut, error=_Abandoned())
+                raise
+            except BaseException as exc:
+                self._finish(key, fut, error=exc)
+                raise
+            await self._off_loop(self._publish, key, token, result, store_if)
+            self._finish(key, fut, result=result)
+            return result
+
+    def run_sync(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        *,
+        store_if: Callable[[Any], bool] = _default_store_if,
+    ) -> Any:
+        """Blocking variant of `run` for sync callers (thread-pool handlers)."""
+        if not self.enabled:
+            return fn()
+        while True:
+            fut, leader = self._join(key)
+            if not leader:
+                try:
+                    result = fut.result()
+                except _Abandoned:
+                    continue
+                self._count("collapsed")
+                return copy.deepcopy(result)
+
+            try:
+                token = self._try_lock(key)
+                if token is None:
+                    found, result = self._wait_remote(key)
+                    if found:
+                        self._finish(key, fut, result=result)
+                        return result
+                    token = uuid.uuid4().hex
+                self._count("leaders")
+                result = fn()
+            except BaseException as exc:
+                self._finish(key, fut, error=exc)
+                raise
+            self._publish(key, token, result, store_if)
+            self._finish(key, fut, result=result)
+            return result
+
+    async def _await_remote(self, key: str) -> Tuple[bool, Any]:
+        deadline = time.monotonic() + self.wait_ms / 1000.0
+        while time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_SECONDS)
+            done, result = await self._off_loop(self._poll_remote, key)
+            if done:
+                return self._remote_outcome(result)
+        self._count("remote_timeouts")
+        return False, None
+
+    def _wait_remote(self, key: str) -> Tuple[bool, Any]:
+        deadline = time.monotonic() + self.wait_ms / 1000.0
+        while time.monotonic() < deadline:
+            time.sleep(_POLL_SECONDS)
+            done, result = self._poll_remote(key)
+            if done:
+                return self._remote_outcome(result)
+        self._count("remote_timeouts")
+        return False, None
+
+    def _remote_outcome(self, result: Any) -> Tuple[bool, Any]:
+        if result is None:
+            # Holder finished with nothing publishable (or died): run it here
+            self._count("remote_misses")
+            return False, None
+        self._count("remote_collapsed")
+        return True, result
+
+    def _count(self, event: str) -> None:
+        with self._lock:
+            self._stats[event] = self._stats.get(event, 0) + 1
+        inc("shopbot_single_flight_total", call=self.name, event=event)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["in_flight"] = len(self._inflight)
+        calls = out.get("leaders", 0) + out.get("collapsed", 0) + out.get("remote_collapsed", 0)
+        out["collapse_rate"] = round((calls - out.get("leaders", 0)) / calls, 4) if calls else 0.0
+        out["enabled"] = self.enabled
+        out["redis_tier"] = self._get_redis() is not None
+        return out
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(name: str) -> SingleFlight:
+    """Process-wide coalescer for one call type, configured from the environment."""
+    flight = _flights.get(name)
+    if flight is None:
+        with _flights_lock:
+            flight = _flights.setdefault(name, SingleFlight(name))
+    return flight
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    return {name: flight.stats() for name, flight in sorted(_flights.items())}
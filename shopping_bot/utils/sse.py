@@ -1,8 +1,27 @@
+"""
+Server-Sent Events helpers.
+
+• `make_event` / `heartbeat` format frames.
+• `relay` runs a producer coroutine that reports progress through an
+  `emit` callback and yields its events as they arrive, heartbeats while it
+  is quiet, and finally its result. The hand-off queue is bounded, so a slow
+  client slows the producer; closing the relay cancels the producer.
+• `EventStreamBody` wraps an async generator of frames as a response body.
+  The ASGI adapter (shopping_bot/asgi.py) iterates it on the worker loop and
+  awaits every socket send; under WSGI it is driven on a private loop in the
+  request thread.
+• `StreamLimiter` caps concurrent streams per worker.
+"""
+
 from __future__ import annotations
 
+import asyncio
 import json
+import threading
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+Emit = Callable[[Dict[str, Any]], Awaitable[None]]
 
 
 def make_event(event_type: str, data: Dict[str, Any]) -> str:
@@ -15,3 +34,129 @@ def heartbeat() -> str:
     return make_event("heartbeat", {"ts": datetime.utcnow().isoformat() + "Z"})
 
 
+async def relay(
+    run: Callable[[Emit], Awaitable[Any]],
+    *,
+    heartbeat_s: float,
+    max_pending: int = 64,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Run `run(emit)` as a task and yield, in order:
+
+        ("stream", {"event", "data"})   for every emit({"event", "data"})
+        ("heartbeat", None)             whenever nothing arrived for heartbeat_s
+        ("result", value) | ("error", exc)   exactly once, last
+    """
+    queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue(maxsize=max_pending)
+
+    async def emit(event: Dict[str, Any]) -> None:
+        await queue.put(("stream", {"event": event.get("event", "delta"), "data": event.get("data", {})}))
+
+    async def runner() -> None:
+        try:
+            result = await run(emit)
+        except Exception as exc:  # noqa: BLE001 - surfaced to the consumer
+            await queue.put(("error", exc))
+        else:
+            await queue.put(("result", result))
+
+    task = asyncio.ensure_future(runner())
+    try:
+        while True:
+            try:
+                kind, payload = await asyncio.wait_for(queue.get(), timeout=heartbeat_s)
+            except asyncio.TimeoutError:
+                yield "heartbeat", None
+                continue
+            yield kind, payload
+            if kind in ("result", "error"):
+                return
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:  # noqa: BLE001 - cancelled/aborted producer
+                pass
+
+
+class EventStreamBody:
+    """Response body over an async generator of SSE frames (bytes)."""
+
+    def __init__(self, frames: AsyncIterator[bytes], on_close: Optional[Callable[[], None]] = None):
+        self._frames = frames
+        self._on_close = on_close
+        self._sync: Optional[Iterator[bytes]] = None
+        self._closed = False
+
+    # ── ASGI: iterated on the worker loop ──
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._frames.__aiter__()
+
+    async def aclose(self) -> None:
+        try:
+            await self._frames.aclose()
+        finally:
+            self._release()
+
+    # ── WSGI: driven on a private loop in the request thread ──
+
+    def __iter__(self) -> Iterator[bytes]:
+        self._sync = self._drive()
+        return self._sync
+
+    def _drive(self) -> Iterator[bytes]:
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(self._frames.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            try:
+                loop.run_until_complete(self._frames.aclose())
+                # What asyncio.run does on exit: loop-bound resources (e.g. the
+                # ES transport's aiohttp session) are closed by async generators
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                if hasattr(loop, "shutdown_default_executor"):  # 3.9+
+                    loop.run_until_complete(loop.shutdown_default_executor())
+            finally:
+                loop.close()
+                self._release()
+
+    def close(self) -> None:
+        if self._sync is not None:
+            self._sync.close()
+        self._release()
+
+    def _release(self) -> None:
+        if not self._closed:
+            self._closed = True
+            if self._on_close is not None:
+                self._on_close()
+
+
+class StreamLimiter:
+    """Counts open streams; `try_acquire` fails once `limit` are open (0 = unlimited)."""
+
+    def __init__(self, limit: int):
+        self.limit = int(limit)
+        self.active = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.limit and self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.active = max(0, self.active - 1)
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": self.active, "limit": self.limit, "rejected": self.rejected}
@@ -0,0 +1,200 @@
+# shopping_bot/utils/tracing.py
+"""
+Leveled, lazy tracing for hot paths.
+
+Replaces per-request print() dumps with stdlib logging that only pays for
+formatting when the level is enabled:
+
+    _trace = get_tracer(__name__)
+    _trace.debug("ES_REQUEST | endpoint=%s", endpoint)       # %-args, formatted lazily
+    _trace.debug(lambda: f"PREVIEW | {expensive()}")         # callable, evaluated lazily
+    _trace.capture("es_query", body, endpoint=endpoint)      # ring buffer (+ sampled TRACE dump)
+
+Configuration (env):
+  TRACE_LEVEL        default level for every tracer (TRACE/DEBUG/INFO/WARNING/ERROR), default INFO
+  TRACE_LEVELS       per-module overrides, e.g. "es_products=DEBUG,redis_manager=WARNING"
+                     (matched against the dotted logger name suffix)
+  TRACE_SAMPLE_RATE  fraction (0..1) of captured payloads that are also dumped to the log at TRACE
+  TRACE_RING_SIZE    payloads kept per kind for the debug endpoint (0 disables capture)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+_LEVEL_NAMES = {
+    "TRACE": TRACE,
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARN": logging.WARNING,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+
+Message = Union[str, Callable[[], str]]
+
+
+def _parse_level(name: Optional[str], default: int = logging.INFO) -> int:
+    if not name:
+        return default
+    return _LEVEL_NAMES.get(str(name).strip().upper(), default)
+
+
+def _parse_overrides(raw: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        name, level = part.split("=", 1)
+        if name.strip():
+            out[name.strip()] = _parse_level(level)
+    return out
+
+
+_DEFAULT_LEVEL = _parse_level(os.getenv("TRACE_LEVEL"), logging.INFO)
+_OVERRIDES = _parse_overrides(os.getenv("TRACE_LEVELS", ""))
+_SAMPLE_RATE = max(0.0, min(1.0, float(os.getenv("TRACE_SAMPLE_RATE", "0") or 0)))
+_RING_SIZE = max(0, int(os.getenv("TRACE_RING_SIZE", "50") or 0))
+
+_tracers: Dict[str, "Tracer"] = {}
+_rings: Dict[str, Deque[Dict[str, Any]]] = {}
+_lock = threading.Lock()
+
+
+class Tracer:
+    """Thin wrapper over a stdlib logger with lazy messages and payload capture."""
+
+    def __init__(self, name: str, level: int):
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(level)
+
+    def set_level(self, level: Union[int, str]) -> None:
+        self.logger.setLevel(_parse_level(level) if isinstance(level, str) else int(level))
+
+    @property
+    def level(self) -> int:
+        return self.logger.getEffectiveLevel()
+
+    def enabled(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def _emit(self, level: int, msg: Message, args: tuple) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if callable(msg):
+            try:
+                msg = msg()
+            except Exception as exc:  # never let tracing break a request
+                msg = f"TRACE_FORMAT_ERROR | {exc}"
+        self.logger.log(level, msg, *args)
+
+    def trace(self, msg: Message, *args: Any) -> None:
+        self._emit(TRACE, msg, args)
+
+    def debug(self, msg: Message, *args: Any) -> None:
+        self._emit(logging.DEBUG, msg, args)
+
+    def info(self, msg: Message, *args: Any) -> None:
+        self._emit(logging.INFO, msg, args)
+
+    def warning(self, msg: Message, *args: Any) -> None:
+        self._emit(logging.WARNING, msg, args)
+
+    def error(self, msg: Message, *args: Any) -> None:
+        self._emit(logging.ERROR, msg, args)
+
+    def capture(self, kind: str, payload: Any, **meta: Any) -> None:
+        """Keep a reference to `payload` in the `kind` ring; dump a sampled copy at TRACE.
+
+        Serialization only happens when the payload is dumped or fetched from the
+        debug endpoint, so capturing is O(1) on the request path.
+        """
+        if _RING_SIZE:
+            entry = {"ts": time.time(), "source": self.name, "meta": meta, "payload": payload}
+            with _lock:
+                ring = _rings.get(kind)
+                if ring is None:
+                    ring = _rings[kind] = deque(maxlen=_RING_SIZE)
+                ring.append(entry)
+        if _SAMPLE_RATE and self.logger.isEnabledFor(TRACE) and random.random() < _SAMPLE_RATE:
+            self.logger.log(
+                TRACE,
+                "CAPTURE | kind=%s | meta=%s | payload=%s",
+                kind,
+                meta,
+                _LazyJSON(payload),
+            )
+
+
+class _LazyJSON:
+    """Defers json.dumps until the log record is actually formatted."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        try:
+            return json.dumps(self.obj, ensure_ascii=False, default=str)
+        except Exception:
+            return repr(self.obj)
+
+
+def _level_for(name: str) -> int:
+    best: Optional[str] = None
+    for key in _OVERRIDES:
+        if name == key or name.endswith("." + key):
+            if best is None or len(key) > len(best):
+                best = key
+    return _OVERRIDES[best] if best else _DEFAULT_LEVEL
+
+
+def get_tracer(name: str) -> Tracer:
+    """Get or create the tracer for a module (level from TRACE_LEVEL / TRACE_LEVELS)."""
+    with _lock:
+        tracer = _tracers.get(name)
+        if tracer is None:
+            tracer = _tracers[name] = Tracer(name, _level_for(name))
+        return tracer
+
+
+def set_levels(levels: Dict[str, str]) -> Dict[str, str]:
+    """Change tracer levels at runtime; keys match like TRACE_LEVELS entries."""
+    with _lock:
+        for key, level in (levels or {}).items():
+            _OVERRIDES[key] = _parse_level(level)
+        tracers = list(_tracers.values())
+    for tracer in tracers:
+        tracer.set_level(_level_for(tracer.name))
+    return levels_snapshot()
+
+
+def levels_snapshot() -> Dict[str, str]:
+    with _lock:
+        tracers = list(_tracers.values())
+    return {t.name: logging.getLevelName(t.level) for t in tracers}
+
+
+def recent_payloads(kind: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Most recent captured payloads of `kind`, newest first."""
+    with _lock:
+        ring = list(_rings.get(kind) or [])
+    return list(reversed(ring))[: max(0, int(limit))]
+
+
+def capture_kinds() -> Dict[str, int]:
+    with _lock:
+        return {kind: len(ring) for kind, ring in _rings.items()}
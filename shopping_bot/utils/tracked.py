@@ -0,0 +1,210 @@
+# shopping_bot/utils/tracked.py
+"""
+Change-tracking containers for UserContext buckets.
+
+`TrackedDict` records which top-level keys were written (`dirty`), removed
+(`deleted`) or handed out by a read whose value is mutable (`touched`, since
+the caller may mutate it in place). The Redis layer uses this to write only
+what changed:
+
+    dirty / deleted   → always written / HDEL'd
+    touched           → re-serialized, written only if it differs from the baseline
+    everything else   → skipped (no serialization at all)
+
+`touched` survives `mark_clean()`: a caller can keep a reference to a nested
+value across a save and mutate it later, so every mutable value that was
+handed out (or written) stays under comparison for the life of the object.
+`is_dirty()` therefore means "may have unsaved changes"; the save diffs
+touched fields against the baseline and sends nothing when they match.
+
+`HistoryList` is the append-only log used for conversation history. It
+counts appends and prefix trims (`del h[:n]`) so a save can be `RPUSH` of
+the new items + `LTRIM`; any other mutation flags a full rewrite. Entries
+are treated as immutable records once appended.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Optional, Set
+
+_IMMUTABLE = (str, int, float, bool, bytes, type(None))
+
+
+class TrackedDict(dict):
+    """dict that remembers which top-level keys changed since `mark_clean()`."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # A dict built outside the loader has no stored baseline: write all of it
+        self.replaced = True
+        self.dirty: Set[str] = set()
+        self.deleted: Set[str] = set()
+        self.touched: Set[str] = set()
+        # field -> serialized form as last loaded/saved (for touched comparisons)
+        self.baseline: Dict[str, Any] = {}
+
+    @classmethod
+    def loaded(cls, data: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> "TrackedDict":
+        """Wrap data read from storage; it starts clean."""
+        out = cls(data)
+        out.replaced = False  # nothing outside holds references into freshly decoded data
+        out.mark_clean(baseline)
+        return out
+
+    def mark_clean(self, baseline: Optional[Dict[str, Any]] = None) -> None:
+        # Mutable values that left this dict may still be changed through a held reference
+        exposed = set(dict.keys(self)) if self.replaced else self.touched | self.dirty
+        self.touched = {k for k in exposed if k in self and not isinstance(dict.__getitem__(self, k), (_IMMUTABLE, HistoryList))}
+        self.replaced = False
+        self.dirty.clear()
+        self.deleted.clear()
+        if baseline is not None:
+            self.baseline = dict(baseline)
+        for value in dict.values(self):
+            if isinstance(value, HistoryList):
+                value.mark_clean()
+
+    def is_dirty(self) -> bool:
+        if self.replaced or self.dirty or self.deleted or self.touched:
+            return True
+        return any(isinstance(v, HistoryList) and v.is_dirty() for v in dict.values(self))
+
+    # ── writes ──
+
+    def _write(self, key: Any) -> None:
+        self.dirty.add(key)
+        self.deleted.discard(key)
+
+    def _remove(self, key: Any) -> None:
+        self.deleted.add(key)
+        self.dirty.discard(key)
+        self.touched.discard(key)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        super().__setitem__(key, value)
+        self._write(key)
+
+    def __delitem__(self, key: Any) -> None:
+        super().__delitem__(key)
+        self._remove(key)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key in self:
+            self._remove(key)
+        return super().pop(key, *default)
+
+    def popitem(self) -> Any:
+        key, value = super().popitem()
+        self._remove(key)
+        return key, value
+
+    def clear(self) -> None:
+        for key in list(dict.keys(self)):
+            self._remove(key)
+        super().clear()
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+            return default
+        return self[key]
+
+    # ── reads that hand out (possibly mutable) values ──
+
+    def _touch(self, key: Any, value: Any) -> Any:
+        if not isinstance(value, (_IMMUTABLE, HistoryList)):
+            self.touched.add(key)
+        return value
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._touch(key, super().__getitem__(key))
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        return default
+
+    def values(self):  # type: ignore[override]
+        for key in dict.keys(self):
+            self._touch(key, dict.__getitem__(self, key))
+        return super().values()
+
+    def items(self):  # type: ignore[override]
+        self.values()
+        return super().items()
+
+    def copy(self) -> Dict[str, Any]:
+        self.values()
+        return dict(self)
+
+
+class HistoryList(list):
+    """list that records appends and prefix trims since `mark_clean()`."""
+
+    def __init__(self, items: Iterable[Any] = ()):
+        super().__init__(items)
+        self.appended = 0
+        self.trimmed = False
+        self.rewritten = False
+
+    def mark_clean(self) -> None:
+        self.appended = 0
+        self.trimmed = False
+        self.rewritten = False
+
+    def is_dirty(self) -> bool:
+        return self.rewritten or self.trimmed or self.appended > 0
+
+    def new_items(self) -> list:
+        return list.__getitem__(self, slice(len(self) - self.appended, None)) if self.appended else []
+
+    def append(self, item: Any) -> None:
+        super().append(item)
+        self.appended += 1
+
+    def extend(self, items: Iterable[Any]) -> None:
+        before = len(self)
+        super().extend(items)
+        self.appended += len(self) - before
+
+    def __iadd__(self, items: Iterable[Any]) -> "HistoryList":
+        self.extend(items)
+        return self
+
+    def __delitem__(self, index: Any) -> None:
+        before = len(self)
+        if isinstance(index, slice) and index.start in (None, 0) and index.step in (None, 1):
+            super().__delitem__(index)
+            # A prefix trim is what LTRIM does anyway; only appended items it ate matter
+            removed = before - len(self)
+            self.trimmed = self.trimmed or removed > 0
+            old = before - self.appended
+            if removed > old:
+                self.appended -= removed - old
+            return
+        super().__delitem__(index)
+        self.rewritten = True
+
+    def _rewrite(name: str):  # type: ignore[misc]
+        method = getattr(list, name)
+
+        def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            self.rewritten = True
+            return method(self, *args, **kwargs)
+
+        wrapper.__name__ = name
+        return wrapper
+
+    __setitem__ = _rewrite("__setitem__")
+    __imul__ = _rewrite("__imul__")
+    insert = _rewrite("insert")
+    pop = _rewrite("pop")
+    remove = _rewrite("remove")
+    clear = _rewrite("clear")
+    sort = _rewrite("sort")
+    reverse = _rewrite("reverse")
+    del _rewrite
@@ -13,9 +13,10 @@ import logging
 from typing import Any, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
-import anthropic
+from anthropic import AsyncAnthropic
 
 from .config import get_config
+from .llm_registry import get_anthropic_client
 from .models import UserContext
 from .enums import UXIntentType, PSLType
 from .bot_helpers import pick_tool
@@ -75,8 +76,9 @@ UX_CLASSIFICATION_TOOL = {
 class UXClassifierService:
     """Service for classifying user queries into UX intent patterns"""
     
-    def __init__(self):
-        self.anthropic = anthropic.AsyncAnthropic(api_key=Cfg.ANTHROPIC_API_KEY)
+    @property
+    def anthropic(self) -> AsyncAnthropic:
+        return get_anthropic_client()
     
     async def classify_ux_intent(
         self, 
@@ -16,9 +16,10 @@ import logging
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
-import anthropic
+from anthropic import AsyncAnthropic
 
 from .config import get_config
+from .llm_registry import get_anthropic_client
 from .models import UserContext
 
 Cfg = get_config()
@@ -116,8 +117,9 @@ class UXResponseGenerator:
     Designed to be separable as future microservice.
     """
     
-    def __init__(self):
-        self.anthropic = anthropic.AsyncAnthropic(api_key=Cfg.ANTHROPIC_API_KEY)
+    @property
+    def anthropic(self) -> AsyncAnthropic:
+        return get_anthropic_client()
     
     async def generate_ux_response(
         self,
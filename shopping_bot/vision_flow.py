@@ -3,13 +3,13 @@ from __future__ import annotations
 import json
 from typing import Any, Dict, List, Tuple
 
-import anthropic
 import base64
 import mimetypes
 import traceback
 
 from .config import get_config
 from .data_fetchers.es_products import get_es_fetcher
+from .llm_registry import get_anthropic_client
 from .models import UserContext
 
 Cfg = get_config()
@@ -87,7 +87,7 @@ async def process_image_query(ctx: UserContext, image_url: str) -> Dict[str, Any
     """
     try:
         media_type, b64_data = _normalize_b64_input(image_url)
-        extractor = anthropic.AsyncAnthropic(api_key=Cfg.ANTHROPIC_API_KEY)
+        extractor = get_anthropic_client()
 
         TOOL = {
             "name": "parse_product_from_image",
@@ -172,10 +172,8 @@ async def process_image_query(ctx: UserContext, image_url: str) -> Dict[str, Any
                     "fields": ["name^5", "description^2", "combined_text"],
                 }
             })
-        # Prepare fetcher and loop before any sync offloading
+        # Prepare fetcher (async transport; no executor offloading needed)
         fetcher = get_es_fetcher()
-        import asyncio as _a
-        loop = _a.get_running_loop()
 
         if brand_name:
             should.append({
@@ -204,7 +202,7 @@ async def process_image_query(ctx: UserContext, image_url: str) -> Dict[str, Any
         if brand_name:
             # Brand normalization via ES brand suggestion to align with canonical values (e.g., 'Dabur Real')
             try:
-                canonical = await loop.run_in_executor(None, lambda: fetcher.suggest_brand(brand_name, category_group or None))
+                canonical = await fetcher.asuggest_brand(brand_name, category_group or None)
             except Exception:
                 canonical = None
             effective_brand = (canonical or brand_name).strip()
@@ -223,7 +221,7 @@ async def process_image_query(ctx: UserContext, image_url: str) -> Dict[str, Any
         if flavor_tokens:
             params["must_keywords"] = flavor_tokens
 
-        result = await loop.run_in_executor(None, lambda: fetcher.search(params))
+        result = await fetcher.asearch(params)
 
         products = (result or {}).get("products", [])
         product_ids: List[str] = [str(p.get("id")).strip() for p in products[:3] if str(p.get("id") or "").strip()]